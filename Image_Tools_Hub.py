@@ -1,3 +1,5 @@
+import time
+_PAGE_IMPORT_START = time.perf_counter()
 import streamlit as st
 import os
 import sys
@@ -11,9 +13,11 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.append(current_dir)
 
-from utils import load_css
+from utils import load_css, render_api_usage_report, render_startup_report
+from logic.instrumentation import record_page_startup
 
 # --- Seitenkonfiguration ---
+record_page_startup("Image Tools Hub", time.perf_counter() - _PAGE_IMPORT_START)
 st.set_page_config(
     page_title="Image Tools Hub",
     page_icon="🛠️",
@@ -41,10 +45,14 @@ st.markdown(
     - **💡 Concept Generator**: Erzeugt Bilder aus textuellen Ideen und Stilen.
     - **🔬 Model Testbed**: Vergleicht die Ergebnisse verschiedener Bildmodelle.
     - **✍️ Prompt Generator**: Erstellt hochwertige Prompts für Bild-KIs.
+    - **🗂️ Verlauf**: Öffnet frühere Ergebnisse aus dem lokalen Verlauf, ohne neu zu generieren.
     """
 )
 
 st.info(
     "Jede Seite ist ein eigenständiges Tool. API-Schlüssel und Konfigurationen werden aus der `.env`-Datei im Projektverzeichnis geladen.",
     icon="ℹ️"
-)
\ No newline at end of file
+)
+
+render_startup_report()
+render_api_usage_report()
@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from PIL import Image
+
+# Verfügbare rembg-Modelle (Name -> Beschreibung für die UI)
+REMBG_MODELS: dict[str, str] = {
+    "u2net": "U²-Net – Standard, ausgewogen",
+    "u2netp": "U²-Net-P – sehr schnell, ideal für einfache Flaschenbilder",
+    "isnet-general-use": "IS-Net – präzise Kanten, langsamer",
+    "silueta": "Silueta – kompakt, schnell",
+    "u2net_human_seg": "U²-Net Human – für Personen",
+    "birefnet-general-lite": "BiRefNet Lite – hohe Qualität",
+    "birefnet-general": "BiRefNet – höchste Qualität, sehr langsam",
+}
+DEFAULT_REMBG_MODEL = "u2net"
+
+EXECUTION_PROVIDER_OPTIONS: dict[str, list[str]] = {
+    "CPU": ["CPUExecutionProvider"],
+    "CUDA": ["CUDAExecutionProvider", "CPUExecutionProvider"],
+    "CoreML": ["CoreMLExecutionProvider", "CPUExecutionProvider"],
+}
+DEFAULT_EXECUTION_PROVIDER = "CPU"
+
+MAX_WARM_SESSIONS = 3          # Maximal gleichzeitig geladene Modelle
+SESSION_MAX_IDLE_SECONDS = 900  # Nicht genutzte Modelle werden danach entladen
+
+DEFAULT_ALPHA_MATTING_OPTIONS: dict = {
+    "alpha_matting_foreground_threshold": 240,
+    "alpha_matting_background_threshold": 10,
+    "alpha_matting_erode_size": 10,
+}
+
+# OMP_NUM_THREADS gilt prozessweit: Setzen, Anlegen der Session und Zurücksetzen dürfen sich nicht überschneiden
+_session_env_lock = threading.Lock()
+
+# === Session-Pool ===
+class RembgSessionPool:
+    """
+    Hält rembg-Sessions pro (Modell, Provider, Threads) warm.
+    Begrenzt auf max_size Einträge mit LRU-Verdrängung; Leerlauf-Sessions werden entladen.
+    """
+
+    def __init__(self, max_size: int = MAX_WARM_SESSIONS, max_idle_seconds: float = SESSION_MAX_IDLE_SECONDS):
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self._sessions: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._loading: dict[tuple, threading.Event] = {}  # Sessions, die gerade (außerhalb des Locks) angelegt werden
+        self._lock = threading.Lock()
+        self.timings: dict[str, list[float]] = {}
+
+    @staticmethod
+    def _create_session(model: str, providers: list[str], threads: Optional[int]) -> Any:
+        from rembg import new_session  # Lazy: rembg zieht onnxruntime, scipy und scikit-image nach
+
+        # rembg übernimmt die Thread-Anzahl aus OMP_NUM_THREADS beim Anlegen der ONNX-Session.
+        # Eigener Lock (nicht der Pool-Lock): auch Sessions ohne threads dürfen keinen fremden Wert sehen
+        with _session_env_lock:
+            previous = os.environ.get("OMP_NUM_THREADS")
+            try:
+                if threads:
+                    os.environ["OMP_NUM_THREADS"] = str(threads)
+                return new_session(model, providers=providers)
+            finally:
+                if threads:
+                    if previous is None:
+                        os.environ.pop("OMP_NUM_THREADS", None)
+                    else:
+                        os.environ["OMP_NUM_THREADS"] = previous
+
+    def get(self, model: str, providers: Optional[list[str]] = None, threads: Optional[int] = None) -> Any:
+        """
+        Liefert eine warme Session; legt sie bei Bedarf an und verdrängt die am längsten ungenutzte.
+        Das Anlegen läuft außerhalb des Locks, damit loaded_models() & Co. währenddessen nicht blockieren;
+        parallele Anfragen für dasselbe Modell warten auf den ersten Ladevorgang statt doppelt zu laden.
+        """
+        providers = providers or EXECUTION_PROVIDER_OPTIONS[DEFAULT_EXECUTION_PROVIDER]
+        pool_key = (model, tuple(providers), threads)
+        while True:
+            with self._lock:
+                self._evict_idle_locked()
+                entry = self._sessions.get(pool_key)
+                if entry is not None:
+                    self._sessions.move_to_end(pool_key)
+                    entry["last_used"] = time.monotonic()
+                    return entry["session"]
+                loading = self._loading.get(pool_key)
+                if loading is None:
+                    loading = self._loading[pool_key] = threading.Event()
+                    break
+            # Ein anderer Thread lädt bereits; danach erneut nachsehen (schlug das Laden fehl, versuchen wir es selbst)
+            loading.wait()
+
+        try:
+            session = self._create_session(model, providers, threads)
+            with self._lock:
+                self._sessions[pool_key] = {"session": session, "last_used": time.monotonic()}
+                while len(self._sessions) > self.max_size:
+                    self._sessions.popitem(last=False)
+            return session
+        finally:
+            with self._lock:
+                del self._loading[pool_key]
+            loading.set()
+
+    def _evict_idle_locked(self) -> None:
+        now = time.monotonic()
+        for pool_key in [k for k, v in self._sessions.items() if now - v["last_used"] > self.max_idle_seconds]:
+            del self._sessions[pool_key]
+
+    def preload(self, model: str, providers: Optional[list[str]] = None, threads: Optional[int] = None) -> None:
+        """Lädt ein Modell vorab und führt eine Mini-Inferenz aus, damit der erste echte Aufruf schnell ist."""
+        from rembg import remove
+        session = self.get(model, providers, threads)
+        remove(Image.new("RGB", (64, 64), "white"), session=session)
+
+    def preload_async(self, model: str, providers: Optional[list[str]] = None, threads: Optional[int] = None) -> threading.Thread:
+        thread = threading.Thread(target=self.preload, args=(model, providers, threads), daemon=True)
+        thread.start()
+        return thread
+
+    def loaded_models(self) -> list[str]:
+        with self._lock:
+            return [k[0] for k in self._sessions.keys()]
+
+    def loading_models(self) -> list[str]:
+        with self._lock:
+            return [k[0] for k in self._loading.keys()]
+
+    def record_timing(self, model: str, seconds: float) -> None:
+        with self._lock:
+            self.timings.setdefault(model, []).append(seconds)
+
+    def timing_summary(self) -> list[dict]:
+        """Inferenzzeiten je Modell (Anzahl, letzte, Mittelwert, Minimum) für die Anzeige."""
+        with self._lock:
+            return [
+                {"Modell": model, "Läufe": len(values), "Letzte (s)": round(values[-1], 2),
+                 "Mittel (s)": round(sum(values) / len(values), 2), "Min (s)": round(min(values), 2)}
+                for model, values in self.timings.items() if values
+            ]
+
+_SESSION_POOL = RembgSessionPool()
+
+def get_session_pool() -> RembgSessionPool:
+    """Prozessweiter Pool, den alle Seiten und Jobs teilen."""
+    return _SESSION_POOL
+
+def available_execution_providers() -> list[str]:
+    """Namen der Provider-Optionen, die onnxruntime in dieser Umgebung anbietet."""
+    try:
+        import onnxruntime
+        available = set(onnxruntime.get_available_providers())
+    except Exception:
+        return [DEFAULT_EXECUTION_PROVIDER]
+    return [name for name, providers in EXECUTION_PROVIDER_OPTIONS.items() if providers[0] in available]
+
+# === Freistellung ===
+def remove_background(
+    img: Image.Image,
+    model: str = DEFAULT_REMBG_MODEL,
+    alpha_matting: bool = False,
+    alpha_matting_options: Optional[dict] = None,
+    execution_provider: str = DEFAULT_EXECUTION_PROVIDER,
+    threads: Optional[int] = None,
+) -> Tuple[Image.Image, float]:
+    """
+    Entfernt den Hintergrund direkt auf einem PIL-Bild (ohne PNG-Umweg).
+    Gibt das RGBA-Ergebnis und die Inferenzzeit in Sekunden zurück.
+    """
+    if model not in REMBG_MODELS:
+        raise ValueError(f"Unbekanntes rembg-Modell: {model}")
+    from rembg import remove
+
+    pool = get_session_pool()
+    session = pool.get(model, EXECUTION_PROVIDER_OPTIONS.get(execution_provider), threads)
+    matting_kwargs = {**DEFAULT_ALPHA_MATTING_OPTIONS, **(alpha_matting_options or {})} if alpha_matting else {}
+
+    start = time.perf_counter()
+    result = remove(img, session=session, alpha_matting=alpha_matting, **matting_kwargs)
+    elapsed = time.perf_counter() - start
+    pool.record_timing(model, elapsed)
+    return result.convert("RGBA"), elapsed
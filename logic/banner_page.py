@@ -0,0 +1,177 @@
+"""
+Gemeinsame Streamlit-Bausteine der Banner-Seiten (Direct, Classic, Concept).
+
+Alle Funktionen arbeiten auf st.session_state-Schlüsseln mit dem Präfix der jeweiligen Seite
+(z. B. "classic_bg_"): image_input, image_input_name, img_from, uploader_instance_key,
+temp_sku_input, ratio_choice, custom_width, custom_height, target_size, ai_banner_img.
+Seitenspezifisches (z. B. Duplikat-Hinweise) erledigt der on_new_image-Callback der Seite.
+"""
+import hashlib
+from typing import TYPE_CHECKING, Callable, Optional
+
+import streamlit as st
+from PIL import Image
+
+from utils import find_sku_row, render_sku_search
+from logic.pipeline import export_budget, export_image, load_sku_image, open_image
+from logic.upscale import resize_to_target, super_resolution_applies
+
+if TYPE_CHECKING:
+    import pandas as pd  # pandas wird erst mit den SKU-Daten geladen
+
+try:
+    from streamlit_cropper import st_cropper
+    CROPPER_AVAILABLE = True
+except ImportError:
+    CROPPER_AVAILABLE = False
+
+UPLOAD_IMAGE_TYPES = ["png", "jpg", "jpeg", "webp"]
+CROPPER_ASPECT_DEFINITION_MAX_WIDTH = 700
+CROPPER_BOX_COLOR = "#8c133a"
+BANNER_PREVIEW_WIDTH = 400
+
+# on_new_image(Bild, SKU-Zeile): setzt seitenspezifische States zurück; die SKU-Zeile ist None bei Uploads
+NewImageCallback = Callable[[Image.Image, Optional["pd.Series"]], None]
+
+# === Zielgröße ===
+def update_target_size(prefix: str, ratio_options: dict, default_ratio_key: str) -> None:
+    """Leitet target_size aus dem gewählten Format bzw. der benutzerdefinierten Größe ab."""
+    choice = st.session_state[prefix + "ratio_choice"]
+    if choice == "Custom":
+        st.session_state[prefix + "target_size"] = (st.session_state[prefix + "custom_width"], st.session_state[prefix + "custom_height"])
+    else:
+        st.session_state[prefix + "target_size"] = ratio_options.get(choice, ratio_options[default_ratio_key])
+
+# === Bild-Input ===
+def _set_input_image(prefix: str, img: Image.Image, name: str, source: str) -> None:
+    st.session_state[prefix + "image_input"] = img
+    st.session_state[prefix + "image_input_name"] = name
+    st.session_state[prefix + "img_from"] = source
+    st.session_state[prefix + "uploader_instance_key"] += 1
+
+def handle_upload(prefix: str, on_new_image: NewImageCallback) -> None:
+    """Datei-Upload als Bild-Input; ein neues Bild leert die SKU-Suche und startet die Seite neu."""
+    uploader_key = f"{prefix}uploader_{st.session_state[prefix + 'uploader_instance_key']}"
+    up_file = st.file_uploader("Bild auswählen (PNG/JPG/WEBP)", type=UPLOAD_IMAGE_TYPES, key=uploader_key)
+    if not up_file:
+        return
+    if st.session_state.get(prefix + "image_input_name") == up_file.name and st.session_state.get(prefix + "img_from") == "upload":
+        return
+    try:
+        img = open_image(up_file)
+        _set_input_image(prefix, img, up_file.name, "upload")
+        st.session_state[prefix + "temp_sku_input"] = ""
+        st.session_state.pop(prefix + "temp_sku_input_query", None)
+        on_new_image(img, None)
+    except Exception as e:
+        st.error(f"Bild konnte nicht geladen werden: {e}")
+    else:
+        st.rerun()
+
+def handle_sku_lookup(prefix: str, df_skus: "pd.DataFrame", on_new_image: NewImageCallback) -> None:
+    """SKU-Suche als Bild-Input (Bild-URL aus dem Katalog)."""
+    import pandas as pd  # Lazy: ist durch load_sku_data bereits geladen
+    render_sku_search(prefix + "temp_sku_input", df_skus, "SKU eingeben:")
+    if not st.button("🔍 Bild via SKU suchen", key=prefix + "sku_lookup_btn"):
+        return
+    sku_value = st.session_state[prefix + "temp_sku_input"].strip()
+    if not sku_value:
+        st.warning("Bitte eine SKU eingeben.")
+        return
+    if st.session_state.get(prefix + "image_input_name") == f"SKU:{sku_value}" and st.session_state.get(prefix + "img_from") == "sku":
+        return
+    match = find_sku_row(df_skus, sku_value)
+    if match is None or pd.isna(match["image_url"]):
+        st.error(f"Für SKU '{sku_value}' wurde kein gültiges Bild gefunden.")
+        return
+    try:
+        img = load_sku_image(df_skus, sku_value)
+        _set_input_image(prefix, img, f"SKU:{sku_value}", "sku")
+        on_new_image(img, match)
+    except Exception as e:
+        st.error(f"SKU-Bild konnte nicht geladen werden: {e}")
+    else:
+        st.rerun()
+
+# === Zuschnitt & Download ===
+def _cropper_aspect(target_w: int, target_h: int) -> tuple[int, int]:
+    """Seitenverhältnis für st_cropper in kleinen Zahlen (große Werte bremsen die Komponente aus)."""
+    if target_w > CROPPER_ASPECT_DEFINITION_MAX_WIDTH:
+        scale = CROPPER_ASPECT_DEFINITION_MAX_WIDTH / target_w
+        target_w, target_h = int(target_w * scale), int(target_h * scale)
+    return target_w, max(target_h, 1)
+
+def crop_banner(prefix: str) -> Optional[Image.Image]:
+    """
+    Zuschnitt des generierten Banners im Zielformat und Skalierung auf die Zielgröße.
+    Während des Zuschneidens (jede Box-Bewegung ist ein Rerun) wird nur per LANCZOS skaliert;
+    die ESRGAN-Hochskalierung läuft erst auf Knopfdruck und gilt, bis sich Zuschnitt oder Zielgröße ändern.
+    """
+    img_to_crop = st.session_state[prefix + "ai_banner_img"]
+    if not img_to_crop:
+        return None
+    target_size = tuple(st.session_state[prefix + "target_size"])
+    if not CROPPER_AVAILABLE:
+        st.warning("`streamlit-cropper` nicht installiert.")
+        return img_to_crop
+    box = st_cropper(img_to_crop, realtime_update=True, box_color=CROPPER_BOX_COLOR,
+                     aspect_ratio=_cropper_aspect(*target_size), return_type="box", key=prefix + "cropper")
+    crop_box = (box["left"], box["top"], box["left"] + box["width"], box["top"] + box["height"])
+    cropped = img_to_crop.crop(crop_box)
+    if not super_resolution_applies(cropped.size, target_size) or not st.checkbox(
+            "🔍 KI-Hochskalierung (Super-Resolution)", value=True, key=prefix + "use_sr",
+            help="Vergrößert per lokalem ESRGAN-Modell, bevor auf die Zielgröße skaliert wird (nur wenn die Zielgröße den Zuschnitt übersteigt)."):
+        return resize_to_target(cropped, target_size, False)
+
+    upscaled = st.session_state.get(prefix + "sr_banner")
+    if upscaled and upscaled["source"] is img_to_crop and upscaled["box"] == crop_box and upscaled["target_size"] == target_size:
+        st.caption("🔍 KI-hochskaliert.")
+        return upscaled["image"]
+    if st.button("🔍 Zuschnitt per KI hochskalieren", key=prefix + "sr_btn", use_container_width=True):
+        with st.spinner("Skaliere per ESRGAN hoch..."):
+            image = resize_to_target(cropped, target_size, True)
+        st.session_state[prefix + "sr_banner"] = {"source": img_to_crop, "box": crop_box, "target_size": target_size, "image": image}
+        return image
+    st.caption("Vorschau ohne KI-Hochskalierung – erst den Zuschnitt wählen, dann hochskalieren.")
+    return resize_to_target(cropped, target_size, False)
+
+def _encoding_key(img: Image.Image, target_size: tuple, output_format: str) -> str:
+    digest = hashlib.blake2b(f"{img.mode}:{img.size}:{tuple(target_size)}:{output_format}".encode("utf-8"), digest_size=16)
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+def _encode_banner(prefix: str, img: Image.Image, target_size: tuple, output_format: str) -> tuple[bytes, Optional[dict]]:
+    """
+    Kodierung für den Download. Während des Zuschneidens (jede Box-Bewegung ist ein Rerun) nur mit fester Qualität;
+    die Qualitätssuche für das CDN-Budget läuft auf Knopfdruck und gilt, bis sich Bild, Zielgröße oder Format ändern.
+    """
+    budget = export_budget(target_size, output_format)
+    if not budget:
+        return export_image(img, target_size, output_format, search_quality=False)
+    key = _encoding_key(img, target_size, output_format)
+    cached = st.session_state.get(prefix + "encoded_banner")
+    if cached and cached["key"] == key:
+        return cached["data"], cached["info"]
+    if st.button(f"🗜️ Auf CDN-Budget komprimieren ({budget / 1024:.0f} KB)", key=prefix + "encode_btn", use_container_width=True):
+        with st.spinner("Suche optimale Kompression..."):
+            data, info = export_image(img, target_size, output_format)
+        st.session_state[prefix + "encoded_banner"] = {"key": key, "data": data, "info": info}
+        return data, info
+    data, _ = export_image(img, target_size, output_format, search_quality=False)
+    st.caption(f"Export mit fester Qualität ({len(data) / 1024:.0f} KB) – für das CDN-Budget erst den Zuschnitt wählen, dann komprimieren.")
+    return data, None
+
+def download_banner(prefix: str, img: Image.Image, file_stem: str, output_format: str = "JPEG") -> None:
+    """Vorschau, Kodierung (CDN-Budget per Knopfdruck, falls vorhanden) und Download-Button."""
+    target_w, target_h = st.session_state[prefix + "target_size"]
+    extension = output_format.lower()
+    st.image(img, caption=f"Vorschau Banner ({target_w}×{target_h}px)", width=BANNER_PREVIEW_WIDTH)
+    download_bytes, enc_info = _encode_banner(prefix, img, (target_w, target_h), output_format)
+    if enc_info:
+        st.caption(f"🗜️ {enc_info['size'] / 1024:.0f} KB (Budget {enc_info['budget'] / 1024:.0f} KB) | Qualität {enc_info['quality']} | "
+                   f"Subsampling {enc_info['subsampling_label']} | SSIM {enc_info['ssim']:.4f}")
+    st.download_button(
+        f"📥 Banner herunterladen ({target_w}×{target_h}px - .{extension})", data=download_bytes,
+        file_name=f"{file_stem}_{target_w}x{target_h}.{extension}", mime=f"image/{extension}",
+        type="primary", use_container_width=True, key=prefix + "download_btn",
+    )
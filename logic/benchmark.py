@@ -0,0 +1,212 @@
+"""
+Benchmark für Bildmodelle: N Wiederholungen × M Prompts × K Modelle mit begrenzter Parallelität.
+
+Pro Aufruf werden Gesamtlatenz, Zeit bis Bilddaten, Antwortgröße, Fehler und Kosten festgehalten; daraus entstehen
+p50/p90/p99-Tabellen und Histogramme. "Zeit bis Bilddaten" reicht bis zum Beginn des Einlesens bzw. Dekodierens
+der Bildantwort (logic.transport): bei Streaming-Providern nach den Antwort-Headern, bei base64 in JSON erst,
+wenn die komplette Antwort vorliegt. Eine echte Time-to-first-Byte ist das nicht.
+
+Pro Modell laufen höchstens per_model_concurrency Aufträge gleichzeitig; weitere werden erst eingereiht,
+wenn ein Platz frei ist, damit wartende Aufträge keine Threads des Pools blockieren.
+
+Headless (aus dem Projekt-Root):
+    python -m logic.benchmark --model "GPT-Image-1" --model "Stability AI (Core)" --trials 5 --json bench.json
+"""
+import argparse
+import csv
+import io
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+DEFAULT_TRIALS = 3
+DEFAULT_CONCURRENCY = 4
+PER_MODEL_CONCURRENCY = 2  # Schont die Rate-Limits einzelner Provider
+HISTOGRAM_BINS = 12
+METRICS = {"latency_s": "Latenz (s)", "data_wait_s": "Zeit bis Bilddaten (s)", "payload_kb": "Antwortgröße (KB)"}
+
+@dataclass
+class TrialResult:
+    model: str
+    prompt_index: int
+    trial: int
+    ok: bool
+    latency_s: float
+    data_wait_s: Optional[float] = None  # Bis zum Beginn des Einlesens der Bildantwort (keine echte TTFB)
+    payload_kb: Optional[float] = None
+    payload_format: Optional[str] = None
+    cost_chf: Optional[float] = None
+    error: Optional[str] = None
+    started_at: float = 0.0  # Unix-Zeit
+
+def _run_trial(generate: Callable, model: str, prompt: str, prompt_index: int, trial: int,
+               target_size: tuple[int, int], cost_chf: Optional[float]) -> TrialResult:
+    started_at, started = time.time(), time.perf_counter()
+    try:
+        img = generate(model, prompt, *target_size)
+    except Exception as e:
+        return TrialResult(model, prompt_index, trial, ok=False, latency_s=time.perf_counter() - started,
+                           error=str(e)[:300], started_at=started_at)
+    latency = time.perf_counter() - started
+    transport = (getattr(img, "info", None) or {}).get("transport") or {}
+    return TrialResult(
+        model, prompt_index, trial, ok=img is not None, latency_s=latency,
+        data_wait_s=transport["started"] - started if "started" in transport else None,
+        payload_kb=transport["bytes"] / 1024 if "bytes" in transport else None,
+        payload_format=transport.get("format"), cost_chf=cost_chf, started_at=started_at,
+        error=None if img is not None else "Kein Bild erhalten.",
+    )
+
+def run_benchmark(models: list[str], prompts: list[str], trials: int = DEFAULT_TRIALS,
+                  target_size: tuple[int, int] = (1024, 1024), max_concurrency: int = DEFAULT_CONCURRENCY,
+                  per_model_concurrency: int = PER_MODEL_CONCURRENCY, cost_per_call: Optional[dict] = None,
+                  on_result: Optional[Callable[[TrialResult, int, int], None]] = None,
+                  generate: Optional[Callable] = None) -> list[TrialResult]:
+    """
+    Führt die ganze Matrix aus. Aufträge werden über Modelle verschränkt eingereiht, damit Lastspitzen
+    eines Providers nicht nur einen Teil der Läufe treffen; ein Auftrag wird erst übergeben, wenn sein Modell
+    unter per_model_concurrency liegt. on_result(ergebnis, fertig, gesamt) wird im aufrufenden Thread gemeldet
+    (Streamlit-Aufrufe nur dort).
+    """
+    if generate is None:
+        from logic.providers import generate_with_provider as generate
+    prompts = [p for p in (p.strip() for p in prompts) if p]
+    if not models or not prompts or trials < 1:
+        raise ValueError("Mindestens ein Modell, ein Prompt und eine Wiederholung angeben.")
+    cost_per_call = cost_per_call or {}
+    max_concurrency, per_model_concurrency = max(1, max_concurrency), max(1, per_model_concurrency)
+    tasks = [(model, prompt_index, trial) for trial in range(trials) for prompt_index in range(len(prompts)) for model in models]
+    waiting = list(tasks)
+    active = {model: 0 for model in models}
+    running: dict = {}  # Future -> Modell
+    results: list[TrialResult] = []
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        def submit_ready() -> None:
+            """Übergibt wartende Aufträge in Reihenfolge, solange Pool und Modell freie Plätze haben."""
+            for task in list(waiting):
+                if len(running) >= max_concurrency:
+                    return
+                model, prompt_index, trial = task
+                if active[model] >= per_model_concurrency:
+                    continue
+                waiting.remove(task)
+                active[model] += 1
+                future = executor.submit(_run_trial, generate, model, prompts[prompt_index], prompt_index, trial,
+                                         target_size, cost_per_call.get(model))
+                running[future] = model
+
+        submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                active[running.pop(future)] -= 1
+                results.append(future.result())
+                if on_result:
+                    on_result(results[-1], len(results), len(tasks))
+            submit_ready()
+    return sorted(results, key=lambda r: (r.model, r.prompt_index, r.trial))
+
+# === Auswertung ===
+def _percentiles(values: list[float]) -> list[Optional[float]]:
+    if not values:
+        return [None] * len(PERCENTILES)
+    return [round(float(v), 2) for v in np.percentile(np.asarray(values, dtype=np.float64), PERCENTILES)]
+
+def summarize(results: list[TrialResult]) -> list[dict]:
+    """Eine Zeile pro Modell: Fehlerquote, Perzentile (nur erfolgreiche Läufe), Antwortgröße und Kosten."""
+    by_model: dict[str, list[TrialResult]] = {}
+    for result in results:
+        by_model.setdefault(result.model, []).append(result)
+    rows = []
+    for model, entries in by_model.items():
+        ok = [r for r in entries if r.ok]
+        row = {"Modell": model, "Läufe": len(entries), "Fehler": len(entries) - len(ok),
+               "Fehlerquote (%)": round(100 * (len(entries) - len(ok)) / len(entries), 1)}
+        for label, values in (("Latenz", [r.latency_s for r in ok]), ("Bilddaten", [r.data_wait_s for r in ok if r.data_wait_s is not None])):
+            for p, value in zip(PERCENTILES, _percentiles(values)):
+                row[f"{label} p{p} (s)"] = value
+        sizes = [r.payload_kb for r in ok if r.payload_kb is not None]
+        row["Ø Größe (KB)"] = round(sum(sizes) / len(sizes), 1) if sizes else None
+        row["Format"] = ", ".join(sorted({r.payload_format for r in ok if r.payload_format})) or None
+        costs = [r.cost_chf for r in entries if r.cost_chf is not None]
+        row["Kosten gesamt (CHF)"] = round(sum(costs), 2) if costs else None
+        row["Kosten pro Erfolg (CHF)"] = round(sum(costs) / len(ok), 3) if costs and ok else None
+        rows.append(row)
+    return sorted(rows, key=lambda r: (r["Latenz p50 (s)"] is None, r["Latenz p50 (s)"] or 0))
+
+def histogram(results: list[TrialResult], metric: str = "latency_s", bins: int = HISTOGRAM_BINS) -> dict:
+    """Gemeinsame Klassen über alle Modelle: {"Bereich": [...], <Modell>: [Anzahl, ...]} (direkt für st.bar_chart)."""
+    values = {r.model: [] for r in results}
+    for r in results:
+        value = getattr(r, metric)
+        if r.ok and value is not None:
+            values[r.model].append(value)
+    everything = [v for vs in values.values() for v in vs]
+    if not everything:
+        return {}
+    edges = np.histogram_bin_edges(np.asarray(everything, dtype=np.float64), bins=bins)
+    data = {"Bereich": [f"{lo:.2f}–{hi:.2f}" for lo, hi in zip(edges[:-1], edges[1:])]}
+    for model, vs in values.items():
+        data[model] = np.histogram(np.asarray(vs, dtype=np.float64), bins=edges)[0].tolist()
+    return data
+
+# === Export ===
+def to_csv(results: list[TrialResult]) -> str:
+    buffer = io.StringIO()
+    fields = list(TrialResult.__dataclass_fields__)
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    writer.writerows(asdict(r) for r in results)
+    return buffer.getvalue()
+
+def to_json(results: list[TrialResult], prompts: list[str], meta: Optional[dict] = None) -> str:
+    return json.dumps({
+        "meta": {"created_at": time.time(), "percentiles": list(PERCENTILES), **(meta or {})},
+        "prompts": prompts, "summary": summarize(results), "trials": [asdict(r) for r in results],
+    }, ensure_ascii=False, indent=2)
+
+# === Headless ===
+def _parse_size(value: str) -> tuple[int, int]:
+    try:
+        w, h = value.lower().split("x")
+        return int(w), int(h)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Ungültige Größe '{value}', erwartet z. B. 1024x1024.")
+
+def main() -> None:
+    import os
+    from dotenv import load_dotenv
+    from logic.providers import PROVIDER_ORDER
+    from utils import PROJECT_ROOT
+
+    load_dotenv(os.path.join(PROJECT_ROOT, ".env"))
+    parser = argparse.ArgumentParser(description="Misst Latenzverteilungen der Bildmodelle.")
+    parser.add_argument("--model", action="append", choices=PROVIDER_ORDER, required=True, help="Modell (mehrfach möglich)")
+    parser.add_argument("--prompt", action="append", default=[], help="Prompt (mehrfach möglich)")
+    parser.add_argument("--trials", type=int, default=DEFAULT_TRIALS)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--size", type=_parse_size, default=(1024, 1024))
+    parser.add_argument("--csv", help="Einzelergebnisse als CSV speichern")
+    parser.add_argument("--json", help="Ergebnisse inkl. Zusammenfassung als JSON speichern")
+    args = parser.parse_args()
+
+    prompts = args.prompt or ["A single red grape on a rustic wooden table, soft vineyard background, golden hour."]
+    results = run_benchmark(args.model, prompts, args.trials, args.size, args.concurrency,
+                            on_result=lambda r, done, total: print(f"[{done}/{total}] {r.model}: "
+                                                                   f"{'ok' if r.ok else 'FEHLER'} {r.latency_s:.1f} s"))
+    for row in summarize(results):
+        print(" | ".join(f"{k}: {v}" for k, v in row.items()))
+    if args.csv:
+        with open(args.csv, "w", encoding="utf-8", newline="") as f:
+            f.write(to_csv(results))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(to_json(results, prompts, {"size": list(args.size), "concurrency": args.concurrency}))
+
+if __name__ == "__main__":
+    main()
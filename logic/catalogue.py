@@ -0,0 +1,221 @@
+"""
+SKU-Katalog als kompakter, spaltenorientierter Snapshot.
+
+Die CSV wird einmal in eine Parquet-Datei (Arrow-Strings, kategorische Spalten für
+wenige verschiedene Werte, Zeilen-Hashes) übersetzt. Bei Änderungen der CSV (mtime/Größe,
+dann Inhalts-Hash) gilt:
+- nur Zeilen angehängt (alter Inhalt ist unverändertes Präfix): nur der neue Byte-Bereich wird gelesen;
+- sonst: die CSV wird neu gelesen, aber nur neue oder geänderte Zeilen werden neu aufbereitet.
+Alle Seiten teilen sich denselben DataFrame im Prozess – er ist als schreibgeschützt zu behandeln.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+from typing import Optional
+
+import pandas as pd
+
+from utils import PROJECT_ROOT, SKU_CSV_FILENAME
+
+try:
+    import pyarrow  # Für Parquet-Snapshot und Arrow-String-Spalten
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+SNAPSHOT_DIR = os.path.join(PROJECT_ROOT, ".catalogue_cache")
+CATALOGUE_COLUMNS = ["sku", "image_url", "background_image_url_opt", "name"]
+COLUMN_ALIASES = {
+    "image_url": ["bild"],
+    "background_image_url_opt": ["hintergrundbild"],
+    "name": ["produktname", "bezeichnung", "product_name", "titel"],
+}
+ROW_HASH_COLUMN = "_row_hash"
+CATEGORY_MAX_RATIO = 0.5  # Spalten mit höchstens so vielen verschiedenen Werten pro Zeile werden kategorisch
+
+_lock = threading.Lock()
+_state: dict[str, dict] = {}  # CSV-Pfad -> {"df", "signature"}
+
+# === Hilfsfunktionen ===
+def _snapshot_paths(csv_path: str) -> tuple[str, str]:
+    stem = hashlib.sha1(os.path.abspath(csv_path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(SNAPSHOT_DIR, f"catalogue_{stem}.parquet"), os.path.join(SNAPSHOT_DIR, f"catalogue_{stem}.json")
+
+def _file_signature(csv_path: str) -> tuple[int, int]:
+    stat = os.stat(csv_path)
+    return stat.st_mtime_ns, stat.st_size
+
+def _file_sha256(csv_path: str, prefix_len: Optional[int] = None) -> tuple[str, Optional[str]]:
+    """SHA-256 der ganzen Datei und – im selben Durchgang – der ersten prefix_len Bytes (Anhänge-Erkennung)."""
+    digest, prefix_digest, offset = hashlib.sha256(), None, 0
+    with open(csv_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            if prefix_len is not None and prefix_digest is None and offset + len(chunk) >= prefix_len:
+                digest.update(chunk[: prefix_len - offset])
+                prefix_digest = digest.copy()
+                digest.update(chunk[prefix_len - offset:])
+            else:
+                digest.update(chunk)
+            offset += len(chunk)
+    return digest.hexdigest(), prefix_digest.hexdigest() if prefix_digest else None
+
+def _ends_with_newline(csv_path: str, size: int) -> bool:
+    if size <= 0:
+        return False
+    with open(csv_path, "rb") as f:
+        f.seek(size - 1)
+        return f.read(1) == b"\n"
+
+def _read_raw_csv(csv_path: str, appended_from: Optional[int] = None) -> pd.DataFrame:
+    """
+    Liest die CSV unverändert als Strings und vereinheitlicht die Spaltennamen.
+    Mit appended_from wird nur der ab diesem Byte angehängte Bereich (plus Kopfzeile) gelesen.
+    """
+    source = csv_path
+    if appended_from is not None:
+        with open(csv_path, "rb") as f:
+            header = f.readline()
+            f.seek(appended_from)
+            source = io.BytesIO(header + f.read())
+    raw = pd.read_csv(source, sep=";", encoding="utf-8-sig", dtype=str, keep_default_na=True)
+    raw.columns = [str(col).strip().lower() for col in raw.columns]
+    if "sku" not in raw.columns:
+        raise ValueError(f"Die CSV-Datei unter '{csv_path}' muss eine Spalte 'sku' enthalten.")
+    for target, aliases in COLUMN_ALIASES.items():
+        if target not in raw.columns:
+            alias = next((a for a in aliases if a in raw.columns), None)
+            raw[target] = raw[alias] if alias else None
+    return raw[CATALOGUE_COLUMNS]
+
+def _row_hashes(raw: pd.DataFrame) -> pd.Series:
+    return pd.util.hash_pandas_object(raw, index=False).astype("uint64")
+
+def _normalize(raw: pd.DataFrame) -> pd.DataFrame:
+    """Bereinigt die Rohzeilen und wandelt sie in kompakte String-Spalten um."""
+    string_dtype = pd.ArrowDtype(pyarrow.string()) if PYARROW_AVAILABLE else "string"
+    df = raw.astype({col: string_dtype for col in CATALOGUE_COLUMNS})
+    for col in CATALOGUE_COLUMNS:
+        df[col] = df[col].str.strip()
+    # Leere SKUs als "" statt NA, damit Vergleichsmasken immer rein boolesch sind
+    df["sku"] = df["sku"].fillna("")
+    return df
+
+def _compact(df: pd.DataFrame) -> pd.DataFrame:
+    """Spalten mit wenigen verschiedenen Werten (z. B. Hintergrundbilder) kategorisch, den Rest als String-Spalten."""
+    string_dtype = pd.ArrowDtype(pyarrow.string()) if PYARROW_AVAILABLE else "string"
+    for col in CATALOGUE_COLUMNS:
+        values = df[col].astype(string_dtype)
+        if col != "sku" and len(df) and values.nunique() <= CATEGORY_MAX_RATIO * len(df):
+            df[col] = values.astype("category")
+        else:
+            df[col] = values
+    return df
+
+def _load_snapshot(parquet_path: str) -> Optional[pd.DataFrame]:
+    if not PYARROW_AVAILABLE or not os.path.exists(parquet_path):
+        return None
+    try:
+        import pyarrow.parquet as pq
+        # Memory-Mapping + Arrow-Strings: die Spalten werden ohne zusätzliche Kopie übernommen;
+        # Dictionary-Spalten werden wieder zu pandas-Kategorien
+        table = pq.read_table(parquet_path, memory_map=True)
+        return table.to_pandas(types_mapper=lambda t: pd.ArrowDtype(t) if pyarrow.types.is_string(t) else None)
+    except Exception:
+        return None
+
+def _write_snapshot(df: pd.DataFrame, parquet_path: str, meta_path: str, meta: dict) -> None:
+    if not PYARROW_AVAILABLE:
+        return
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    tmp_path = parquet_path + ".tmp"
+    df.to_parquet(tmp_path, engine="pyarrow", index=False)
+    os.replace(tmp_path, parquet_path)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+# === Inkrementelles Laden ===
+def _rebuild(csv_path: str, previous: Optional[pd.DataFrame], appended_from: Optional[int] = None) -> tuple[pd.DataFrame, dict]:
+    """
+    Liest die CSV, übernimmt unveränderte Zeilen aus dem alten Snapshot und bereitet nur den Rest neu auf.
+    Mit appended_from (nur angehängt) wird ausschließlich der neue Byte-Bereich gelesen.
+    """
+    if appended_from is not None and previous is not None:
+        raw = _read_raw_csv(csv_path, appended_from)
+        fresh = _normalize(raw)
+        fresh[ROW_HASH_COLUMN] = _row_hashes(raw).to_numpy()
+        df = pd.concat([previous, fresh], ignore_index=True)
+        stats = {"rows": len(df), "reused": len(previous), "reprocessed": len(raw), "appended_only": True}
+        return _compact(df), stats
+
+    raw = _read_raw_csv(csv_path)
+    hashes = _row_hashes(raw)
+    stats = {"rows": len(raw), "reused": 0, "reprocessed": len(raw)}
+
+    if previous is not None and ROW_HASH_COLUMN in previous.columns:
+        old_by_hash = previous.drop_duplicates(ROW_HASH_COLUMN).set_index(ROW_HASH_COLUMN)
+        old_by_hash.index = old_by_hash.index.astype("uint64")
+        reusable = hashes.isin(old_by_hash.index).to_numpy()
+        fresh = _normalize(raw[~reusable])
+        reused = old_by_hash.loc[hashes[reusable].to_numpy()].reset_index(drop=True)
+        reused.index = raw.index[reusable]
+        df = pd.concat([reused[CATALOGUE_COLUMNS], fresh]).sort_index()
+        stats.update(reused=int(reusable.sum()), reprocessed=int((~reusable).sum()))
+    else:
+        df = _normalize(raw)
+
+    df[ROW_HASH_COLUMN] = hashes.to_numpy()
+    return _compact(df.reset_index(drop=True)), stats
+
+def get_catalogue(csv_path: str = SKU_CSV_FILENAME) -> pd.DataFrame:
+    """
+    Liefert den geteilten Katalog-DataFrame. Ein os.stat pro Aufruf erkennt Änderungen an der CSV;
+    nur dann wird der Inhalts-Hash geprüft und der Snapshot inkrementell aktualisiert.
+    """
+    signature = _file_signature(csv_path)  # FileNotFoundError an den Aufrufer durchreichen
+    state = _state.get(csv_path)
+    if state and state["signature"] == signature:
+        return state["df"]
+
+    with _lock:
+        state = _state.get(csv_path)
+        if state and state["signature"] == signature:
+            return state["df"]
+
+        parquet_path, meta_path = _snapshot_paths(csv_path)
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        previous = state["df"] if state else _load_snapshot(parquet_path)
+
+        if previous is not None and tuple(meta.get("signature", ())) == signature:
+            df = previous
+        else:
+            old_size = meta.get("size") if previous is not None else None
+            sha256, prefix_sha256 = _file_sha256(csv_path, old_size)
+            if previous is not None and meta.get("sha256") == sha256:
+                df = previous  # Nur mtime geändert, Inhalt identisch
+            else:
+                # Alter Inhalt unverändert am Anfang und mit Zeilenende abgeschlossen: nur Anhänge lesen
+                appended = prefix_sha256 is not None and prefix_sha256 == meta.get("sha256") \
+                    and _ends_with_newline(csv_path, old_size)
+                df, stats = _rebuild(csv_path, previous, old_size if appended else None)
+                meta["last_rebuild"] = stats
+                meta["sha256"] = sha256
+                meta["size"] = signature[1]
+            meta["signature"] = list(signature)
+            _write_snapshot(df, parquet_path, meta_path, meta)
+
+        _state[csv_path] = {"df": df, "signature": signature}
+        return df
+
+def catalogue_stats(csv_path: str = SKU_CSV_FILENAME) -> dict:
+    """Informationen zum letzten Neuaufbau (Zeilen, übernommen, neu aufbereitet)."""
+    _, meta_path = _snapshot_paths(csv_path)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f).get("last_rebuild", {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
@@ -0,0 +1,260 @@
+"""
+Classic-Ablauf (GPT-4o Vision → DALL·E 3) für mehrere SKUs bzw. Varianten im Fließband.
+
+Jede Stufe hat einen eigenen Thread-Pool: Während DALL·E Bild N rendert, analysiert GPT-4o
+bereits Bild N+1, und SKU-Downloads laufen parallel zu beiden. DALL·E liefert b64_json,
+der separate Download der Ergebnis-URL entfällt.
+
+SKUs mit (beinahe) identischem Produktbild (logic.phash) übernehmen den Prompt der ersten
+solchen SKU derselben Variante; die GPT-4o-Analyse läuft pro Duplikat-Gruppe nur einmal.
+Im Vision-Modus werden geladene Bilder gesammelt und zu mehreren in einer GPT-4o-Anfrage analysiert.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator, Optional, Tuple
+
+from PIL import Image
+
+SOURCE_WORKERS = 4
+VISION_WORKERS = 2
+IMAGE_WORKERS = 3  # DALL·E 3 ist pro Minute limitiert; mehr parallele Renders bringen meist nur 429er
+
+@dataclass
+class ClassicBatchItem:
+    """Ein Eintrag im Stapel. status: queued | loading | waiting | analysing | rendering | done | error"""
+    label: str
+    sku: Optional[str] = None
+    variant: int = 0
+    source: Optional[Image.Image] = field(default=None, repr=False)
+    status: str = "queued"
+    prompt: Optional[str] = None
+    image: Optional[Image.Image] = field(default=None, repr=False)
+    error: Optional[str] = None
+    duplicate_of: Optional[str] = None  # Label des Eintrags, dessen Prompt übernommen wurde
+    submitted_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.submitted_at
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+def build_batch_items(skus: list[str], variants: int = 1, image: Optional[Image.Image] = None,
+                      image_label: str = "Bild") -> list[ClassicBatchItem]:
+    """Ein Eintrag pro SKU und Variante; optional zusätzlich Varianten eines bereits geladenen Bildes."""
+    items = []
+    if image is not None:
+        items += [ClassicBatchItem(f"{image_label} #{i + 1}", source=image, variant=i) for i in range(variants)]
+    for sku in dict.fromkeys(s.strip() for s in skus if s.strip()):
+        items += [ClassicBatchItem(f"SKU {sku}" + (f" #{i + 1}" if variants > 1 else ""), sku=sku, variant=i) for i in range(variants)]
+    return items
+
+class ClassicBatchRun:
+    """
+    Startet den Stapel sofort im Hintergrund. Status-Updates werden über updates()
+    im aufrufenden Thread ausgeliefert (Streamlit-Aufrufe nur dort).
+    """
+
+    def __init__(self, items: list[ClassicBatchItem], df_skus, target_size: Tuple[int, int],
+                 quality: str = "standard", outpaint: bool = False, outpaint_engine: str = "gpt-image-1",
+                 dedupe: bool = True, prompt_mode: str = "vision", batch_vision: bool = True):
+        from logic.generation_v1 import BATCH_MAX_IMAGES, get_best_dalle_size
+
+        self.items = list(items)
+        self.df_skus = df_skus
+        self.target_size = target_size
+        self.quality = quality
+        self.outpaint = outpaint
+        self.outpaint_engine = outpaint_engine
+        self.dedupe = dedupe
+        self.prompt_mode = prompt_mode
+        self.batch_vision = batch_vision and prompt_mode == "vision"
+        self._batch_size = BATCH_MAX_IMAGES
+        w, h = target_size
+        self._dalle_size = get_best_dalle_size(w / h if h > 0 else 1)
+        self._updates: queue.Queue = queue.Queue()  # (Eintrag, abgeschlossen?)
+        self._remaining = len(self.items)
+        self._lock = threading.Lock()
+        # Duplikat-Abgleich: erste SKU je Bild und Variante analysiert, weitere warten auf deren Prompt
+        self._leaders: list[Tuple[ClassicBatchItem, dict]] = []
+        self._followers: dict[int, list[ClassicBatchItem]] = {}
+        self._failed_leaders: set[int] = set()
+        # Stapel-Analyse: wartende Einträge, bis ein Stapel voll ist oder alle Bilder geladen sind
+        self._vision_queue: list[ClassicBatchItem] = []
+        self._loads_pending = len(self.items)
+        self._pools = [
+            ThreadPoolExecutor(max_workers=SOURCE_WORKERS, thread_name_prefix="classic-source"),
+            ThreadPoolExecutor(max_workers=VISION_WORKERS, thread_name_prefix="classic-vision"),
+            ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="classic-image"),
+        ]
+        self._source_pool, self._vision_pool, self._image_pool = self._pools
+        for item in self.items:
+            self._source_pool.submit(self._load, item)
+        if not self.items:
+            for pool in self._pools:
+                pool.shutdown(wait=False)
+
+    # --- Stufen (laufen in den Pools, reichen den Eintrag an die nächste Stufe weiter)
+    def _set_status(self, item: ClassicBatchItem, status: str) -> None:
+        item.status = status
+        self._updates.put((item, False))
+
+    def _finish(self, item: ClassicBatchItem, error: Optional[Exception] = None) -> None:
+        if error is not None:
+            item.status, item.error = "error", str(error)
+        else:
+            item.status = "done"
+        item.finished_at = time.perf_counter()
+        self._updates.put((item, True))
+        with self._lock:
+            self._remaining -= 1
+            all_done = self._remaining == 0
+        if all_done:
+            for pool in self._pools:
+                pool.shutdown(wait=False)
+
+    def _load(self, item: ClassicBatchItem) -> None:
+        try:
+            if item.source is None:
+                from logic.pipeline import load_sku_image
+                self._set_status(item, "loading")
+                item.source = load_sku_image(self.df_skus, item.sku)
+            if self.dedupe and item.sku and self._attach_to_leader(item):
+                return
+            if self.batch_vision:
+                with self._lock:
+                    self._vision_queue.append(item)
+            else:
+                self._vision_pool.submit(self._analyse, item)
+        except Exception as e:
+            self._finish(item, e)
+        finally:
+            with self._lock:
+                self._loads_pending -= 1
+            self._flush_vision_queue()
+
+    def _flush_vision_queue(self) -> None:
+        """Reicht volle Stapel an GPT-4o weiter; sind alle Bilder geladen, auch den Rest."""
+        with self._lock:
+            all_loaded = self._loads_pending == 0
+            while self._vision_queue and (all_loaded or len(self._vision_queue) >= self._batch_size):
+                batch, self._vision_queue = self._vision_queue[:self._batch_size], self._vision_queue[self._batch_size:]
+                self._vision_pool.submit(self._analyse_batch, batch)
+
+    def _attach_to_leader(self, item: ClassicBatchItem) -> bool:
+        """True, wenn der Eintrag den Prompt eines Beinahe-Duplikats übernimmt (sofort oder sobald dieser vorliegt)."""
+        from logic.phash import DUPLICATE_THRESHOLDS, compute_hashes, hamming_distance
+
+        hashes = compute_hashes(item.source)
+        with self._lock:
+            leader = next((
+                candidate for candidate, candidate_hashes in self._leaders
+                if candidate.variant == item.variant and candidate.sku != item.sku
+                and all(hamming_distance(hashes[name], candidate_hashes[name]) <= limit for name, limit in DUPLICATE_THRESHOLDS.items())
+            ), None)
+            if leader is None:
+                self._leaders.append((item, hashes))
+                self._followers[id(item)] = []
+                return False
+            if id(leader) in self._failed_leaders:
+                return False  # Analyse des Vorbilds ist gescheitert: selbst analysieren
+            item.duplicate_of = leader.label
+            if leader.prompt is None:
+                self._followers[id(leader)].append(item)
+                self._set_status(item, "waiting")
+                return True
+        item.prompt = leader.prompt
+        self._image_pool.submit(self._render, item)
+        return True
+
+    def _release_followers(self, leader: ClassicBatchItem, prompt: Optional[str]) -> None:
+        with self._lock:
+            followers = self._followers.pop(id(leader), [])
+            if prompt is None:
+                self._failed_leaders.add(id(leader))
+        for follower in followers:
+            if prompt is None:
+                follower.duplicate_of = None
+                self._vision_pool.submit(self._analyse, follower)
+            else:
+                follower.prompt = prompt
+                self._image_pool.submit(self._render, follower)
+
+    def _image_url(self, item: ClassicBatchItem) -> Optional[str]:
+        """Bild-URL der SKU (für eine gespeicherte Freistellung als Maske der lokalen Analyse)."""
+        if not item.sku or self.prompt_mode == "vision":
+            return None
+        from utils import find_sku_row
+        match = find_sku_row(self.df_skus, item.sku)
+        url = str(match["image_url"]).strip() if match is not None else ""
+        return url if url.startswith("http") else None
+
+    def _analyse(self, item: ClassicBatchItem) -> None:
+        try:
+            from logic.pipeline import classic_prompt
+            self._set_status(item, "analysing")
+            item.prompt = classic_prompt(item.source, self.prompt_mode, self._image_url(item))
+            self._release_followers(item, item.prompt)
+            self._image_pool.submit(self._render, item)
+        except Exception as e:
+            self._release_followers(item, None)
+            self._finish(item, e)
+
+    def _analyse_batch(self, items: list[ClassicBatchItem]) -> None:
+        from logic.generation_v1 import generate_banner_prompts_gpt4_batch
+        from logic.prompt_engine_v1 import build_autonomous_prompt
+
+        for item in items:
+            self._set_status(item, "analysing")
+        images = {str(i): item.source for i, item in enumerate(items)}
+        try:
+            results = generate_banner_prompts_gpt4_batch(images, build_autonomous_prompt(), max_per_request=len(items))
+        except Exception as e:
+            results = {item_id: e for item_id in images}
+        for item_id, item in zip(images, items):
+            result = results.get(item_id, ValueError("GPT-4o hat keinen Prompt geliefert."))
+            if isinstance(result, Exception):
+                self._release_followers(item, None)
+                self._finish(item, result)
+                continue
+            item.prompt = result
+            self._release_followers(item, result)
+            self._image_pool.submit(self._render, item)
+
+    def _render(self, item: ClassicBatchItem) -> None:
+        try:
+            from logic.generation_v1 import generate_dalle_image_b64
+            self._set_status(item, "rendering")
+            img = generate_dalle_image_b64(item.prompt, self._dalle_size, quality=self.quality)
+            if self.outpaint:
+                from logic.outpaint import needs_outpainting, outpaint_to_wide
+                if needs_outpainting(self.target_size):
+                    img = outpaint_to_wide(img, self.target_size, self.outpaint_engine)
+            item.image = img
+            self._finish(item)
+        except Exception as e:
+            self._finish(item, e)
+
+    # --- Auslieferung
+    @property
+    def pending(self) -> list[ClassicBatchItem]:
+        return [item for item in self.items if not item.finished]
+
+    def updates(self) -> Iterator[ClassicBatchItem]:
+        """Liefert jeden Eintrag, sobald sich sein Status ändert, bis alle abgeschlossen sind."""
+        remaining = len(self.items)
+        while remaining:
+            item, final = self._updates.get()
+            remaining -= final
+            yield item
+
+    def wait(self) -> list[ClassicBatchItem]:
+        for _ in self.updates():
+            pass
+        return self.items
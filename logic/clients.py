@@ -0,0 +1,199 @@
+"""
+Gemeinsame API-Clients pro Prozess.
+
+Jeder Client wird beim ersten Aufruf einmal erzeugt und danach wiederverwendet, damit
+TCP-/TLS-Verbindungen (Keep-Alive, HTTP/2 wo verfügbar) über alle Seiten geteilt werden.
+Schlüssel kommen über utils.get_secret (st.secrets bzw. .env). Nach einem Schlüsselwechsel
+reset_clients() aufrufen.
+"""
+import asyncio
+import importlib.util
+import threading
+import time
+import weakref
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils import get_secret
+
+# HTTP/2 braucht das optionale Paket "h2" (pip install "httpx[http2]")
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Zeitlimits in Sekunden: Bildgenerierung kann deutlich über eine Minute dauern
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 180.0
+MAX_RETRIES = 3
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE_CONNECTIONS = 10
+KEEPALIVE_EXPIRY = 60.0
+
+# Wiederholungen für einfache HTTP-Aufrufe (Bild-Downloads, Stability)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+RETRY_BACKOFF_FACTOR = 0.5
+
+STABILITY_API_HOST = "https://api.stability.ai"
+
+def _require_secret(name: str, label: str) -> str:
+    value = get_secret(name)
+    if not value:
+        raise ValueError(f"{label} API Key nicht gefunden ({name}). Bitte in `.env` bzw. st.secrets setzen.")
+    return value
+
+def _httpx_options() -> dict:
+    import httpx
+    return {
+        "limits": httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        "http2": HTTP2_AVAILABLE,
+    }
+
+# === OpenAI ===
+@lru_cache(maxsize=1)
+def get_openai_client():
+    """Synchroner OpenAI-Client mit geteiltem Verbindungspool, Zeitlimits und Wiederholungen."""
+    import openai  # Lazy: wird erst beim ersten Aufruf geladen
+    return openai.OpenAI(
+        api_key=_require_secret("OPENAI_API_KEY", "OpenAI"),
+        http_client=openai.DefaultHttpxClient(**_httpx_options()),
+        max_retries=MAX_RETRIES,
+    )
+
+def _generation_retryable(error: Exception) -> bool:
+    """
+    Darf ein kostenpflichtiger Bild-Aufruf wiederholt werden? Nur bei 429/5xx und bei Verbindungsfehlern,
+    bevor die Anfrage gesendet wurde. Nach einem Lese-Timeout läuft die Generierung evtl. schon (und wird berechnet).
+    """
+    import httpx
+    import openai
+    if isinstance(error, (openai.RateLimitError, openai.InternalServerError)):
+        return True
+    return isinstance(error, openai.APIConnectionError) and isinstance(error.__cause__, (httpx.ConnectError, httpx.ConnectTimeout))
+
+def create_image(endpoint: str, **request):
+    """
+    images.generate bzw. images.edit (endpoint = "generate"/"edit") ohne die Wiederholungen des SDK,
+    die auch nach Lese-Timeouts greifen und so doppelt abrechnen könnten; siehe _generation_retryable.
+    """
+    images = get_openai_client().with_options(max_retries=0).images
+    call = {"generate": images.generate, "edit": images.edit}[endpoint]
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return call(**request)
+        except Exception as e:
+            if attempt == MAX_RETRIES or not _generation_retryable(e):
+                raise
+            time.sleep(RETRY_BACKOFF_FACTOR * 2 ** attempt)
+
+def stream_chat_text(call_name: str = "chat", cache_key: Optional[str] = None, **request) -> Iterator[str]:
+    """
+    Chat-Completion als Stream: liefert die Text-Stücke, sobald sie eintreffen (für st.write_stream).
+    Batch-Aufrufer sammeln denselben Stream mit collect_text ein.
+
+    Für OpenAIs automatisches Prompt-Caching muss der Anfang der Nachrichten byte-identisch sein:
+    statische System-Prompts zuerst, variable Inhalte zuletzt. cache_key bündelt gleichartige Anfragen
+    (prompt_cache_key). Tokens, gecachter Anteil und Latenzen landen in logic.instrumentation.
+    """
+    from logic.instrumentation import record_api_call
+
+    if cache_key:
+        request["extra_body"] = {**request.get("extra_body", {}), "prompt_cache_key": cache_key}
+    started = time.perf_counter()
+    first_token_s, usage = None, None
+    stream = get_openai_client().chat.completions.create(stream=True, stream_options={"include_usage": True}, **request)
+    try:
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage  # kommt mit include_usage im letzten Chunk (ohne choices)
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token_s is None:
+                    first_token_s = time.perf_counter() - started
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+        details = getattr(usage, "prompt_tokens_details", None)
+        record_api_call(
+            call_name, request.get("model"), time.perf_counter() - started, first_token_s,
+            prompt_tokens=getattr(usage, "prompt_tokens", None), cached_tokens=getattr(details, "cached_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+        )
+
+def collect_text(chunks: Iterable[str], empty_message: str = "Leere Antwort erhalten.") -> str:
+    """Setzt einen Text-Stream zusammen (ValueError bei leerem Ergebnis)."""
+    text = "".join(chunks).strip()
+    if not text:
+        raise ValueError(empty_message)
+    return text
+
+# Async-Clients sind an ihren Event-Loop gebunden, daher ein Client pro Loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = weakref.WeakKeyDictionary()
+_async_lock = threading.Lock()
+
+def get_async_openai_client():
+    """AsyncOpenAI-Client für den aktuell laufenden Event-Loop (muss innerhalb einer Coroutine aufgerufen werden)."""
+    import openai
+    loop = asyncio.get_running_loop()
+    with _async_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = openai.AsyncOpenAI(
+                api_key=_require_secret("OPENAI_API_KEY", "OpenAI"),
+                http_client=openai.DefaultAsyncHttpxClient(**_httpx_options()),
+                max_retries=MAX_RETRIES,
+            )
+            _async_clients[loop] = client
+        return client
+
+# === HTTP-Sessions (requests) ===
+def _build_session(allowed_methods: frozenset, status_forcelist: tuple = RETRY_STATUS_CODES,
+                   read_retries: Optional[int] = None) -> requests.Session:
+    retry = Retry(
+        total=MAX_RETRIES, read=read_retries, backoff_factor=RETRY_BACKOFF_FACTOR, status_forcelist=status_forcelist,
+        allowed_methods=allowed_methods, respect_retry_after_header=True, raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=MAX_KEEPALIVE_CONNECTIONS, pool_maxsize=MAX_CONNECTIONS, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+@lru_cache(maxsize=1)
+def get_http_session() -> requests.Session:
+    """Geteilte Session für Bild-Downloads (SKU-Bilder, DALL·E-/Fal-Ergebnis-URLs)."""
+    return _build_session(frozenset({"HEAD", "GET"}))
+
+@lru_cache(maxsize=1)
+def get_stability_session() -> requests.Session:
+    """
+    Session für die Stability-API mit gesetztem Authorization-Header.
+    POST wird nur bei Verbindungsfehlern und 429/503 wiederholt – dann wurde nachweislich kein Bild erzeugt;
+    nach einem Lese-Timeout nicht, da die Generierung dann bereits laufen (und berechnet werden) kann.
+    """
+    session = _build_session(frozenset({"GET", "POST"}), status_forcelist=(429, 503), read_retries=0)
+    session.headers["authorization"] = f"Bearer {_require_secret('STABILITY_API_KEY', 'Stability AI')}"
+    return session
+
+# === Fal ===
+@lru_cache(maxsize=1)
+def get_fal_client():
+    """fal_client.SyncClient mit dem Schlüssel aus get_secret statt aus os.environ."""
+    import fal_client  # Lazy: wird erst beim ersten Aufruf geladen
+    return fal_client.SyncClient(key=_require_secret("FAL_KEY", "Fal AI"), default_timeout=READ_TIMEOUT)
+
+def missing_secrets(names: list[str]) -> list[str]:
+    """Welche der angegebenen Schlüssel fehlen? (für Hinweise in der UI)"""
+    return [name for name in names if not get_secret(name)]
+
+def reset_clients() -> None:
+    """Verwirft alle gecachten Clients, z. B. nach einer Schlüsseländerung."""
+    for factory in (get_openai_client, get_http_session, get_stability_session, get_fal_client):
+        factory.cache_clear()
+    with _async_lock:
+        _async_clients.clear()
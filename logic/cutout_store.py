@@ -0,0 +1,350 @@
+"""
+Content-adressierter Speicher für vorab freigestellte SKU-Bilder.
+
+Offline-Job (aus dem Projekt-Root):
+    python -m logic.cutout_store --model u2net --workers 4
+
+Beinahe-Duplikate (logic.phash, gleiche Bildgröße) werden im Job nur einmal freigestellt;
+die übrigen URLs übernehmen nur deren Alpha-Maske auf das eigene Bild (logic.matte.transfer_alpha),
+im Manifest als "derived_from" vermerkt. Passt die Ausrichtung nicht, werden sie einzeln freigestellt.
+
+Freistellungen mit Alpha-Matting liegen in eigenen Varianten-Verzeichnissen (siehe store_variant).
+Das Manifest wird unter einer prozessübergreifenden Lock-Datei eintragsweise zusammengeführt,
+damit parallele Jobs und die Seiten sich nicht gegenseitig Einträge überschreiben.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from io import BytesIO
+from typing import Iterator, Optional, Tuple
+
+import requests
+from PIL import Image, ImageOps
+
+from utils import PROJECT_ROOT, SKU_CSV_FILENAME
+
+CUTOUT_STORE_DIR = os.path.join(PROJECT_ROOT, "cutout_store")
+MANIFEST_FILENAME = "manifest.json"
+DOWNLOAD_TIMEOUT = 20
+DOWNLOAD_WORKERS = 8
+MANIFEST_LOCK_TIMEOUT = 30  # Sekunden; ältere Lock-Dateien gelten als verwaist
+
+_manifest_lock = threading.Lock()
+
+# === Pfade & Manifest ===
+def url_hash(image_url: str) -> str:
+    return hashlib.sha256(image_url.strip().encode("utf-8")).hexdigest()
+
+def store_variant(model: str, matting: Optional[dict] = None) -> str:
+    """
+    Store-Schlüssel aus Modell und Alpha-Matting-Parametern.
+    Ohne Matting nur der Modellname (wie vom Offline-Job erzeugt), sonst z. B. "u2net+am240-10-10".
+    """
+    if not matting:
+        return model
+    return (f"{model}+am{matting['alpha_matting_foreground_threshold']}-"
+            f"{matting['alpha_matting_background_threshold']}-{matting['alpha_matting_erode_size']}")
+
+def cutout_path(image_url: str, model: str, store_dir: str = CUTOUT_STORE_DIR, matting: Optional[dict] = None) -> str:
+    digest = url_hash(image_url)
+    return os.path.join(store_dir, store_variant(model, matting), digest[:2], f"{digest}.png")
+
+def _manifest_path(store_dir: str) -> str:
+    return os.path.join(store_dir, MANIFEST_FILENAME)
+
+def load_manifest(store_dir: str = CUTOUT_STORE_DIR) -> dict:
+    try:
+        with open(_manifest_path(store_dir), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _save_manifest(manifest: dict, store_dir: str) -> None:
+    os.makedirs(store_dir, exist_ok=True)
+    tmp_path = f"{_manifest_path(store_dir)}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, _manifest_path(store_dir))
+
+@contextmanager
+def _manifest_file_lock(store_dir: str) -> Iterator[None]:
+    """Sperrt das Manifest für Threads dieses Prozesses und – per Lock-Datei – für andere Prozesse."""
+    os.makedirs(store_dir, exist_ok=True)
+    lock_path = _manifest_path(store_dir) + ".lock"
+    with _manifest_lock:
+        deadline = time.monotonic() + MANIFEST_LOCK_TIMEOUT
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > MANIFEST_LOCK_TIMEOUT:
+                        os.remove(lock_path)  # Lock eines abgestürzten Prozesses übernehmen
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Manifest-Sperre {lock_path} wird nicht freigegeben.")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.remove(lock_path)
+
+def update_manifest(entries: dict, store_dir: str = CUTOUT_STORE_DIR) -> None:
+    """Führt geänderte Einträge feldweise in das aktuelle Manifest auf der Platte zusammen."""
+    if not entries:
+        return
+    with _manifest_file_lock(store_dir):
+        manifest = load_manifest(store_dir)
+        for key, entry in entries.items():
+            manifest[key] = {**manifest.get(key, {}), **entry}
+        _save_manifest(manifest, store_dir)
+
+def _manifest_key(image_url: str, model: str, matting: Optional[dict] = None) -> str:
+    return f"{store_variant(model, matting)}:{url_hash(image_url)}"
+
+def _atomic_write(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+# === Lesen & Schreiben (für die Seiten) ===
+def load_cutout(image_url: str, model: str, store_dir: str = CUTOUT_STORE_DIR,
+                matting: Optional[dict] = None) -> Optional[Image.Image]:
+    """Liefert die gespeicherte Freistellung (Modell + Matting-Parameter) oder None bei einem Cache-Miss."""
+    path = cutout_path(image_url, model, store_dir, matting)
+    if not os.path.exists(path):
+        return None
+    try:
+        with Image.open(path) as img:
+            return img.convert("RGBA")
+    except OSError:
+        return None
+
+def store_cutout(image_url: str, model: str, cutout: Image.Image, source_bytes: Optional[bytes] = None,
+                 sku: Optional[str] = None, store_dir: str = CUTOUT_STORE_DIR, matting: Optional[dict] = None) -> str:
+    """Schreibt eine Freistellung in den Store (z. B. nach einer Live-Freistellung) und aktualisiert das Manifest."""
+    buffer = BytesIO()
+    cutout.save(buffer, format="PNG")
+    path = cutout_path(image_url, model, store_dir, matting)
+    _atomic_write(path, buffer.getvalue())
+    update_manifest({
+        _manifest_key(image_url, model, matting): {
+            "url": image_url, "model": model, "matting": matting, "sku": sku,
+            "content_sha256": hashlib.sha256(source_bytes).hexdigest() if source_bytes else None,
+            "etag": None, "last_modified": None, "updated": time.time(),
+        }
+    }, store_dir)
+    return path
+
+# === Offline-Job ===
+_worker_session = None
+
+def _init_worker(model: str) -> None:
+    """Initialisiert pro Prozess genau eine rembg-Session."""
+    global _worker_session
+    from rembg import new_session
+    _worker_session = new_session(model)
+
+def _remove_in_worker(image_bytes: bytes) -> bytes:
+    from rembg import remove
+    img = ImageOps.exif_transpose(Image.open(BytesIO(image_bytes))).convert("RGBA")
+    result = remove(img, session=_worker_session)
+    buffer = BytesIO()
+    result.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _derive_cutout(leader_cutout: Image.Image, image_bytes: bytes) -> Optional[bytes]:
+    """Freistellung eines Duplikats aus der Leader-Maske und dem eigenen Bild; None, wenn die Ausrichtung nicht passt."""
+    from logic.matte import transfer_alpha
+    cutout = transfer_alpha(leader_cutout, ImageOps.exif_transpose(Image.open(BytesIO(image_bytes))))
+    if cutout is None:
+        return None
+    buffer = BytesIO()
+    cutout.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _fetch_if_changed(session: requests.Session, image_url: str, entry: Optional[dict], cutout_exists: bool,
+                      force: bool) -> Tuple[str, Optional[bytes], dict]:
+    """
+    Prüft per HEAD (ETag/Last-Modified) und Inhalts-Hash, ob das Bild neu oder geändert ist.
+    Rückgabe: (Status, Bild-Bytes oder None, aktualisierte Header-Infos).
+    """
+    headers_info = {"etag": None, "last_modified": None}
+    try:
+        head = session.head(image_url, timeout=DOWNLOAD_TIMEOUT, allow_redirects=True)
+        if head.ok:
+            headers_info = {"etag": head.headers.get("ETag"), "last_modified": head.headers.get("Last-Modified")}
+    except requests.RequestException:
+        pass
+
+    if not force and entry and cutout_exists and (headers_info["etag"] or headers_info["last_modified"]):
+        if (headers_info["etag"], headers_info["last_modified"]) == (entry.get("etag"), entry.get("last_modified")):
+            return "unchanged", None, headers_info
+
+    response = session.get(image_url, timeout=DOWNLOAD_TIMEOUT)
+    response.raise_for_status()
+    content_sha = hashlib.sha256(response.content).hexdigest()
+    headers_info["content_sha256"] = content_sha
+    if not force and entry and cutout_exists and entry.get("content_sha256") == content_sha:
+        return "unchanged", None, headers_info
+    return "changed", response.content, headers_info
+
+def run_precompute_job(csv_path: str = SKU_CSV_FILENAME, model: str = "u2net", workers: Optional[int] = None,
+                       store_dir: str = CUTOUT_STORE_DIR, force: bool = False, dedupe: bool = True) -> dict:
+    """
+    Stellt alle Katalogbilder vorab frei. Nur neue oder geänderte Bilder werden neu berechnet.
+    Downloads laufen in einem Thread-Pool, die Freistellung in einem Prozess-Pool.
+    """
+    from utils import load_sku_data
+    from logic.phash import DUPLICATE_THRESHOLDS, get_phash_index, hamming_distance
+
+    df = load_sku_data(csv_path)
+    rows = df.dropna(subset=["image_url"])
+    url_to_sku: dict[str, str] = {}
+    for sku, image_url in zip(rows["sku"], rows["image_url"]):
+        image_url = str(image_url).strip()
+        if image_url.startswith("http"):
+            url_to_sku.setdefault(image_url, sku)
+
+    manifest = load_manifest(store_dir)
+    dirty: set[str] = set()  # Im Lauf geänderte Manifest-Einträge; nur diese werden zusammengeführt
+    stats = {"total": len(url_to_sku), "unchanged": 0, "processed": 0, "derived": 0, "failed": 0}
+    started = time.perf_counter()
+    http = requests.Session()
+    phash_index = get_phash_index()
+    leaders: list[Tuple[str, tuple, dict]] = []  # (URL, Bildgröße, Hashes) der in diesem Lauf freigestellten Bilder
+    followers: dict[str, list[Tuple[str, bytes]]] = {}  # Leader-URL -> [(URL, Bild-Bytes)] der Beinahe-Duplikate
+
+    def flush_manifest() -> None:
+        update_manifest({key: manifest[key] for key in dirty}, store_dir)
+        dirty.clear()
+
+    def find_leader(image_url: str, image_bytes: bytes) -> Optional[str]:
+        img = ImageOps.exif_transpose(Image.open(BytesIO(image_bytes)))
+        hashes = phash_index.add(url_to_sku[image_url], image_url, img, persist=False)
+        for leader_url, size, leader_hashes in leaders:
+            if size == img.size and all(hamming_distance(hashes[name], leader_hashes[name]) <= limit
+                                        for name, limit in DUPLICATE_THRESHOLDS.items()):
+                return leader_url
+        leaders.append((image_url, img.size, hashes))
+        return None
+
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as downloads, \
+         ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model,)) as removals:
+        fetches = {
+            downloads.submit(
+                _fetch_if_changed, http, image_url, manifest.get(_manifest_key(image_url, model)),
+                os.path.exists(cutout_path(image_url, model, store_dir)), force,
+            ): image_url
+            for image_url in url_to_sku
+        }
+        pending_removals = {}
+        for future in as_completed(fetches):
+            image_url = fetches[future]
+            try:
+                status, image_bytes, headers_info = future.result()
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"[FEHLER] Download {url_to_sku[image_url]}: {e}")
+                continue
+            key = _manifest_key(image_url, model)
+            entry = manifest.setdefault(key, {"url": image_url, "model": model})
+            entry.update({k: v for k, v in headers_info.items() if v is not None})
+            entry["sku"] = url_to_sku[image_url]
+            dirty.add(key)
+            if status == "unchanged":
+                stats["unchanged"] += 1
+                continue
+            leader_url = None
+            if dedupe:
+                try:
+                    leader_url = find_leader(image_url, image_bytes)
+                except Exception as e:
+                    print(f"[WARNUNG] pHash {url_to_sku[image_url]}: {e}")
+            if leader_url is not None:
+                followers.setdefault(leader_url, []).append((image_url, image_bytes))
+                continue
+            pending_removals[removals.submit(_remove_in_worker, image_bytes)] = image_url
+
+        pending = set(pending_removals)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                image_url = pending_removals.pop(future)
+                derived = followers.pop(image_url, [])
+                try:
+                    cutout_bytes = future.result()
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"[FEHLER] Freistellung {url_to_sku[image_url]}: {e}")
+                    for follower_url, follower_bytes in derived:  # Duplikate dann doch einzeln freistellen
+                        retry = removals.submit(_remove_in_worker, follower_bytes)
+                        pending_removals[retry] = follower_url
+                        pending.add(retry)
+                    continue
+                outputs = [(image_url, cutout_bytes)]
+                leader_cutout = Image.open(BytesIO(cutout_bytes)) if derived else None
+                for follower_url, follower_bytes in derived:
+                    try:
+                        follower_cutout = _derive_cutout(leader_cutout, follower_bytes)
+                    except Exception as e:
+                        print(f"[WARNUNG] Maske übernehmen {url_to_sku[follower_url]}: {e}")
+                        follower_cutout = None
+                    if follower_cutout is None:  # Nicht deckungsgleich: einzeln freistellen
+                        retry = removals.submit(_remove_in_worker, follower_bytes)
+                        pending_removals[retry] = follower_url
+                        pending.add(retry)
+                    else:
+                        outputs.append((follower_url, follower_cutout))
+                for target_url, target_bytes in outputs:
+                    try:
+                        _atomic_write(cutout_path(target_url, model, store_dir), target_bytes)
+                    except OSError as e:
+                        stats["failed"] += 1
+                        print(f"[FEHLER] Speichern {url_to_sku[target_url]}: {e}")
+                        continue
+                    key = _manifest_key(target_url, model)
+                    entry = manifest[key]
+                    entry["updated"] = time.time()
+                    dirty.add(key)
+                    if target_url == image_url:
+                        entry["derived_from"] = None  # Feldweises Zusammenführen: explizit zurücksetzen
+                        stats["processed"] += 1
+                        if stats["processed"] % 25 == 0:
+                            flush_manifest()
+                    else:
+                        entry["derived_from"] = image_url
+                        stats["derived"] += 1
+
+    flush_manifest()
+    if dedupe:
+        phash_index.save()
+    stats["seconds"] = round(time.perf_counter() - started, 1)
+    return stats
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stellt alle SKU-Bilder vorab frei und legt sie im Cut-out-Store ab.")
+    parser.add_argument("--csv", default=SKU_CSV_FILENAME, help="Pfad zur SKU-CSV")
+    parser.add_argument("--model", default="u2net", help="rembg-Modell (z. B. u2net, u2netp, isnet-general-use)")
+    parser.add_argument("--workers", type=int, default=None, help="Anzahl Prozesse (Standard: CPU-Kerne)")
+    parser.add_argument("--store", default=CUTOUT_STORE_DIR, help="Zielverzeichnis des Stores")
+    parser.add_argument("--force", action="store_true", help="Alle Bilder neu berechnen")
+    parser.add_argument("--no-dedupe", action="store_true", help="Beinahe-Duplikate nicht zusammenfassen")
+    args = parser.parse_args()
+    stats = run_precompute_job(args.csv, args.model, args.workers, args.store, args.force, dedupe=not args.no_dedupe)
+    print(f"Fertig: {stats['processed']} neu, {stats['derived']} von Duplikaten übernommen, {stats['unchanged']} unverändert, "
+          f"{stats['failed']} Fehler von {stats['total']} Bildern in {stats['seconds']} s.")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
-import openai
-import base64
-from io import BytesIO
 from PIL import Image
-from typing import Tuple
+from typing import List, Tuple
+
+from logic.clients import create_image
+from logic.transport import decode_b64_images, gpt_image_output_args
 
 def get_best_gpt_image_1_size(target_aspect_ratio: float) -> str:
     """
@@ -25,19 +25,24 @@ def generate_image_with_gpt_image_1_from_text(prompt: str, size: str, quality: s
     Generiert ein Bild mit gpt-image-1 aus einem Text-Prompt.
     Gibt ein PIL Image Objekt zurück.
     """
+    return generate_images_with_gpt_image_1_from_text(prompt, size, quality, n=1)[0]
+
+def generate_images_with_gpt_image_1_from_text(prompt: str, size: str, quality: str = "auto", n: int = 1) -> List[Image.Image]:
+    """Wie generate_image_with_gpt_image_1_from_text, aber n Varianten in einer Anfrage."""
+    import openai  # Lazy: nur für die Fehlerklassen
     try:
-        response = openai.images.generate(
+        response = create_image(
+            "generate",
             model="gpt-image-1",
             prompt=prompt,
-            n=1,
+            n=n,
             size=size, # type: ignore
-            quality=quality
+            quality=quality,
+            **gpt_image_output_args()
         )
-        if response.data and response.data[0].b64_json:
-            b64_data = response.data[0].b64_json
-            image_data_bytes = base64.b64decode(b64_data)
-            generated_image_pil = Image.open(BytesIO(image_data_bytes))
-            return generated_image_pil.convert("RGB")
+        images = decode_b64_images(response.data or [], source="gpt-image-1")
+        if images:
+            return images
         else:
             raise ValueError("gpt-image-1 API hat keine Bilddaten zurückgegeben.")
     except openai.BadRequestError as e:
@@ -1,43 +1,156 @@
-import os
-import requests
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
 from PIL import Image
-from io import BytesIO
-import fal_client
 
-def _generate_fal_image(model_id: str, prompt: str, aspect_ratio: str) -> Image.Image:
-    """Eine generische Hilfsfunktion, um ein Bild von einem Fal AI Modell zu generieren."""
-    if not os.environ.get("FAL_KEY"):
-        raise ValueError("Fal AI Key nicht in .env gefunden (FAL_KEY).")
-        
+from logic.clients import get_fal_client
+from logic.transport import fal_output_args, load_image_reference
+
+FAL_MODEL_IDS: dict[str, str] = {
+    "FLUX.1 Pro": "fal-ai/flux-pro/kontext/text-to-image",
+    "FLUX.1.1 Ultra": "fal-ai/flux-pro/v1.1-ultra",
+    "Ideogram 3.0": "fal-ai/ideogram/v3",
+}
+# Modelle, die output_format akzeptieren (Ideogram liefert immer sein Standardformat)
+FAL_OUTPUT_FORMAT_MODELS: frozenset[str] = frozenset({FAL_MODEL_IDS["FLUX.1 Pro"], FAL_MODEL_IDS["FLUX.1.1 Ultra"]})
+POLL_INTERVAL_SECONDS = 1.0
+JOB_TIMEOUT_SECONDS = 300
+MAX_POLL_WORKERS = 8
+
+# === Warteschlangen-Jobs (submit statt blockierendem subscribe) ===
+@dataclass
+class FalJob:
+    """Ein eingereihter Fal-Auftrag. status: queued | running | downloading | done | error"""
+    model_id: str
+    prompt: str
+    handle: object = field(repr=False)
+    label: str = ""
+    status: str = "queued"
+    queue_position: Optional[int] = None
+    logs: list[str] = field(default_factory=list)
+    image: Optional[Image.Image] = field(default=None, repr=False)
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+
+    @property
+    def request_id(self) -> str:
+        return getattr(self.handle, "request_id", "")
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.submitted_at
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+def submit_fal_job(model_id: str, prompt: str, aspect_ratio: str, label: str = "",
+                   webhook_url: Optional[str] = None) -> FalJob:
+    """
+    Reiht einen Auftrag in die Fal-Queue ein und kehrt sofort zurück.
+    Mit webhook_url ruft Fal nach Abschluss zusätzlich diese URL auf (z. B. für Batch-Jobs außerhalb von Streamlit).
+    Das Ergebnis kommt per sync_mode inline (data-URI) statt als CDN-URL mit zweitem Download.
+    """
+    handle = get_fal_client().submit(  # ValueError, falls FAL_KEY fehlt
+        model_id,
+        arguments={"prompt": prompt, "aspect_ratio": aspect_ratio, **fal_output_args(model_id in FAL_OUTPUT_FORMAT_MODELS)},
+        webhook_url=webhook_url,
+    )
+    return FalJob(model_id=model_id, prompt=prompt, handle=handle, label=label or model_id)
+
+def _poll_until_done(job: FalJob, updates: queue.Queue, timeout: float) -> None:
+    import fal_client  # Lazy: Status-Klassen
+
     try:
-        result = fal_client.subscribe(
-            model_id,
-            arguments={
-                "prompt": prompt,
-                "aspect_ratio": aspect_ratio,
-            }
-        )
+        deadline = time.perf_counter() + timeout
+        while True:
+            status = job.handle.status(with_logs=True)
+            if isinstance(status, fal_client.Queued):
+                changed = job.status != "queued" or job.queue_position != status.position
+                job.status, job.queue_position = "queued", status.position
+            elif isinstance(status, fal_client.InProgress):
+                new_logs = [entry.get("message", "") for entry in (status.logs or [])]
+                changed = job.status != "running" or new_logs != job.logs
+                job.status, job.queue_position, job.logs = "running", None, new_logs
+            else:  # fal_client.Completed
+                break
+            if changed:
+                updates.put((job, False))
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"Zeitüberschreitung nach {timeout:.0f} s.")
+            time.sleep(POLL_INTERVAL_SECONDS)
+
+        result = job.handle.get()
         if not result or "images" not in result or not result["images"]:
             raise ValueError("Fal AI API hat keine Bilder zurückgegeben.")
-        
-        image_url = result["images"][0]["url"]
-        
-        response = requests.get(image_url, timeout=45)
-        response.raise_for_status()
-        
-        img = Image.open(BytesIO(response.content))
-        return img.convert("RGB")
+        job.status = "downloading"
+        updates.put((job, False))
+        job.image = load_image_reference(result["images"][0]["url"], source=f"fal {job.model_id}")  # data-URI oder URL
+        job.status = "done"
+    except Exception as e:
+        job.status, job.error = "error", f"Fehler bei der Fal AI Bildgenerierung ({job.model_id}): {e}"
+    job.finished_at = time.perf_counter()
+    updates.put((job, True))
+
+class FalJobMonitor:
+    """
+    Überwacht beliebig viele Fal-Jobs parallel im Hintergrund.
+    Die Status-Updates werden über updates() im aufrufenden Thread ausgeliefert (Streamlit-Aufrufe nur dort).
+    """
+
+    def __init__(self, jobs: list[FalJob], timeout: float = JOB_TIMEOUT_SECONDS):
+        self.jobs = list(jobs)
+        self._updates: queue.Queue = queue.Queue()  # (Job, abgeschlossen?)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, min(MAX_POLL_WORKERS, len(self.jobs))))
+        for job in self.jobs:
+            self._executor.submit(_poll_until_done, job, self._updates, timeout)
+        self._executor.shutdown(wait=False)
+
+    @property
+    def pending(self) -> list[FalJob]:
+        return [job for job in self.jobs if not job.finished]
+
+    def updates(self) -> Iterator[FalJob]:
+        """Liefert jeden Job, sobald sich sein Status ändert, bis alle abgeschlossen sind."""
+        remaining = len(self.jobs)
+        while remaining:
+            job, final = self._updates.get()
+            remaining -= final
+            yield job
+
+    def wait(self) -> list[FalJob]:
+        for _ in self.updates():
+            pass
+        return self.jobs
+
+def wait_for_fal_job(job: FalJob, timeout: float = JOB_TIMEOUT_SECONDS) -> Image.Image:
+    """Blockiert, bis ein einzelner Job fertig ist, und gibt das Bild zurück (oder wirft den Fehler)."""
+    FalJobMonitor([job], timeout).wait()
+    if job.error:
+        raise Exception(job.error)
+    return job.image
+
+# === Blockierende Aufrufe (bestehende API) ===
+def _generate_fal_image(model_id: str, prompt: str, aspect_ratio: str) -> Image.Image:
+    """Eine generische Hilfsfunktion, um ein Bild von einem Fal AI Modell zu generieren."""
+    try:
+        job = submit_fal_job(model_id, prompt, aspect_ratio)
     except Exception as e:
         raise Exception(f"Fehler bei der Fal AI Bildgenerierung ({model_id}): {e}")
+    return wait_for_fal_job(job)
 
 def generate_image_with_fal_flux_pro(prompt: str, aspect_ratio: str) -> Image.Image:
     """Generiert ein Bild mit dem Fal AI FLUX.1 Pro Modell."""
-    return _generate_fal_image("fal-ai/flux-pro/kontext/text-to-image", prompt, aspect_ratio)
+    return _generate_fal_image(FAL_MODEL_IDS["FLUX.1 Pro"], prompt, aspect_ratio)
 
 def generate_image_with_fal_flux_ultra(prompt: str, aspect_ratio: str) -> Image.Image:
     """Generiert ein Bild mit dem Fal AI FLUX.1 Ultra Modell."""
-    return _generate_fal_image("fal-ai/flux-pro/v1.1-ultra", prompt, aspect_ratio)
+    return _generate_fal_image(FAL_MODEL_IDS["FLUX.1.1 Ultra"], prompt, aspect_ratio)
 
 def generate_image_with_ideogram_v3(prompt: str, aspect_ratio: str) -> Image.Image:
     """Generiert ein Bild mit dem Ideogram v3 Modell via Fal AI."""
-    return _generate_fal_image("fal-ai/ideogram/v3", prompt, aspect_ratio)
\ No newline at end of file
+    return _generate_fal_image(FAL_MODEL_IDS["Ideogram 3.0"], prompt, aspect_ratio)
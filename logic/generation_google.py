@@ -1,14 +1,9 @@
 from __future__ import annotations
 import os
-from io import BytesIO
 from typing import Tuple
 from PIL import Image
 import streamlit as st
 
-import vertexai
-from vertexai.vision_models import ImageGenerationModel
-from google.oauth2 import service_account
-
 from utils import get_secret
 
 
@@ -25,6 +20,11 @@ def get_closest_imagen_dimensions(target_w: int, target_h: int) -> str:
 
 def generate_image_with_google_imagen(prompt: str, target_w: int, target_h: int) -> Image.Image:
     """Generiert ein Bild mit Google Vertex AI Imagen über das stabile und umgebungsbewusste SDK."""
+    # Lazy: Vertex AI lädt google.cloud.aiplatform und ist sehr importlastig
+    import vertexai
+    from vertexai.vision_models import ImageGenerationModel
+    from google.oauth2 import service_account
+
     project_id = get_secret("GOOGLE_CLOUD_PROJECT")
     if not project_id:
         raise ValueError("GOOGLE_CLOUD_PROJECT wurde weder in st.secrets noch in der .env-Datei gefunden.")
@@ -69,6 +69,5 @@ def generate_image_with_google_imagen(prompt: str, target_w: int, target_h: int)
     if not response.images:
         raise ValueError("Kein Bild von der Google-Imagen-API erhalten.")
 
-    image_bytes = response.images[0]._image_bytes
-    pil_image = Image.open(BytesIO(image_bytes))
-    return pil_image.convert("RGB")
\ No newline at end of file
+    from logic.transport import decode_image_bytes
+    return decode_image_bytes(response.images[0]._image_bytes, source="imagen")
\ No newline at end of file
@@ -1,15 +1,9 @@
 from __future__ import annotations
 import os
-from io import BytesIO
 import json
 from typing import Tuple
 from PIL import Image
 
-# Importiere die korrekten, aktuellen und stabilen Klassen für Vertex AI
-import vertexai
-from vertexai.vision_models import ImageGenerationModel
-from google.oauth2 import service_account
-
 # WICHTIG: Importiere unsere robuste Hilfsfunktion
 from utils import get_secret
 
@@ -29,6 +23,11 @@ def get_closest_imagen_dimensions(target_w: int, target_h: int) -> str:
 
 def generate_image_with_google_imagen(prompt: str, target_w: int, target_h: int) -> Image.Image:
     """Generiert ein Bild mit Google Vertex AI Imagen über das stabile und umgebungsbewusste SDK."""
+    # Lazy: Vertex AI lädt google.cloud.aiplatform und ist sehr importlastig
+    import vertexai
+    from vertexai.vision_models import ImageGenerationModel
+    from google.oauth2 import service_account
+
     # --- START DER FINALEN KORREKTUR ---
     
     # Schritt 1: Lade Projekt-ID und Credentials sicher mit unserer Hilfsfunktion
@@ -76,6 +75,5 @@ def generate_image_with_google_imagen(prompt: str, target_w: int, target_h: int)
     if not response.images:
         raise ValueError("Kein Bild von der Google-Imagen-API erhalten.")
 
-    image_bytes = response.images[0]._image_bytes
-    pil_image = Image.open(BytesIO(image_bytes))
-    return pil_image.convert("RGB")
\ No newline at end of file
+    from logic.transport import decode_image_bytes
+    return decode_image_bytes(response.images[0]._image_bytes, source="imagen")
\ No newline at end of file
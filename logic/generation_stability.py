@@ -1,27 +1,147 @@
-import os
-import requests
-from PIL import Image
+from PIL import Image, ImageFilter, ImageOps
 from io import BytesIO
-from typing import Tuple
+import math
+from typing import Optional, Tuple
+
+from logic.clients import CONNECT_TIMEOUT, READ_TIMEOUT, STABILITY_API_HOST, get_stability_session
+from logic.transport import decode_stream
 
 STABILITY_ASPECT_RATIO_MAP = {
     (1920, 1080): "16:9", (1024, 1024): "1:1", (1080, 1920): "9:16",
     (3000, 660): "21:9", (1500, 1000): "3:2",
 }
 
+# Generierungs-Endpunkte nach Geschwindigkeit/Kosten (Ultra: beste Qualität, Core: schnell & günstig)
+STABILITY_GENERATE_ENDPOINTS = {
+    "ultra": "/v2beta/stable-image/generate/ultra",
+    "sd3": "/v2beta/stable-image/generate/sd3",
+    "core": "/v2beta/stable-image/generate/core",
+}
+STABILITY_SPEED_TIERS = {
+    "Qualität (Ultra)": "ultra",
+    "Ausgewogen (SD3)": "sd3",
+    "Schnell (Core)": "core",
+}
+# Nur diese Endpunkte akzeptieren ein Referenzbild (image + strength)
+STABILITY_IMAGE_TO_IMAGE_TIERS = ("ultra", "sd3")
+# API-Grenzen für Eingabebilder: Seitenverhältnis 1:2.5 bis 2.5:1, begrenzte Pixelzahl
+STABILITY_MAX_INPUT_ASPECT = 2.5
+STABILITY_MAX_INPUT_PIXELS = 4_000_000
+STABILITY_EDIT_ENDPOINTS = {
+    "inpaint": "/v2beta/stable-image/edit/inpaint",
+    "outpaint": "/v2beta/stable-image/edit/outpaint",
+}
+STABILITY_OUTPUT_FORMATS = ("webp", "png", "jpeg")
+DEFAULT_STABILITY_OUTPUT_FORMAT = "webp"  # Deutlich kleinere Antworten als PNG/JPEG
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
 def get_best_stability_aspect_ratio(target_w: int, target_h: int) -> str:
     target_ratio = target_w / target_h if target_h > 0 else 1.0
     closest_match = min(STABILITY_ASPECT_RATIO_MAP.keys(), key=lambda size: abs((size[0] / size[1]) - target_ratio))
     return STABILITY_ASPECT_RATIO_MAP[closest_match]
 
-def generate_image_with_stability_ai(prompt: str, aspect_ratio: str) -> Image.Image:
-    api_key = os.environ.get("STABILITY_API_KEY")
-    if not api_key: raise ValueError("Stability AI API Key nicht in .env gefunden (STABILITY_API_KEY).")
-    host = "https://api.stability.ai/v2beta/stable-image/generate/ultra"
-    headers = {"authorization": f"Bearer {api_key}", "accept": "image/*"}
-    data = {"prompt": prompt, "aspect_ratio": aspect_ratio, "output_format": "jpeg"}
-    response = requests.post(host, headers=headers, files={"none": ''}, data=data)
-    if response.status_code == 200:
-        return Image.open(BytesIO(response.content)).convert("RGB")
-    else:
-        raise Exception(f"Stability AI API Fehler (HTTP {response.status_code}): {response.text}")
\ No newline at end of file
+def _image_file(img: Image.Image, name: str = "image", mode: str = "RGB") -> Tuple[str, bytes, str]:
+    """Kodiert ein PIL Image als PNG für den Multipart-Upload."""
+    buffer = BytesIO()
+    img.convert(mode).save(buffer, format="PNG")
+    return (f"{name}.png", buffer.getvalue(), "image/png")
+
+def _post_stability(path: str, data: dict, files: Optional[dict] = None) -> Image.Image:
+    """
+    Sendet eine Anfrage über die geteilte Session und dekodiert die Bildantwort blockweise,
+    ohne die komplette Antwort vorher zu puffern.
+    """
+    session = get_stability_session()  # ValueError, falls STABILITY_API_KEY fehlt
+    output_format = data.setdefault("output_format", DEFAULT_STABILITY_OUTPUT_FORMAT)
+    if output_format not in STABILITY_OUTPUT_FORMATS:
+        raise ValueError(f"Ungültiges Ausgabeformat: {output_format}. Erlaubt: {', '.join(STABILITY_OUTPUT_FORMATS)}.")
+    with session.post(
+        f"{STABILITY_API_HOST}{path}", headers={"accept": "image/*"}, files=files or {"none": ""},
+        data=data, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), stream=True,
+    ) as response:
+        if response.status_code != 200:
+            raise Exception(f"Stability AI API Fehler (HTTP {response.status_code}): {response.text}")
+        return decode_stream(response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE), source=f"stability {path.rsplit('/', 1)[-1]}")
+
+def _generation_data(prompt: str, negative_prompt: Optional[str], seed: Optional[int], output_format: str) -> dict:
+    data = {"prompt": prompt, "output_format": output_format}
+    if negative_prompt:
+        data["negative_prompt"] = negative_prompt
+    if seed is not None:
+        data["seed"] = seed
+    return data
+
+# === Text-zu-Bild ===
+def generate_image_with_stability_ai(prompt: str, aspect_ratio: str, tier: str = "ultra",
+                                     output_format: str = DEFAULT_STABILITY_OUTPUT_FORMAT,
+                                     negative_prompt: Optional[str] = None, seed: Optional[int] = None) -> Image.Image:
+    """Generiert ein Bild über den gewählten Endpunkt (ultra, sd3 oder core)."""
+    if tier not in STABILITY_GENERATE_ENDPOINTS:
+        raise ValueError(f"Unbekannte Stability-Stufe: {tier}")
+    data = _generation_data(prompt, negative_prompt, seed, output_format)
+    data["aspect_ratio"] = aspect_ratio
+    return _post_stability(STABILITY_GENERATE_ENDPOINTS[tier], data)
+
+# === Bild-zu-Bild (Produktbild als Referenz) ===
+def pad_reference_to_aspect(reference_img: Image.Image, target_w: int, target_h: int) -> Image.Image:
+    """
+    Bettet das Referenzbild mittig in eine Fläche mit dem Banner-Seitenverhältnis ein (begrenzt auf die API-Grenzen),
+    damit die Bild-zu-Bild-Antwort nicht hochkant kommt und danach fast vollständig weggeschnitten wird.
+    Die Ränder füllt eine unscharfe, vergrößerte Kopie des Bildes, sodass die Generierung dort den Hintergrund weiterführt.
+    """
+    ratio = target_w / target_h if target_h > 0 else 1.0
+    ratio = min(max(ratio, 1 / STABILITY_MAX_INPUT_ASPECT), STABILITY_MAX_INPUT_ASPECT)
+    rgb = reference_img.convert("RGB")
+    w, h = rgb.size
+    if abs(w / h - ratio) < 0.01:
+        return rgb
+    canvas_w, canvas_h = (round(h * ratio), h) if w / h < ratio else (w, round(w / ratio))
+    scale = min(1.0, math.sqrt(STABILITY_MAX_INPUT_PIXELS / (canvas_w * canvas_h)))
+    if scale < 1.0:
+        w, h = max(1, int(w * scale)), max(1, int(h * scale))
+        canvas_w, canvas_h = max(64, int(canvas_w * scale)), max(64, int(canvas_h * scale))
+        rgb = rgb.resize((w, h), Image.Resampling.LANCZOS)
+    canvas = ImageOps.fit(rgb, (canvas_w, canvas_h), Image.Resampling.BILINEAR)
+    canvas = canvas.filter(ImageFilter.GaussianBlur(radius=max(canvas_w, canvas_h) / 40))
+    canvas.paste(rgb, ((canvas_w - w) // 2, (canvas_h - h) // 2))
+    return canvas
+
+def generate_stability_image_to_image(reference_img: Image.Image, prompt: str, strength: float = 0.6,
+                                      tier: str = "sd3", output_format: str = DEFAULT_STABILITY_OUTPUT_FORMAT,
+                                      negative_prompt: Optional[str] = None, seed: Optional[int] = None) -> Image.Image:
+    """
+    Erzeugt ein Bild auf Basis eines Referenzbildes. strength (0–1) steuert, wie stark vom Original
+    abgewichen wird. Das Seitenverhältnis folgt dem Referenzbild (für Banner vorher pad_reference_to_aspect).
+    """
+    if tier not in STABILITY_IMAGE_TO_IMAGE_TIERS:
+        raise ValueError(f"Bild-zu-Bild wird nur von {', '.join(STABILITY_IMAGE_TO_IMAGE_TIERS)} unterstützt.")
+    if not 0.0 <= strength <= 1.0:
+        raise ValueError("strength muss zwischen 0 und 1 liegen.")
+    data = _generation_data(prompt, negative_prompt, seed, output_format)
+    data["strength"] = strength
+    if tier == "sd3":
+        data["mode"] = "image-to-image"
+    return _post_stability(STABILITY_GENERATE_ENDPOINTS[tier], data, files={"image": _image_file(reference_img)})
+
+# === Bearbeitung ===
+def inpaint_with_stability(img: Image.Image, mask: Image.Image, prompt: str,
+                           output_format: str = DEFAULT_STABILITY_OUTPUT_FORMAT,
+                           negative_prompt: Optional[str] = None, seed: Optional[int] = None) -> Image.Image:
+    """Ersetzt die weißen Bereiche der Maske (L-Bild, gleiche Größe wie img) gemäß Prompt."""
+    if mask.size != img.size:
+        raise ValueError("Maske und Bild müssen gleich groß sein.")
+    data = _generation_data(prompt, negative_prompt, seed, output_format)
+    files = {"image": _image_file(img), "mask": _image_file(mask, "mask", "L")}
+    return _post_stability(STABILITY_EDIT_ENDPOINTS["inpaint"], data, files=files)
+
+def outpaint_with_stability(img: Image.Image, left: int = 0, right: int = 0, up: int = 0, down: int = 0,
+                            prompt: str = "", output_format: str = DEFAULT_STABILITY_OUTPUT_FORMAT,
+                            seed: Optional[int] = None) -> Image.Image:
+    """Erweitert das Bild um die angegebenen Pixel je Seite (z. B. Produktbild zu breitem Banner)."""
+    if not any((left, right, up, down)):
+        raise ValueError("Mindestens eine Seite muss erweitert werden.")
+    data = _generation_data(prompt, None, seed, output_format)
+    data.update({"left": left, "right": right, "up": up, "down": down})
+    if not prompt:
+        data.pop("prompt")
+    return _post_stability(STABILITY_EDIT_ENDPOINTS["outpaint"], data, files={"image": _image_file(img)})
@@ -1,8 +1,12 @@
-import openai
 import base64
+import json
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from PIL import Image
-from typing import Tuple
+from typing import Iterator, Optional, Tuple, Union
+
+from logic.clients import collect_text, create_image, stream_chat_text
+from logic.transport import decode_b64_image
 
 # === V1: Bildanalyse und DALL-E Prompt Generierung (GPT-4o) ===
 def encode_image_to_base64(img: Image.Image) -> str:
@@ -11,33 +15,115 @@ def encode_image_to_base64(img: Image.Image) -> str:
     img.save(buffered, format="JPEG") # JPEG ist für Vision-Modelle oft ausreichend
     return base64.b64encode(buffered.getvalue()).decode('utf-8')
 
-def generate_banner_prompt_gpt4(img: Image.Image, system_prompt: str) -> str:
-    """Sendet ein Bild an GPT-4o und generiert basierend darauf einen DALL-E Prompt."""
+VISION_INSTRUCTION = "Please analyze this image and generate the DALL·E 3 prompt based on your instructions."
+
+def stream_banner_prompt_gpt4(img: Image.Image, system_prompt: str, context: Optional[str] = None) -> Iterator[str]:
+    """
+    Wie generate_banner_prompt_gpt4, liefert den Prompt aber stückweise, sobald GPT-4o ihn schreibt.
+    context (z. B. lokale Messwerte) steht hinter dem statischen Teil, damit dieser aus dem Prompt-Cache kommen kann.
+    """
     base64_image = encode_image_to_base64(img)
+    content = [{"type": "text", "text": VISION_INSTRUCTION}]
+    if context:
+        content.append({"type": "text", "text": context})
+    content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}})
     
     try:
-        response = openai.chat.completions.create(
+        yield from stream_chat_text(
+            call_name="banner_prompt_vision",
+            cache_key="banner_prompt_vision",
             model="gpt-4o",
             messages=[
-                { "role": "system", "content": system_prompt },
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "Please analyze this image and generate the DALL·E 3 prompt based on your instructions."},
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                    ],
-                }
+                { "role": "system", "content": system_prompt },  # statisch, cachebar
+                { "role": "user", "content": content },  # variabel, immer zuletzt
             ],
             max_tokens=300
         )
-        if response.choices[0].message.content:
-            return response.choices[0].message.content.strip()
-        else:
-            raise ValueError("GPT-4o hat einen leeren Prompt zurückgegeben.")
     except Exception as e:
         print(f"Fehler bei der Kommunikation mit GPT-4o: {e}")
         raise
 
+def generate_banner_prompt_gpt4(img: Image.Image, system_prompt: str, context: Optional[str] = None) -> str:
+    """Sendet ein Bild an GPT-4o und generiert basierend darauf einen DALL-E Prompt."""
+    return collect_text(stream_banner_prompt_gpt4(img, system_prompt, context), "GPT-4o hat einen leeren Prompt zurückgegeben.")
+
+# === V1: Mehrere Bilder in einer Anfrage ===
+BATCH_MAX_IMAGES = 6          # Bilder pro Anfrage; mehr verschlechtert erfahrungsgemäß die Zuordnung
+BATCH_IMAGE_MAX_SIDE = 512    # Verkleinert, "detail: low" reicht für Farben, Motive und Stimmung
+BATCH_MAX_TOKENS_PER_IMAGE = 320
+BATCH_WORKERS = 2
+BATCH_INSTRUCTION = (
+    "You will receive several product images, each preceded by its id. Apply your instructions to every image "
+    "independently. Respond with a JSON object of the form {\"prompts\": {\"<id>\": \"<DALL·E 3 prompt>\"}} "
+    "containing exactly one prompt for every id and nothing else."
+)
+
+def _downscale(img: Image.Image, max_side: int = BATCH_IMAGE_MAX_SIDE) -> Image.Image:
+    small = img.convert("RGB")
+    small.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    return small
+
+def parse_batch_prompts(raw: str, expected_ids: list[str]) -> dict[str, str]:
+    """Prüft die JSON-Antwort und liefert nur gültige, nicht-leere Prompts zu erwarteten IDs."""
+    data = json.loads(raw)
+    prompts = data.get("prompts", data) if isinstance(data, dict) else {}
+    if not isinstance(prompts, dict):
+        raise ValueError("Antwort enthält kein Objekt 'prompts'.")
+    return {
+        item_id: prompts[item_id].strip() for item_id in expected_ids
+        if isinstance(prompts.get(item_id), str) and prompts[item_id].strip()
+    }
+
+def _request_batch(images: dict[str, Image.Image], system_prompt: str) -> dict[str, str]:
+    content: list[dict] = [{"type": "text", "text": BATCH_INSTRUCTION}]
+    for item_id, img in images.items():
+        content.append({"type": "text", "text": f"id: {item_id}"})
+        content.append({"type": "image_url", "image_url": {
+            "url": f"data:image/jpeg;base64,{encode_image_to_base64(_downscale(img))}", "detail": "low",
+        }})
+    raw = collect_text(stream_chat_text(
+        call_name="banner_prompt_vision_batch",
+        cache_key="banner_prompt_vision",
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": system_prompt},  # gleicher statischer Anfang wie der Einzelaufruf
+            {"role": "user", "content": content},
+        ],
+        response_format={"type": "json_object"},
+        max_tokens=BATCH_MAX_TOKENS_PER_IMAGE * len(images),
+    ), "GPT-4o hat eine leere Stapel-Antwort zurückgegeben.")
+    return parse_batch_prompts(raw, list(images))
+
+def generate_banner_prompts_gpt4_batch(images: dict[str, Image.Image], system_prompt: str,
+                                       max_per_request: int = BATCH_MAX_IMAGES) -> dict[str, Union[str, Exception]]:
+    """
+    Analysiert mehrere Bilder (ID -> Bild) mit wenigen GPT-4o-Anfragen zu je max_per_request Bildern.
+    Fehlt ein Prompt in der Antwort oder schlägt eine Anfrage fehl, wird für die betroffenen IDs
+    einzeln generate_banner_prompt_gpt4 aufgerufen. Rückgabe: ID -> Prompt oder die Exception des Einzelaufrufs.
+    """
+    ids = list(images)
+    chunks = [ids[i:i + max_per_request] for i in range(0, len(ids), max_per_request)]
+
+    def run_chunk(chunk: list[str]) -> dict[str, Union[str, Exception]]:
+        try:
+            results: dict[str, Union[str, Exception]] = dict(_request_batch({i: images[i] for i in chunk}, system_prompt))
+        except Exception as e:
+            print(f"Stapel-Analyse fehlgeschlagen, Einzelaufrufe für {len(chunk)} Bilder: {e}")
+            results = {}
+        for item_id in chunk:
+            if item_id not in results:
+                try:
+                    results[item_id] = generate_banner_prompt_gpt4(images[item_id], system_prompt)
+                except Exception as e:
+                    results[item_id] = e
+        return results
+
+    merged: dict[str, Union[str, Exception]] = {}
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as executor:
+        for results in executor.map(run_chunk, chunks):
+            merged.update(results)
+    return merged
+
 # === V1: DALL-E 3 Bildgenerierung ===
 def get_best_dalle_size(target_aspect_ratio: float) -> str:
     """Wählt die am besten passende DALL·E 3 Ausgabegröße."""
@@ -49,25 +135,38 @@ def get_best_dalle_size(target_aspect_ratio: float) -> str:
     closest_size_key = min(dalle_sizes.keys(), key=lambda k: abs(dalle_sizes[k][0] - target_aspect_ratio))
     return dalle_sizes[closest_size_key][1]
 
-def generate_dalle_image(prompt: str, size: str = "1792x1024", quality: str = "standard") -> str:
-    """Generiert ein Bild mit DALL·E 3 und gibt die URL zurück."""
+def _generate_dalle(prompt: str, size: str, quality: str, response_format: str):
+    import openai  # Lazy: nur für die Fehlerklassen
     try:
-        response = openai.images.generate(
+        response = create_image(
+            "generate",
             model="dall-e-3",
             prompt=prompt,
             n=1,
             size=size, # type: ignore
             quality=quality,
-            response_format="url"
+            response_format=response_format
         )
-        if response.data[0].url:
-            return response.data[0].url
-        else:
-            raise ValueError("DALL-E API hat keine Bild-URL zurückgegeben.")
+        return response.data[0]
     except openai.BadRequestError as e:
         if e.body and "content_policy_violation" in str(e.body):
             raise ValueError(f"DALL·E hat den Prompt aufgrund von Content-Richtlinien abgelehnt. Prompt: '{prompt[:100]}...'") from e
         raise
     except Exception as e:
         print(f"Fehler bei der DALL-E Bildgenerierung: {e}")
-        raise
\ No newline at end of file
+        raise
+
+def generate_dalle_image(prompt: str, size: str = "1792x1024", quality: str = "standard") -> str:
+    """Generiert ein Bild mit DALL·E 3 und gibt die URL zurück."""
+    image_data = _generate_dalle(prompt, size, quality, "url")
+    if image_data.url:
+        return image_data.url
+    else:
+        raise ValueError("DALL-E API hat keine Bild-URL zurückgegeben.")
+
+def generate_dalle_image_b64(prompt: str, size: str = "1792x1024", quality: str = "standard") -> Image.Image:
+    """Generiert ein Bild mit DALL·E 3 und liefert es direkt als PIL Image (b64_json, kein zweiter Download)."""
+    image_data = _generate_dalle(prompt, size, quality, "b64_json")
+    if not image_data.b64_json:
+        raise ValueError("DALL-E API hat keine Bilddaten zurückgegeben.")
+    return decode_b64_image(image_data.b64_json, source="dall-e-3")
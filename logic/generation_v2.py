@@ -1,8 +1,9 @@
-import openai
-import base64
 from io import BytesIO
 from PIL import Image
-from typing import Tuple
+from typing import List, Sequence, Tuple
+
+from logic.clients import create_image
+from logic.transport import decode_b64_images, gpt_image_output_args
 
 # === Bildkodierung (für den Upload an OpenAI API) ===
 def pil_to_bytes_with_mimetype(img: Image.Image, format: str = "PNG") -> Tuple[bytes, str]:
@@ -50,13 +51,32 @@ def generate_banner_with_gpt_image_1(
     original_image_pil: Image.Image,
     instruction_prompt: str,
     target_size_str: str,
-    quality: str = "auto" # 'low', 'medium', 'high', oder 'auto'
+    quality: str = "auto", # 'low', 'medium', 'high', oder 'auto'
+    additional_images: Sequence[Image.Image] = ()
 ) -> Image.Image:
     """
     Generiert ein Banner mit gpt-image-1, inspiriert vom original_image_pil.
     target_size_str: Eine der von gpt-image-1 unterstützten Größen-Strings.
     quality: Die gewünschte Qualität des generierten Bildes für gpt-image-1.
+    additional_images: weitere Referenzbilder (werden nach original_image_pil mitgeschickt).
+    """
+    return generate_banners_with_gpt_image_1(original_image_pil, instruction_prompt, target_size_str, quality, n=1,
+                                             additional_images=additional_images)[0]
+
+def generate_banners_with_gpt_image_1(
+    original_image_pil: Image.Image,
+    instruction_prompt: str,
+    target_size_str: str,
+    quality: str = "auto",
+    n: int = 1,
+    additional_images: Sequence[Image.Image] = ()
+) -> List[Image.Image]:
+    """
+    Wie generate_banner_with_gpt_image_1, aber n Varianten in einer Anfrage
+    (das Referenzbild wird nur einmal hochgeladen und berechnet, z. B. für Entwürfe).
     """
+    import openai  # Lazy: nur für die Fehlerklassen
+
     if not instruction_prompt:
         raise ValueError("Instruction prompt cannot be empty for gpt-image-1.")
     if not original_image_pil:
@@ -65,23 +85,25 @@ def generate_banner_with_gpt_image_1(
         raise ValueError(f"Invalid quality setting: {quality}. Must be one of 'low', 'medium', 'high', 'auto'.")
 
     try:
-        image_bytes, image_mimetype = pil_to_bytes_with_mimetype(original_image_pil, format="PNG")
-        dummy_filename = f"input_image.{image_mimetype.split('/')[1]}"
+        image_files = []
+        for i, img in enumerate([original_image_pil, *additional_images]):
+            image_bytes, image_mimetype = pil_to_bytes_with_mimetype(img, format="PNG")
+            image_files.append((f"input_image_{i}.{image_mimetype.split('/')[1]}", image_bytes, image_mimetype))
 
-        response = openai.images.edit(
+        response = create_image(
+            "edit",
             model="gpt-image-1",
-            image=(dummy_filename, image_bytes, image_mimetype),
+            image=image_files[0] if len(image_files) == 1 else image_files, # Mehrere Referenzen als Liste
             prompt=instruction_prompt,
-            n=1,
+            n=n,
             size=target_size_str, # type: ignore
-            quality=quality # Qualitätsparameter hinzugefügt
+            quality=quality, # Qualitätsparameter hinzugefügt
+            **gpt_image_output_args() # JPEG statt PNG: deutlich kleinere Antwort
         )
 
-        if response.data and response.data[0].b64_json:
-            b64_data = response.data[0].b64_json
-            image_data_bytes = base64.b64decode(b64_data)
-            generated_image_pil = Image.open(BytesIO(image_data_bytes))
-            return generated_image_pil.convert("RGB")
+        images = decode_b64_images(response.data or [], source="gpt-image-1")
+        if images:
+            return images
         else:
             raise ValueError("No image data received from gpt-image-1 API response, or data is empty.")
 
@@ -122,4 +144,37 @@ def generate_banner_with_gpt_image_1(
         raise
     except Exception as e:
         print(f"An unexpected error occurred during gpt-image-1 image generation: {e}")
-        raise
\ No newline at end of file
+        raise
+# === GPT-Image-1: Bearbeitung mit Maske (z. B. Outpainting) ===
+def edit_with_mask_gpt_image_1(image_pil: Image.Image, mask_pil: Image.Image, instruction_prompt: str,
+                               target_size_str: str, quality: str = "auto") -> Image.Image:
+    """
+    Bearbeitet nur die Bereiche, die in der Maske transparent sind (Alpha = 0).
+    image_pil und mask_pil müssen gleich groß sein und der target_size_str entsprechen.
+    """
+    import openai  # Lazy: nur für die Fehlerklassen
+
+    if image_pil.size != mask_pil.size:
+        raise ValueError("Image and mask must have the same size for gpt-image-1 edits.")
+    image_bytes, image_mimetype = pil_to_bytes_with_mimetype(image_pil.convert("RGBA"), format="PNG")
+    mask_bytes, mask_mimetype = pil_to_bytes_with_mimetype(mask_pil.convert("RGBA"), format="PNG")
+    try:
+        response = create_image(
+            "edit",
+            model="gpt-image-1",
+            image=("input_image.png", image_bytes, image_mimetype),
+            mask=("mask.png", mask_bytes, mask_mimetype),
+            prompt=instruction_prompt,
+            n=1,
+            size=target_size_str, # type: ignore
+            quality=quality,
+            **gpt_image_output_args()
+        )
+    except openai.BadRequestError as e:
+        if "content_policy_violation" in str(e.body).lower():
+            raise ValueError(f"gpt-image-1 rejected the edit due to content policy: '{instruction_prompt[:100]}...'") from e
+        raise ValueError(f"gpt-image-1 API Bad Request: {e}") from e
+    images = decode_b64_images(response.data or [], source="gpt-image-1 (edit)")
+    if not images:
+        raise ValueError("No image data received from gpt-image-1 API response, or data is empty.")
+    return images[0]
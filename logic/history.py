@@ -0,0 +1,227 @@
+"""
+Lokaler Verlauf aller generierten Bilder.
+
+SQLite-Index (history.db) plus content-adressierter Bildordner: Jedes Bild liegt genau einmal
+unter images/<aa>/<hash>.png, das Vorschaubild wird beim Schreiben unter thumbs/ erzeugt.
+Die Galerie lädt nur die Vorschaubilder der aktuellen Seite; ein altes Ergebnis zu öffnen ist ein Lesezugriff
+auf die Platte statt eines erneuten API-Aufrufs.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Iterator, Optional
+
+from PIL import Image
+
+from utils import PROJECT_ROOT
+
+HISTORY_DIR = os.environ.get("BANNER_HISTORY_DIR", os.path.join(PROJECT_ROOT, "history"))
+DB_FILENAME = "history.db"
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_QUALITY = 80
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    page TEXT NOT NULL,
+    model TEXT,
+    prompt TEXT,
+    params TEXT,
+    cost_chf REAL,
+    latency_s REAL,
+    sku TEXT,
+    image_hash TEXT NOT NULL,
+    width INTEGER,
+    height INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_results_created ON results (created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_results_page ON results (page, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_results_sku ON results (sku);
+CREATE INDEX IF NOT EXISTS idx_results_hash ON results (image_hash);
+"""
+
+_schema_lock = threading.Lock()
+_schema_ready: set[str] = set()
+
+@dataclass
+class HistoryEntry:
+    id: int
+    created_at: float
+    page: str
+    model: Optional[str]
+    prompt: Optional[str]
+    params: dict
+    cost_chf: Optional[float]
+    latency_s: Optional[float]
+    sku: Optional[str]
+    image_hash: str
+    width: int
+    height: int
+
+# === Pfade & Verbindung ===
+def image_path(image_hash: str, history_dir: str = HISTORY_DIR) -> str:
+    return os.path.join(history_dir, "images", image_hash[:2], f"{image_hash}.png")
+
+def thumbnail_path(image_hash: str, history_dir: str = HISTORY_DIR) -> str:
+    return os.path.join(history_dir, "thumbs", image_hash[:2], f"{image_hash}.{THUMBNAIL_FORMAT.lower()}")
+
+@contextmanager
+def _connect(history_dir: str = HISTORY_DIR) -> Iterator[sqlite3.Connection]:
+    """Kurzlebige Verbindung pro Aufruf (Streamlit-Reruns laufen in wechselnden Threads)."""
+    os.makedirs(history_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(history_dir, DB_FILENAME), timeout=10)
+    conn.row_factory = sqlite3.Row
+    try:
+        with _schema_lock:
+            if history_dir not in _schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                _schema_ready.add(history_dir)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def _atomic_write(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _image_hash(img: Image.Image) -> str:
+    digest = hashlib.sha256(f"{img.mode}:{img.size}".encode("utf-8"))
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+def _row_to_entry(row: sqlite3.Row) -> HistoryEntry:
+    return HistoryEntry(
+        id=row["id"], created_at=row["created_at"], page=row["page"], model=row["model"], prompt=row["prompt"],
+        params=json.loads(row["params"] or "{}"), cost_chf=row["cost_chf"], latency_s=row["latency_s"],
+        sku=row["sku"], image_hash=row["image_hash"], width=row["width"], height=row["height"],
+    )
+
+# === Schreiben ===
+def _store_image(img: Image.Image, history_dir: str) -> str:
+    image_hash = _image_hash(img)
+    full_path = image_path(image_hash, history_dir)
+    if not os.path.exists(full_path):
+        buffer = BytesIO()
+        img.save(buffer, format="PNG")
+        _atomic_write(full_path, buffer.getvalue())
+    thumb_path = thumbnail_path(image_hash, history_dir)
+    if not os.path.exists(thumb_path):
+        thumb = img.convert("RGB")
+        thumb.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        thumb.save(buffer, format=THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+        _atomic_write(thumb_path, buffer.getvalue())
+    return image_hash
+
+def record_result(img: Image.Image, page: str, model: Optional[str] = None, prompt: Optional[str] = None,
+                  params: Optional[dict] = None, cost_chf: Optional[float] = None, latency_s: Optional[float] = None,
+                  sku: Optional[str] = None, history_dir: str = HISTORY_DIR) -> Optional[int]:
+    """
+    Speichert ein Ergebnis im Verlauf und gibt die ID zurück. Fehler werden nur protokolliert
+    (None), damit ein volles Laufwerk o. Ä. nie die eigentliche Generierung abbricht.
+    """
+    try:
+        image_hash = _store_image(img, history_dir)
+        with _connect(history_dir) as conn:
+            cursor = conn.execute(
+                "INSERT INTO results (created_at, page, model, prompt, params, cost_chf, latency_s, sku, image_hash, width, height)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), page, model, prompt, json.dumps(params or {}, default=str), cost_chf, latency_s,
+                 sku, image_hash, img.width, img.height),
+            )
+            return cursor.lastrowid
+    except Exception as e:
+        print(f"Verlauf konnte nicht gespeichert werden: {e}")
+        return None
+
+def delete_result(entry_id: int, history_dir: str = HISTORY_DIR) -> None:
+    """Entfernt einen Eintrag; Bild und Vorschau werden gelöscht, sobald kein Eintrag mehr darauf verweist."""
+    with _connect(history_dir) as conn:
+        row = conn.execute("SELECT image_hash FROM results WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            return
+        conn.execute("DELETE FROM results WHERE id = ?", (entry_id,))
+        still_used = conn.execute("SELECT 1 FROM results WHERE image_hash = ? LIMIT 1", (row["image_hash"],)).fetchone()
+    if not still_used:
+        for path in (image_path(row["image_hash"], history_dir), thumbnail_path(row["image_hash"], history_dir)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+# === Lesen ===
+def _where(page: Optional[str], sku: Optional[str], search: Optional[str]) -> tuple[str, list]:
+    clauses, args = [], []
+    if page:
+        clauses.append("page = ?"); args.append(page)
+    if sku:
+        clauses.append("sku = ?"); args.append(sku)
+    if search:
+        clauses.append("(prompt LIKE ? OR model LIKE ?)"); args += [f"%{search}%", f"%{search}%"]
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+def count_results(page: Optional[str] = None, sku: Optional[str] = None, search: Optional[str] = None,
+                  history_dir: str = HISTORY_DIR) -> int:
+    where, args = _where(page, sku, search)
+    with _connect(history_dir) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM results{where}", args).fetchone()[0]
+
+def list_results(offset: int = 0, limit: int = 12, page: Optional[str] = None, sku: Optional[str] = None,
+                 search: Optional[str] = None, history_dir: str = HISTORY_DIR) -> list[HistoryEntry]:
+    """Eine Seite des Verlaufs, neueste zuerst (nur Metadaten, keine Bilder)."""
+    where, args = _where(page, sku, search)
+    with _connect(history_dir) as conn:
+        rows = conn.execute(
+            f"SELECT * FROM results{where} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?", args + [limit, offset]
+        ).fetchall()
+    return [_row_to_entry(row) for row in rows]
+
+def get_result(entry_id: int, history_dir: str = HISTORY_DIR) -> Optional[HistoryEntry]:
+    with _connect(history_dir) as conn:
+        row = conn.execute("SELECT * FROM results WHERE id = ?", (entry_id,)).fetchone()
+    return _row_to_entry(row) if row else None
+
+def latest_result_for_skus(skus: list[str], page: Optional[str] = None, history_dir: str = HISTORY_DIR) -> Optional[HistoryEntry]:
+    """Neuestes Ergebnis zu einer der SKUs (z. B. für Beinahe-Duplikate aus logic.phash)."""
+    if not skus:
+        return None
+    clauses = f"sku IN ({', '.join('?' for _ in skus)})" + (" AND page = ?" if page else "")
+    args = list(skus) + ([page] if page else [])
+    with _connect(history_dir) as conn:
+        row = conn.execute(f"SELECT * FROM results WHERE {clauses} ORDER BY created_at DESC LIMIT 1", args).fetchone()
+    return _row_to_entry(row) if row else None
+
+def list_pages(history_dir: str = HISTORY_DIR) -> list[str]:
+    with _connect(history_dir) as conn:
+        return [row[0] for row in conn.execute("SELECT DISTINCT page FROM results ORDER BY page")]
+
+def load_thumbnail_bytes(image_hash: str, history_dir: str = HISTORY_DIR) -> Optional[bytes]:
+    try:
+        with open(thumbnail_path(image_hash, history_dir), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def load_image_bytes(image_hash: str, history_dir: str = HISTORY_DIR) -> Optional[bytes]:
+    try:
+        with open(image_path(image_hash, history_dir), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def load_image(image_hash: str, history_dir: str = HISTORY_DIR) -> Optional[Image.Image]:
+    data = load_image_bytes(image_hash, history_dir)
+    return Image.open(BytesIO(data)).convert("RGB") if data else None
@@ -0,0 +1,204 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Byte-Budgets des CDN pro Ausgabegröße (Breite, Höhe) -> max. Bytes
+CDN_BYTE_BUDGETS: dict[Tuple[int, int], int] = {
+    (3000, 660): 250 * 1024,
+    (1500, 1000): 200 * 1024,
+    (1920, 1080): 300 * 1024,
+}
+
+# PIL-Subsampling-Werte: 0 = 4:4:4, 1 = 4:2:2, 2 = 4:2:0
+JPEG_SUBSAMPLING_OPTIONS: dict[int, str] = {2: "4:2:0", 1: "4:2:2", 0: "4:4:4"}
+SEARCH_QUALITY_MIN = 30
+SEARCH_QUALITY_MAX = 95
+SSIM_REFERENCE_MAX_SIDE = 512  # Luma-SSIM wird auf einer verkleinerten Graustufen-Version berechnet
+# Chroma-SSIM in voller Auflösung auf den farbintensivsten Kacheln – verkleinert wäre der 4:2:0-Verlust unsichtbar
+SSIM_CHROMA_TILE = 128
+SSIM_CHROMA_TILES = 6
+SUPPORTED_SEARCH_FORMATS = ("JPEG", "WEBP")
+
+# === Kodierung ===
+def _prepare_for_format(img: Image.Image, fmt: str) -> Image.Image:
+    """Bringt das Bild in einen Modus, den das Zielformat speichern kann."""
+    if fmt == "JPEG" and img.mode != "RGB":
+        return img.convert("RGB")
+    if fmt == "WEBP" and img.mode not in ("RGB", "RGBA"):
+        return img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+    return img
+
+def encode_image(img: Image.Image, fmt: str, quality: int, subsampling: Optional[int] = None) -> bytes:
+    """
+    Kodiert ein Bild mit fester Qualität.
+    JPEGs werden immer progressiv und mit optimierten Huffman-Tabellen geschrieben.
+    """
+    buffer = BytesIO()
+    if fmt == "JPEG":
+        save_kwargs = {"quality": quality, "optimize": True, "progressive": True}
+        if subsampling is not None:
+            save_kwargs["subsampling"] = subsampling
+        img.save(buffer, format="JPEG", **save_kwargs)
+    elif fmt == "WEBP":
+        img.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        img.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+# === SSIM (NumPy, ohne SciPy) ===
+def _to_luma_array(img: Image.Image) -> np.ndarray:
+    """Graustufen-Array (float32) in reduzierter Auflösung für den Qualitätsvergleich."""
+    gray = img.convert("L")
+    scale = SSIM_REFERENCE_MAX_SIDE / max(gray.size)
+    if scale < 1:
+        gray = gray.resize((max(1, int(gray.width * scale)), max(1, int(gray.height * scale))), Image.Resampling.BILINEAR)
+    return np.asarray(gray, dtype=np.float32)
+
+def _box_mean(a: np.ndarray, radius: int) -> np.ndarray:
+    """Mittelwertfilter über ein (2r+1)²-Fenster mittels Integralbild."""
+    k = 2 * radius + 1
+    padded = np.pad(a, radius + 1, mode="edge")
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    window_sum = integral[k:, k:] - integral[:-k, k:] - integral[k:, :-k] + integral[:-k, :-k]
+    return window_sum[: a.shape[0], : a.shape[1]] / (k * k)
+
+def ssim(reference: np.ndarray, candidate: np.ndarray, radius: int = 3) -> float:
+    """Mittlerer SSIM zweier Graustufen-Arrays gleicher Größe (Wertebereich 0..255)."""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    mu_x, mu_y = _box_mean(reference, radius), _box_mean(candidate, radius)
+    var_x = _box_mean(reference * reference, radius) - mu_x * mu_x
+    var_y = _box_mean(candidate * candidate, radius) - mu_y * mu_y
+    cov_xy = _box_mean(reference * candidate, radius) - mu_x * mu_y
+    ssim_map = ((2 * mu_x * mu_y + c1) * (2 * cov_xy + c2)) / ((mu_x ** 2 + mu_y ** 2 + c1) * (var_x + var_y + c2))
+    return float(ssim_map.mean())
+
+def _chroma_tile_boxes(img: Image.Image) -> list[Tuple[int, int, int, int]]:
+    """Wählt die Kacheln mit der größten Cb/Cr-Varianz (Schrift, Logos, farbige Kanten)."""
+    chroma = np.asarray(img.convert("YCbCr"), dtype=np.float32)[..., 1:]
+    t = SSIM_CHROMA_TILE
+    rows, cols = chroma.shape[0] // t, chroma.shape[1] // t
+    if rows == 0 or cols == 0:
+        return [(0, 0, img.width, img.height)]
+    tiles = chroma[: rows * t, : cols * t].reshape(rows, t, cols, t, 2)
+    energy = tiles.var(axis=(1, 3)).sum(axis=-1).ravel()
+    order = np.argsort(energy)[::-1][:SSIM_CHROMA_TILES]
+    return [((i % cols) * t, (i // cols) * t, (i % cols + 1) * t, (i // cols + 1) * t) for i in order]
+
+def _chroma_arrays(img: Image.Image, boxes: list) -> list[np.ndarray]:
+    """Cb/Cr-Arrays (float32, H×W×2) der gewählten Kacheln in voller Auflösung."""
+    ycbcr = img.convert("YCbCr")
+    return [np.asarray(ycbcr.crop(box), dtype=np.float32)[..., 1:] for box in boxes]
+
+def _build_reference(img: Image.Image) -> dict:
+    """Vergleichsdaten des Originals: verkleinerte Luma plus Chroma-Kacheln in voller Auflösung."""
+    boxes = _chroma_tile_boxes(img)
+    return {"luma": _to_luma_array(img), "boxes": boxes, "chroma": _chroma_arrays(img, boxes)}
+
+def color_ssim(reference: dict, candidate: Image.Image) -> float:
+    """
+    Minimum aus Luma-SSIM und den SSIM-Werten der Cb- und Cr-Ebene.
+    So gewinnt 4:2:0 nur, wenn auch die Farbkanten (z. B. rote Schrift) erhalten bleiben.
+    """
+    scores = [ssim(reference["luma"], _to_luma_array(candidate))]
+    candidate_chroma = _chroma_arrays(candidate, reference["boxes"])
+    for channel in (0, 1):
+        per_tile = [ssim(ref[..., channel], cand[..., channel]) for ref, cand in zip(reference["chroma"], candidate_chroma)]
+        scores.append(float(np.mean(per_tile)))
+    return min(scores)
+
+# === Suche nach Qualität & Subsampling ===
+def _search_quality(img: Image.Image, fmt: str, subsampling: Optional[int], reference: dict,
+                    max_bytes: Optional[int], min_ssim: Optional[float], q_min: int, q_max: int) -> dict:
+    """
+    Binärsuche über die Qualitätsstufe für eine feste Subsampling-Einstellung.
+    Mit SSIM-Untergrenze: kleinste Qualität, die die Untergrenze erreicht (und ins Budget passt).
+    Nur mit Budget: größte Qualität, die noch ins Budget passt.
+    """
+    cache: dict[int, dict] = {}
+
+    def attempt(quality: int, with_ssim: bool) -> dict:
+        entry = cache.get(quality)
+        if entry is None:
+            data = encode_image(img, fmt, quality, subsampling)
+            entry = {"data": data, "size": len(data), "quality": quality, "subsampling": subsampling, "ssim": None}
+            cache[quality] = entry
+        if with_ssim and entry["ssim"] is None:
+            decoded = Image.open(BytesIO(entry["data"]))
+            entry["ssim"] = color_ssim(reference, decoded)
+        return entry
+
+    def bisect(predicate, find_lowest: bool) -> Optional[int]:
+        lo, hi, found = q_min, q_max, None
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            if predicate(mid):
+                found = mid
+                if find_lowest: hi = mid - 1
+                else: lo = mid + 1
+            else:
+                if find_lowest: lo = mid + 1
+                else: hi = mid - 1
+        return found
+
+    if min_ssim is not None:
+        # Früh abbrechen, wenn selbst die höchste Stufe die Untergrenze verfehlt
+        if attempt(q_max, True)["ssim"] >= min_ssim:
+            q = bisect(lambda q: attempt(q, True)["ssim"] >= min_ssim, find_lowest=True)
+            best = attempt(q, True)
+            if max_bytes is None or best["size"] <= max_bytes:
+                return {**best, "within_budget": True, "ssim_met": True}
+
+    if max_bytes is not None:
+        # Früh abbrechen, wenn selbst die niedrigste Stufe das Budget sprengt
+        if attempt(q_min, False)["size"] > max_bytes:
+            return {**attempt(q_min, True), "within_budget": False, "ssim_met": False}
+        q = bisect(lambda q: attempt(q, False)["size"] <= max_bytes, find_lowest=False)
+        best = attempt(q, True)
+        return {**best, "within_budget": True, "ssim_met": min_ssim is None or best["ssim"] >= min_ssim}
+
+    # SSIM-Untergrenze nicht erreichbar und kein Budget: beste Stufe liefern
+    return {**attempt(q_max, True), "within_budget": True, "ssim_met": False}
+
+def encode_to_target(
+    img: Image.Image,
+    fmt: str = "JPEG",
+    max_bytes: Optional[int] = None,
+    min_ssim: Optional[float] = None,
+    q_min: int = SEARCH_QUALITY_MIN,
+    q_max: int = SEARCH_QUALITY_MAX,
+) -> Tuple[bytes, dict]:
+    """
+    Kodiert ein Bild so klein wie möglich unter einem Byte-Budget und/oder einer SSIM-Untergrenze.
+    Für JPEG werden alle Subsampling-Varianten parallel durchsucht, für WebP nur die Qualität.
+    Der SSIM-Wert ist das Minimum aus Luma und Chroma (siehe color_ssim).
+    Gibt die Bytes und ein Info-Dict (quality, subsampling, size, ssim, within_budget, ssim_met) zurück.
+    """
+    fmt = fmt.upper()
+    if fmt not in SUPPORTED_SEARCH_FORMATS:
+        raise ValueError(f"Zielgrößen-Kodierung unterstützt nur {', '.join(SUPPORTED_SEARCH_FORMATS)}, nicht {fmt}.")
+    if max_bytes is None and min_ssim is None:
+        raise ValueError("Bitte ein Byte-Budget und/oder eine SSIM-Untergrenze angeben.")
+
+    prepared = _prepare_for_format(img, fmt)
+    reference = _build_reference(prepared)
+    subsampling_variants = list(JPEG_SUBSAMPLING_OPTIONS.keys()) if fmt == "JPEG" else [None]
+
+    with ThreadPoolExecutor(max_workers=len(subsampling_variants)) as pool:
+        candidates = list(pool.map(
+            lambda ss: _search_quality(prepared, fmt, ss, reference, max_bytes, min_ssim, q_min, q_max),
+            subsampling_variants,
+        ))
+
+    def rank(c: dict):
+        # Gültige Kandidaten zuerst; mit SSIM-Ziel gewinnt die kleinste Datei, sonst die höchste Ähnlichkeit
+        valid = c["within_budget"] and (min_ssim is None or c["ssim_met"])
+        return (not valid, c["size"] if min_ssim is not None else -c["ssim"])
+
+    best = min(candidates, key=rank)
+    info = {k: v for k, v in best.items() if k != "data"}
+    info["format"] = fmt
+    info["subsampling_label"] = JPEG_SUBSAMPLING_OPTIONS.get(best["subsampling"], "–")
+    return best["data"], info
@@ -0,0 +1,182 @@
+"""
+Leichtgewichtige Messpunkte für Startzeiten und API-Aufrufe.
+
+Import-Bericht pro Seite (jeweils in einem frischen Prozess gemessen):
+    python -m logic.instrumentation
+
+Gemessen werden die Import-Anweisungen, die eine Seite vor ihrem record_page_startup-Aufruf ausführt;
+sie werden direkt aus den Seitendateien gelesen (keine von Hand gepflegte Liste).
+"""
+import ast
+import glob
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+PROCESS_START = time.perf_counter()
+
+MAIN_PAGE_FILE = "Image_Tools_Hub.py"
+PAGES_DIR = "pages"
+
+# Schwergewichtige Bibliotheken, die erst bei Bedarf geladen werden sollen
+HEAVY_MODULES: list[str] = ["pandas", "openai", "rembg", "onnxruntime", "fal_client", "vertexai", "google.cloud.aiplatform"]
+
+_lock = threading.Lock()
+_page_startups: dict[str, dict] = {}
+MAX_API_CALLS = 500  # Nur die letzten Aufrufe werden gehalten
+_api_calls: deque = deque(maxlen=MAX_API_CALLS)
+_image_transfers: deque = deque(maxlen=MAX_API_CALLS)
+
+# === Startzeiten der Seiten (im laufenden Prozess) ===
+def record_page_startup(page_name: str, import_seconds: float) -> None:
+    """Merkt sich die Import-Phase einer Seite: der erste Lauf ist der Kaltstart, alle weiteren sind warm."""
+    with _lock:
+        entry = _page_startups.get(page_name)
+        if entry is None:
+            _page_startups[page_name] = {
+                "cold_seconds": import_seconds,
+                "since_process_start": time.perf_counter() - PROCESS_START,
+                "warm_seconds": None, "runs": 1,
+            }
+        else:
+            entry["warm_seconds"] = import_seconds
+            entry["runs"] += 1
+
+def page_startup_report() -> list[dict]:
+    """Tabellenzeilen für die Anzeige der gemessenen Startzeiten."""
+    with _lock:
+        return [
+            {"Seite": name, "Kaltstart (s)": round(e["cold_seconds"], 3),
+             "Warm (s)": round(e["warm_seconds"], 3) if e["warm_seconds"] is not None else None,
+             "Läufe": e["runs"], "Nach Prozessstart (s)": round(e["since_process_start"], 1)}
+            for name, e in sorted(_page_startups.items())
+        ]
+
+# === API-Aufrufe (Tokens, Prompt-Cache, Latenz) ===
+def record_api_call(name: str, model: Optional[str], latency_s: float, first_token_s: Optional[float] = None,
+                    prompt_tokens: Optional[int] = None, cached_tokens: Optional[int] = None,
+                    completion_tokens: Optional[int] = None) -> None:
+    """Merkt sich einen Chat-Aufruf; cached_tokens ist der Anteil des Prompts, den der Anbieter aus dem Cache bedient hat."""
+    with _lock:
+        _api_calls.append({
+            "name": name, "model": model, "latency_s": latency_s, "first_token_s": first_token_s,
+            "prompt_tokens": prompt_tokens, "cached_tokens": cached_tokens, "completion_tokens": completion_tokens,
+            "at": time.time(),
+        })
+
+def api_call_report() -> list[dict]:
+    """Tabellenzeilen pro Aufruf-Art: Mittelwerte für Latenz und erstes Token, Summen und Cache-Anteil der Tokens."""
+    with _lock:
+        calls = list(_api_calls)
+    by_name: dict[str, list[dict]] = {}
+    for call in calls:
+        by_name.setdefault(call["name"], []).append(call)
+
+    def mean(values: list) -> Optional[float]:
+        values = [v for v in values if v is not None]
+        return round(sum(values) / len(values), 2) if values else None
+
+    rows = []
+    for name, entries in sorted(by_name.items()):
+        prompt_tokens = sum(e["prompt_tokens"] or 0 for e in entries)
+        cached_tokens = sum(e["cached_tokens"] or 0 for e in entries)
+        rows.append({
+            "Aufruf": name, "Anzahl": len(entries),
+            "Ø Latenz (s)": mean([e["latency_s"] for e in entries]),
+            "Ø erstes Token (s)": mean([e["first_token_s"] for e in entries]),
+            "Prompt-Tokens": prompt_tokens, "davon gecacht": cached_tokens,
+            "Cache-Anteil (%)": round(100 * cached_tokens / prompt_tokens, 1) if prompt_tokens else None,
+            "Antwort-Tokens": sum(e["completion_tokens"] or 0 for e in entries),
+        })
+    return rows
+
+# === Bildantworten der Provider (Transportformat, Bytes, Dekodierzeit) ===
+def record_image_transfer(source: str, fmt: Optional[str], payload_bytes: int, seconds: float) -> None:
+    """Merkt sich eine dekodierte Bildantwort; seconds umfasst bei Downloads auch die Übertragung."""
+    with _lock:
+        _image_transfers.append({"source": source, "format": fmt, "bytes": payload_bytes, "seconds": seconds, "at": time.time()})
+
+def image_transfer_report() -> list[dict]:
+    """Tabellenzeilen pro Quelle und Format: Anzahl, mittlere Antwortgröße und Dekodierzeit."""
+    with _lock:
+        transfers = list(_image_transfers)
+    groups: dict[tuple, list[dict]] = {}
+    for transfer in transfers:
+        groups.setdefault((transfer["source"], transfer["format"]), []).append(transfer)
+    return [
+        {"Quelle": source, "Format": fmt or "?", "Anzahl": len(entries),
+         "Ø Größe (KB)": round(sum(e["bytes"] for e in entries) / len(entries) / 1024, 1),
+         "Ø Dekodierung (ms)": round(1000 * sum(e["seconds"] for e in entries) / len(entries), 1)}
+        for (source, fmt), entries in sorted(groups.items(), key=lambda item: (item[0][0], item[0][1] or ""))
+    ]
+
+def loaded_heavy_modules() -> list[str]:
+    """Welche der schweren Bibliotheken sind in diesem Prozess bereits geladen?"""
+    return [m for m in HEAVY_MODULES if m in sys.modules]
+
+# === Kaltstart-Messung in frischen Prozessen ===
+def _is_startup_call(node: ast.stmt) -> bool:
+    return (isinstance(node, ast.Expr) and isinstance(node.value, ast.Call)
+            and isinstance(node.value.func, ast.Name) and node.value.func.id == "record_page_startup")
+
+def page_imports(path: str) -> tuple[Optional[str], list[str]]:
+    """
+    Seitenname (erstes Argument von record_page_startup) und die Import-Anweisungen auf Modulebene davor.
+    Optionale Importe in try-Blöcken werden übernommen und dürfen im Messprozess fehlschlagen.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    statements: list[str] = []
+    for node in tree.body:
+        if _is_startup_call(node):
+            name = node.value.args[0]
+            return (name.value if isinstance(name, ast.Constant) else None), statements
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            statements.append(ast.unparse(node))
+        elif isinstance(node, ast.Try):
+            statements += [f"try:\n    {ast.unparse(n)}\nexcept ImportError:\n    pass"
+                           for n in node.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+    return None, statements
+
+def page_files(project_root: str) -> list[str]:
+    """Hauptseite und alle Seiten unter pages/ in Menü-Reihenfolge."""
+    return [os.path.join(project_root, MAIN_PAGE_FILE)] + sorted(glob.glob(os.path.join(project_root, PAGES_DIR, "*.py")))
+
+def measure_cold_import(statements: list[str], project_root: Optional[str] = None) -> Optional[float]:
+    """Laufzeit einer Liste von Import-Anweisungen in einem neuen Python-Prozess (Sekunden) oder None bei Fehler."""
+    code = (
+        "import sys, time\n"
+        f"sys.path.insert(0, {project_root!r})\n"
+        "t = time.perf_counter()\n"
+        + "".join(f"{statement}\n" for statement in statements)
+        + "print(time.perf_counter() - t)\n"
+    )
+    try:
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=300, cwd=project_root)
+    except subprocess.TimeoutExpired:
+        return None
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+def cold_start_report(project_root: Optional[str] = None) -> list[dict]:
+    project_root = project_root or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    rows = []
+    for path in page_files(project_root):
+        name, statements = page_imports(path)
+        rows.append({"Ziel": f"Seite: {name or os.path.basename(path)}", "Sekunden": measure_cold_import(statements, project_root)})
+    rows += [{"Ziel": f"Modul: {m}", "Sekunden": measure_cold_import([f"import {m}"], project_root)} for m in HEAVY_MODULES]
+    return rows
+
+def main() -> None:
+    print(f"{'Ziel':<45} {'Kaltstart':>10}")
+    for row in cold_start_report():
+        seconds = f"{row['Sekunden']:.2f} s" if row["Sekunden"] is not None else "Fehler"
+        print(f"{row['Ziel']:<45} {seconds:>10}")
+
+if __name__ == "__main__":
+    main()
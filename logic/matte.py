@@ -0,0 +1,182 @@
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Seitenverhältnis-Vorgaben für das Auffüllen (Breite, Höhe); None = Originalformat beibehalten
+MATTE_ASPECT_PRESETS: dict[str, Optional[Tuple[int, int]]] = {
+    "Original": None,
+    "Quadratisch (1:1)": (1, 1),
+    "Hochformat (2:3)": (2, 3),
+    "Hochformat (9:16)": (9, 16),
+    "Klassisch (3:2)": (3, 2),
+    "Breitbild (16:9)": (16, 9),
+}
+
+DEFAULT_MATTE_OPTIONS: dict = {
+    "trim": True,
+    "alpha_threshold": 10,    # Alpha-Werte darunter werden vollständig transparent
+    "erode_px": 1,            # Kante um n Pixel nach innen ziehen (entfernt Farbsäume)
+    "feather_px": 1,          # Weiche Kante über n Pixel
+    "decontaminate": True,    # Hintergrundfarbe aus halbtransparenten Kantenpixeln herausrechnen
+    "aspect_preset": "Original",
+    "padding_pct": 5,         # Rand um das Objekt in Prozent der längeren Seite
+    "background_color": None, # None = transparent, sonst (R, G, B)
+}
+
+# === Grundoperationen auf Arrays ===
+def alpha_bbox(alpha: np.ndarray, threshold: int = 0) -> Optional[Tuple[int, int, int, int]]:
+    """Bounding-Box (left, top, right, bottom) aller Pixel mit Alpha > threshold."""
+    mask = alpha > threshold
+    rows, cols = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+    if rows.size == 0:
+        return None
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+def _min_filter_1d(a: np.ndarray, radius: int, axis: int) -> np.ndarray:
+    """Minimum über ein Fenster der Breite 2r+1 entlang einer Achse (Erosion)."""
+    result = a.copy()
+    for shift in range(1, radius + 1):
+        forward = np.roll(a, shift, axis=axis)
+        backward = np.roll(a, -shift, axis=axis)
+        # Randbereiche, die durch np.roll umlaufen würden, als transparent behandeln
+        edge = [slice(None)] * a.ndim
+        edge[axis] = slice(0, shift)
+        forward[tuple(edge)] = 0
+        edge[axis] = slice(-shift, None)
+        backward[tuple(edge)] = 0
+        np.minimum(result, forward, out=result)
+        np.minimum(result, backward, out=result)
+    return result
+
+def _box_blur_1d(a: np.ndarray, radius: int, axis: int) -> np.ndarray:
+    """Gleitender Mittelwert entlang einer Achse mittels kumulativer Summe."""
+    k = 2 * radius + 1
+    pad = [(0, 0)] * a.ndim
+    pad[axis] = (radius + 1, radius)
+    csum = np.pad(a, pad, mode="edge").cumsum(axis=axis, dtype=np.float32)
+    upper = [slice(None)] * a.ndim
+    lower = [slice(None)] * a.ndim
+    upper[axis] = slice(k, None)
+    lower[axis] = slice(None, -k)
+    return (csum[tuple(upper)] - csum[tuple(lower)]) / k
+
+def refine_alpha(alpha: np.ndarray, threshold: int = 10, erode_px: int = 0, feather_px: int = 0) -> np.ndarray:
+    """Schwellwert, Erosion und Kantenglättung des Alpha-Kanals (uint8 rein, uint8 raus)."""
+    refined = np.where(alpha < threshold, 0, alpha).astype(np.uint8)
+    if erode_px > 0:
+        refined = _min_filter_1d(_min_filter_1d(refined, erode_px, 0), erode_px, 1)
+    if feather_px > 0:
+        blurred = _box_blur_1d(_box_blur_1d(refined.astype(np.float32), feather_px, 0), feather_px, 1)
+        # Nur weicher machen, nie über den ursprünglichen Rand hinaus wachsen lassen
+        refined = np.minimum(blurred, refined.astype(np.float32)).round().astype(np.uint8)
+    return refined
+
+def estimate_background_color(original_rgb: np.ndarray, alpha: np.ndarray) -> np.ndarray:
+    """Schätzt die ursprüngliche Hintergrundfarbe aus den voll transparenten Pixeln (Median)."""
+    background = original_rgb[alpha == 0]
+    if background.size == 0:
+        return np.array([255, 255, 255], dtype=np.float32)
+    # Stichprobe genügt für einen stabilen Median und hält große Bilder schnell
+    step = max(1, background.shape[0] // 50_000)
+    return np.median(background[::step], axis=0).astype(np.float32)
+
+def decontaminate_colors(rgb: np.ndarray, alpha: np.ndarray, background: np.ndarray) -> np.ndarray:
+    """
+    Entfernt Farbsäume an halbtransparenten Kanten: C = a*F + (1-a)*B  =>  F = (C - (1-a)*B) / a.
+    Vollständig deckende und vollständig transparente Pixel bleiben unverändert.
+    """
+    edge = (alpha > 0) & (alpha < 255)
+    if not edge.any():
+        return rgb
+    a = alpha[edge].astype(np.float32)[:, None] / 255.0
+    observed = rgb[edge].astype(np.float32)
+    foreground = (observed - (1.0 - a) * background[None, :]) / np.maximum(a, 1e-3)
+    result = rgb.copy()
+    result[edge] = np.clip(foreground, 0, 255).astype(np.uint8)
+    return result
+
+def pad_to_aspect(rgba: np.ndarray, aspect: Optional[Tuple[int, int]], padding_pct: float = 0) -> np.ndarray:
+    """Zentriert das Objekt auf einer transparenten Fläche im gewünschten Seitenverhältnis."""
+    h, w = rgba.shape[:2]
+    pad = int(round(max(w, h) * padding_pct / 100))
+    canvas_w, canvas_h = w + 2 * pad, h + 2 * pad
+    if aspect:
+        ratio = aspect[0] / aspect[1]
+        if canvas_w / canvas_h < ratio:
+            canvas_w = int(round(canvas_h * ratio))
+        else:
+            canvas_h = int(round(canvas_w / ratio))
+    if (canvas_w, canvas_h) == (w, h):
+        return rgba
+    canvas = np.zeros((canvas_h, canvas_w, 4), dtype=np.uint8)
+    top, left = (canvas_h - h) // 2, (canvas_w - w) // 2
+    canvas[top:top + h, left:left + w] = rgba
+    return canvas
+
+def composite_on_color(rgba: np.ndarray, color: Tuple[int, int, int]) -> np.ndarray:
+    """Legt das RGBA-Array auf eine einfarbige Fläche und liefert ein RGB-Array."""
+    alpha = rgba[..., 3:4].astype(np.float32) / 255.0
+    background = np.asarray(color, dtype=np.float32)[None, None, :]
+    blended = rgba[..., :3].astype(np.float32) * alpha + background * (1.0 - alpha)
+    return blended.round().astype(np.uint8)
+
+# === Maske eines Beinahe-Duplikats übernehmen ===
+ALPHA_TRANSFER_MAX_DIFF = 8.0  # Mittlere Farbabweichung (0–255) im deckenden Bereich, bis zu der die Maske übertragbar ist
+ALPHA_TRANSFER_SAMPLES = 256   # Stichproben je Bildseite für den Ausrichtungs-Vergleich
+
+def transfer_alpha(source_cutout: Image.Image, target: Image.Image) -> Optional[Image.Image]:
+    """
+    Übernimmt nur die Alpha-Maske einer Freistellung für ein deckungsgleiches Beinahe-Duplikat
+    (z. B. anderer Jahrgang mit gleichem Etikett); Farben und Details stammen aus dem eigenen Bild (putalpha).
+    None, wenn Größe oder Ausrichtung nicht passen – dann muss das Bild selbst freigestellt werden.
+    """
+    if source_cutout.size != target.size:
+        return None
+    source_rgba = source_cutout.convert("RGBA")
+    step = max(1, max(target.size) // ALPHA_TRANSFER_SAMPLES)
+    source_samples = np.asarray(source_rgba)[::step, ::step]
+    target_samples = np.asarray(target.convert("RGB"))[::step, ::step]
+    # Nur voll deckende Pixel vergleichen: dort enthält die Freistellung unverändert die Originalfarben
+    opaque = source_samples[..., 3] >= 250
+    if not opaque.any():
+        return None
+    diff = np.abs(source_samples[..., :3][opaque].astype(np.int16) - target_samples[opaque].astype(np.int16))
+    if float(diff.mean()) > ALPHA_TRANSFER_MAX_DIFF:
+        return None
+    result = target.convert("RGBA")
+    result.putalpha(source_rgba.getchannel("A"))
+    return result
+
+# === Gesamter Nachbearbeitungsschritt ===
+def postprocess_matte(cutout: Image.Image, original: Optional[Image.Image] = None, options: Optional[dict] = None) -> Image.Image:
+    """
+    Nachbearbeitung einer rembg-Freistellung ohne Umweg über PNG-Bytes.
+    cutout: RGBA-Ergebnis von rembg. original: Originalbild (für die Hintergrundfarb-Schätzung).
+    options: siehe DEFAULT_MATTE_OPTIONS. Liefert RGBA oder – mit background_color – RGB.
+    """
+    opts = {**DEFAULT_MATTE_OPTIONS, **(options or {})}
+    rgba = np.asarray(cutout.convert("RGBA"))
+    rgb, raw_alpha = rgba[..., :3], rgba[..., 3]
+
+    if opts["decontaminate"]:
+        if original is not None and original.size == cutout.size:
+            background = estimate_background_color(np.asarray(original.convert("RGB")), raw_alpha)
+        else:
+            background = np.array([255, 255, 255], dtype=np.float32)
+        rgb = decontaminate_colors(rgb, raw_alpha, background)
+
+    alpha = refine_alpha(raw_alpha, opts["alpha_threshold"], opts["erode_px"], opts["feather_px"])
+    rgba = np.dstack([rgb, alpha])
+
+    if opts["trim"]:
+        bbox = alpha_bbox(alpha)
+        if bbox:
+            left, top, right, bottom = bbox
+            rgba = rgba[top:bottom, left:right]
+
+    rgba = pad_to_aspect(rgba, MATTE_ASPECT_PRESETS.get(opts["aspect_preset"]), opts["padding_pct"])
+
+    if opts["background_color"] is not None:
+        return Image.fromarray(composite_on_color(rgba, opts["background_color"]), mode="RGB")
+    return Image.fromarray(np.ascontiguousarray(rgba), mode="RGBA")
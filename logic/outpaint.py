@@ -0,0 +1,155 @@
+"""
+Wide-Banner per Outpainting statt Zuschnitt.
+
+Das generierte Bild (native Providergröße, z. B. 1536×1024) wird auf die Zielhöhe skaliert und
+in die Mitte der Zielfläche gesetzt. Links und rechts wird parallel mit maskierten gpt-image-1-Edits
+(oder Stability Outpaint) erweitert; die Übergänge werden lokal und vektorisiert überblendet.
+"""
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+import numpy as np
+from PIL import Image
+
+OUTPAINT_ENGINES = {"GPT-Image-1": "gpt-image-1", "Stability (Outpaint)": "stability"}
+DEFAULT_OUTPAINT_ENGINE = "gpt-image-1"
+GPT_IMAGE_1_EDIT_SIZE = (1536, 1024)
+CONTEXT_PX = 256  # Vorhandener Bildinhalt, den jedes Erweiterungsfenster sieht (in Zielpixeln)
+FEATHER_PX = 48   # Breite der Überblendung am Übergang
+MIN_OUTPAINT_ASPECT = 2.0  # Erst ab diesem Seitenverhältnis lohnt sich Outpainting gegenüber dem Zuschnitt
+
+def needs_outpainting(target_size: Tuple[int, int]) -> bool:
+    target_w, target_h = target_size
+    return target_h > 0 and target_w / target_h >= MIN_OUTPAINT_ASPECT
+
+def _center_on_height(base: Image.Image, target_w: int, target_h: int) -> Image.Image:
+    """Skaliert das Basisbild auf die Zielhöhe; ist es dann breiter als das Ziel, wird mittig beschnitten."""
+    scaled_w = max(1, round(base.width * target_h / base.height))
+    center = base.convert("RGB").resize((scaled_w, target_h), Image.Resampling.LANCZOS)
+    if scaled_w > target_w:
+        left = (scaled_w - target_w) // 2
+        center = center.crop((left, 0, left + target_w, target_h))
+    return center
+
+def _window_width(height: int, canvas_w: int) -> int:
+    edit_w, edit_h = GPT_IMAGE_1_EDIT_SIZE
+    return min(canvas_w, round(height * edit_w / edit_h))
+
+def estimate_outpaint_calls(base_size: Tuple[int, int], target_size: Tuple[int, int], context_px: int = CONTEXT_PX) -> int:
+    """Anzahl der kostenpflichtigen gpt-image-1-Edits für beide Seiten zusammen."""
+    target_w, target_h = target_size
+    center_w = min(target_w, max(1, round(base_size[0] * target_h / base_size[1])))
+    missing = target_w - center_w
+    if missing <= 0:
+        return 0
+    step = max(1, _window_width(target_h, target_w) - context_px)
+    left = missing // 2
+    return math.ceil(left / step) + math.ceil((missing - left) / step)
+
+# === Überblendung ===
+def feather_blend(canvas: np.ndarray, patch: np.ndarray, x0: int, seam_x: int, feather: int, side: str) -> None:
+    """
+    Schreibt patch (H×w×3) ab Spalte x0 in canvas. Neuer Inhalt liegt auf der Seite `side` der Naht seam_x
+    und ersetzt dort alles; auf der bekannten Seite wird über `feather` Spalten linear überblendet.
+    """
+    width = patch.shape[1]
+    seam = seam_x - x0
+    weights = np.zeros(width, dtype=np.float32)
+    if side == "right":
+        weights[seam:] = 1.0
+        band_start = max(0, seam - feather)
+        weights[band_start:seam] = np.linspace(0.0, 1.0, seam - band_start, endpoint=False)
+    else:
+        weights[:seam] = 1.0
+        band_end = min(width, seam + feather)
+        weights[seam:band_end] = np.linspace(1.0, 0.0, band_end - seam, endpoint=False)
+    weights = weights[None, :, None]
+    region = canvas[:, x0:x0 + width]
+    canvas[:, x0:x0 + width] = region * (1.0 - weights) + patch * weights
+
+# === Erweiterung einer Seite ===
+def _edit_window(window: np.ndarray, known_from: int, known_to: int, prompt: str, quality: str) -> np.ndarray:
+    """Schickt ein Fenster mit transparentem Bereich an gpt-image-1 und liefert das Ergebnis in Fenstergröße."""
+    from logic.generation_v2 import edit_with_mask_gpt_image_1
+
+    height, width = window.shape[:2]
+    alpha = np.zeros((height, width), dtype=np.uint8)
+    alpha[:, known_from:known_to] = 255
+    rgba = np.dstack([np.clip(window, 0, 255).astype(np.uint8), alpha])
+    edit_w, edit_h = GPT_IMAGE_1_EDIT_SIZE
+    image = Image.fromarray(rgba, "RGBA").resize((edit_w, edit_h), Image.Resampling.LANCZOS)
+    mask = Image.fromarray(rgba, "RGBA").resize((edit_w, edit_h), Image.Resampling.NEAREST)
+    result = edit_with_mask_gpt_image_1(image, mask, prompt, f"{edit_w}x{edit_h}", quality)
+    return np.asarray(result.resize((width, height), Image.Resampling.LANCZOS), dtype=np.float32)
+
+def _extend_side_gpt(canvas: np.ndarray, known_lo: int, known_hi: int, side: str, quality: str,
+                     context_px: int, feather_px: int) -> np.ndarray:
+    from logic.prompt_engine_v2 import build_outpaint_prompt
+
+    prompt = build_outpaint_prompt(side)
+    height, canvas_w = canvas.shape[:2]
+    win_w = _window_width(height, canvas_w)
+    context_px = min(context_px, win_w // 2)  # Jedes Fenster muss neue Spalten beitragen
+    if side == "right":
+        while known_hi < canvas_w:
+            x0 = max(0, min(known_hi - context_px, canvas_w - win_w))
+            patch = _edit_window(canvas[:, x0:x0 + win_w], 0, known_hi - x0, prompt, quality)
+            feather_blend(canvas, patch, x0, known_hi, feather_px, "right")
+            known_hi = x0 + win_w
+    else:
+        while known_lo > 0:
+            x0 = max(0, min(known_lo + context_px, canvas_w) - win_w)
+            patch = _edit_window(canvas[:, x0:x0 + win_w], known_lo - x0, win_w, prompt, quality)
+            feather_blend(canvas, patch, x0, known_lo, feather_px, "left")
+            known_lo = x0
+    return canvas
+
+def _extend_side_stability(canvas: np.ndarray, known_lo: int, known_hi: int, side: str, feather_px: int) -> np.ndarray:
+    from logic.generation_stability import outpaint_with_stability
+
+    height, canvas_w = canvas.shape[:2]
+    center = Image.fromarray(np.clip(canvas[:, known_lo:known_hi], 0, 255).astype(np.uint8), "RGB")
+    pad = known_lo if side == "left" else canvas_w - known_hi
+    result = outpaint_with_stability(center, **{side: pad})
+    expected = (center.width + pad, height)
+    if result.size != expected:
+        result = result.resize(expected, Image.Resampling.LANCZOS)
+    patch = np.asarray(result, dtype=np.float32)
+    if side == "left":
+        feather_blend(canvas, patch, 0, known_lo, feather_px, "left")
+    else:
+        feather_blend(canvas, patch, known_lo, known_hi, feather_px, "right")
+    return canvas
+
+# === Einstieg ===
+def outpaint_to_wide(base: Image.Image, target_size: Tuple[int, int], engine: str = DEFAULT_OUTPAINT_ENGINE,
+                     quality: str = "medium", context_px: int = CONTEXT_PX, feather_px: int = FEATHER_PX) -> Image.Image:
+    """
+    Erzeugt aus einem Bild in nativer Providergröße ein Banner in exakt target_size.
+    Linke und rechte Erweiterung laufen gleichzeitig; sie berühren getrennte Spaltenbereiche.
+    """
+    target_w, target_h = target_size
+    center = _center_on_height(base, target_w, target_h)
+    if center.width >= target_w:
+        return center
+
+    known_lo = (target_w - center.width) // 2
+    known_hi = known_lo + center.width
+    feather_px = min(feather_px, center.width // 4)
+    canvas = np.zeros((target_h, target_w, 3), dtype=np.float32)
+    canvas[:, known_lo:known_hi] = np.asarray(center, dtype=np.float32)
+
+    def extend(side: str) -> np.ndarray:
+        if engine == "stability":
+            return _extend_side_stability(canvas.copy(), known_lo, known_hi, side, feather_px)
+        return _extend_side_gpt(canvas.copy(), known_lo, known_hi, side, quality, context_px, feather_px)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        left_future, right_future = executor.submit(extend, "left"), executor.submit(extend, "right")
+        left_canvas, right_canvas = left_future.result(), right_future.result()
+
+    middle = (known_lo + known_hi) // 2
+    canvas[:, :middle] = left_canvas[:, :middle]
+    canvas[:, middle:] = right_canvas[:, middle:]
+    return Image.fromarray(np.clip(canvas + 0.5, 0, 255).astype(np.uint8), "RGB")
@@ -0,0 +1,305 @@
+"""
+Lokale Etikett-Analyse als schneller Weg zum Banner-Prompt.
+
+Statt das Flaschenfoto für Farben, Motive und Stimmung an GPT-4o zu schicken, werden
+Farbpalette (k-Means bzw. Median-Cut), dominanter Farbton, Kontrast und Detailgrad direkt
+aus den Pixeln berechnet und zu einem strukturierten Prompt-Fragment bzw. einem fertigen
+DALL·E-Prompt zusammengesetzt (typisch einige zehn Millisekunden, kein API-Aufruf).
+
+Liegt eine rembg-Freistellung im Cut-out-Store, wird deren Alpha-Kanal als Maske genutzt;
+sonst wird der Hintergrund über die Randfarbe geschätzt.
+"""
+import colorsys
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+ANALYSIS_MAX_SIDE = 256
+MAX_SAMPLES = 4096
+DEFAULT_PALETTE_SIZE = 5
+PALETTE_METHODS = ("kmeans", "median_cut")
+KMEANS_ITERATIONS = 12
+# Mindestabstand (RGB, euklidisch) zur Randfarbe, ab dem ein Pixel ohne Freistellung als Vordergrund zählt
+BACKGROUND_DISTANCE = 40
+MIN_FOREGROUND_SHARE = 0.05
+MIN_PROMPT_SHARE = 0.06  # Kleinere Palettenanteile werden im Prompt nicht genannt
+CHROMATIC_SATURATION = 0.2
+
+# Farbton-Obergrenze (Grad) -> Name
+_HUE_NAMES: list[Tuple[float, str]] = [
+    (12, "red"), (35, "orange"), (50, "amber"), (65, "gold"), (85, "olive"), (150, "green"), (185, "teal"),
+    (215, "azure"), (250, "blue"), (285, "violet"), (330, "magenta"), (345, "rose"), (360, "red"),
+]
+# Farbname -> eigener Name für dunkle Töne (Helligkeit < 0.45)
+_DARK_NAMES = {"red": "burgundy", "rose": "burgundy", "blue": "navy", "azure": "navy", "orange": "brown",
+               "amber": "brown", "green": "forest green", "olive": "dark olive", "violet": "aubergine"}
+
+@dataclass
+class PaletteColour:
+    rgb: Tuple[int, int, int]
+    share: float
+    name: str
+
+    @property
+    def hex(self) -> str:
+        return "#{:02x}{:02x}{:02x}".format(*self.rgb)
+
+@dataclass
+class LabelAnalysis:
+    colours: list[PaletteColour]
+    dominant_hue: Optional[str]  # None bei (fast) unbunten Etiketten
+    warmth: float                # Anteil warmer Töne an den bunten Pixeln
+    lightness: float             # 0..1
+    saturation: float            # 0..1
+    contrast_ratio: float        # WCAG-Verhältnis zwischen hellster und dunkelster Palettenfarbe
+    rms_contrast: float          # Standardabweichung der Luminanz, 0..1
+    colourfulness: float         # Hasler & Süsstrunk
+    detail: float                # mittlere Gradientenstärke im Vordergrund, 0..1
+    mood: str
+    used_cutout: bool
+    elapsed_ms: float = field(default=0.0)
+
+# === Vorbereitung ===
+def _to_array(img: Image.Image) -> np.ndarray:
+    small = img.convert("RGB")
+    small.thumbnail((ANALYSIS_MAX_SIDE, ANALYSIS_MAX_SIDE), Image.Resampling.BOX)
+    return np.asarray(small, dtype=np.float32)
+
+def label_mask(img: Image.Image, rgb: np.ndarray, cutout: Optional[Image.Image] = None) -> Tuple[np.ndarray, bool]:
+    """
+    Vordergrundmaske in Analyseauflösung. Vorrang hat der Alpha-Kanal der Freistellung bzw. des Bildes,
+    sonst zählt alles, was sich deutlich von der Randfarbe (Studio-Hintergrund) unterscheidet.
+    Rückgabe: (Maske, Alpha genutzt?).
+    """
+    height, width = rgb.shape[:2]
+    alpha_source = cutout if cutout is not None else (img if img.mode in ("RGBA", "LA") else None)
+    if alpha_source is not None and "A" in alpha_source.getbands():
+        alpha = np.asarray(alpha_source.getchannel("A").resize((width, height), Image.Resampling.BILINEAR))
+        mask = alpha > 128
+        if mask.mean() >= MIN_FOREGROUND_SHARE:
+            return mask, True
+    border = np.concatenate([rgb[0], rgb[-1], rgb[:, 0], rgb[:, -1]])
+    background = np.median(border, axis=0)
+    mask = np.sqrt(((rgb - background) ** 2).sum(axis=-1)) > BACKGROUND_DISTANCE
+    if mask.mean() < MIN_FOREGROUND_SHARE:
+        mask = np.ones((height, width), dtype=bool)
+    return mask, False
+
+def _sample(pixels: np.ndarray, max_samples: int = MAX_SAMPLES) -> np.ndarray:
+    if len(pixels) <= max_samples:
+        return pixels
+    rng = np.random.default_rng(0)  # Feste Saat: gleiches Bild, gleiche Palette
+    return pixels[rng.choice(len(pixels), max_samples, replace=False)]
+
+# === Palette ===
+def _kmeans(pixels: np.ndarray, k: int, iterations: int = KMEANS_ITERATIONS) -> Tuple[np.ndarray, np.ndarray]:
+    """Vektorisiertes k-Means (k-means++-Start) auf N×3-Pixeln; Rückgabe: (Zentren, Anzahl je Zentrum)."""
+    rng = np.random.default_rng(0)
+    centres = pixels[[rng.integers(len(pixels))]]
+    for _ in range(1, k):
+        nearest = ((pixels[:, None, :] - centres[None]) ** 2).sum(axis=-1).min(axis=1)
+        if nearest.sum() == 0:
+            break
+        centres = np.vstack([centres, pixels[rng.choice(len(pixels), p=nearest / nearest.sum())]])
+
+    for _ in range(iterations):
+        labels = ((pixels[:, None, :] - centres[None]) ** 2).sum(axis=-1).argmin(axis=1)
+        counts = np.bincount(labels, minlength=len(centres))
+        sums = np.stack([np.bincount(labels, weights=pixels[:, c], minlength=len(centres)) for c in range(3)], axis=1)
+        updated = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centres)
+        converged = np.abs(updated - centres).max() < 0.5
+        centres = updated
+        if converged:
+            break
+    labels = ((pixels[:, None, :] - centres[None]) ** 2).sum(axis=-1).argmin(axis=1)
+    return centres, np.bincount(labels, minlength=len(centres))
+
+def _median_cut(pixels: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    strip = Image.fromarray(pixels.reshape(1, -1, 3).astype(np.uint8), "RGB")
+    quantized = strip.quantize(colors=k, method=Image.Quantize.MEDIANCUT)
+    indices = np.asarray(quantized).ravel()
+    palette = np.array(quantized.getpalette()[:3 * k], dtype=np.float32).reshape(-1, 3)
+    counts = np.bincount(indices, minlength=len(palette))
+    return palette[:len(counts)], counts
+
+def describe_colour(rgb: Tuple[int, int, int]) -> str:
+    """Beschreibender englischer Farbname (für den DALL·E-Prompt), z. B. "deep burgundy" oder "ivory"."""
+    h, s, v = colorsys.rgb_to_hsv(*(c / 255 for c in rgb))
+    hue = h * 360
+    if s < CHROMATIC_SATURATION or v < 0.12:
+        if v < 0.15:
+            return "black"
+        if v < 0.35:
+            return "charcoal"
+        if v > 0.88:
+            return "ivory" if 20 <= hue <= 65 and s > 0.04 else "white"
+        return "silver grey" if v > 0.6 else "slate grey"
+    name = next(label for limit, label in _HUE_NAMES if hue < limit)
+    if v < 0.45 and name in _DARK_NAMES:
+        return f"deep {_DARK_NAMES[name]}"
+    if name == "gold" and s < 0.6:
+        return "antique gold"
+    if v < 0.35:
+        return f"deep {name}"
+    if v > 0.85 and s < 0.45:
+        return f"pale {name}"
+    if s < 0.4:
+        return f"muted {name}"
+    if s > 0.75 and v > 0.7:
+        return f"vivid {name}"
+    return name
+
+def extract_palette(pixels: np.ndarray, k: int = DEFAULT_PALETTE_SIZE, method: str = "kmeans") -> list[PaletteColour]:
+    """Palette aus N×3-Pixeln, nach Anteil absteigend; ähnliche Farbnamen werden zusammengefasst."""
+    if method not in PALETTE_METHODS:
+        raise ValueError(f"Unbekannte Methode: {method}")
+    pixels = _sample(pixels)
+    centres, counts = (_kmeans if method == "kmeans" else _median_cut)(pixels, min(k, len(pixels)))
+    total = counts.sum()
+    merged: dict[str, PaletteColour] = {}
+    for i in np.argsort(-counts):
+        if counts[i] == 0:
+            continue
+        rgb = tuple(int(round(c)) for c in centres[i])
+        name = describe_colour(rgb)
+        if name in merged:
+            merged[name].share += float(counts[i] / total)
+        else:
+            merged[name] = PaletteColour(rgb, float(counts[i] / total), name)
+    return sorted(merged.values(), key=lambda c: c.share, reverse=True)
+
+# === Statistik ===
+def _hsv(pixels: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vektorisierte RGB→HSV-Umrechnung (Farbton in Grad, S und V 0..1)."""
+    rgb = pixels / 255.0
+    v = rgb.max(axis=1)
+    c = v - rgb.min(axis=1)
+    s = np.where(v > 0, c / np.maximum(v, 1e-6), 0)
+    r, g, b = rgb.T
+    safe_c = np.maximum(c, 1e-6)
+    hue = np.select(
+        [v == r, v == g],
+        [((g - b) / safe_c) % 6, (b - r) / safe_c + 2],
+        (r - g) / safe_c + 4,
+    ) * 60
+    return np.where(c > 0, hue, 0), s, v
+
+def _luminance(rgb: np.ndarray) -> np.ndarray:
+    linear = rgb / 255.0
+    linear = np.where(linear <= 0.03928, linear / 12.92, ((linear + 0.055) / 1.055) ** 2.4)
+    return linear @ np.array([0.2126, 0.7152, 0.0722])
+
+def _dominant_hue(hue: np.ndarray, saturation: np.ndarray) -> Tuple[Optional[str], float]:
+    chromatic = saturation > CHROMATIC_SATURATION
+    if chromatic.mean() < 0.1:
+        return None, 0.0
+    angles = np.deg2rad(hue[chromatic])
+    weights = saturation[chromatic]
+    mean_angle = np.rad2deg(np.arctan2((np.sin(angles) * weights).sum(), (np.cos(angles) * weights).sum())) % 360
+    warm = ((hue[chromatic] >= 330) | (hue[chromatic] < 70)).mean()
+    return next(label for limit, label in _HUE_NAMES if mean_angle < limit), float(warm)
+
+def _infer_mood(lightness: float, saturation: float, warmth: float, colourfulness: float, contrast_ratio: float) -> str:
+    if lightness < 0.3 and saturation < 0.45:
+        return "old-world elegance, dark and refined"
+    if colourfulness > 60 and contrast_ratio > 7:
+        return "modern and bold"
+    if warmth > 0.6 and saturation < 0.55:
+        return "rustic and organic, with earthy warmth"
+    if lightness > 0.7 and saturation < 0.25:
+        return "minimalist and airy, quietly elegant"
+    if saturation > 0.5:
+        return "vibrant and expressive"
+    return "classic and understated"
+
+def analyse_label(img: Image.Image, cutout: Optional[Image.Image] = None, k: int = DEFAULT_PALETTE_SIZE,
+                  method: str = "kmeans") -> LabelAnalysis:
+    """Farb-, Kontrast- und Detailstatistik des Produkts (ohne Hintergrund)."""
+    started = time.perf_counter()
+    rgb = _to_array(img)
+    mask, used_cutout = label_mask(img, rgb, cutout)
+    pixels = rgb[mask]
+    colours = extract_palette(pixels, k, method)
+
+    hue, saturation, value = _hsv(_sample(pixels))
+    dominant_hue, warmth = _dominant_hue(hue, saturation)
+    luminance = _luminance(pixels)
+    main = [c for c in colours if c.share >= MIN_PROMPT_SHARE] or colours
+    palette_luminance = _luminance(np.array([c.rgb for c in main], dtype=np.float32))
+    contrast_ratio = (palette_luminance.max() + 0.05) / (palette_luminance.min() + 0.05)
+    rg = pixels[:, 0] - pixels[:, 1]
+    yb = 0.5 * (pixels[:, 0] + pixels[:, 1]) - pixels[:, 2]
+    colourfulness = np.hypot(rg.std(), yb.std()) + 0.3 * np.hypot(rg.mean(), yb.mean())
+
+    gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    gradient = np.hypot(*np.gradient(gray))
+    detail = float(np.clip(gradient[mask].mean() / 40, 0, 1))
+
+    lightness, mean_saturation = float(value.mean()), float(saturation.mean())
+    return LabelAnalysis(
+        colours=colours, dominant_hue=dominant_hue, warmth=warmth, lightness=lightness, saturation=mean_saturation,
+        contrast_ratio=float(contrast_ratio), rms_contrast=float(luminance.std()),
+        colourfulness=float(colourfulness), detail=detail,
+        mood=_infer_mood(lightness, mean_saturation, warmth, float(colourfulness), float(contrast_ratio)),
+        used_cutout=used_cutout, elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
+
+def find_cached_cutout(image_url: str) -> Optional[Image.Image]:
+    """Erste vorhandene Freistellung der URL aus dem Cut-out-Store (beliebiges rembg-Modell) oder None."""
+    from logic.background_removal import DEFAULT_REMBG_MODEL, REMBG_MODELS
+    from logic.cutout_store import load_cutout
+
+    for model in dict.fromkeys([DEFAULT_REMBG_MODEL, *REMBG_MODELS]):
+        cutout = load_cutout(image_url, model)
+        if cutout is not None:
+            return cutout
+    return None
+
+# === Prompt ===
+def _level(value: float, thresholds: Tuple[float, float], labels: Tuple[str, str, str]) -> str:
+    return labels[0] if value < thresholds[0] else labels[1] if value < thresholds[1] else labels[2]
+
+def to_prompt_fragment(analysis: LabelAnalysis) -> str:
+    """Strukturiertes Fragment (eine Angabe pro Zeile), z. B. als Zusatz für GPT-4o oder andere Prompts."""
+    main = [c for c in analysis.colours if c.share >= MIN_PROMPT_SHARE] or analysis.colours[:1]
+    contrast = _level(analysis.contrast_ratio, (3, 7), ("low", "medium", "high"))
+    lines = [
+        "Colour palette: " + ", ".join(f"{c.name} ({c.share:.0%}, {c.hex})" for c in main),
+        f"Dominant hue: {analysis.dominant_hue or 'neutral / achromatic'}"
+        + (f" ({'warm' if analysis.warmth >= 0.5 else 'cool'})" if analysis.dominant_hue else ""),
+        f"Contrast: {contrast} ({analysis.contrast_ratio:.1f}:1)",
+        f"Saturation: {_level(analysis.saturation, (0.25, 0.55), ('muted', 'moderate', 'rich'))}",
+        f"Lightness: {_level(analysis.lightness, (0.35, 0.65), ('dark', 'balanced', 'light'))}",
+        f"Detail: {_level(analysis.detail, (0.2, 0.45), ('clean, flat surfaces', 'moderate ornamentation', 'intricate, finely detailed patterns'))}",
+        f"Mood: {analysis.mood}",
+    ]
+    return "\n".join(lines)
+
+def build_fast_prompt(analysis: LabelAnalysis) -> str:
+    """Fertiger DALL·E-3-Prompt nach den Regeln von AUTONOMOUS_PROMPT_TEMPLATE, ohne Vision-Aufruf."""
+    main = [c.name for c in analysis.colours if c.share >= MIN_PROMPT_SHARE] or [analysis.colours[0].name]
+    base = " and ".join(main[:2])
+    accents = main[2:4]
+    if analysis.detail >= 0.45:
+        forms = "Intricate, ornamental patterns and fine engraved lines"
+    elif analysis.detail >= 0.2:
+        forms = "Layered, flowing shapes with delicate ornamental accents"
+    else:
+        forms = "Broad, smooth planes of colour and soft gradients"
+    contrast = {
+        "high": "Strong contrast between light and dark areas gives the composition a crisp, graphic presence.",
+        "medium": "Balanced contrast keeps the composition calm yet defined.",
+        "low": "Gentle, tonal transitions keep the composition soft and harmonious.",
+    }[_level(analysis.contrast_ratio, (3, 7), ("low", "medium", "high"))]
+    texture = "subtle, tactile paper texture" if analysis.saturation < 0.45 else "a fine, luminous sheen"
+    parts = [
+        f"An artistic, abstract, wide-format background image with a {analysis.mood} aesthetic.",
+        f"{forms} in {base}" + (f", accented with touches of {' and '.join(accents)}." if accents else "."),
+        contrast,
+        f"The surface has {texture} and a soft, diffused play of light.",
+        "Sophisticated and luxurious, rendered as a seamless, continuous, edge-to-edge composition suitable for a wide banner.",
+    ]
+    return " ".join(parts)
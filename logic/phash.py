@@ -0,0 +1,313 @@
+"""
+Perzeptuelle Hashes (aHash, dHash, pHash) für Produktbilder und ein Index über den Katalog.
+
+Viele SKUs sind Jahrgänge oder Flaschengrößen desselben Weins mit identischem Etikett.
+Über den Index erkennen Generierung, Freistellung und Batch-Läufe solche Beinahe-Duplikate
+und können ein vorhandenes Ergebnis übernehmen, statt erneut zu bezahlen bzw. zu rechnen.
+
+Der Index ist nach Bild-URL geschlüsselt; mehrere SKUs mit derselben URL teilen sich einen Eintrag
+und gelten untereinander als Duplikate. Neue Einträge schreibt ein Hintergrund-Timer gesammelt auf die Platte.
+
+Index für den ganzen Katalog vorab aufbauen (aus dem Projekt-Root):
+    python -m logic.phash --workers 8
+"""
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from utils import PROJECT_ROOT, SKU_CSV_FILENAME
+
+INDEX_DIR = os.path.join(PROJECT_ROOT, ".catalogue_cache")
+INDEX_FILENAME = "phash_index.json"
+HASH_NAMES = ("ahash", "dhash", "phash")
+# Maximale Hamming-Distanz (von 64 Bit), ab der zwei Bilder als Beinahe-Duplikat gelten; pHash und dHash müssen beide passen
+DUPLICATE_THRESHOLDS = {"phash": 6, "dhash": 8}
+DOWNLOAD_WORKERS = 8
+DOWNLOAD_TIMEOUT = 15
+SAVE_DELAY_S = 5.0  # Neue Einträge werden gesammelt und frühestens nach dieser Zeit geschrieben
+
+# === Hashes (vektorisiert, kleine Auflösung) ===
+def _gray(img: Image.Image, size: tuple[int, int]) -> np.ndarray:
+    if img.mode in ("RGBA", "LA", "P"):
+        rgba = img.convert("RGBA")
+        flat = Image.new("RGBA", rgba.size, (255, 255, 255, 255))  # Transparenz wie weißer Hintergrund
+        flat.alpha_composite(rgba)
+        img = flat
+    return np.asarray(img.convert("L").resize(size, Image.Resampling.BOX), dtype=np.float32)
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+_DCT_32 = _dct_matrix(32)
+
+def _pack(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+def compute_hashes(img: Image.Image) -> dict[str, int]:
+    """64-Bit aHash, dHash und pHash eines Bildes."""
+    small = _gray(img, (8, 8))
+    wide = _gray(img, (9, 8))
+    dct = _DCT_32 @ _gray(img, (32, 32)) @ _DCT_32.T
+    low = dct[:8, :8].ravel()
+    return {
+        "ahash": _pack(small > small.mean()),
+        "dhash": _pack(wide[:, 1:] > wide[:, :-1]),
+        "phash": _pack(low > np.median(low[1:])),  # DC-Anteil ausgenommen
+    }
+
+_POPCOUNT_8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(values).astype(np.int32)
+    return _POPCOUNT_8[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1, dtype=np.int32)
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def _url_key(image_url: str) -> str:
+    return hashlib.sha256(image_url.strip().encode("utf-8")).hexdigest()
+
+# === Index ===
+@dataclass
+class DuplicateMatch:
+    sku: str
+    image_url: str
+    distance: int  # pHash-Distanz
+
+class PerceptualIndex:
+    """Hashes aller bekannten SKU-Bilder; Abfragen vergleichen vektorisiert gegen den ganzen Index."""
+
+    def __init__(self, index_dir: str = INDEX_DIR):
+        self.path = os.path.join(index_dir, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = self._load()
+        self._arrays: Optional[tuple[list[str], np.ndarray]] = None
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        self._save_lock = threading.Lock()  # Hält Schnappschuss und Schreiben zusammen (kein älterer Stand zuletzt)
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                raw = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        for entry in raw.values():
+            for name in HASH_NAMES:
+                entry[name] = int(entry[name], 16)
+            if "skus" not in entry:  # Ältere Indizes: eine SKU pro URL
+                entry["skus"] = [entry.pop("sku")]
+        return raw
+
+    def save(self) -> None:
+        """Schreibt den Index sofort (z. B. am Ende eines Offline-Laufs); ein geplantes Speichern entfällt damit."""
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                self._dirty = False
+                data = {k: {**v, "skus": list(v["skus"]), **{name: f"{v[name]:016x}" for name in HASH_NAMES}}
+                        for k, v in self._entries.items()}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, image_url: str) -> bool:
+        return _url_key(image_url) in self._entries
+
+    def flush(self) -> None:
+        """Schreibt ausstehende Änderungen (geplantes Speichern, Prozessende)."""
+        with self._lock:
+            self._save_timer = None
+            dirty = self._dirty
+        if dirty:
+            self.save()
+
+    def _schedule_save(self) -> None:
+        """Sammelt Änderungen und speichert sie im Hintergrund statt pro Bild im aufrufenden (UI-)Thread."""
+        with self._lock:
+            self._dirty = True
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(SAVE_DELAY_S, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def add_sku(self, sku: str, image_url: str, persist: bool = True) -> bool:
+        """Verknüpft eine SKU mit einer bereits indexierten URL; False, wenn die URL noch fehlt."""
+        with self._lock:
+            entry = self._entries.get(_url_key(image_url))
+            if entry is None:
+                return False
+            if str(sku) in entry["skus"]:
+                return True
+            entry["skus"].append(str(sku))
+            self._dirty = True
+        if persist:
+            self._schedule_save()
+        return True
+
+    def add(self, sku: str, image_url: str, img: Image.Image, persist: bool = True) -> dict[str, int]:
+        """
+        Berechnet die Hashes (falls die URL noch fehlt), verknüpft die SKU mit der URL und gibt die Hashes zurück.
+        persist=True plant ein gesammeltes Speichern im Hintergrund; Offline-Läufe rufen am Ende save() auf.
+        """
+        key = _url_key(image_url)
+        if not self.add_sku(sku, image_url, persist):
+            entry = {"skus": [str(sku)], "url": image_url, "size": list(img.size), **compute_hashes(img), "added": time.time()}
+            with self._lock:
+                entry = self._entries.setdefault(key, entry)  # Parallel hinzugefügt? Dann den vorhandenen Eintrag behalten
+                if str(sku) not in entry["skus"]:
+                    entry["skus"].append(str(sku))
+                self._arrays = None
+                self._dirty = True
+            if persist:
+                self._schedule_save()
+        with self._lock:
+            entry = self._entries[key]
+        return {name: entry[name] for name in HASH_NAMES}
+
+    def _matrix(self) -> tuple[list[str], np.ndarray]:
+        with self._lock:
+            if self._arrays is None:
+                keys = list(self._entries)
+                matrix = np.array([[self._entries[k][name] for name in HASH_NAMES] for k in keys], dtype=np.uint64)
+                self._arrays = (keys, matrix.reshape(len(keys), len(HASH_NAMES)))
+            return self._arrays
+
+    def find_near_duplicates(self, hashes: dict[str, int], exclude_sku: Optional[str] = None,
+                             thresholds: dict[str, int] = DUPLICATE_THRESHOLDS) -> list[DuplicateMatch]:
+        """
+        Alle SKUs innerhalb der Schwellen (eine Zeile pro SKU, auch mit identischer URL), sortiert nach pHash-Distanz.
+        exclude_sku blendet die anfragende SKU selbst aus.
+        """
+        keys, matrix = self._matrix()
+        if not keys:
+            return []
+        query = np.array([hashes[name] for name in HASH_NAMES], dtype=np.uint64)
+        distances = _popcount(matrix ^ query)
+        mask = np.ones(len(keys), dtype=bool)
+        for name, limit in thresholds.items():
+            mask &= distances[:, HASH_NAMES.index(name)] <= limit
+        matches = []
+        with self._lock:
+            for i in np.flatnonzero(mask):
+                entry = self._entries[keys[i]]
+                distance = int(distances[i, HASH_NAMES.index("phash")])
+                matches.extend(DuplicateMatch(sku, entry["url"], distance) for sku in entry["skus"] if sku != exclude_sku)
+        return sorted(matches, key=lambda m: m.distance)
+
+    def duplicate_groups(self, thresholds: dict[str, int] = DUPLICATE_THRESHOLDS) -> list[list[str]]:
+        """Gruppiert alle SKUs mit Beinahe-Duplikaten (Union-Find über die paarweisen Distanzen)."""
+        keys, matrix = self._matrix()
+        parent = list(range(len(keys)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i in range(len(keys)):
+            distances = _popcount(matrix[i + 1:] ^ matrix[i])
+            mask = np.ones(len(distances), dtype=bool)
+            for name, limit in thresholds.items():
+                mask &= distances[:, HASH_NAMES.index(name)] <= limit
+            for j in np.flatnonzero(mask) + i + 1:
+                parent[find(int(j))] = find(i)
+
+        groups: dict[int, list[str]] = {}
+        for i, key in enumerate(keys):
+            groups.setdefault(find(i), []).extend(self._entries[key]["skus"])
+        return [sorted(group) for group in groups.values() if len(group) > 1]
+
+_index: Optional[PerceptualIndex] = None
+_index_lock = threading.Lock()
+
+def get_phash_index() -> PerceptualIndex:
+    """Prozessweiter Index (wird beim ersten Zugriff von der Platte geladen)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = PerceptualIndex()
+            atexit.register(_index.flush)  # Noch geplante Änderungen beim Beenden schreiben
+        return _index
+
+def register_and_find_duplicates(sku: str, image_url: str, img: Image.Image) -> list[DuplicateMatch]:
+    """Nimmt ein frisch geladenes SKU-Bild in den Index auf und liefert Beinahe-Duplikate anderer SKUs."""
+    index = get_phash_index()
+    hashes = index.add(sku, image_url, img)
+    return index.find_near_duplicates(hashes, exclude_sku=str(sku))
+
+# === Offline-Aufbau ===
+def build_index(csv_path: str = SKU_CSV_FILENAME, workers: int = DOWNLOAD_WORKERS) -> dict:
+    """Lädt alle noch fehlenden Katalogbilder und nimmt sie in den Index auf."""
+    from io import BytesIO
+    from PIL import ImageOps
+    from logic.clients import get_http_session
+    from utils import load_sku_data
+
+    df = load_sku_data(csv_path).dropna(subset=["image_url"])
+    index = get_phash_index()
+    todo: dict[str, list[str]] = {}  # URL -> SKUs; jede URL wird nur einmal geladen
+    for sku, url in zip(df["sku"], df["image_url"]):
+        image_url = str(url).strip()
+        if image_url.startswith("http") and not index.add_sku(str(sku), image_url, persist=False):
+            todo.setdefault(image_url, []).append(str(sku))
+    started = time.perf_counter()
+
+    def process(item: tuple[str, list[str]]) -> bool:
+        image_url, skus = item
+        try:
+            response = get_http_session().get(image_url, timeout=DOWNLOAD_TIMEOUT)
+            response.raise_for_status()
+            img = ImageOps.exif_transpose(Image.open(BytesIO(response.content)))
+            for sku in skus:
+                index.add(sku, image_url, img, persist=False)
+            return True
+        except Exception as e:
+            print(f"[FEHLER] {', '.join(skus)}: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(process, todo.items()))
+    index.save()
+    stats = {"total": len(df), "added": sum(results), "failed": len(results) - sum(results)}
+    stats["groups"] = index.duplicate_groups()
+    stats["seconds"] = round(time.perf_counter() - started, 1)
+    return stats
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Baut den pHash-Index über alle SKU-Bilder auf.")
+    parser.add_argument("--csv", default=SKU_CSV_FILENAME, help="Pfad zur SKU-CSV")
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS, help="Parallele Downloads")
+    args = parser.parse_args()
+    stats = build_index(args.csv, args.workers)
+    duplicates = sum(len(group) - 1 for group in stats["groups"])
+    print(f"Fertig: {stats['added']} neu, {stats['failed']} Fehler, {len(stats['groups'])} Duplikat-Gruppen "
+          f"({duplicates} redundante SKUs) in {stats['seconds']} s.")
+    for group in stats["groups"]:
+        print("  " + ", ".join(group))
+
+if __name__ == "__main__":
+    main()
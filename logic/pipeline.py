@@ -0,0 +1,570 @@
+"""
+Gemeinsame Pipeline für die Banner-Seiten (Direct, Classic, Concept) und für Batch-Läufe.
+
+Eine Pipeline besteht aus Stufen (Quelle, Prompt, Generierung, Nachbearbeitung, Export).
+Unabhängige Stufen laufen parallel (z. B. SKU-Download und Prompt-Aufbau), Zwischenergebnisse
+werden über einen Schlüssel aus Parametern und Vorgänger-Schlüsseln zwischengespeichert.
+Für gpt-image-1 gibt es einen Entwurfs-Ablauf: günstige low-Entwürfe (generate_drafts), danach wird
+nur der gewählte Entwurf (als Referenz) in high neu gerendert oder lokal weiterverarbeitet (finalize_draft).
+
+Headless (aus dem Projekt-Root):
+    python -m logic.pipeline --flow direct --sku 12345 --sku 67890 --size 3000x660 --out exports/
+    python -m logic.pipeline --flow concept --subject "Weinberg im Nebel" --style Watercolor --out exports/
+"""
+import argparse
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Any, Callable, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+MAX_STAGE_WORKERS = 4
+MAX_PARALLEL_RUNS = 4
+ARTIFACT_CACHE_SIZE = 32
+DEFAULT_EXPORT_FORMAT = "JPEG"
+DEFAULT_EXPORT_QUALITY = 95
+SOURCE_DOWNLOAD_TIMEOUT = 15
+# Classic-Prompt: "vision" = GPT-4o analysiert das Bild, "fast" = lokale Etikett-Analyse (logic.palette),
+# "enriched" = lokale Analyse als Zusatzkontext für GPT-4o
+CLASSIC_PROMPT_MODES = ("vision", "fast", "enriched")
+# Entwurf -> Final (nur gpt-image-1): Entwürfe in DRAFT_QUALITY, das gewählte Ergebnis in FINAL_QUALITY
+DRAFT_QUALITY = "low"
+FINAL_QUALITY = "high"
+MAX_DRAFTS = 4
+FINALIZE_MODES = ("rerender", "upscale")
+DRAFT_RERENDER_PROMPT_TEMPLATE = """
+Re-render the first provided image (a low-detail draft) in full detail.
+Keep its composition, layout, colors, shapes and any text exactly as they are; only refine sharpness, textures and lighting.
+{reference_note}The draft was created from this brief:
+{prompt}
+"""
+DRAFT_RERENDER_SOURCE_NOTE = ("The second provided image is the original product photo: take the label's colors, "
+                              "patterns and fine details from it rather than from the draft.\n")
+
+# === Engine ===
+@dataclass(frozen=True)
+class Stage:
+    """
+    Eine Pipeline-Stufe. func erhält ein Dict aus Parametern und den Ergebnissen der Stufen in `inputs`.
+    `params` nennt die Parameter, die das Ergebnis beeinflussen (Teil des Cache-Schlüssels).
+    Nicht-deterministische Stufen (KI-Aufrufe) führen "run_id" in params, damit jeder Lauf neu generiert.
+    """
+    name: str
+    func: Callable[[dict], Any]
+    inputs: Tuple[str, ...] = ()
+    params: Tuple[str, ...] = ()
+    cache: bool = True
+
+@dataclass
+class PipelineResult:
+    artifacts: dict
+    timings: dict = field(default_factory=dict)
+    cached: list = field(default_factory=list)
+    params: dict = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    def __getitem__(self, stage_name: str) -> Any:
+        return self.artifacts[stage_name]
+
+    @property
+    def public_params(self) -> dict:
+        """Parameter ohne Bild- und Binärdaten (z. B. für den Verlauf)."""
+        return {k: v for k, v in self.params.items() if not isinstance(v, (Image.Image, bytes, bytearray))}
+
+class PipelineError(Exception):
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(f"Fehler in Stufe '{stage}': {error}")
+        self.stage = stage
+        self.error = error
+
+class ArtifactCache:
+    """Kleiner LRU-Speicher für Zwischenergebnisse (prozessweit, threadsicher)."""
+
+    def __init__(self, max_entries: int = ARTIFACT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key: str, default: Any = None) -> Any:
+        with self._lock:
+            if cache_key not in self._entries:
+                return default
+            self._entries.move_to_end(cache_key)
+            return self._entries[cache_key]
+
+    def put(self, cache_key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[cache_key] = value
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+ARTIFACT_CACHE = ArtifactCache()
+_MISSING = object()
+
+def _fingerprint(value: Any) -> str:
+    if isinstance(value, Image.Image):
+        digest = hashlib.blake2b(value.tobytes(), digest_size=16).hexdigest()
+        return f"img:{value.mode}:{value.size}:{digest}"
+    if isinstance(value, (bytes, bytearray)):
+        return f"bytes:{hashlib.blake2b(value, digest_size=16).hexdigest()}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(_fingerprint(v) for v in value) + "]"
+    return repr(value)
+
+class Pipeline:
+    def __init__(self, name: str, stages: list[Stage]):
+        self.name = name
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [dep for dep in stage.inputs if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stufe '{stage.name}' hängt von unbekannten Stufen ab: {missing}")
+
+    def _required(self, until: Optional[str], provided: tuple = ()) -> list[str]:
+        """Nötige Stufen in Reihenfolge; für bereits vorhandene Ergebnisse (provided) entfallen auch deren Vorgänger."""
+        if until is None:
+            until = list(self.stages)[-1]
+        if until not in self.stages:
+            raise ValueError(f"Unbekannte Stufe: {until}")
+        required, stack = [], [until]
+        while stack:
+            name = stack.pop()
+            if name not in required:
+                required.append(name)
+                if name not in provided:
+                    stack.extend(self.stages[name].inputs)
+        return [name for name in self.stages if name in required and name not in provided]
+
+    def _stage_key(self, stage: Stage, params: dict, keys: dict) -> str:
+        parts = [self.name, stage.name]
+        parts += [f"{p}={_fingerprint(params.get(p))}" for p in stage.params]
+        parts += [f"<{dep}:{keys[dep]}>" for dep in stage.inputs]
+        return hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+    @staticmethod
+    def _timed(stage: Stage, context: dict) -> Tuple[Any, float]:
+        start = time.perf_counter()
+        value = stage.func(context)
+        return value, time.perf_counter() - start
+
+    def run(self, params: dict, until: Optional[str] = None, cache: Optional[ArtifactCache] = ARTIFACT_CACHE,
+            on_stage: Optional[Callable[[str, str, float], None]] = None,
+            max_workers: int = MAX_STAGE_WORKERS, provided: Optional[dict] = None) -> PipelineResult:
+        """
+        Führt alle (bzw. die bis `until` nötigen) Stufen aus. on_stage(name, event, sekunden) wird im
+        aufrufenden Thread gemeldet; event ist "start", "done" oder "cached".
+        provided: bereits vorhandene Stufen-Ergebnisse (z. B. ein gewählter Entwurf als "generate").
+        """
+        started = time.perf_counter()
+        params = dict(params)
+        params.setdefault("run_id", uuid.uuid4().hex)
+        notify = on_stage or (lambda name, event, seconds: None)
+        provided = {name: value for name, value in (provided or {}).items() if name in self.stages}
+        pending = self._required(until, tuple(provided))
+        keys: dict[str, str] = {}
+        result = PipelineResult(artifacts={}, params=params)
+        running: dict = {}
+        for name, value in provided.items():
+            keys[name] = f"provided:{_fingerprint(value)}"
+            result.artifacts[name], result.timings[name] = value, 0.0
+            result.cached.append(name)
+            notify(name, "cached", 0.0)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                progressed = True
+                while progressed:  # Cache-Treffer können weitere Stufen sofort freischalten
+                    progressed = False
+                    for name in list(pending):
+                        stage = self.stages[name]
+                        if not all(dep in result.artifacts for dep in stage.inputs):
+                            continue
+                        pending.remove(name)
+                        keys[name] = self._stage_key(stage, params, keys)
+                        hit = cache.get(keys[name], _MISSING) if (cache is not None and stage.cache) else _MISSING
+                        if hit is not _MISSING:
+                            result.artifacts[name], result.timings[name] = hit, 0.0
+                            result.cached.append(name)
+                            notify(name, "cached", 0.0)
+                            progressed = True
+                            continue
+                        context = {**params, **{dep: result.artifacts[dep] for dep in stage.inputs}}
+                        running[executor.submit(self._timed, stage, context)] = name
+                        notify(name, "start", 0.0)
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        value, seconds = future.result()
+                    except Exception as e:
+                        for other in running:
+                            other.cancel()
+                        raise PipelineError(name, e) from e
+                    result.artifacts[name], result.timings[name] = value, seconds
+                    if cache is not None and self.stages[name].cache:
+                        cache.put(keys[name], value)
+                    notify(name, "done", seconds)
+        result.elapsed = time.perf_counter() - started
+        return result
+
+# === Quellen (auch direkt von den Seiten genutzt) ===
+def open_image(source) -> Image.Image:
+    """Öffnet Upload, Bytes oder Pfad, korrigiert die EXIF-Orientierung und liefert RGB."""
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    img = Image.open(source)
+    return ImageOps.exif_transpose(img).convert("RGB")
+
+def load_sku_image(df, sku: str) -> Image.Image:
+    """Lädt das Produktbild einer SKU aus dem Katalog (ValueError, wenn keine Bild-URL vorhanden ist)."""
+    import pandas as pd
+    from logic.clients import get_http_session
+    from utils import find_sku_row
+
+    match = find_sku_row(df, sku)
+    if match is None or pd.isna(match["image_url"]):
+        raise ValueError(f"Für SKU '{sku}' wurde kein gültiges Bild gefunden.")
+    response = get_http_session().get(match["image_url"], timeout=SOURCE_DOWNLOAD_TIMEOUT)
+    response.raise_for_status()
+    return open_image(response.content)
+
+def _stage_source(ctx: dict) -> Image.Image:
+    if ctx.get("image") is not None:
+        return ctx["image"]
+    if ctx.get("image_path"):
+        return open_image(ctx["image_path"])
+    if ctx.get("sku"):
+        from utils import SKU_CSV_FILENAME, load_sku_data
+        return load_sku_image(load_sku_data(SKU_CSV_FILENAME), ctx["sku"])
+    raise ValueError("Keine Bildquelle angegeben (image, image_path oder sku).")
+
+# === Prompts ===
+def _stage_prompt_direct(ctx: dict) -> str:
+    from logic.prompt_engine_v2 import build_gpt_image_1_banner_prompt, build_gpt_image_1_banner_with_text_prompt
+
+    user_text = (ctx.get("user_text") or "").strip()
+    if ctx.get("include_text") and user_text:
+        return build_gpt_image_1_banner_with_text_prompt(user_text, ctx.get("text_position", "zentral"))
+    return build_gpt_image_1_banner_prompt()
+
+def classic_prompt(img: Image.Image, prompt_mode: str = "vision", image_url: Optional[str] = None) -> str:
+    """DALL·E-Prompt aus dem Produktbild; image_url erlaubt die Nutzung einer gespeicherten Freistellung als Maske."""
+    from logic.generation_v1 import generate_banner_prompt_gpt4
+    from logic.prompt_engine_v1 import build_autonomous_prompt, build_enrichment_context
+
+    if prompt_mode not in CLASSIC_PROMPT_MODES:
+        raise ValueError(f"Unbekannter Prompt-Modus: {prompt_mode}")
+    if prompt_mode == "vision":
+        return generate_banner_prompt_gpt4(img, build_autonomous_prompt())
+    from logic.palette import analyse_label, build_fast_prompt, find_cached_cutout, to_prompt_fragment
+    analysis = analyse_label(img, find_cached_cutout(image_url) if image_url else None)
+    if prompt_mode == "fast":
+        return build_fast_prompt(analysis)
+    return generate_banner_prompt_gpt4(img, build_autonomous_prompt(), build_enrichment_context(to_prompt_fragment(analysis)))
+
+def _stage_prompt_classic(ctx: dict) -> str:
+    return classic_prompt(ctx["source"], ctx.get("prompt_mode", "vision"), ctx.get("image_url"))
+
+def _stage_prompt_concept(ctx: dict) -> str:
+    from logic.prompt_engine_concept import build_concept_prompt
+
+    if ctx.get("prompt_text"):  # Bereits erstellt, z. B. live auf der Seite gestreamt
+        return ctx["prompt_text"]
+    subject = (ctx.get("subject") or "").strip()
+    if not subject:
+        raise ValueError("Bitte geben Sie ein Motiv oder einen Prompt ein.")
+    if ctx.get("direct_prompt_mode"):
+        return subject
+    return build_concept_prompt(subject, ctx.get("style", "Photorealistic"))
+
+# === Generierung ===
+def _ratio(ctx: dict) -> float:
+    w, h = ctx["target_size"]
+    return w / h if h > 0 else 1
+
+def _stage_generate_direct(ctx: dict) -> Image.Image:
+    stability_tier = ctx.get("stability_tier")
+    if stability_tier:
+        from logic.generation_stability import generate_stability_image_to_image, pad_reference_to_aspect
+        # Die Antwort übernimmt das Seitenverhältnis der Referenz – daher vorher auf Banner-Format auffüllen
+        reference = pad_reference_to_aspect(ctx["source"], *ctx["target_size"])
+        return generate_stability_image_to_image(reference, ctx["prompt"], ctx.get("strength", 0.6), tier=stability_tier)
+    from logic.generation_v2 import generate_banner_with_gpt_image_1, get_best_dalle_size
+    return generate_banner_with_gpt_image_1(ctx["source"], ctx["prompt"], get_best_dalle_size(_ratio(ctx)), ctx.get("quality", "medium"))
+
+def _stage_generate_dalle(ctx: dict) -> Image.Image:
+    from logic.generation_v1 import generate_dalle_image_b64, get_best_dalle_size
+
+    return generate_dalle_image_b64(ctx["prompt"], get_best_dalle_size(_ratio(ctx)), quality=ctx.get("quality", "standard"))
+
+def _stage_generate_concept(ctx: dict) -> Image.Image:
+    if ctx.get("model", "DALL·E 3") == "DALL·E 3":
+        return _stage_generate_dalle(ctx)
+    from logic.generation_advanced import generate_image_with_gpt_image_1_from_text, get_best_gpt_image_1_size
+    return generate_image_with_gpt_image_1_from_text(ctx["prompt"], get_best_gpt_image_1_size(_ratio(ctx)), ctx.get("quality", "medium"))
+
+# === Nachbearbeitung & Export ===
+def _stage_postprocess(ctx: dict) -> Image.Image:
+    img = ctx["generate"]
+    if ctx.get("outpaint"):
+        from logic.outpaint import needs_outpainting, outpaint_to_wide
+        if needs_outpainting(ctx["target_size"]):
+            quality = ctx.get("quality") if ctx.get("quality") in ("low", "medium", "high", "auto") else "medium"
+            img = outpaint_to_wide(img, ctx["target_size"], ctx.get("outpaint_engine", "gpt-image-1"), quality)
+    return img.convert("RGB")
+
+def fit_to_target(img: Image.Image, target_size: Tuple[int, int], use_super_resolution: bool = True) -> Image.Image:
+    """Mittiger Zuschnitt auf das Zielverhältnis (Ersatz für den interaktiven Cropper) und finale Skalierung."""
+    from logic.upscale import resize_to_target
+
+    target_w, target_h = target_size
+    target_ratio = target_w / target_h
+    if img.width / img.height > target_ratio:
+        crop_w = round(img.height * target_ratio)
+        left = (img.width - crop_w) // 2
+        img = img.crop((left, 0, left + crop_w, img.height))
+    else:
+        crop_h = round(img.width / target_ratio)
+        top = (img.height - crop_h) // 2
+        img = img.crop((0, top, img.width, top + crop_h))
+    return resize_to_target(img, target_size, use_super_resolution)
+
+def export_budget(target_size: Tuple[int, int], fmt: str = DEFAULT_EXPORT_FORMAT) -> Optional[int]:
+    """CDN-Bytebudget, für das export_image die Qualität sucht (None: feste Qualität)."""
+    from logic.image_encoding import CDN_BYTE_BUDGETS, SUPPORTED_SEARCH_FORMATS
+
+    return CDN_BYTE_BUDGETS.get(tuple(target_size)) if fmt in SUPPORTED_SEARCH_FORMATS else None
+
+def export_image(img: Image.Image, target_size: Tuple[int, int], fmt: str = DEFAULT_EXPORT_FORMAT,
+                 search_quality: bool = True) -> Tuple[bytes, Optional[dict]]:
+    """
+    Kodiert das fertige Banner. Für Formate mit CDN-Budget wird die Qualität per Suche bestimmt,
+    sonst (oder mit search_quality=False, z. B. für Serien) mit fester Qualität gespeichert.
+    Rückgabe: (Bytes, Info der Suche oder None).
+    """
+    from logic.image_encoding import encode_to_target
+
+    byte_budget = export_budget(target_size, fmt) if search_quality else None
+    if byte_budget:
+        data, info = encode_to_target(img, fmt, max_bytes=byte_budget)
+        info["budget"] = byte_budget
+        return data, info
+    buffer = BytesIO()
+    save_kwargs = {}
+    if fmt == "JPEG":
+        save_kwargs["quality"] = DEFAULT_EXPORT_QUALITY
+        if img.mode in ("RGBA", "P"):
+            img = img.convert("RGB")
+    img.save(buffer, format=fmt, **save_kwargs)
+    return buffer.getvalue(), None
+
+def _stage_export(ctx: dict) -> Tuple[bytes, Optional[dict]]:
+    final = fit_to_target(ctx["postprocess"], ctx["target_size"], ctx.get("use_sr", True))
+    return export_image(final, ctx["target_size"], ctx.get("output_format", DEFAULT_EXPORT_FORMAT))
+
+# === Flows ===
+_POSTPROCESS = Stage("postprocess", _stage_postprocess, inputs=("generate",),
+                     params=("target_size", "outpaint", "outpaint_engine", "quality"))
+_EXPORT = Stage("export", _stage_export, inputs=("postprocess",), params=("target_size", "use_sr", "output_format"))
+
+FLOWS: dict[str, Pipeline] = {
+    "direct": Pipeline("direct", [
+        Stage("source", _stage_source, params=("image", "image_path", "sku")),
+        Stage("prompt", _stage_prompt_direct, params=("include_text", "user_text", "text_position")),
+        Stage("generate", _stage_generate_direct, inputs=("source", "prompt"),
+              params=("run_id", "target_size", "quality", "stability_tier", "strength")),
+        _POSTPROCESS, _EXPORT,
+    ]),
+    "classic": Pipeline("classic", [
+        Stage("source", _stage_source, params=("image", "image_path", "sku")),
+        Stage("prompt", _stage_prompt_classic, inputs=("source",), params=("run_id", "prompt_mode", "image_url")),
+        Stage("generate", _stage_generate_dalle, inputs=("prompt",), params=("run_id", "target_size", "quality")),
+        _POSTPROCESS, _EXPORT,
+    ]),
+    "concept": Pipeline("concept", [
+        Stage("prompt", _stage_prompt_concept, params=("run_id", "subject", "style", "direct_prompt_mode", "prompt_text")),
+        Stage("generate", _stage_generate_concept, inputs=("prompt",), params=("run_id", "target_size", "model", "quality")),
+        _POSTPROCESS, _EXPORT,
+    ]),
+}
+
+# Neu-Rendern eines gewählten Entwurfs: der Entwurf ist die Komposition-Vorlage eines gpt-image-1-Edits in FINAL_QUALITY,
+# bei Direct kommt das Produktfoto als zweite Referenz hinzu (Etikett-Details nicht aus dem low-Entwurf)
+def _stage_prompt_draft(ctx: dict) -> str:
+    return ctx["prompt_text"]
+
+def _stage_rerender_draft(ctx: dict) -> Image.Image:
+    from logic.generation_v2 import generate_banner_with_gpt_image_1, get_best_dalle_size
+
+    references = [ctx["source"]] if ctx.get("source") is not None else []
+    prompt = DRAFT_RERENDER_PROMPT_TEMPLATE.format(
+        prompt=ctx["prompt"].strip(), reference_note=DRAFT_RERENDER_SOURCE_NOTE if references else "")
+    return generate_banner_with_gpt_image_1(ctx["draft"], prompt, get_best_dalle_size(_ratio(ctx)), FINAL_QUALITY,
+                                            additional_images=references)
+
+_RERENDER_PARAMS = ("run_id", "target_size", "draft")
+_RERENDER_DRAFT: dict[str, Pipeline] = {
+    "direct": Pipeline("rerender_direct", [
+        FLOWS["direct"].stages["source"],
+        Stage("prompt", _stage_prompt_draft, params=("prompt_text",)),
+        Stage("generate", _stage_rerender_draft, inputs=("source", "prompt"), params=_RERENDER_PARAMS),
+        _POSTPROCESS, _EXPORT,
+    ]),
+    "concept": Pipeline("rerender_concept", [
+        Stage("prompt", _stage_prompt_draft, params=("prompt_text",)),
+        Stage("generate", _stage_rerender_draft, inputs=("prompt",), params=_RERENDER_PARAMS),
+        _POSTPROCESS, _EXPORT,
+    ]),
+}
+
+def run_flow(flow: str, params: dict, until: Optional[str] = None,
+             on_stage: Optional[Callable[[str, str, float], None]] = None) -> PipelineResult:
+    if flow not in FLOWS:
+        raise ValueError(f"Unbekannter Ablauf: {flow}")
+    return FLOWS[flow].run(params, until=until, on_stage=on_stage)
+
+# === Entwurf -> Final ===
+@dataclass
+class DraftSet:
+    """Entwürfe eines Laufs: gleicher Prompt und gleiche Referenz, mehrere Bilder in DRAFT_QUALITY."""
+    flow: str
+    params: dict
+    prompt: str
+    images: list
+    elapsed: float = 0.0
+
+def supports_drafts(flow: str, params: dict) -> bool:
+    """Entwürfe gibt es nur mit gpt-image-1 (Direct ohne Stability, Concept mit GPT-Image-1)."""
+    if flow == "direct":
+        return not params.get("stability_tier")
+    if flow == "concept":
+        return params.get("model", "DALL·E 3") != "DALL·E 3"
+    return False
+
+def generate_drafts(flow: str, params: dict, count: int = 2) -> DraftSet:
+    """
+    Quelle und Prompt laufen über die Pipeline (inkl. Cache), die Entwürfe kommen aus einer einzigen
+    gpt-image-1-Anfrage mit n=count in DRAFT_QUALITY.
+    """
+    if not supports_drafts(flow, params):
+        raise ValueError("Entwürfe sind nur mit GPT-Image-1 möglich.")
+    started = time.perf_counter()
+    params = {**params, "quality": DRAFT_QUALITY}
+    params.setdefault("run_id", uuid.uuid4().hex)
+    inputs = FLOWS[flow].stages["generate"].inputs
+    artifacts: dict = {}
+    for name in inputs:
+        artifacts.update(run_flow(flow, params, until=name).artifacts)
+    count = max(1, min(count, MAX_DRAFTS))
+    size_ratio = _ratio(params)
+    if flow == "direct":
+        from logic.generation_v2 import generate_banners_with_gpt_image_1, get_best_dalle_size
+        images = generate_banners_with_gpt_image_1(artifacts["source"], artifacts["prompt"], get_best_dalle_size(size_ratio), DRAFT_QUALITY, n=count)
+    else:
+        from logic.generation_advanced import generate_images_with_gpt_image_1_from_text, get_best_gpt_image_1_size
+        images = generate_images_with_gpt_image_1_from_text(artifacts["prompt"], get_best_gpt_image_1_size(size_ratio), DRAFT_QUALITY, n=count)
+    return DraftSet(flow, params, artifacts["prompt"], images, time.perf_counter() - started)
+
+def finalize_draft(drafts: DraftSet, index: int, mode: str = "rerender", until: Optional[str] = None,
+                   on_stage: Optional[Callable[[str, str, float], None]] = None) -> PipelineResult:
+    """
+    Macht aus einem gewählten Entwurf das Endergebnis:
+    "rerender" rendert den Entwurf per gpt-image-1-Edit (Entwurf als Vorlage, bei Direct plus Produktfoto) in FINAL_QUALITY neu,
+    "upscale" verarbeitet den Entwurf selbst weiter (Nachbearbeitung, Zuschnitt, lokale Hochskalierung).
+    In beiden Fällen laufen kostenpflichtige Folgeschritte (z. B. Outpainting) in FINAL_QUALITY, nicht in DRAFT_QUALITY.
+    """
+    if mode not in FINALIZE_MODES:
+        raise ValueError(f"Unbekannter Modus: {mode}")
+    if not 0 <= index < len(drafts.images):
+        raise ValueError(f"Ungültiger Entwurf: {index}")
+    params = {**drafts.params, "prompt_text": drafts.prompt, "quality": FINAL_QUALITY}
+    if mode == "rerender":
+        params.update(run_id=uuid.uuid4().hex, draft=drafts.images[index], draft_index=index)
+        return _RERENDER_DRAFT[drafts.flow].run(params, until=until, on_stage=on_stage)
+    return FLOWS[drafts.flow].run(params, until=until, on_stage=on_stage,
+                                  provided={"prompt": drafts.prompt, "generate": drafts.images[index]})
+
+def run_many(flow: str, param_sets: list[dict], max_parallel: int = MAX_PARALLEL_RUNS) -> list:
+    """Mehrere Läufe gleichzeitig (z. B. viele SKUs); liefert pro Lauf ein PipelineResult oder die Exception."""
+    def run_one(params: dict):
+        try:
+            return run_flow(flow, params)
+        except Exception as e:
+            return e
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        return list(executor.map(run_one, param_sets))
+
+# === Headless ===
+def _parse_size(value: str) -> Tuple[int, int]:
+    try:
+        w, h = value.lower().split("x")
+        return int(w), int(h)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Ungültige Größe '{value}', erwartet z. B. 3000x660.")
+
+def main() -> None:
+    from dotenv import load_dotenv
+    from utils import PROJECT_ROOT
+
+    load_dotenv(os.path.join(PROJECT_ROOT, ".env"))
+    parser = argparse.ArgumentParser(description="Erzeugt Banner ohne Streamlit-Oberfläche.")
+    parser.add_argument("--flow", choices=sorted(FLOWS), default="direct")
+    parser.add_argument("--sku", action="append", default=[], help="SKU (mehrfach möglich, Läufe parallel)")
+    parser.add_argument("--image", action="append", default=[], help="Bildpfad (mehrfach möglich)")
+    parser.add_argument("--subject", help="Motiv für den Concept-Ablauf")
+    parser.add_argument("--style", default="Photorealistic", help="Stil für den Concept-Ablauf")
+    parser.add_argument("--model", default="DALL·E 3", help="Concept: 'DALL·E 3' oder 'GPT-Image-1'")
+    parser.add_argument("--size", type=_parse_size, default=(3000, 660))
+    parser.add_argument("--quality", default=None, help="Qualitätsstufe des Modells")
+    parser.add_argument("--outpaint", action="store_true", help="Breite Formate per Outpainting erweitern")
+    parser.add_argument("--prompt-mode", choices=CLASSIC_PROMPT_MODES, default="vision",
+                        help="Classic: GPT-4o-Analyse, lokale Etikett-Analyse oder beides")
+    parser.add_argument("--format", default=DEFAULT_EXPORT_FORMAT, choices=["JPEG", "WEBP", "PNG"])
+    parser.add_argument("--out", default="exports", help="Zielverzeichnis")
+    args = parser.parse_args()
+
+    base = {"target_size": args.size, "outpaint": args.outpaint, "output_format": args.format, "prompt_mode": args.prompt_mode}
+    if args.quality:
+        base["quality"] = args.quality
+    if args.flow == "concept":
+        if not args.subject:
+            parser.error("--subject ist für den Concept-Ablauf erforderlich.")
+        jobs = [("concept", {**base, "subject": args.subject, "style": args.style, "model": args.model})]
+    else:
+        jobs = [(f"sku_{sku}", {**base, "sku": sku}) for sku in args.sku]
+        jobs += [(os.path.splitext(os.path.basename(path))[0], {**base, "image_path": path}) for path in args.image]
+        if not jobs:
+            parser.error("Bitte mindestens eine --sku oder --image angeben.")
+
+    os.makedirs(args.out, exist_ok=True)
+    started = time.perf_counter()
+    results = run_many(args.flow, [params for _, params in jobs])
+    extension = {"JPEG": "jpg", "WEBP": "webp", "PNG": "png"}[args.format]
+    for (label, _), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            print(f"[FEHLER] {label}: {result}")
+            continue
+        data, _ = result["export"]
+        path = os.path.join(args.out, f"{args.flow}_{label}_{args.size[0]}x{args.size[1]}.{extension}")
+        with open(path, "wb") as f:
+            f.write(data)
+        stages = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in result.timings.items())
+        print(f"{path} ({len(data) / 1024:.0f} KB) – {stages}")
+    print(f"Fertig in {time.perf_counter() - started:.1f} s.")
+
+if __name__ == "__main__":
+    main()
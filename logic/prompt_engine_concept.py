@@ -1,4 +1,6 @@
-import openai
+from typing import Iterator
+
+from logic.clients import collect_text, stream_chat_text
 
 # NEU: Kategorisierte und kuratierte Liste von Kunststilen
 CATEGORIZED_ART_STYLES = {
@@ -91,31 +93,47 @@ Your task is to take a user's core idea (a 'Subject') and a desired 'Artistic St
 - Your Generated DALL-E 3 Prompt: "An impressionist oil painting of a serene, sun-drenched beach at dusk. Gentle waves lap at the shore, reflecting the pastel colors of the sky. Tall, wispy dune grass sways in the breeze. The scene is captured with soft, broken brushstrokes and a focus on the play of light. Wide format banner, ultra-detailed, cinematic lighting, seamless edge-to-edge composition."
 """
 
-def build_concept_prompt(subject: str, style: str) -> str:
+def _fallback_concept_prompt(subject: str, style: str) -> str:
+    return f"{style}, {subject}. Wide format banner, ultra-detailed, cinematic lighting, seamless edge-to-edge composition."
+
+def stream_concept_prompt(subject: str, style: str) -> Iterator[str]:
     """
-    Verwendet GPT-4o, um einen einfachen Input in einen reichhaltigen DALL-E 3 Prompt zu verwandeln.
+    Wie build_concept_prompt, liefert den Prompt aber stückweise, sobald GPT-4o ihn schreibt.
+    Schlägt die Anfrage vor dem ersten Stück fehl, kommt der einfache Fallback-Prompt.
     """
     if not subject.strip():
         raise ValueError("Das Motiv / Thema darf nicht leer sein.")
 
     user_prompt_for_enhancer = f"Subject: '{subject}'\nArtistic Style: '{style}'"
-
+    started = False
     try:
-        response = openai.chat.completions.create(
+        for chunk in stream_chat_text(
+            call_name="concept_prompt",
+            cache_key="concept_prompt_enhancer",
             model="gpt-4o",
             messages=[
-                {"role": "system", "content": CONCEPT_PROMPT_ENHANCER_TEMPLATE},
-                {"role": "user", "content": user_prompt_for_enhancer}
+                {"role": "system", "content": CONCEPT_PROMPT_ENHANCER_TEMPLATE},  # statisch, cachebar
+                {"role": "user", "content": user_prompt_for_enhancer}  # variabel, immer zuletzt
             ],
             max_tokens=350,
-            temperature=0.7
-        )
-        
-        if response.choices[0].message.content:
-            return response.choices[0].message.content.strip()
-        else:
-            raise ValueError("Der KI-Prompt-Enhancer hat eine leere Antwort zurückgegeben.")
+            temperature=0.7,
+        ):
+            started = True
+            yield chunk
+    except Exception as e:
+        print(f"Fehler bei der Kommunikation mit dem Prompt-Enhancer (GPT-4o): {e}")
+        if started:
+            raise
+        yield _fallback_concept_prompt(subject, style)
 
+def build_concept_prompt(subject: str, style: str) -> str:
+    """
+    Verwendet GPT-4o, um einen einfachen Input in einen reichhaltigen DALL-E 3 Prompt zu verwandeln.
+    """
+    if not subject.strip():
+        raise ValueError("Das Motiv / Thema darf nicht leer sein.")
+    try:
+        return collect_text(stream_concept_prompt(subject, style), "Der KI-Prompt-Enhancer hat eine leere Antwort zurückgegeben.")
     except Exception as e:
         print(f"Fehler bei der Kommunikation mit dem Prompt-Enhancer (GPT-4o): {e}")
-        return f"{style}, {subject}. Wide format banner, ultra-detailed, cinematic lighting, seamless edge-to-edge composition."
\ No newline at end of file
+        return _fallback_concept_prompt(subject, style)
\ No newline at end of file
@@ -1,4 +1,6 @@
-import openai
+from typing import Iterator
+
+from logic.clients import collect_text, stream_chat_text
 
 # System-Prompt für GPT-4o, um einen Prompt basierend auf der Herkunft zu erstellen
 ORIGIN_PROMPT_ENHANCER_TEMPLATE: str = """
@@ -31,9 +33,9 @@ Generate a single, detailed paragraph that describes a scene. This scene should
 - Your Generated Prompt: "A hyperrealistic photograph of a sun-drenched vineyard in South Tyrol, Italy, during the golden hour. In the background, the dramatic, jagged peaks of the Dolomites are bathed in warm evening light. The rows of grapevines are meticulously kept, with lush green leaves and deep purple grapes. The scene evokes a sense of clean, crisp air and timeless elegance. Cinematic composition, ultra-detailed, wide format, seamless edge-to-edge."
 """
 
-def build_origin_prompt(wine_type: str, origin: str, mood: str) -> str:
+def stream_origin_prompt(wine_type: str, origin: str, mood: str) -> Iterator[str]:
     """
-    Verwendet GPT-4o, um einen atmosphärischen Prompt basierend auf Wein-Herkunft und -Typ zu erstellen.
+    Wie build_origin_prompt, liefert den Prompt aber stückweise, sobald GPT-4o ihn schreibt.
     """
     if not wine_type.strip() or not origin.strip():
         raise ValueError("Weintyp und Herkunft dürfen nicht leer sein.")
@@ -41,21 +43,23 @@ def build_origin_prompt(wine_type: str, origin: str, mood: str) -> str:
     user_input_for_enhancer = f"Wine Type/Grape: '{wine_type}'\nRegion of Origin: '{origin}'\nDesired Mood: '{mood}'"
 
     try:
-        response = openai.chat.completions.create(
+        yield from stream_chat_text(
+            call_name="origin_prompt",
+            cache_key="origin_prompt_enhancer",
             model="gpt-4o",
             messages=[
-                {"role": "system", "content": ORIGIN_PROMPT_ENHANCER_TEMPLATE},
-                {"role": "user", "content": user_input_for_enhancer}
+                {"role": "system", "content": ORIGIN_PROMPT_ENHANCER_TEMPLATE},  # statisch, cachebar
+                {"role": "user", "content": user_input_for_enhancer}  # variabel, immer zuletzt
             ],
             max_tokens=400,
             temperature=0.8, # Etwas mehr Kreativität für atmosphärische Beschreibungen
         )
-        
-        if response.choices[0].message.content:
-            return response.choices[0].message.content.strip()
-        else:
-            raise ValueError("Der KI-Herkunfts-Prompt-Generator hat eine leere Antwort zurückgegeben.")
-
     except Exception as e:
         print(f"Fehler bei der Kommunikation mit dem Herkunfts-Prompt-Generator (GPT-4o): {e}")
-        raise
\ No newline at end of file
+        raise
+
+def build_origin_prompt(wine_type: str, origin: str, mood: str) -> str:
+    """
+    Verwendet GPT-4o, um einen atmosphärischen Prompt basierend auf Wein-Herkunft und -Typ zu erstellen.
+    """
+    return collect_text(stream_origin_prompt(wine_type, origin, mood), "Der KI-Herkunfts-Prompt-Generator hat eine leere Antwort zurückgegeben.")
\ No newline at end of file
@@ -1,4 +1,6 @@
 # Prompt für den klassischen GPT-4 Vision -> DALL-E 3 Workflow
+# Die Vorlagen werden unverändert als System-Prompt gesendet (byte-identisch, damit der Prompt-Cache greift);
+# variable Angaben gehören in die User-Nachricht.
 
 AUTONOMOUS_PROMPT_TEMPLATE: str = """
 As an expert in art direction and marketing for luxury wines, your task is to create a detailed, evocative, and artistic prompt for DALL·E 3.
@@ -29,4 +31,15 @@ You will be given an image of the wine bottle. Your analysis of the bottle's lab
 
 def build_autonomous_prompt() -> str:
     """Gibt den vordefinierten Prompt-Template für die GPT-4o Analyse zurück."""
-    return AUTONOMOUS_PROMPT_TEMPLATE
\ No newline at end of file
+    return AUTONOMOUS_PROMPT_TEMPLATE
+
+ENRICHMENT_CONTEXT_TEMPLATE: str = """
+**Measured Label Analysis (pixel statistics of the product, treat the colours as ground truth):**
+{fragment}
+
+Use these measurements for the colour palette and overall mood; use the image only for motifs, typography style and texture.
+"""
+
+def build_enrichment_context(fragment: str) -> str:
+    """Lokal gemessene Etikett-Analyse (logic.palette) als Zusatzkontext in der User-Nachricht an GPT-4o."""
+    return ENRICHMENT_CONTEXT_TEMPLATE.format(fragment=fragment).strip()
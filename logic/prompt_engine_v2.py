@@ -42,4 +42,29 @@ def build_gpt_image_1_banner_with_text_prompt(user_text: str, text_position: str
         pass
 
     prompt = GPT_IMAGE_1_BANNER_WITH_TEXT_PROMPT_TEMPLATE.replace("{user_text}", user_text).replace("{text_position}", text_position)
-    return prompt
\ No newline at end of file
+    return prompt
+
+GPT_IMAGE_1_OUTPAINT_PROMPT_TEMPLATE: str = """
+Extend this banner seamlessly to the {side}. Fill only the transparent area.
+Continue the existing colors, shapes, textures, lighting and perspective so the transition is invisible.
+Do **not** add any text, words, logos, bottles or products in the new area.
+Output only the generated image.
+"""
+
+def build_outpaint_prompt(side: str) -> str:
+    """Prompt für die seitliche Erweiterung (Outpainting) eines Banners nach links oder rechts."""
+    return GPT_IMAGE_1_OUTPAINT_PROMPT_TEMPLATE.replace("{side}", side)
+
+GPT_IMAGE_1_REGION_EDIT_PROMPT_TEMPLATE: str = """
+Repaint only the transparent area of this banner. Everything else must stay exactly as it is.
+{instruction}
+Continue the surrounding colors, shapes, textures, lighting and perspective so the repaired area blends in invisibly.
+Do **not** add any text, words, logos, bottles or products unless explicitly requested above.
+Output only the generated image.
+"""
+
+REGION_EDIT_DEFAULT_INSTRUCTION = "Remove any artifacts, distortions or unwanted text in this area and replace them with matching background."
+
+def build_region_edit_prompt(instruction: str = "") -> str:
+    """Prompt für die Korrektur eines einzelnen Bereichs (maskierter Edit); ohne Anweisung wird nur bereinigt."""
+    return GPT_IMAGE_1_REGION_EDIT_PROMPT_TEMPLATE.replace("{instruction}", instruction.strip() or REGION_EDIT_DEFAULT_INSTRUCTION)
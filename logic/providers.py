@@ -0,0 +1,87 @@
+import importlib
+from typing import Callable
+
+from PIL import Image
+
+# Lazy Provider-Registry: Modelle werden erst beim ersten Aufruf importiert.
+# Jeder Eintrag: Anzeigename -> Name des Adapters in diesem Modul
+# Adapter-Signatur: (prompt: str, target_w: int, target_h: int) -> PIL.Image
+PROVIDER_REGISTRY: dict[str, str] = {
+    "DALL·E 3": "_run_dalle3",
+    "GPT-Image-1": "_run_gpt_image_1",
+    "Google Imagen 2": "_run_google_imagen",
+    "Stability AI (Ultra)": "_run_stability_ultra",
+    "Stability AI (SD3)": "_run_stability_sd3",
+    "Stability AI (Core)": "_run_stability_core",
+    "FLUX.1 Pro": "_run_flux_pro",
+    "FLUX.1.1 Ultra": "_run_flux_ultra",
+    "Ideogram 3.0": "_run_ideogram_v3",
+}
+PROVIDER_ORDER: list[str] = list(PROVIDER_REGISTRY.keys())
+# Modelle mit Warteschlange (Fal): können eingereiht und parallel überwacht werden
+QUEUED_PROVIDERS: frozenset[str] = frozenset({"FLUX.1 Pro", "FLUX.1.1 Ultra", "Ideogram 3.0"})
+
+def _load(module_path: str, attribute: str):
+    return getattr(importlib.import_module(module_path), attribute)
+
+# === Adapter (importieren ihr Provider-Modul erst beim Aufruf) ===
+def _run_dalle3(prompt: str, target_w: int, target_h: int) -> Image.Image:
+    # b64_json statt URL: das Bild kommt mit der Antwort, kein zweiter Download
+    generate_dalle_image_b64 = _load("logic.generation_v1", "generate_dalle_image_b64")
+    get_best_dalle_size = _load("logic.generation_v1", "get_best_dalle_size")
+    return generate_dalle_image_b64(prompt, get_best_dalle_size(target_w / target_h if target_h > 0 else 1), quality="hd")
+
+def _run_gpt_image_1(prompt: str, target_w: int, target_h: int) -> Image.Image:
+    generate = _load("logic.generation_advanced", "generate_image_with_gpt_image_1_from_text")
+    get_size = _load("logic.generation_advanced", "get_best_gpt_image_1_size")
+    return generate(prompt, get_size(target_w / target_h if target_h > 0 else 1), quality="high")
+
+def _run_google_imagen(prompt: str, target_w: int, target_h: int) -> Image.Image:
+    return _load("logic.generation_google", "generate_image_with_google_imagen")(prompt, target_w, target_h)
+
+def _stability_ratio(target_w: int, target_h: int) -> str:
+    return _load("logic.generation_stability", "get_best_stability_aspect_ratio")(target_w, target_h)
+
+def _run_stability(tier: str, prompt: str, target_w: int, target_h: int) -> Image.Image:
+    generate = _load("logic.generation_stability", "generate_image_with_stability_ai")
+    return generate(prompt, _stability_ratio(target_w, target_h), tier=tier)
+
+def _run_stability_ultra(prompt: str, target_w: int, target_h: int) -> Image.Image:
+    return _run_stability("ultra", prompt, target_w, target_h)
+
+def _run_stability_sd3(prompt: str, target_w: int, target_h: int) -> Image.Image:
+    return _run_stability("sd3", prompt, target_w, target_h)
+
+def _run_stability_core(prompt: str, target_w: int, target_h: int) -> Image.Image:
+    return _run_stability("core", prompt, target_w, target_h)
+
+def _run_flux_pro(prompt: str, target_w: int, target_h: int) -> Image.Image:
+    return _load("logic.generation_fal", "generate_image_with_fal_flux_pro")(prompt, _stability_ratio(target_w, target_h))
+
+def _run_flux_ultra(prompt: str, target_w: int, target_h: int) -> Image.Image:
+    return _load("logic.generation_fal", "generate_image_with_fal_flux_ultra")(prompt, _stability_ratio(target_w, target_h))
+
+def _run_ideogram_v3(prompt: str, target_w: int, target_h: int) -> Image.Image:
+    return _load("logic.generation_fal", "generate_image_with_ideogram_v3")(prompt, _stability_ratio(target_w, target_h))
+
+# === Öffentliche API ===
+def get_provider(name: str) -> Callable[[str, int, int], Image.Image]:
+    """Liefert den Adapter für ein Modell; das eigentliche Provider-Modul wird erst beim Aufruf geladen."""
+    if name not in PROVIDER_REGISTRY:
+        raise ValueError(f"Unbekanntes Modell: {name}")
+    return globals()[PROVIDER_REGISTRY[name]]
+
+def generate_with_provider(name: str, prompt: str, target_w: int, target_h: int) -> Image.Image:
+    return get_provider(name)(prompt, target_w, target_h)
+
+def submit_provider_job(name: str, prompt: str, target_w: int, target_h: int):
+    """Reiht einen Auftrag bei einem Warteschlangen-Modell ein und liefert sofort den FalJob zurück."""
+    if name not in QUEUED_PROVIDERS:
+        raise ValueError(f"Modell ohne Warteschlange: {name}")
+    submit_fal_job = _load("logic.generation_fal", "submit_fal_job")
+    model_ids = _load("logic.generation_fal", "FAL_MODEL_IDS")
+    return submit_fal_job(model_ids[name], prompt, _stability_ratio(target_w, target_h), label=name)
+
+def monitor_provider_jobs(jobs: list):
+    """Startet die parallele Statusabfrage für eingereichte Jobs (siehe logic.generation_fal.FalJobMonitor)."""
+    return _load("logic.generation_fal", "FalJobMonitor")(jobs)
@@ -0,0 +1,99 @@
+"""
+Bereichs-Korrektur für generierte Banner.
+
+Statt ein ganzes Banner neu zu generieren, wird nur ein Rechteck (z. B. aus st_cropper) mit einem
+maskierten gpt-image-1-Edit neu gemalt. Das Modell sieht ein Fenster mit etwas Umgebung; die Maske
+wird lokal erzeugt, das Ergebnis vektorisiert mit weicher Kante zurück ins Original geblendet.
+Alles außerhalb von Box und Überblendung bleibt pixelgenau erhalten.
+"""
+from typing import Tuple
+
+import numpy as np
+from PIL import Image
+
+GPT_IMAGE_1_EDIT_SIZES = {"1024x1024": (1024, 1024), "1536x1024": (1536, 1024), "1024x1536": (1024, 1536)}
+CONTEXT_PX = 192   # Umgebung, die das Modell um die Box herum mindestens sieht (in Bildpixeln)
+CONTEXT_RATIO = 0.5  # ... bzw. dieser Anteil der Boxgröße, falls größer
+FEATHER_PX = 24    # Breite der Überblendung an der Boxkante
+MIN_BOX_PX = 8
+
+Box = Tuple[int, int, int, int]  # left, top, right, bottom
+
+def normalize_box(box: dict, image_size: Tuple[int, int]) -> Box:
+    """Wandelt eine st_cropper-Box (left, top, width, height) in begrenzte Bildkoordinaten um."""
+    width, height = image_size
+    left = max(0, min(int(round(box["left"])), width - 1))
+    top = max(0, min(int(round(box["top"])), height - 1))
+    right = max(left + 1, min(int(round(box["left"] + box["width"])), width))
+    bottom = max(top + 1, min(int(round(box["top"] + box["height"])), height))
+    if right - left < MIN_BOX_PX or bottom - top < MIN_BOX_PX:
+        raise ValueError(f"Der gewählte Bereich ist zu klein (mindestens {MIN_BOX_PX}×{MIN_BOX_PX} px).")
+    return left, top, right, bottom
+
+def _context_window(box: Box, image_size: Tuple[int, int]) -> Box:
+    left, top, right, bottom = box
+    width, height = image_size
+    pad_x = max(CONTEXT_PX, round((right - left) * CONTEXT_RATIO))
+    pad_y = max(CONTEXT_PX, round((bottom - top) * CONTEXT_RATIO))
+    return max(0, left - pad_x), max(0, top - pad_y), min(width, right + pad_x), min(height, bottom + pad_y)
+
+def _best_edit_size(window_w: int, window_h: int) -> str:
+    ratio = window_w / window_h
+    return min(GPT_IMAGE_1_EDIT_SIZES, key=lambda s: abs(GPT_IMAGE_1_EDIT_SIZES[s][0] / GPT_IMAGE_1_EDIT_SIZES[s][1] - ratio))
+
+def _ramp(length: int, lo: int, hi: int, feather: int) -> np.ndarray:
+    """1D-Gewichte: 1 innerhalb [lo, hi), linear auf 0 über `feather` Pixel, zentriert auf der Kante."""
+    positions = np.arange(length, dtype=np.float32) + 0.5
+    half = feather / 2
+    if feather <= 0:
+        return ((positions >= lo) & (positions < hi)).astype(np.float32)
+    rising = np.clip((positions - (lo - half)) / feather, 0.0, 1.0)
+    falling = np.clip(((hi + half) - positions) / feather, 0.0, 1.0)
+    return np.minimum(rising, falling)
+
+def feather_weights(size: Tuple[int, int], box: Box, feather: int = FEATHER_PX) -> np.ndarray:
+    """H×W-Gewichte für die Box (Kanten weich über `feather` Pixel), separabel berechnet."""
+    width, height = size
+    left, top, right, bottom = box
+    feather = min(feather, (right - left) // 2, (bottom - top) // 2)
+    return np.minimum.outer(_ramp(height, top, bottom, feather), _ramp(width, left, right, feather))
+
+def build_edit_mask(size: Tuple[int, int], box: Box, grow_px: int = FEATHER_PX // 2) -> Image.Image:
+    """RGBA-Maske für gpt-image-1: transparent (Alpha 0) = neu malen; leicht größer als die Box für die Überblendung."""
+    width, height = size
+    left, top, right, bottom = box
+    alpha = np.full((height, width), 255, dtype=np.uint8)
+    alpha[max(0, top - grow_px):min(height, bottom + grow_px), max(0, left - grow_px):min(width, right + grow_px)] = 0
+    return Image.fromarray(np.dstack([np.zeros((height, width, 3), dtype=np.uint8), alpha]), "RGBA")
+
+def edit_region(img: Image.Image, box: Box, instruction: str = "", quality: str = "medium",
+                feather: int = FEATHER_PX) -> Image.Image:
+    """
+    Malt den Bereich `box` (left, top, right, bottom) mit einem maskierten gpt-image-1-Edit neu
+    und blendet ihn weich ins Original zurück. Ein kostenpflichtiger Aufruf, unabhängig von der Bildgröße.
+    """
+    from logic.generation_v2 import edit_with_mask_gpt_image_1
+    from logic.prompt_engine_v2 import build_region_edit_prompt
+
+    img = img.convert("RGB")
+    wl, wt, wr, wb = _context_window(box, img.size)
+    window = img.crop((wl, wt, wr, wb))
+    local_box = (box[0] - wl, box[1] - wt, box[2] - wl, box[3] - wt)
+
+    size_str = _best_edit_size(window.width, window.height)
+    edit_w, edit_h = GPT_IMAGE_1_EDIT_SIZES[size_str]
+    scale_x, scale_y = edit_w / window.width, edit_h / window.height
+    edit_box = (round(local_box[0] * scale_x), round(local_box[1] * scale_y),
+                round(local_box[2] * scale_x), round(local_box[3] * scale_y))
+    grow = max(1, round(feather / 2 * max(scale_x, scale_y)))
+    result = edit_with_mask_gpt_image_1(
+        window.resize((edit_w, edit_h), Image.Resampling.LANCZOS), build_edit_mask((edit_w, edit_h), edit_box, grow),
+        build_region_edit_prompt(instruction), size_str, quality,
+    )
+
+    patch = np.asarray(result.resize(window.size, Image.Resampling.LANCZOS), dtype=np.float32)
+    weights = feather_weights(window.size, local_box, feather)[:, :, None]
+    canvas = np.asarray(img, dtype=np.float32).copy()
+    region = canvas[wt:wb, wl:wr]
+    canvas[wt:wb, wl:wr] = region * (1.0 - weights) + patch * weights
+    return Image.fromarray(np.clip(canvas + 0.5, 0, 255).astype(np.uint8), "RGB")
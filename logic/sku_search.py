@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Optional, Sequence
+
+import numpy as np
+
+DEFAULT_TOP_K = 10
+MIN_FUZZY_SCORE = 0.2
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class SkuSearchIndex:
+    """
+    Suchindex über SKUs und (optional) Produktnamen.
+    Präfixsuche über sortierte Arrays (np.searchsorted), unscharfe Suche über einen Trigramm-Index
+    mit Jaccard-Bewertung (np.bincount über die Trefferlisten).
+    """
+
+    def __init__(self, skus: Sequence[str], names: Optional[Sequence[Optional[str]]] = None):
+        self.skus = np.asarray([str(s) for s in skus], dtype=object)
+        self.names = np.asarray([str(n) if n is not None else "" for n in (names if names is not None else [""] * len(skus))], dtype=object)
+        sku_keys = np.asarray([s.lower() for s in self.skus], dtype=str)
+        name_keys = np.asarray([n.lower() for n in self.names], dtype=str)
+
+        # Präfixsuche: sortierte Schlüssel + zugehörige Zeilennummern
+        self._sku_order = np.argsort(sku_keys, kind="stable")
+        self._sorted_skus = sku_keys[self._sku_order]
+        self._name_order = np.argsort(name_keys, kind="stable")
+        self._sorted_names = name_keys[self._name_order]
+        self._exact = {key: row for row, key in reversed(list(enumerate(sku_keys)))}
+
+        # Trigramm-Index über "sku name"
+        postings: dict[str, list[int]] = defaultdict(list)
+        trigram_counts = np.zeros(len(sku_keys), dtype=np.int32)
+        for row, (sku_key, name_key) in enumerate(zip(sku_keys, name_keys)):
+            grams = _trigrams(f"{sku_key} {name_key}".strip())
+            trigram_counts[row] = len(grams)
+            for gram in grams:
+                postings[gram].append(row)
+        self._postings = {gram: np.asarray(rows, dtype=np.int32) for gram, rows in postings.items()}
+        self._trigram_counts = trigram_counts
+
+    def __len__(self) -> int:
+        return len(self.skus)
+
+    def row_of(self, sku: str) -> Optional[int]:
+        """Zeilennummer einer SKU (exakt, Groß-/Kleinschreibung egal) oder None."""
+        return self._exact.get(sku.strip().lower())
+
+    @staticmethod
+    def _prefix_rows(sorted_keys: np.ndarray, order: np.ndarray, prefix: str, limit: int) -> np.ndarray:
+        start = np.searchsorted(sorted_keys, prefix, side="left")
+        end = np.searchsorted(sorted_keys, prefix + "\uffff", side="left")
+        return order[start:min(end, start + limit)]
+
+    def search(self, query: str, k: int = DEFAULT_TOP_K) -> list[dict]:
+        """Top-k Treffer: exakte SKU, dann SKU-/Namens-Präfixe, dann unscharfe Trigramm-Treffer."""
+        q = query.strip().lower()
+        if not q:
+            return []
+        ranked: dict[int, float] = {}
+
+        exact_row = self._exact.get(q)
+        if exact_row is not None:
+            ranked[exact_row] = 3.0
+        for row in self._prefix_rows(self._sorted_skus, self._sku_order, q, k):
+            ranked.setdefault(int(row), 2.0)
+        for row in self._prefix_rows(self._sorted_names, self._name_order, q, k):
+            ranked.setdefault(int(row), 1.5)
+
+        if len(ranked) < k and len(self):
+            query_grams = _trigrams(q)
+            hits = [self._postings[g] for g in query_grams if g in self._postings]
+            if hits:
+                counts = np.bincount(np.concatenate(hits), minlength=len(self))
+                candidates = np.flatnonzero(counts)
+                union = len(query_grams) + self._trigram_counts[candidates] - counts[candidates]
+                scores = counts[candidates] / np.maximum(union, 1)
+                top = min(k, scores.size)
+                best = np.argpartition(-scores, top - 1)[:top]
+                for i in best[np.argsort(-scores[best])]:
+                    if scores[i] >= MIN_FUZZY_SCORE:
+                        ranked.setdefault(int(candidates[i]), float(scores[i]))
+
+        rows = sorted(ranked.items(), key=lambda kv: -kv[1])[:k]
+        return [{"row": row, "sku": self.skus[row], "name": self.names[row], "score": round(score, 3)} for row, score in rows]
+
+# Referenz auf den DataFrame halten, damit ein Identitätsvergleich sicher ist
+_index_cache: dict = {"df": None, "index": None}
+_index_lock = threading.Lock()
+
+def get_search_index(df) -> SkuSearchIndex:
+    """
+    Baut den Index einmal pro Katalog-DataFrame (der Katalog ist pro Prozess geteilt, siehe logic/catalogue.py).
+    Ändert sich die CSV, liefert der Katalog ein neues Objekt und der Index wird neu aufgebaut.
+    """
+    if _index_cache["df"] is df:
+        return _index_cache["index"]
+    with _index_lock:
+        if _index_cache["df"] is not df:
+            names = df["name"].to_numpy(dtype=object, na_value=None) if "name" in df.columns else None
+            index = SkuSearchIndex(df["sku"].to_numpy(dtype=object, na_value=""), names)
+            _index_cache.update(df=df, index=index)
+        return _index_cache["index"]
+
+def timed_search(index: SkuSearchIndex, query: str, k: int = DEFAULT_TOP_K) -> tuple[list[dict], float]:
+    """Suche inkl. Laufzeit in Millisekunden (für die Anzeige)."""
+    start = time.perf_counter()
+    results = index.search(query, k)
+    return results, (time.perf_counter() - start) * 1000
@@ -0,0 +1,179 @@
+"""
+Lokales Einsetzen von Banner-Text mit PIL.
+
+Das Artwork wird einmal ohne Text generiert; Wortlaut, Sprache und Position werden danach
+in Millisekunden lokal gerendert (automatische Schriftgröße, Positions-Presets und eine
+Schriftfarbe, die anhand des Bildausschnitts unter dem Text gewählt wird).
+
+Eigene Schriften (TTF/OTF) gehören nach assets/fonts/.
+"""
+import glob
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont, ImageStat
+
+from utils import PROJECT_ROOT
+
+FONT_DIR = os.path.join(PROJECT_ROOT, "assets", "fonts")
+SYSTEM_FONT_DIRS = ["/usr/share/fonts", "/Library/Fonts", "/System/Library/Fonts", "C:\\Windows\\Fonts"]
+FALLBACK_FONT_NAME = "Standard (PIL)"
+# Position -> (horizontale Ausrichtung, vertikale Ausrichtung); gleiche Bezeichnungen wie in der Prompt-Variante
+TEXT_POSITIONS: dict[str, Tuple[str, str]] = {
+    "zentral": ("center", "center"),
+    "oben": ("center", "top"),
+    "unten": ("center", "bottom"),
+    "links": ("left", "center"),
+    "rechts": ("right", "center"),
+}
+# Anteil der Bildfläche, den der Textblock maximal einnehmen darf (Breite, Höhe)
+TEXT_BOX_FRACTION = {"center": (0.8, 0.5), "side": (0.42, 0.8)}
+MARGIN_FRACTION = 0.06
+LINE_SPACING = 1.15
+MIN_FONT_PX = 10
+LIGHT_TEXT = (255, 255, 255)
+DARK_TEXT = (26, 26, 26)
+# Ab dieser Helligkeits-Streuung im Textbereich wird eine Kontur gezeichnet
+BUSY_BACKGROUND_STDDEV = 48
+
+@dataclass
+class TextLayout:
+    lines: list[str]
+    font_px: int
+    box: Tuple[int, int, int, int]  # (links, oben, rechts, unten) des Textblocks
+    align: str
+
+# === Schriften ===
+@lru_cache(maxsize=1)
+def available_fonts() -> dict[str, Optional[str]]:
+    """Anzeigename -> Pfad. Projekt-Schriften zuerst, dann einige Systemschriften, zuletzt die PIL-Standardschrift."""
+    fonts: dict[str, Optional[str]] = {}
+    for path in sorted(glob.glob(os.path.join(FONT_DIR, "*.[ot]tf"))):
+        fonts[os.path.splitext(os.path.basename(path))[0]] = path
+    for directory in SYSTEM_FONT_DIRS:
+        for pattern in ("DejaVuSans*.ttf", "Arial*.ttf", "Helvetica*.tt[fc]", "LiberationSans*.ttf"):
+            for path in sorted(glob.glob(os.path.join(directory, "**", pattern), recursive=True)):
+                fonts.setdefault(os.path.splitext(os.path.basename(path))[0], path)
+    fonts[FALLBACK_FONT_NAME] = None
+    return fonts
+
+@lru_cache(maxsize=64)
+def _load_font(font_path: Optional[str], size: int) -> ImageFont.FreeTypeFont:
+    if font_path:
+        return ImageFont.truetype(font_path, size)
+    return ImageFont.load_default(size)
+
+# === Layout ===
+def _wrap(draw: ImageDraw.ImageDraw, text: str, font, max_width: int) -> list[str]:
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        current = ""
+        for word in paragraph.split():
+            candidate = f"{current} {word}".strip()
+            if not current or draw.textlength(candidate, font=font) <= max_width:
+                current = candidate
+            else:
+                lines.append(current)
+                current = word
+        lines.append(current)
+    return lines
+
+def _block_size(draw: ImageDraw.ImageDraw, lines: list[str], font, font_px: int) -> Tuple[int, int]:
+    width = max((draw.textlength(line, font=font) for line in lines), default=0)
+    height = font_px * (1 + LINE_SPACING * (len(lines) - 1))
+    return int(width), int(height)
+
+def fit_text(text: str, box_size: Tuple[int, int], font_path: Optional[str] = None,
+             max_font_px: Optional[int] = None) -> Tuple[list[str], int]:
+    """Größte Schriftgröße (binäre Suche), bei der der umbrochene Text in box_size passt."""
+    box_w, box_h = box_size
+    draw = ImageDraw.Draw(Image.new("L", (1, 1)))
+    lo, hi = MIN_FONT_PX, max(MIN_FONT_PX, max_font_px or box_h)
+    best = (_wrap(draw, text, _load_font(font_path, lo), box_w), lo)
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        font = _load_font(font_path, mid)
+        lines = _wrap(draw, text, font, box_w)
+        w, h = _block_size(draw, lines, font, mid)
+        if w <= box_w and h <= box_h:
+            best, lo = (lines, mid), mid + 1
+        else:
+            hi = mid - 1
+    return best
+
+def layout_text(img_size: Tuple[int, int], text: str, position: str = "zentral", font_path: Optional[str] = None,
+                max_font_px: Optional[int] = None) -> TextLayout:
+    width, height = img_size
+    h_align, v_align = TEXT_POSITIONS.get(position, TEXT_POSITIONS["zentral"])
+    margin = int(min(width, height) * MARGIN_FRACTION)
+    frac_w, frac_h = TEXT_BOX_FRACTION["side" if h_align != "center" else "center"]
+    box_w, box_h = int((width - 2 * margin) * frac_w), int((height - 2 * margin) * frac_h)
+    lines, font_px = fit_text(text, (box_w, box_h), font_path, max_font_px)
+
+    draw = ImageDraw.Draw(Image.new("L", (1, 1)))
+    block_w, block_h = _block_size(draw, lines, _load_font(font_path, font_px), font_px)
+    left = {"left": margin, "center": (width - block_w) // 2, "right": width - margin - block_w}[h_align]
+    top = {"top": margin, "center": (height - block_h) // 2, "bottom": height - margin - block_h}[v_align]
+    return TextLayout(lines, font_px, (left, top, left + block_w, top + block_h), h_align)
+
+# === Farbe ===
+def _relative_luminance(rgb: Tuple[float, float, float]) -> float:
+    def channel(c: float) -> float:
+        c /= 255.0
+        return c / 12.92 if c <= 0.03928 else ((c + 0.055) / 1.055) ** 2.4
+    r, g, b = (channel(c) for c in rgb)
+    return 0.2126 * r + 0.7152 * g + 0.0722 * b
+
+def _contrast_ratio(l1: float, l2: float) -> float:
+    light, dark = max(l1, l2), min(l1, l2)
+    return (light + 0.05) / (dark + 0.05)
+
+def pick_text_colour(img: Image.Image, box: Tuple[int, int, int, int]) -> Tuple[Tuple[int, int, int], Optional[Tuple[int, int, int]]]:
+    """
+    Wählt Hell oder Dunkel nach dem höheren Kontrastverhältnis (WCAG) zur mittleren Farbe unter dem Text.
+    Ist der Hintergrund unruhig, wird zusätzlich eine Konturfarbe geliefert (sonst None).
+    """
+    region = img.convert("RGB").crop(box)
+    region.thumbnail((128, 128))  # Statistik auf einer Verkleinerung reicht und ist schnell
+    stat = ImageStat.Stat(region)
+    background = _relative_luminance(tuple(stat.mean))
+    light_ratio = _contrast_ratio(_relative_luminance(LIGHT_TEXT), background)
+    dark_ratio = _contrast_ratio(_relative_luminance(DARK_TEXT), background)
+    colour, other = (LIGHT_TEXT, DARK_TEXT) if light_ratio >= dark_ratio else (DARK_TEXT, LIGHT_TEXT)
+    busy = ImageStat.Stat(region.convert("L")).stddev[0] > BUSY_BACKGROUND_STDDEV
+    return colour, (other if busy else None)
+
+def hex_to_rgb(value: str) -> Tuple[int, int, int]:
+    value = value.lstrip("#")
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+# === Rendern ===
+def render_text(img: Image.Image, text: str, position: str = "zentral", font_name: Optional[str] = None,
+                max_font_px: Optional[int] = None, colour: Optional[Tuple[int, int, int]] = None) -> Image.Image:
+    """Gibt eine Kopie von img mit eingesetztem Text zurück (colour=None: automatisch nach Kontrast)."""
+    text = text.strip()
+    if not text:
+        return img
+    font_path = available_fonts().get(font_name) if font_name else next(iter(available_fonts().values()))
+    layout = layout_text(img.size, text, position, font_path, max_font_px)
+    stroke = None
+    if colour is None:
+        colour, stroke = pick_text_colour(img, layout.box)
+
+    result = img.convert("RGB").copy()
+    draw = ImageDraw.Draw(result)
+    font = _load_font(font_path, layout.font_px)
+    stroke_width = max(1, layout.font_px // 18) if stroke else 0
+    left, top, right, _ = layout.box
+    for i, line in enumerate(layout.lines):
+        line_w = draw.textlength(line, font=font)
+        x = {"left": left, "center": left + (right - left - line_w) / 2, "right": right - line_w}[layout.align]
+        y = top + i * layout.font_px * LINE_SPACING
+        draw.text((x, y), line, font=font, fill=colour, stroke_width=stroke_width, stroke_fill=stroke)
+    return result
+
+def render_text_variants(img: Image.Image, texts: list[str], **kwargs) -> list[Tuple[str, Image.Image]]:
+    """Rendert beliebig viele Text-/Sprachvarianten aus einem generierten Bild."""
+    return [(text, render_text(img, text, **kwargs)) for text in texts if text.strip()]
@@ -0,0 +1,111 @@
+"""
+Transportformate und Dekodierung der Bildantworten aller Provider.
+
+gpt-image-1 liefert standardmäßig PNG als base64 – für Banner, die ohnehin als JPEG/WebP exportiert
+werden, ist das ein Vielfaches der nötigen Bytes. Hier wird pro Provider das kompakteste unterstützte
+Format angefragt (gpt-image-1: output_format/output_compression, Fal: sync_mode statt CDN-Download,
+Stability: WebP) und die Antwort ohne Umwege direkt im Zielmodus dekodiert.
+Bytes und Dekodier- bzw. Download-Zeit pro Antwort landen in logic.instrumentation (Übersicht auf dem Hub)
+und stehen zusätzlich im Bild selbst unter img.info["transport"] (z. B. für logic.benchmark).
+"""
+import binascii
+import time
+from io import BytesIO
+from typing import Iterable, Optional
+
+from PIL import Image, ImageFile
+
+# gpt-image-1: "png" | "jpeg" | "webp"; Kompression 0–100 gilt nur für jpeg/webp
+GPT_IMAGE_OUTPUT_FORMAT = "jpeg"
+GPT_IMAGE_OUTPUT_COMPRESSION = 92
+GPT_IMAGE_OUTPUT_FORMATS = ("png", "jpeg", "webp")
+# Fal: Ergebnis als data-URI in der Antwort statt als CDN-URL (spart den zweiten Request)
+FAL_SYNC_MODE = True
+FAL_OUTPUT_FORMAT = "jpeg"
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_TIMEOUT = 45
+
+# === Anfrage-Parameter ===
+def gpt_image_output_args(output_format: Optional[str] = None, compression: Optional[int] = None) -> dict:
+    """Zusätzliche Argumente für images.generate/images.edit mit gpt-image-1."""
+    output_format = output_format or GPT_IMAGE_OUTPUT_FORMAT
+    if output_format not in GPT_IMAGE_OUTPUT_FORMATS:
+        raise ValueError(f"Ungültiges Ausgabeformat: {output_format}. Erlaubt: {', '.join(GPT_IMAGE_OUTPUT_FORMATS)}.")
+    args = {"output_format": output_format}
+    if output_format != "png":
+        args["output_compression"] = GPT_IMAGE_OUTPUT_COMPRESSION if compression is None else compression
+    return args
+
+def fal_output_args(supports_output_format: bool = True) -> dict:
+    args = {"sync_mode": FAL_SYNC_MODE}
+    if supports_output_format:
+        args["output_format"] = FAL_OUTPUT_FORMAT
+    return args
+
+# === Dekodierung ===
+def _finish(img: Image.Image, mode: str) -> Image.Image:
+    """Dekodiert einmal und konvertiert nur, wenn der Modus abweicht (convert legt sonst eine unnötige Kopie an)."""
+    if img.format == "JPEG" and mode in ("RGB", "L"):
+        img.draft(mode, img.size)  # JPEG-Decoder liefert direkt den Zielmodus
+    img.load()
+    return img if img.mode == mode else img.convert(mode)
+
+def _record(img: Image.Image, source: str, fmt: Optional[str], payload_bytes: int, started: float) -> Image.Image:
+    from logic.instrumentation import record_image_transfer
+
+    finished = time.perf_counter()
+    record_image_transfer(source, fmt, payload_bytes, finished - started)
+    # started/finished als perf_counter-Werte: Beginn der Übertragung bzw. Dekodierung und fertiges Bild
+    img.info["transport"] = {"source": source, "format": fmt, "bytes": payload_bytes, "started": started, "finished": finished}
+    return img
+
+def decode_image_bytes(data: bytes, mode: str = "RGB", source: str = "image") -> Image.Image:
+    started = time.perf_counter()
+    img = Image.open(BytesIO(data))
+    fmt = img.format
+    return _record(_finish(img, mode), source, fmt, len(data), started)
+
+def decode_b64_image(b64_data: str, mode: str = "RGB", source: str = "image") -> Image.Image:
+    """base64 (z. B. b64_json von OpenAI) -> PIL Image im Zielmodus; gemessen wird die Größe der base64-Nutzlast."""
+    started = time.perf_counter()
+    raw = binascii.a2b_base64(b64_data)
+    img = Image.open(BytesIO(raw))
+    fmt = img.format
+    return _record(_finish(img, mode), source, fmt, len(b64_data), started)
+
+def decode_b64_images(items: Iterable, mode: str = "RGB", source: str = "image") -> list[Image.Image]:
+    """Alle b64_json-Einträge einer OpenAI-Bildantwort (response.data)."""
+    return [decode_b64_image(item.b64_json, mode, source) for item in items if item.b64_json]
+
+def decode_data_uri(uri: str, mode: str = "RGB", source: str = "image") -> Image.Image:
+    """data:image/...;base64,... -> PIL Image (z. B. Fal im sync_mode)."""
+    header, _, payload = uri.partition(",")
+    if not header.startswith("data:") or ";base64" not in header:
+        raise ValueError("Keine base64-data-URI.")
+    return decode_b64_image(payload, mode, source)
+
+def decode_stream(chunks: Iterable[bytes], mode: str = "RGB", source: str = "image") -> Image.Image:
+    """Dekodiert ein Bild blockweise, während es noch übertragen wird (kein Puffern der ganzen Antwort)."""
+    started = time.perf_counter()
+    parser, received = ImageFile.Parser(), 0
+    for chunk in chunks:
+        received += len(chunk)
+        parser.feed(chunk)
+    img = parser.close()
+    fmt = img.format
+    return _record(_finish(img, mode), source, fmt, received, started)
+
+def download_image(url: str, mode: str = "RGB", source: str = "image", session=None) -> Image.Image:
+    """Lädt ein Bild in Blöcken und dekodiert es bereits während des Downloads."""
+    if session is None:
+        from logic.clients import get_http_session
+        session = get_http_session()
+    with session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        return decode_stream(response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE), mode, source)
+
+def load_image_reference(ref: str, mode: str = "RGB", source: str = "image") -> Image.Image:
+    """Provider-Ergebnis als data-URI (inline) oder URL (zweiter Download)."""
+    if ref.startswith("data:"):
+        return decode_data_uri(ref, mode, source)
+    return download_image(ref, mode, source)
@@ -0,0 +1,170 @@
+"""
+Lokale Super-Resolution (ESRGAN-Klasse) über onnxruntime, nur CPU.
+
+Die ONNX-Modelle werden nicht mitgeliefert. Sie gehören nach models/ im Projekt-Root
+(oder in das Verzeichnis aus der Umgebungsvariable UPSCALE_MODEL_DIR), z. B. ein
+Real-ESRGAN-Export mit Eingabe NCHW float32 RGB im Bereich 0–1.
+"""
+import hashlib
+import importlib.util
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from utils import PROJECT_ROOT
+
+# onnxruntime wird erst bei der ersten Inferenz importiert (schwerer Import, siehe logic/instrumentation.py)
+ONNXRUNTIME_AVAILABLE = importlib.util.find_spec("onnxruntime") is not None
+
+UPSCALE_MODEL_DIR = os.environ.get("UPSCALE_MODEL_DIR", os.path.join(PROJECT_ROOT, "models"))
+# Anzeigename -> Dateiname und Vergrößerungsfaktor
+UPSCALE_MODELS: dict[str, dict] = {
+    "Real-ESRGAN x2": {"file": "RealESRGAN_x2plus.onnx", "scale": 2},
+    "Real-ESRGAN x4": {"file": "RealESRGAN_x4plus.onnx", "scale": 4},
+    "Real-ESRGAN x4 (Anime/Grafik, klein)": {"file": "RealESRGAN_x4plus_anime_6B.onnx", "scale": 4},
+}
+DEFAULT_TILE_SIZE = 256
+DEFAULT_TILE_OVERLAP = 16
+DEFAULT_TILE_WORKERS = 2
+# Erst ab diesem Vergrößerungsfaktor lohnt sich die Super-Resolution gegenüber LANCZOS
+MIN_UPSCALE_FACTOR = 1.15
+RESULT_CACHE_SIZE = 4
+
+_session_lock = threading.Lock()
+_sessions: dict[tuple, object] = {}
+_result_cache: "OrderedDict[tuple, Image.Image]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+# === Modelle & Sessions ===
+def _model_path(model_name: str) -> str:
+    return os.path.join(UPSCALE_MODEL_DIR, UPSCALE_MODELS[model_name]["file"])
+
+def available_upscale_models() -> list[str]:
+    """Modelle, deren ONNX-Datei vorhanden ist (leer, wenn onnxruntime fehlt)."""
+    if not ONNXRUNTIME_AVAILABLE:
+        return []
+    return [name for name in UPSCALE_MODELS if os.path.exists(_model_path(name))]
+
+def upscaler_available() -> bool:
+    return bool(available_upscale_models())
+
+def _get_session(model_name: str, workers: int):
+    """Eine Session pro Modell; die Kerne werden auf die parallel laufenden Kacheln verteilt."""
+    import onnxruntime as ort
+
+    intra_threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+    cache_key = (model_name, intra_threads)
+    with _session_lock:
+        session = _sessions.get(cache_key)
+        if session is None:
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = intra_threads
+            options.inter_op_num_threads = 1
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = ort.InferenceSession(_model_path(model_name), options, providers=["CPUExecutionProvider"])
+            _sessions[cache_key] = session
+        return session
+
+def pick_model_for_factor(factor: float) -> Optional[str]:
+    """Kleinstes verfügbares Modell, dessen Faktor den benötigten erreicht (sonst das größte)."""
+    models = sorted(available_upscale_models(), key=lambda name: UPSCALE_MODELS[name]["scale"])
+    if not models:
+        return None
+    return next((name for name in models if UPSCALE_MODELS[name]["scale"] >= factor), models[-1])
+
+# === Gekachelte Inferenz ===
+def _tile_origins(length: int, tile: int) -> list[int]:
+    if length <= tile:
+        return [0]
+    origins = list(range(0, length - tile, tile))
+    origins.append(length - tile)
+    return origins
+
+def _run_tile(session, padded: np.ndarray, y: int, x: int, tile_h: int, tile_w: int,
+              overlap: int) -> np.ndarray:
+    # padded ist um overlap gespiegelt erweitert: Kachel inkl. Rand ausschneiden
+    patch = padded[y:y + tile_h + 2 * overlap, x:x + tile_w + 2 * overlap]
+    batch = np.ascontiguousarray(patch.transpose(2, 0, 1)[None], dtype=np.float32)
+    input_name = session.get_inputs()[0].name
+    return session.run(None, {input_name: batch})[0][0]
+
+def upscale_image(img: Image.Image, model_name: Optional[str] = None, tile: int = DEFAULT_TILE_SIZE,
+                  overlap: int = DEFAULT_TILE_OVERLAP, workers: int = DEFAULT_TILE_WORKERS) -> Image.Image:
+    """
+    Vergrößert ein Bild mit dem gewählten Modell. Das Bild wird in Kacheln mit Überlappung zerlegt,
+    damit der Speicherbedarf begrenzt bleibt; von jeder Kachel wird nur der innere Teil übernommen,
+    so entstehen keine Nähte. Ein Alphakanal wird per LANCZOS mitskaliert.
+    """
+    if not ONNXRUNTIME_AVAILABLE:
+        raise RuntimeError("onnxruntime ist nicht installiert.")
+    model_name = model_name or pick_model_for_factor(2)
+    if not model_name or not os.path.exists(_model_path(model_name)):
+        raise FileNotFoundError(f"Kein Upscaling-Modell gefunden in {UPSCALE_MODEL_DIR}.")
+    scale = UPSCALE_MODELS[model_name]["scale"]
+    session = _get_session(model_name, workers)
+
+    rgb = np.asarray(img.convert("RGB"), dtype=np.float32) / 255.0
+    height, width = rgb.shape[:2]
+    overlap = max(0, min(overlap, height - 1, width - 1))  # Spiegeln braucht einen Rand kleiner als das Bild
+    padded = np.pad(rgb, ((overlap, overlap), (overlap, overlap), (0, 0)), mode="reflect")
+    output = np.zeros((height * scale, width * scale, 3), dtype=np.float32)
+
+    jobs = []
+    for y in _tile_origins(height, tile):
+        for x in _tile_origins(width, tile):
+            jobs.append((y, x, min(tile, height), min(tile, width)))
+
+    def process(job: Tuple[int, int, int, int]) -> None:
+        y, x, tile_h, tile_w = job
+        result = _run_tile(session, padded, y, x, tile_h, tile_w, overlap)
+        inner = result[:, overlap * scale:(overlap + tile_h) * scale, overlap * scale:(overlap + tile_w) * scale]
+        output[y * scale:(y + tile_h) * scale, x * scale:(x + tile_w) * scale] = inner.transpose(1, 2, 0)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        list(executor.map(process, jobs))
+
+    upscaled = Image.fromarray((np.clip(output, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8), "RGB")
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        alpha = img.convert("RGBA").getchannel("A").resize(upscaled.size, Image.Resampling.LANCZOS)
+        upscaled.putalpha(alpha)
+    return upscaled
+
+# === Einstieg für die Seiten ===
+def _cache_key(img: Image.Image, model_name: str) -> tuple:
+    digest = hashlib.blake2b(img.tobytes(), digest_size=16).hexdigest()
+    return (digest, img.size, img.mode, model_name)
+
+def super_resolution_applies(source_size: Tuple[int, int], target_size: Tuple[int, int]) -> bool:
+    """Würde resize_to_target Super-Resolution einsetzen (Ziel deutlich größer, Modell vorhanden)?"""
+    factor = max(target_size[0] / max(source_size[0], 1), target_size[1] / max(source_size[1], 1))
+    return factor >= MIN_UPSCALE_FACTOR and pick_model_for_factor(factor) is not None
+
+def resize_to_target(img: Image.Image, target_size: Tuple[int, int], use_super_resolution: bool = True) -> Image.Image:
+    """
+    Finale Skalierung auf die Zielgröße. Ist die Zielgröße größer als die Quelle, wird vorher
+    (falls ein Modell vorhanden ist) per Super-Resolution vergrößert und danach per LANCZOS
+    exakt auf das Ziel verkleinert. Ergebnisse werden für wiederholte Reruns zwischengespeichert.
+    """
+    target_w, target_h = target_size
+    factor = max(target_w / max(img.width, 1), target_h / max(img.height, 1))
+    if use_super_resolution and factor >= MIN_UPSCALE_FACTOR:
+        model_name = pick_model_for_factor(factor)
+        if model_name:
+            cache_key = _cache_key(img, model_name)
+            with _cache_lock:
+                upscaled = _result_cache.get(cache_key)
+                if upscaled is not None:
+                    _result_cache.move_to_end(cache_key)
+            if upscaled is None:
+                upscaled = upscale_image(img, model_name)
+                with _cache_lock:
+                    _result_cache[cache_key] = upscaled
+                    while len(_result_cache) > RESULT_CACHE_SIZE:
+                        _result_cache.popitem(last=False)
+            img = upscaled
+    return img.resize((target_w, target_h), Image.Resampling.LANCZOS)
@@ -1,9 +1,10 @@
+import hashlib
+import time
+_PAGE_IMPORT_START = time.perf_counter()
 import streamlit as st
-from PIL import Image, ImageOps
-from io import BytesIO
 import os
-import pandas as pd
-import requests
+import zipfile
+from io import BytesIO
 from dotenv import load_dotenv
 import sys
 
@@ -14,25 +15,27 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 # -------------------------------------------------------------------- Imports
-from utils import load_css, load_sku_data, SKU_CSV_FILENAME
-from logic.prompt_engine_v2 import (
-    build_gpt_image_1_banner_prompt,
-    build_gpt_image_1_banner_with_text_prompt,
-)
-from logic.generation_v2 import generate_banner_with_gpt_image_1, get_best_dalle_size
+from utils import get_secret, load_css, load_sku_data, SKU_CSV_FILENAME
+from logic.instrumentation import record_page_startup
+from logic.pipeline import DRAFT_QUALITY, FINAL_QUALITY, MAX_DRAFTS, export_image, finalize_draft, generate_drafts, run_flow
+from logic.banner_page import crop_banner, download_banner, handle_sku_lookup, handle_upload, update_target_size
+from logic.outpaint import OUTPAINT_ENGINES, estimate_outpaint_calls, needs_outpainting
+from logic.history import latest_result_for_skus, load_image, record_result
+from logic.phash import register_and_find_duplicates
+from logic.region_edit import edit_region, normalize_box
+from logic.text_overlay import TEXT_POSITIONS, available_fonts, hex_to_rgb, render_text
 
 # ---------------------------------------------------------------- Streamlit
+record_page_startup("Banner Generator (Direct)", time.perf_counter() - _PAGE_IMPORT_START)
 st.set_page_config(page_title="Banner Generator", page_icon="🚀", layout="wide")
 load_css()
 
 # ---------------------------------------------------------------- OpenAI-Key
 load_dotenv(os.path.join(project_root, ".env"))
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
+# Der OpenAI-Client wird in logic/clients.py einmal pro Prozess erzeugt und liest den Key über get_secret
+if not get_secret("OPENAI_API_KEY"):
     st.error("OpenAI API-Key fehlt. Bitte in `.env` setzen.")
     st.stop()
-import openai
-openai.api_key = OPENAI_API_KEY
 
 # -------------------------------------------------------- optionale Abhängigkeit
 try:
@@ -43,10 +46,21 @@ except ImportError:
 
 # ---------------------------------------------------------------- Konstanten
 OUTPUT_IMAGE_FORMAT = "JPEG"
-OUTPUT_IMAGE_QUALITY_DOWNLOAD = 95
 OUTPUT_IMAGE_EXTENSION = OUTPUT_IMAGE_FORMAT.lower()
-OUTPUT_IMAGE_MIME = f"image/{OUTPUT_IMAGE_EXTENSION}"
 GPT_IMAGE_1_GENERATION_QUALITY_DEFAULT = "medium"
+# KI-Engine -> Stability-Stufe (None = GPT-Image-1)
+BANNER_ENGINES = {
+    "GPT-Image-1": None,
+    "Stability SD3 (Bild-zu-Bild)": "sd3",
+    "Stability Ultra (Bild-zu-Bild)": "ultra",
+}
+DEFAULT_BANNER_ENGINE = "GPT-Image-1"
+OUTPAINT_BASE_SIZE = (1536, 1024)  # Native Querformat-Größe von gpt-image-1
+STABILITY_STRENGTH_DEFAULT = 0.6
+# Geschätzte Kosten pro Aufruf (für den Verlauf)
+GPT_IMAGE_1_PRICING_CHF = {"low": 0.01, "medium": 0.015, "high": 0.03, "auto": 0.015}
+STABILITY_PRICING_CHF = {"ultra": 0.08, "sd3": 0.065}
+STABILITY_OUTPAINT_COST_CHF = 0.04  # Pro Seite ein Aufruf
 
 RATIO_OPTIONS_MAP = {
     "Wide Banner (4.54:1)": (3000, 660),
@@ -59,20 +73,32 @@ DEFAULT_RATIO_KEY = "Wide Banner (4.54:1)"
 CUSTOM_DEFAULT_WIDTH = 3840
 CUSTOM_DEFAULT_HEIGHT = 2160
 PREVIEW_IMAGE_WIDTH = 220
-CROPPER_ASPECT_DEFINITION_MAX_WIDTH = 700
+# Lokal: Artwork einmal ohne Text generieren, Text per PIL einsetzen; KI: Text im Prompt (jede Änderung = neue Generierung)
+TEXT_MODES = ["Lokal einsetzen (sofort, ohne Neugenerierung)", "Von der KI einbauen lassen"]
+TEXT_COLOUR_AUTO = "Automatisch (Kontrast)"
+DRAFT_COUNT_DEFAULT = 2
+DRAFT_PREVIEW_WIDTH = 260
 
 # ------------------------------------------------------- Session-State & Callbacks
+PREFIX = "banner_gen_"  # Präfix für die gemeinsamen Bausteine in logic.banner_page
+
 def initialize_session_state() -> None:
     defaults = {
         "banner_gen_image_input": None, "banner_gen_image_input_name": None, "banner_gen_img_from": None,
-        "uploader_instance_key": 0,
+        "banner_gen_uploader_instance_key": 0,
         "banner_gen_ratio_choice": DEFAULT_RATIO_KEY,
         "banner_gen_custom_width": CUSTOM_DEFAULT_WIDTH, "banner_gen_custom_height": CUSTOM_DEFAULT_HEIGHT,
         "banner_gen_quality_choice": GPT_IMAGE_1_GENERATION_QUALITY_DEFAULT,
+        "banner_gen_engine_choice": DEFAULT_BANNER_ENGINE, "banner_gen_stability_strength": STABILITY_STRENGTH_DEFAULT,
+        "banner_gen_outpaint": False, "banner_gen_outpaint_engine": next(iter(OUTPAINT_ENGINES)),
         "banner_gen_include_text": False, "banner_gen_user_text": "", "banner_gen_text_position": "zentral",
+        "banner_gen_text_mode": TEXT_MODES[0], "banner_gen_text_font": next(iter(available_fonts())),
+        "banner_gen_text_colour_mode": TEXT_COLOUR_AUTO, "banner_gen_text_colour": "#FFFFFF", "banner_gen_text_variants": "", "banner_gen_text_variants_zip": None,
         "banner_gen_instruction_prompt_for_gpt_image_1": None, "banner_gen_ai_banner_img": None,
         "banner_gen_status_message": "", "banner_gen_is_generating": False,
-        "temp_sku_input": "", "banner_gen_current_sku_data": None
+        "banner_gen_temp_sku_input": "", "banner_gen_current_sku_data": None, "banner_gen_duplicate_hint": None,
+        "banner_gen_draft_mode": False, "banner_gen_draft_count": DRAFT_COUNT_DEFAULT, "banner_gen_drafts": None,
+        "banner_gen_region_instruction": "", "banner_gen_region_undo": None,
     }
     for k, v in defaults.items():
         st.session_state.setdefault(k, v)
@@ -80,26 +106,28 @@ def initialize_session_state() -> None:
     _update_target_size_from_state()
 
 def _update_target_size_from_state() -> None:
-    if st.session_state.banner_gen_ratio_choice == "Custom":
-        st.session_state.banner_gen_target_size = (
-            st.session_state.banner_gen_custom_width,
-            st.session_state.banner_gen_custom_height,
-        )
-    else:
-        st.session_state.banner_gen_target_size = RATIO_OPTIONS_MAP.get(
-            st.session_state.banner_gen_ratio_choice, RATIO_OPTIONS_MAP[DEFAULT_RATIO_KEY]
-        )
+    update_target_size(PREFIX, RATIO_OPTIONS_MAP, DEFAULT_RATIO_KEY)
 
 def _reset_ai_states() -> None:
     st.session_state.banner_gen_ai_banner_img = None
     st.session_state.banner_gen_instruction_prompt_for_gpt_image_1 = None
     st.session_state.banner_gen_status_message = ""
+    st.session_state.banner_gen_drafts = None
+    st.session_state.banner_gen_region_undo = None
 
 def _on_parameter_change():
     """Einziger Callback für alle Format/Qualität/Text-Widgets. Aktualisiert abhängige States."""
     _update_target_size_from_state()
     _reset_ai_states()
 
+def _local_text_mode() -> bool:
+    return st.session_state.banner_gen_text_mode == TEXT_MODES[0]
+
+def _on_text_change():
+    """Text im lokalen Modus ändert nur die Nachbearbeitung, das generierte Bild bleibt erhalten."""
+    if not _local_text_mode():
+        _on_parameter_change()
+
 # -------------------------------------------------------------- UI-Funktionen
 def _render_hero() -> None:
     st.markdown( """<div class="hero-section" style="padding:1.5em 1em;margin-bottom:1.5em"> <h1 style="font-size:2em">🚀 Banner Generator (GPT-Image-1)</h1> <p class="subtitle" style="font-size:1em">Erzeuge KI-Banner auf Basis deines Produktbildes.</p> </div> """, unsafe_allow_html=True, )
@@ -107,44 +135,39 @@ def _render_hero() -> None:
 def _render_step_header(step: int, title: str) -> None:
     st.markdown(f"<h2>{step}️⃣ Schritt {step}: {title}</h2>", unsafe_allow_html=True)
 
-def _handle_upload() -> None:
-    uploader_key = f"banner_gen_uploader_{st.session_state.uploader_instance_key}"
-    up_file = st.file_uploader( "Bild auswählen (PNG/JPG/WEBP)", type=["png", "jpg", "jpeg", "webp"], key=uploader_key)
-    if up_file:
-        if st.session_state.get("banner_gen_image_input_name") != up_file.name or st.session_state.get("banner_gen_img_from") != "upload":
-            try:
-                img = Image.open(up_file); img = ImageOps.exif_transpose(img).convert("RGB")
-                st.session_state.banner_gen_image_input = img
-                st.session_state.banner_gen_image_input_name = up_file.name
-                st.session_state.banner_gen_img_from = "upload"
-                st.session_state.banner_gen_current_sku_data = None
-                st.session_state.temp_sku_input = ""
-                st.session_state.uploader_instance_key += 1
-                _reset_ai_states()
-                st.rerun()
-            except Exception as e: st.error(f"Bild konnte nicht geladen werden: {e}")
-
-def _handle_sku_lookup(df_skus: pd.DataFrame) -> None:
-    st.text_input("SKU eingeben:", key="temp_sku_input")
-    if st.button("🔍 Bild via SKU suchen"):
-        sku_value = st.session_state.temp_sku_input.strip()
-        if not sku_value: st.warning("Bitte eine SKU eingeben."); return
-
-        if st.session_state.get("banner_gen_image_input_name") != f"SKU:{sku_value}" or st.session_state.get("banner_gen_img_from") != "sku":
-            match = df_skus[df_skus["sku"].astype(str).str.lower() == sku_value.lower()]
-            if match.empty or pd.isna(match.iloc[0]["image_url"]):
-                st.error(f"Für SKU '{sku_value}' wurde kein gültiges Bild gefunden."); return
-            try:
-                resp = requests.get(match.iloc[0]["image_url"], timeout=15); resp.raise_for_status()
-                img = Image.open(BytesIO(resp.content)); img = ImageOps.exif_transpose(img).convert("RGB")
-                st.session_state.banner_gen_image_input = img
-                st.session_state.banner_gen_image_input_name = f"SKU:{sku_value}"
-                st.session_state.banner_gen_img_from = "sku"
-                st.session_state.banner_gen_current_sku_data = match.iloc[0].to_dict()
-                st.session_state.uploader_instance_key += 1
-                _reset_ai_states()
-                st.rerun()
-            except Exception as e: st.error(f"SKU-Bild konnte nicht geladen werden: {e}")
+def _on_new_image(img, sku_row) -> None:
+    """Neues Eingabebild (Upload oder SKU): SKU-Daten, Duplikat-Hinweis und KI-Ergebnisse zurücksetzen."""
+    st.session_state.banner_gen_current_sku_data = sku_row.to_dict() if sku_row is not None else None
+    st.session_state.banner_gen_duplicate_hint = (
+        _find_reusable_result(str(sku_row["sku"]), str(sku_row["image_url"]).strip(), img) if sku_row is not None else None
+    )
+    _reset_ai_states()
+
+def _find_reusable_result(sku: str, image_url: str, img) -> dict | None:
+    """Sucht ein früheres Direct-Ergebnis zu einer SKU mit (fast) identischem Produktbild."""
+    try:
+        duplicates = register_and_find_duplicates(sku, image_url, img)
+        entry = latest_result_for_skus([d.sku for d in duplicates], page="Banner Generator (Direct)")
+    except Exception as e:
+        print(f"Duplikatsuche fehlgeschlagen: {e}")
+        return None
+    if entry is None:
+        return None
+    distance = next(d.distance for d in duplicates if d.sku == entry.sku)
+    return {"sku": entry.sku, "entry_id": entry.id, "image_hash": entry.image_hash, "prompt": entry.prompt, "distance": distance}
+
+def _render_duplicate_hint() -> None:
+    hint = st.session_state.banner_gen_duplicate_hint
+    if not hint or st.session_state.banner_gen_img_from != "sku" or st.session_state.banner_gen_ai_banner_img: return
+    st.info(f"♻️ SKU {hint['sku']} hat ein (fast) identisches Produktbild (pHash-Distanz {hint['distance']}) und bereits ein generiertes Banner.")
+    if st.button(f"Banner von SKU {hint['sku']} übernehmen (ohne neue Generierung)", use_container_width=True):
+        img = load_image(hint["image_hash"])
+        if img is None:
+            st.error("Das gespeicherte Banner wurde im Verlauf nicht gefunden."); st.session_state.banner_gen_duplicate_hint = None; return
+        st.session_state.banner_gen_ai_banner_img = img
+        st.session_state.banner_gen_instruction_prompt_for_gpt_image_1 = hint["prompt"]
+        st.session_state.banner_gen_status_message = f"✅ Banner erfolgreich generiert! (übernommen von SKU {hint['sku']})"
+        st.rerun()
 
 def _select_options() -> None:
     # --- Format
@@ -170,15 +193,72 @@ def _select_options() -> None:
                 on_change=_on_parameter_change
             )
     
-    # --- Qualität
-    qual_opts = ["auto", "low", "medium", "high"]
-    st.radio( "KI-Qualität:", qual_opts, key="banner_gen_quality_choice", on_change=_on_parameter_change, horizontal=True )
+    # --- Outpainting für sehr breite Formate
+    if needs_outpainting(st.session_state.banner_gen_target_size):
+        st.checkbox( "↔️ Wide Banner per Outpainting erweitern (statt Zuschnitt)", key="banner_gen_outpaint", on_change=_on_parameter_change, help="Generiert in nativer Größe und erweitert links/rechts per KI, statt den Großteil des Bildes wegzuschneiden." )
+        if st.session_state.banner_gen_outpaint:
+            st.radio( "Outpainting-Engine:", list(OUTPAINT_ENGINES.keys()), key="banner_gen_outpaint_engine", on_change=_on_parameter_change, horizontal=True )
+            if OUTPAINT_ENGINES[st.session_state.banner_gen_outpaint_engine] == "gpt-image-1":
+                calls = estimate_outpaint_calls(OUTPAINT_BASE_SIZE, st.session_state.banner_gen_target_size)
+                st.caption(f"≈ {calls} zusätzliche gpt-image-1-Edits (links und rechts parallel).")
+
+    # --- Engine & Qualität
+    st.radio( "KI-Engine:", list(BANNER_ENGINES.keys()), key="banner_gen_engine_choice", on_change=_on_parameter_change, horizontal=True )
+    if BANNER_ENGINES[st.session_state.banner_gen_engine_choice] is None:
+        qual_opts = ["auto", "low", "medium", "high"]
+        st.radio( "KI-Qualität:", qual_opts, key="banner_gen_quality_choice", on_change=_on_parameter_change, horizontal=True )
+    else:
+        st.slider( "Abweichung vom Produktbild (strength):", 0.1, 0.9, step=0.05, key="banner_gen_stability_strength",
+                   on_change=_on_parameter_change, help="Niedrig = nah am Original, hoch = freiere Interpretation." )
     
     # --- Text
-    st.checkbox("Text in Banner integrieren?", key="banner_gen_include_text", on_change=_on_parameter_change)
+    st.checkbox("Text in Banner integrieren?", key="banner_gen_include_text", on_change=_on_text_change)
     if st.session_state.banner_gen_include_text:
-        st.text_area( "Zu integrierender Text:", key="banner_gen_user_text", placeholder="Dein Banner-Text …", on_change=_on_parameter_change )
-        st.radio( "Textposition (KI-Vorschlag):", ["zentral", "oben", "unten", "links", "rechts"], key="banner_gen_text_position", on_change=_on_parameter_change, horizontal=True )
+        st.radio( "Text-Modus:", TEXT_MODES, key="banner_gen_text_mode", on_change=_on_parameter_change, horizontal=True )
+        st.text_area( "Zu integrierender Text:", key="banner_gen_user_text", placeholder="Dein Banner-Text …", on_change=_on_text_change )
+        position_label = "Textposition:" if _local_text_mode() else "Textposition (KI-Vorschlag):"
+        st.radio( position_label, list(TEXT_POSITIONS.keys()), key="banner_gen_text_position", on_change=_on_text_change, horizontal=True )
+
+def _flow_params() -> dict:
+    _update_target_size_from_state()
+    return {
+        "image": st.session_state.banner_gen_image_input,
+        "include_text": st.session_state.banner_gen_include_text and not _local_text_mode(),
+        "user_text": st.session_state.banner_gen_user_text,
+        "text_position": st.session_state.banner_gen_text_position,
+        "target_size": st.session_state.banner_gen_target_size,
+        "quality": st.session_state.banner_gen_quality_choice,
+        "stability_tier": BANNER_ENGINES[st.session_state.banner_gen_engine_choice],
+        "strength": st.session_state.banner_gen_stability_strength,
+        "outpaint": st.session_state.banner_gen_outpaint,
+        "outpaint_engine": OUTPAINT_ENGINES[st.session_state.banner_gen_outpaint_engine],
+    }
+
+def _outpaint_cost_chf(params: dict) -> float:
+    """Zusätzliche Kosten der Outpainting-Erweiterung (wie in der Pipeline nur für sehr breite Formate)."""
+    if not params["outpaint"] or not needs_outpainting(params["target_size"]):
+        return 0.0
+    if params["outpaint_engine"] == "stability":
+        return 2 * STABILITY_OUTPAINT_COST_CHF
+    quality = params["quality"] if params["quality"] in GPT_IMAGE_1_PRICING_CHF else "medium"
+    return estimate_outpaint_calls(OUTPAINT_BASE_SIZE, params["target_size"]) * GPT_IMAGE_1_PRICING_CHF[quality]
+
+def _estimated_cost_chf(params: dict) -> float:
+    """Geschätzte Kosten eines Laufs mit diesen Parametern: Generierung plus ggf. Outpainting."""
+    tier = params["stability_tier"]
+    generation = STABILITY_PRICING_CHF[tier] if tier else GPT_IMAGE_1_PRICING_CHF[params["quality"]]
+    return generation + _outpaint_cost_chf(params)
+
+def _store_result(result, model: str, cost_chf: float) -> None:
+    """Übernimmt ein fertiges Pipeline-Ergebnis (bis postprocess) als Banner und legt es im Verlauf ab."""
+    st.session_state.banner_gen_instruction_prompt_for_gpt_image_1 = result["prompt"]
+    st.session_state.banner_gen_ai_banner_img = result["postprocess"]
+    source_name = st.session_state.banner_gen_image_input_name or ""
+    record_result(
+        result["postprocess"], "Banner Generator (Direct)", model=model, prompt=result["prompt"],
+        params=result.public_params, cost_chf=cost_chf, latency_s=result.elapsed,
+        sku=source_name[4:] if source_name.startswith("SKU:") else None,
+    )
 
 def _perform_banner_generation() -> None:
     if not st.session_state.banner_gen_image_input: return
@@ -186,48 +266,150 @@ def _perform_banner_generation() -> None:
     _reset_ai_states()
     st.session_state.banner_gen_is_generating = True
     
-    st.session_state.banner_gen_status_message = f"🎨 GPT-Image-1 generiert Banner (Qualität: {st.session_state.banner_gen_quality_choice}) …"
+    engine = st.session_state.banner_gen_engine_choice
+    stability_tier = BANNER_ENGINES[engine]
+    detail = f"Qualität: {st.session_state.banner_gen_quality_choice}" if stability_tier is None \
+        else f"strength: {st.session_state.banner_gen_stability_strength:.2f}"
+    st.session_state.banner_gen_status_message = f"🎨 {engine} generiert Banner ({detail}) …"
     with st.spinner(st.session_state.banner_gen_status_message):
         try:
-            _update_target_size_from_state()
-            user_text_final = st.session_state.banner_gen_user_text.strip()
-            use_text_prompt = st.session_state.banner_gen_include_text and user_text_final
-            prompt = build_gpt_image_1_banner_with_text_prompt(user_text_final, st.session_state.banner_gen_text_position) \
-                if use_text_prompt else build_gpt_image_1_banner_prompt()
-            st.session_state.banner_gen_instruction_prompt_for_gpt_image_1 = prompt
-            
-            w, h = st.session_state.banner_gen_target_size
-            dalle_size_str = get_best_dalle_size(w / h if h > 0 else 1)
-            img_result = generate_banner_with_gpt_image_1(
-                st.session_state.banner_gen_image_input, prompt, dalle_size_str, st.session_state.banner_gen_quality_choice
-            )
-            st.session_state.banner_gen_ai_banner_img = img_result
+            params = _flow_params()
+            _store_result(run_flow("direct", params, until="postprocess"), engine, _estimated_cost_chf(params))
             st.session_state.banner_gen_status_message = "✅ Banner erfolgreich generiert!"
         except Exception as e: st.session_state.banner_gen_status_message = f"Fehler bei Bannergenerierung: {e}"
         finally: st.session_state.banner_gen_is_generating = False
 
-def _crop_and_download() -> None: # Unverändert
-    img_to_crop = st.session_state.banner_gen_ai_banner_img
-    if not img_to_crop: return 
-    target_w, target_h = st.session_state.banner_gen_target_size
-    if CROPPER_AVAILABLE:
-        aspect_def_w, aspect_def_h = target_w, target_h
-        if aspect_def_w > CROPPER_ASPECT_DEFINITION_MAX_WIDTH:
-            scale = CROPPER_ASPECT_DEFINITION_MAX_WIDTH / aspect_def_w
-            aspect_def_w = int(aspect_def_w * scale); aspect_def_h = int(aspect_def_h * scale)
-        if aspect_def_h <= 0: aspect_def_h = 1
-        aspect_tuple_for_cropper = (aspect_def_w, aspect_def_h)
-        cropped_pil_img = st_cropper( img_to_crop, realtime_update=True, box_color="#8c133a", aspect_ratio=aspect_tuple_for_cropper, key="banner_gen_cropper_widget", )
-        final_image_to_display = cropped_pil_img.resize((target_w, target_h), Image.Resampling.LANCZOS)
-    else: st.warning("`streamlit-cropper` nicht installiert."); final_image_to_display = img_to_crop
-    st.image(final_image_to_display, caption=f"Vorschau Banner ({target_w}×{target_h}px)", width=400)
-    img_byte_buffer = BytesIO(); save_kwargs_dl = {}
-    download_image = final_image_to_display
-    if OUTPUT_IMAGE_FORMAT == "JPEG":
-        save_kwargs_dl["quality"] = OUTPUT_IMAGE_QUALITY_DOWNLOAD
-        if download_image.mode in ("RGBA", "P"): download_image = download_image.convert("RGB")
-    download_image.save(img_byte_buffer, format=OUTPUT_IMAGE_FORMAT, **save_kwargs_dl)
-    st.download_button( f"📥 Banner herunterladen ({target_w}×{target_h}px - .{OUTPUT_IMAGE_EXTENSION})", data=img_byte_buffer.getvalue(), file_name=f"wine_banner_{target_w}x{target_h}.{OUTPUT_IMAGE_EXTENSION}", mime=OUTPUT_IMAGE_MIME, type="primary", use_container_width=True, )
+# ------------------------------------------------------------- Entwurfsmodus
+def _draft_mode_active() -> bool:
+    return st.session_state.banner_gen_draft_mode and BANNER_ENGINES[st.session_state.banner_gen_engine_choice] is None
+
+def _perform_draft_generation() -> None:
+    if not st.session_state.banner_gen_image_input: return
+    _reset_ai_states()
+    count = st.session_state.banner_gen_draft_count
+    with st.spinner(f"✏️ GPT-Image-1 erstellt {count} Entwürfe (Qualität: {DRAFT_QUALITY}) …"):
+        try:
+            st.session_state.banner_gen_drafts = generate_drafts("direct", _flow_params(), count)
+        except Exception as e: st.session_state.banner_gen_status_message = f"Fehler bei Bannergenerierung: {e}"
+
+def _finalize_selected_draft(index: int, mode: str) -> None:
+    drafts = st.session_state.banner_gen_drafts
+    label = f"in {FINAL_QUALITY} neu gerendert" if mode == "rerender" else "Entwurf lokal weiterverarbeitet"
+    with st.spinner(f"🎯 Entwurf {index + 1}: {label} …"):
+        try:
+            result = finalize_draft(drafts, index, mode, until="postprocess")
+            # Alle Entwürfe wurden bezahlt; dazu kommt der finale Lauf (Neu-Rendern bzw. nur das Outpainting, beides in FINAL_QUALITY)
+            final_params = {**drafts.params, "quality": FINAL_QUALITY}
+            final_cost = _estimated_cost_chf(final_params) if mode == "rerender" else _outpaint_cost_chf(final_params)
+            cost = len(drafts.images) * GPT_IMAGE_1_PRICING_CHF[DRAFT_QUALITY] + final_cost
+            _store_result(result, f"GPT-Image-1 (Entwurf {index + 1}, {label})", cost)
+            st.session_state.banner_gen_status_message = f"✅ Banner erfolgreich generiert! (Entwurf {index + 1}, {label})"
+        except Exception as e: st.session_state.banner_gen_status_message = f"Fehler bei Bannergenerierung: {e}"
+
+def _render_drafts() -> None:
+    drafts = st.session_state.banner_gen_drafts
+    if not drafts: return
+    st.caption(f"✏️ {len(drafts.images)} Entwürfe in {drafts.elapsed:.1f} s (Qualität: {DRAFT_QUALITY}). "
+               f"Wähle einen Entwurf: auf seiner Basis in {FINAL_QUALITY} neu rendern (Komposition bleibt) oder direkt lokal hochskalieren.")
+    cols = st.columns(len(drafts.images))
+    for i, (col, img) in enumerate(zip(cols, drafts.images)):
+        with col:
+            st.image(img, caption=f"Entwurf {i + 1}", width=DRAFT_PREVIEW_WIDTH)
+            if st.button(f"🎯 In {FINAL_QUALITY} rendern", key=f"banner_gen_draft_rerender_{i}", use_container_width=True):
+                _finalize_selected_draft(i, "rerender"); st.rerun()
+            if st.button("🔍 Lokal hochskalieren", key=f"banner_gen_draft_upscale_{i}", use_container_width=True):
+                _finalize_selected_draft(i, "upscale"); st.rerun()
+
+def _render_region_edit() -> None:
+    """Einen Bereich markieren und nur diesen per maskiertem gpt-image-1-Edit neu malen lassen."""
+    with st.expander("🩹 Bereich korrigieren (statt komplett neu generieren)", expanded=False):
+        if not CROPPER_AVAILABLE:
+            st.info("Für die Bereichsauswahl wird `streamlit-cropper` benötigt."); return
+        img = st.session_state.banner_gen_ai_banner_img
+        st.caption("Rahmen um den fehlerhaften Bereich ziehen (z. B. Artefakt, ungewollter Text, unschöne Ecke). "
+                   "Nur dieser Bereich wird neu gemalt und weich ins Banner geblendet – ein einzelner Edit-Aufruf.")
+        box = st_cropper(img, realtime_update=True, box_color="#1f77b4", aspect_ratio=None, return_type="box", key="banner_gen_region_cropper")
+        st.text_input("Anweisung (optional):", key="banner_gen_region_instruction", placeholder="z. B. Schriftzug entfernen, Ecke an den Hintergrund anpassen")
+        col_edit, col_undo = st.columns(2)
+        if col_edit.button(f"🩹 Bereich neu malen (Qualität: {st.session_state.banner_gen_quality_choice})", use_container_width=True):
+            try:
+                region = normalize_box(box, img.size)
+                with st.spinner("🩹 GPT-Image-1 malt den Bereich neu …"):
+                    started = time.perf_counter()
+                    edited = edit_region(img, region, st.session_state.banner_gen_region_instruction, st.session_state.banner_gen_quality_choice)
+                st.session_state.banner_gen_region_undo = img
+                st.session_state.banner_gen_ai_banner_img = edited
+                source_name = st.session_state.banner_gen_image_input_name or ""
+                record_result(
+                    edited, "Banner Generator (Direct)", model="GPT-Image-1 (Bereichs-Edit)",
+                    prompt=st.session_state.banner_gen_region_instruction or None,
+                    params={"region": region, "quality": st.session_state.banner_gen_quality_choice},
+                    cost_chf=GPT_IMAGE_1_PRICING_CHF[st.session_state.banner_gen_quality_choice], latency_s=time.perf_counter() - started, sku=source_name[4:] if source_name.startswith("SKU:") else None,
+                )
+            except Exception as e: st.error(f"Bereich konnte nicht korrigiert werden: {e}")
+            else: st.rerun()
+        if st.session_state.banner_gen_region_undo is not None and col_undo.button("↩️ Letzte Korrektur rückgängig", use_container_width=True):
+            st.session_state.banner_gen_ai_banner_img = st.session_state.banner_gen_region_undo
+            st.session_state.banner_gen_region_undo = None
+            st.rerun()
+
+def _crop_and_download() -> None:
+    final_image_to_display = crop_banner(PREFIX)
+    if final_image_to_display is None: return
+    local_text = st.session_state.banner_gen_include_text and _local_text_mode()
+    if local_text:
+        text_kwargs = _text_overlay_options()
+        artwork = final_image_to_display
+        final_image_to_display = render_text(artwork, st.session_state.banner_gen_user_text, **text_kwargs)
+    download_banner(PREFIX, final_image_to_display, "wine_banner", OUTPUT_IMAGE_FORMAT)
+    if local_text:
+        _text_variants_download(artwork, text_kwargs, st.session_state.banner_gen_target_size)
+
+def _text_overlay_options() -> dict:
+    """Schrift und Farbe für den lokal gerenderten Text (ändern nichts am generierten Bild)."""
+    with st.expander("🔤 Schrift & Farbe", expanded=False):
+        fonts = list(available_fonts().keys())
+        if st.session_state.banner_gen_text_font not in fonts:
+            st.session_state.banner_gen_text_font = fonts[0]
+        st.selectbox("Schrift:", fonts, key="banner_gen_text_font", help="Eigene TTF/OTF-Schriften in assets/fonts/ ablegen.")
+        st.radio("Farbe:", [TEXT_COLOUR_AUTO, "Eigene Farbe"], key="banner_gen_text_colour_mode", horizontal=True)
+        if st.session_state.banner_gen_text_colour_mode != TEXT_COLOUR_AUTO:
+            st.color_picker("Textfarbe:", key="banner_gen_text_colour")
+    colour = None if st.session_state.banner_gen_text_colour_mode == TEXT_COLOUR_AUTO else hex_to_rgb(st.session_state.banner_gen_text_colour)
+    return {"position": st.session_state.banner_gen_text_position, "font_name": st.session_state.banner_gen_text_font, "colour": colour}
+
+def _variants_zip_key(artwork, variants: list, text_kwargs: dict, target_size: tuple) -> str:
+    """Fingerabdruck von Bild, Texten und Schriftoptionen; gleicher Schlüssel = ZIP aus dem Session State."""
+    digest = hashlib.sha256(repr((variants, sorted(text_kwargs.items()), tuple(target_size), artwork.mode, artwork.size)).encode("utf-8"))
+    digest.update(artwork.tobytes())
+    return digest.hexdigest()
+
+def _build_variants_zip(artwork, variants: list, text_kwargs: dict, target_size: tuple) -> bytes:
+    """Rendert alle Varianten und packt sie mit fester Exportqualität (ohne Qualitätssuche pro Bild) in ein ZIP."""
+    target_w, target_h = target_size
+    zip_buffer = BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_STORED) as archive:  # JPEG/WebP sind bereits komprimiert
+        for i, text in enumerate(variants, start=1):
+            data, _ = export_image(render_text(artwork, text, **text_kwargs), target_size, OUTPUT_IMAGE_FORMAT, search_quality=False)
+            archive.writestr(f"wine_banner_{target_w}x{target_h}_text{i:02d}.{OUTPUT_IMAGE_EXTENSION}", data)
+    return zip_buffer.getvalue()
+
+def _text_variants_download(artwork, text_kwargs: dict, target_size: tuple) -> None:
+    """Beliebig viele Text-/Sprachvarianten aus derselben Generierung als ZIP (erstellt erst auf Knopfdruck)."""
+    with st.expander("🌐 Weitere Textvarianten (z. B. Sprachen)", expanded=False):
+        st.text_area("Eine Variante pro Zeile:", key="banner_gen_text_variants", placeholder="Jetzt entdecken\nDécouvrir maintenant\nScopri ora")
+        variants = [line.strip() for line in st.session_state.banner_gen_text_variants.splitlines() if line.strip()]
+        if not variants: return
+        target_w, target_h = target_size
+        zip_key = _variants_zip_key(artwork, variants, text_kwargs, target_size)
+        cached = st.session_state.banner_gen_text_variants_zip
+        if not cached or cached["key"] != zip_key:
+            if not st.button(f"📦 ZIP mit {len(variants)} Varianten erstellen", key="banner_gen_text_variants_build", use_container_width=True):
+                return
+            with st.spinner(f"Rendere {len(variants)} Varianten …"):
+                cached = {"key": zip_key, "data": _build_variants_zip(artwork, variants, text_kwargs, target_size)}
+            st.session_state.banner_gen_text_variants_zip = cached
+        st.download_button(f"📦 {len(variants)} Varianten herunterladen (.zip)", data=cached["data"], file_name=f"wine_banner_{target_w}x{target_h}_varianten.zip", mime="application/zip", use_container_width=True)
 
 # ---------------------------------------------------- Haupt-Page
 def banner_generator_page() -> None:
@@ -238,13 +420,14 @@ def banner_generator_page() -> None:
     # --- Schritt 1: Bildquelle ---
     _render_step_header(1, "Bildquelle wählen")
     up_col, sku_col = st.columns([0.6, 0.4])
-    with up_col: _handle_upload()
-    with sku_col: _handle_sku_lookup(df_skus)
+    with up_col: handle_upload(PREFIX, _on_new_image)
+    with sku_col: handle_sku_lookup(PREFIX, df_skus, _on_new_image)
 
     if not st.session_state.banner_gen_image_input:
         st.info("Bitte zuerst ein Bild hochladen oder per SKU laden."); st.stop()
 
     st.image( st.session_state.banner_gen_image_input, caption=f"Inspiration: {st.session_state.banner_gen_image_input_name}", width=PREVIEW_IMAGE_WIDTH, )
+    _render_duplicate_hint()
     st.markdown("---")
     
     # --- Schritt 2: Optionen ---
@@ -255,13 +438,22 @@ def banner_generator_page() -> None:
     # `_on_parameter_change` hat `_update_target_size_from_state` bereits aufgerufen
     tw_display, th_display = st.session_state.banner_gen_target_size
     st.caption(f"📐 Zielgröße für Zuschnitt: {tw_display}x{th_display}px | "
-               f"🎨 Gewählte KI-Qualität: {st.session_state.banner_gen_quality_choice}")
+               f"🎨 Engine: {st.session_state.banner_gen_engine_choice} | KI-Qualität: {st.session_state.banner_gen_quality_choice}")
 
     # --- Schritt 3: Generierung ---
     st.markdown("---")
     _render_step_header(3, "KI-Banner generieren")
 
-    if st.button("🚀 KI-Banner generieren (GPT-Image-1)", type="primary", use_container_width=True, disabled=st.session_state.banner_gen_is_generating):
+    if BANNER_ENGINES[st.session_state.banner_gen_engine_choice] is None:
+        st.checkbox(f"✏️ Erst Entwürfe ({DRAFT_QUALITY}) generieren, dann den besten finalisieren", key="banner_gen_draft_mode",
+                    help=f"Schnelle, günstige Entwürfe in einer Anfrage; nur der gewählte wird in {FINAL_QUALITY} neu gerendert oder lokal hochskaliert.")
+    if _draft_mode_active():
+        st.slider("Anzahl Entwürfe:", 1, MAX_DRAFTS, key="banner_gen_draft_count")
+        if st.button(f"✏️ {st.session_state.banner_gen_draft_count} Entwürfe generieren ({DRAFT_QUALITY})", type="primary", use_container_width=True, disabled=st.session_state.banner_gen_is_generating):
+            _perform_draft_generation()
+            st.rerun()
+        _render_drafts()
+    elif st.button(f"🚀 KI-Banner generieren ({st.session_state.banner_gen_engine_choice})", type="primary", use_container_width=True, disabled=st.session_state.banner_gen_is_generating):
         _perform_banner_generation()
         st.rerun()
 
@@ -280,6 +472,7 @@ def banner_generator_page() -> None:
     if st.session_state.banner_gen_ai_banner_img and not st.session_state.banner_gen_is_generating:
         st.markdown("---")
         _render_step_header(4, "Ergebnis ansehen & herunterladen")
+        _render_region_edit()
         _crop_and_download()
     elif not st.session_state.banner_gen_is_generating:
         st.markdown("---")
@@ -1,11 +1,14 @@
+import time
+_PAGE_IMPORT_START = time.perf_counter()
 import streamlit as st
-from PIL import Image, ImageOps
-from io import BytesIO
 import os
-import pandas as pd
-import requests
+import uuid
 from dotenv import load_dotenv
 import sys
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd  # pandas wird erst mit den SKU-Daten geladen
 
 # -------------------------------------------------------------------- Pfade
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -14,33 +17,29 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 # -------------------------------------------------------------------- Imports
-from utils import load_css, load_sku_data, SKU_CSV_FILENAME
-from logic.prompt_engine_v1 import build_autonomous_prompt
-from logic.generation_v1 import generate_banner_prompt_gpt4, generate_dalle_image, get_best_dalle_size
+from utils import get_secret, load_css, load_sku_data, SKU_CSV_FILENAME
+from logic.instrumentation import record_page_startup
+from logic.generation_v1 import BATCH_MAX_IMAGES, get_best_dalle_size
+from logic.pipeline import export_image, fit_to_target, run_flow
+from logic.classic_batch import ClassicBatchRun, build_batch_items
+from logic.banner_page import crop_banner, download_banner, handle_sku_lookup, handle_upload, update_target_size
+from logic.outpaint import OUTPAINT_ENGINES, needs_outpainting
+from logic.history import record_result
 
 # ---------------------------------------------------------------- Streamlit
+record_page_startup("Banner Generator (Classic)", time.perf_counter() - _PAGE_IMPORT_START)
 st.set_page_config(page_title="Classic Banner Generator", page_icon="🎨", layout="wide")
 load_css()
 
 # ---------------------------------------------------------------- OpenAI-Key
 load_dotenv(os.path.join(project_root, ".env"))
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
+# Der OpenAI-Client wird in logic/clients.py einmal pro Prozess erzeugt und liest den Key über get_secret
+if not get_secret("OPENAI_API_KEY"):
     st.error("OpenAI API-Key fehlt. Bitte in `.env` setzen.")
     st.stop()
-import openai
-openai.api_key = OPENAI_API_KEY
-
-# -------------------------------------------------------- optionale Abhängigkeit
-try:
-    from streamlit_cropper import st_cropper
-    CROPPER_AVAILABLE = True
-except ImportError:
-    CROPPER_AVAILABLE = False
 
 # ---------------------------------------------------------------- Konstanten
 OUTPUT_IMAGE_FORMAT = "JPEG"
-OUTPUT_IMAGE_QUALITY_DOWNLOAD = 95
 OUTPUT_IMAGE_EXTENSION = OUTPUT_IMAGE_FORMAT.lower()
 OUTPUT_IMAGE_MIME = f"image/{OUTPUT_IMAGE_EXTENSION}"
 DALLE3_QUALITY_DEFAULT = "standard"
@@ -54,7 +53,20 @@ DEFAULT_RATIO_KEY = "Wide Banner (4.54:1)"
 CUSTOM_DEFAULT_WIDTH = 3840
 CUSTOM_DEFAULT_HEIGHT = 2160
 PREVIEW_IMAGE_WIDTH = 220
-CROPPER_ASPECT_DEFINITION_MAX_WIDTH = 700
+GENERATION_MODES = ["Einzelbild", "Stapel (mehrere SKUs / Varianten)"]
+# Anzeige -> Prompt-Modus in logic.pipeline (CLASSIC_PROMPT_MODES)
+PROMPT_MODES = {
+    "🧠 GPT-4o Vision": "vision",
+    "⚡ Schnell (lokale Etikett-Analyse, ohne API)": "fast",
+    "⚡+🧠 Lokale Analyse + GPT-4o-Anreicherung": "enriched",
+}
+PROMPT_MODE_MODELS = {"vision": "GPT-4o + DALL·E 3", "fast": "Etikett-Analyse + DALL·E 3", "enriched": "Etikett-Analyse + GPT-4o + DALL·E 3"}
+MAX_BATCH_VARIANTS = 4
+BATCH_STATUS_LABELS = {
+    "queued": "⏳ wartet", "loading": "📥 lädt SKU-Bild", "waiting": "♻️ wartet auf Duplikat", "analysing": "🧠 analysiert Bild",
+    "rendering": "🖼️ DALL·E rendert", "done": "✅ fertig", "error": "❌ Fehler",
+}
+BATCH_GRID_COLUMNS = 3
 
 # NEU: Preis-Mapping für DALL-E 3
 DALLE3_PRICING_CHF = {
@@ -82,18 +94,18 @@ def initialize_session_state() -> None:
         "ratio_choice": DEFAULT_RATIO_KEY, "custom_width": CUSTOM_DEFAULT_WIDTH, "custom_height": CUSTOM_DEFAULT_HEIGHT,
         "dalle_quality_choice": DALLE3_QUALITY_DEFAULT,
         "generated_dalle_prompt": None, "ai_banner_img": None, "status_message": "",
-        "generation_phase": None,
-        "temp_sku_input": "", "current_sku_data": None
+        "generation_phase": None, "run_id": None, "prompt_seconds": 0.0,
+        "temp_sku_input": "", "current_sku_data": None, "image_url": None, "prompt_mode": next(iter(PROMPT_MODES)),
+        "outpaint": False, "outpaint_engine": next(iter(OUTPAINT_ENGINES)),
+        "mode": GENERATION_MODES[0], "batch_skus": "", "batch_variants": 1,
+        "batch_include_image": True, "batch_dedupe": True, "batch_vision": True, "batch_results": [],
     }
     for k, v in defaults.items():
         st.session_state.setdefault(key(k), v)
     _update_target_size_from_state()
 
 def _update_target_size_from_state() -> None:
-    if st.session_state[key("ratio_choice")] == "Custom":
-        st.session_state[key("target_size")] = (st.session_state[key("custom_width")], st.session_state[key("custom_height")])
-    else:
-        st.session_state[key("target_size")] = RATIO_OPTIONS_MAP.get(st.session_state[key("ratio_choice")])
+    update_target_size(PREFIX, RATIO_OPTIONS_MAP, DEFAULT_RATIO_KEY)
 
 def _reset_ai_states() -> None:
     st.session_state[key("generated_dalle_prompt")] = None
@@ -112,54 +124,29 @@ def _render_hero() -> None:
 def _render_step_header(step: int, title: str) -> None:
     st.markdown(f"<h2>{step}️⃣ Schritt {step}: {title}</h2>", unsafe_allow_html=True)
 
-def _handle_upload() -> None:
-    uploader_key_full = f"{PREFIX}uploader_{st.session_state[key('uploader_instance_key')]}"
-    up_file = st.file_uploader("Bild auswählen (PNG/JPG/WEBP)", type=["png", "jpg", "jpeg", "webp"], key=uploader_key_full)
-    if up_file and st.session_state.get(key("image_input_name")) != up_file.name:
-        try:
-            img = Image.open(up_file); img = ImageOps.exif_transpose(img).convert("RGB")
-            st.session_state[key("image_input")] = img
-            st.session_state[key("image_input_name")] = up_file.name
-            st.session_state[key("img_from")] = "upload"
-            st.session_state[key("temp_sku_input")] = ""
-            st.session_state[key("uploader_instance_key")] += 1
-            _reset_ai_states()
-            st.rerun()
-        except Exception as e: st.error(f"Bild konnte nicht geladen werden: {e}")
-
-def _handle_sku_lookup(df_skus: pd.DataFrame) -> None:
-    st.text_input("SKU eingeben:", key=key("temp_sku_input"))
-    if st.button("🔍 Bild via SKU suchen"):
-        sku_value = st.session_state[key("temp_sku_input")].strip()
-        if not sku_value: st.warning("Bitte eine SKU eingeben."); return
-        if st.session_state.get(key("image_input_name")) != f"SKU:{sku_value}":
-            match = df_skus[df_skus["sku"].astype(str).str.lower() == sku_value.lower()]
-            if match.empty or pd.isna(match.iloc[0]["image_url"]):
-                st.error(f"Für SKU '{sku_value}' wurde kein gültiges Bild gefunden."); return
-            try:
-                resp = requests.get(match.iloc[0]["image_url"], timeout=15); resp.raise_for_status()
-                img = Image.open(BytesIO(resp.content)); img = ImageOps.exif_transpose(img).convert("RGB")
-                st.session_state[key("image_input")] = img
-                st.session_state[key("image_input_name")] = f"SKU:{sku_value}"
-                st.session_state[key("img_from")] = "sku"
-                st.session_state[key("uploader_instance_key")] += 1
-                _reset_ai_states()
-                st.rerun()
-            except Exception as e: st.error(f"SKU-Bild konnte nicht geladen werden: {e}")
+def _on_new_image(img, sku_row) -> None:
+    """Neues Eingabebild (Upload oder SKU): Bild-URL für die Analyse merken und KI-Ergebnisse zurücksetzen."""
+    st.session_state[key("image_url")] = str(sku_row["image_url"]).strip() if sku_row is not None else None
+    _reset_ai_states()
 
-def _get_dalle3_cost() -> str:
-    """Ermittelt die Kosten für die DALL-E 3 Generierung basierend auf der aktuellen Auswahl."""
+def _dalle3_cost_chf() -> float | None:
     try:
         quality = st.session_state[key("dalle_quality_choice")]
         w, h = st.session_state[key("target_size")]
         native_size = get_best_dalle_size(w / h if h > 0 else 1)
-        
-        cost = DALLE3_PRICING_CHF.get(quality, {}).get(native_size)
-        if cost is not None:
-            return f"~{cost:.2f} CHF"
-        return "N/A"
+        return DALLE3_PRICING_CHF.get(quality, {}).get(native_size)
     except Exception:
-        return "N/A"
+        return None
+
+def _get_dalle3_cost() -> str:
+    """Ermittelt die Kosten für die DALL-E 3 Generierung basierend auf der aktuellen Auswahl."""
+    cost = _dalle3_cost_chf()
+    if cost is not None:
+        return f"~{cost:.2f} CHF"
+    return "N/A"
+
+def _source_sku(image_name: str | None) -> str | None:
+    return image_name[4:] if image_name and image_name.startswith("SKU:") else None
 
 def _select_format_and_quality() -> None:
     col_format, col_quality = st.columns(2)
@@ -171,20 +158,45 @@ def _select_format_and_quality() -> None:
             c1, c2 = st.columns(2)
             c1.number_input("Breite (px)", min_value=1, key=key("custom_width"), value=st.session_state[key("custom_width")], on_change=_on_parameter_change)
             c2.number_input("Höhe (px)", min_value=1, key=key("custom_height"), value=st.session_state[key("custom_height")], on_change=_on_parameter_change)
+        if needs_outpainting(st.session_state[key("target_size")]):
+            st.checkbox("↔️ Per Outpainting erweitern (statt Zuschnitt)", key=key("outpaint"), on_change=_on_parameter_change, help="Generiert in nativer Größe und erweitert links/rechts per KI, statt den Großteil des Bildes wegzuschneiden.")
+            if st.session_state[key("outpaint")]:
+                st.radio("Outpainting-Engine:", list(OUTPAINT_ENGINES.keys()), key=key("outpaint_engine"), on_change=_on_parameter_change, horizontal=True)
 
     with col_quality:
         st.markdown("##### KI-Qualität (DALL·E 3)")
         st.radio("Qualität:", ["standard", "hd"], key=key("dalle_quality_choice"), on_change=_on_parameter_change, horizontal=True)
-
+        st.markdown("##### Prompt aus dem Bild")
+        st.radio("Prompt-Modus:", list(PROMPT_MODES.keys()), key=key("prompt_mode"), on_change=_on_parameter_change,
+                 help="Schnell: Farbpalette, Kontrast und Stimmung werden lokal aus den Pixeln bestimmt (Millisekunden, keine Vision-Kosten). "
+                      "Anreicherung: GPT-4o erhält die Messwerte zusätzlich zum Bild.")
+
+def _prompt_mode() -> str:
+    return PROMPT_MODES[st.session_state[key("prompt_mode")]]
+
+
+def _flow_params() -> dict:
+    """Parameter für logic.pipeline; gleiche run_id in beiden Phasen, damit der Prompt aus dem Cache kommt."""
+    return {
+        "image": st.session_state[key("image_input")],
+        "image_url": st.session_state[key("image_url")],
+        "prompt_mode": _prompt_mode(),
+        "run_id": st.session_state[key("run_id")],
+        "target_size": st.session_state[key("target_size")],
+        "quality": st.session_state[key("dalle_quality_choice")],
+        "outpaint": st.session_state[key("outpaint")],
+        "outpaint_engine": OUTPAINT_ENGINES[st.session_state[key("outpaint_engine")]],
+    }
 
 def _perform_generation_flow() -> None:
     if st.session_state[key("generation_phase")] == "prompting":
-        st.session_state[key("status_message")] = "🧠 GPT-4o analysiert Bild und erstellt Prompt..."
+        st.session_state[key("status_message")] = "⚡ Analysiere Etikett lokal und erstelle Prompt..." if _prompt_mode() == "fast" \
+            else "🧠 GPT-4o analysiert Bild und erstellt Prompt..."
         with st.spinner(st.session_state[key("status_message")]):
             try:
-                prompt_template = build_autonomous_prompt()
-                generated_prompt = generate_banner_prompt_gpt4(st.session_state[key("image_input")], prompt_template)
-                st.session_state[key("generated_dalle_prompt")] = generated_prompt
+                result = run_flow("classic", _flow_params(), until="prompt")
+                st.session_state[key("generated_dalle_prompt")] = result["prompt"]
+                st.session_state[key("prompt_seconds")] = result.elapsed
                 st.session_state[key("generation_phase")] = "imaging"
                 st.rerun()
             except Exception as e:
@@ -197,12 +209,15 @@ def _perform_generation_flow() -> None:
         with st.spinner(st.session_state[key("status_message")]):
             try:
                 _update_target_size_from_state() # Sicherstellen, dass target_size aktuell ist
-                w, h = st.session_state[key("target_size")]
-                dalle_size_str = get_best_dalle_size(w / h if h > 0 else 1)
-                img_url = generate_dalle_image(st.session_state[key("generated_dalle_prompt")], dalle_size_str, quality=quality)
-                resp = requests.get(img_url, timeout=45); resp.raise_for_status()
-                img = Image.open(BytesIO(resp.content))
-                st.session_state[key("ai_banner_img")] = img.convert("RGB")
+                result = run_flow("classic", _flow_params(), until="postprocess")
+                st.session_state[key("generated_dalle_prompt")] = result["prompt"]
+                st.session_state[key("ai_banner_img")] = result["postprocess"]
+                record_result(
+                    result["postprocess"], "Banner Generator (Classic)", model=PROMPT_MODE_MODELS[_prompt_mode()], prompt=result["prompt"],
+                    params=result.public_params, cost_chf=_dalle3_cost_chf(),
+                    latency_s=st.session_state[key("prompt_seconds")] + result.elapsed,
+                    sku=_source_sku(st.session_state[key("image_input_name")]),
+                )
                 st.session_state[key("status_message")] = "✅ Banner erfolgreich generiert!"
             except Exception as e:
                 st.error(f"Fehler bei Banner-Generierung: {e}")
@@ -210,36 +225,129 @@ def _perform_generation_flow() -> None:
                 st.session_state[key("generation_phase")] = None
 
 def _crop_and_download() -> None:
-    img_to_crop = st.session_state[key("ai_banner_img")]
-    if not img_to_crop: return 
-    target_w, target_h = st.session_state[key("target_size")]
-    if CROPPER_AVAILABLE:
-        aspect_def_w, aspect_def_h = target_w, target_h
-        if aspect_def_w > CROPPER_ASPECT_DEFINITION_MAX_WIDTH:
-            scale = CROPPER_ASPECT_DEFINITION_MAX_WIDTH / aspect_def_w
-            aspect_def_w = int(aspect_def_w * scale); aspect_def_h = int(aspect_def_h * scale)
-        if aspect_def_h <= 0: aspect_def_h = 1
-        cropped_pil_img = st_cropper(img_to_crop, realtime_update=True, box_color="#8c133a", aspect_ratio=(aspect_def_w, aspect_def_h), key=key("cropper"))
-        final_image = cropped_pil_img.resize((target_w, target_h), Image.Resampling.LANCZOS)
-    else: st.warning("`streamlit-cropper` nicht installiert."); final_image = img_to_crop
-    st.image(final_image, caption=f"Vorschau Banner ({target_w}×{target_h}px)", width=400)
-    img_byte_buffer = BytesIO(); save_kwargs_dl = {}
-    if OUTPUT_IMAGE_FORMAT == "JPEG":
-        save_kwargs_dl["quality"] = OUTPUT_IMAGE_QUALITY_DOWNLOAD
-        if final_image.mode in ("RGBA", "P"): final_image = final_image.convert("RGB")
-    final_image.save(img_byte_buffer, format=OUTPUT_IMAGE_FORMAT, **save_kwargs_dl)
-    st.download_button(f"📥 Banner herunterladen ({target_w}×{target_h}px)", data=img_byte_buffer.getvalue(), file_name=f"classic_banner_{target_w}x{target_h}.{OUTPUT_IMAGE_EXTENSION}", mime=OUTPUT_IMAGE_MIME, type="primary", use_container_width=True)
+    final_image = crop_banner(PREFIX)
+    if final_image is not None:
+        download_banner(PREFIX, final_image, "classic_banner", OUTPUT_IMAGE_FORMAT)
+
+# ---------------------------------------------------- Stapel-Modus
+def _batch_status_table(items) -> str:
+    rows = ["| Eintrag | Status | Zeit |", "|---|---|---|"]
+    for item in items:
+        status = BATCH_STATUS_LABELS.get(item.status, item.status)
+        if item.error:
+            status += f": {item.error[:80]}"
+        elif item.duplicate_of:
+            status += f" (Prompt von {item.duplicate_of})"
+        rows.append(f"| {item.label} | {status} | {item.elapsed:.1f} s |")
+    return "\n".join(rows)
+
+def _perform_batch_generation(df_skus: "pd.DataFrame") -> None:
+    variants = st.session_state[key("batch_variants")]
+    image = st.session_state[key("image_input")] if st.session_state[key("batch_include_image")] else None
+    items = build_batch_items(st.session_state[key("batch_skus")].splitlines(), variants, image, st.session_state[key("image_input_name")] or "Bild")
+    if not items:
+        st.warning("Bitte mindestens eine SKU eingeben oder ein Bild laden."); return
+
+    _update_target_size_from_state()
+    target_size = st.session_state[key("target_size")]
+    run = ClassicBatchRun(
+        items, df_skus, target_size, quality=st.session_state[key("dalle_quality_choice")],
+        outpaint=st.session_state[key("outpaint")], outpaint_engine=OUTPAINT_ENGINES[st.session_state[key("outpaint_engine")]],
+        dedupe=st.session_state[key("batch_dedupe")], prompt_mode=_prompt_mode(), batch_vision=st.session_state[key("batch_vision")],
+    )
+    started = time.perf_counter()
+    progress, table = st.progress(0.0), st.empty()
+    table.markdown(_batch_status_table(run.items))
+    for _ in run.updates():
+        done = len(run.items) - len(run.pending)
+        progress.progress(done / len(run.items), text=f"{done}/{len(run.items)} abgeschlossen")
+        table.markdown(_batch_status_table(run.items))
+
+    results = []
+    for item in run.items:
+        result = {"label": item.label, "duplicate_of": item.duplicate_of, "prompt": item.prompt, "error": item.error, "elapsed": item.elapsed, "image": None, "bytes": None}
+        if item.image is not None:
+            record_result(
+                item.image, "Banner Generator (Classic)", model=PROMPT_MODE_MODELS[run.prompt_mode], prompt=item.prompt,
+                params={"target_size": target_size, "quality": run.quality, "outpaint": run.outpaint, "batch": True,
+                        "prompt_mode": run.prompt_mode, "duplicate_of": item.duplicate_of},
+                cost_chf=_dalle3_cost_chf(), latency_s=item.elapsed,
+                sku=item.sku or _source_sku(st.session_state[key("image_input_name")]),
+            )
+            final_image = fit_to_target(item.image, target_size, use_super_resolution=False)
+            result["image"] = final_image
+            result["bytes"], _ = export_image(final_image, target_size, OUTPUT_IMAGE_FORMAT)
+        results.append(result)
+    st.session_state[key("batch_results")] = results
+    ok = sum(1 for r in results if r["image"] is not None)
+    st.session_state[key("status_message")] = f"✅ {ok}/{len(results)} Banner in {time.perf_counter() - started:.1f} s generiert." if ok \
+        else "Fehler: Kein Banner des Stapels konnte generiert werden."
+
+def _render_batch_results() -> None:
+    results = st.session_state[key("batch_results")]
+    if not results: return
+    tw, th = st.session_state[key("target_size")]
+    for row_start in range(0, len(results), BATCH_GRID_COLUMNS):
+        cols = st.columns(BATCH_GRID_COLUMNS)
+        for col, (i, result) in zip(cols, enumerate(results[row_start:row_start + BATCH_GRID_COLUMNS], start=row_start)):
+            with col:
+                if result["image"] is None:
+                    st.error(f"{result['label']}: {result['error']}"); continue
+                st.image(result["image"], caption=f"{result['label']} ({result['elapsed']:.1f} s)", use_container_width=True)
+                if result.get("duplicate_of"):
+                    st.caption(f"♻️ Prompt übernommen von {result['duplicate_of']}")
+                with st.expander("💡 Prompt", expanded=False):
+                    st.code(result["prompt"], language="text")
+                label_slug = "".join(c if c.isalnum() else "_" for c in result["label"]).strip("_")
+                st.download_button("📥 Herunterladen", data=result["bytes"], file_name=f"classic_banner_{label_slug}_{tw}x{th}.{OUTPUT_IMAGE_EXTENSION}", mime=OUTPUT_IMAGE_MIME, key=key(f"batch_download_{i}"), use_container_width=True)
+
+def _render_batch_mode(df_skus: "pd.DataFrame") -> None:
+    _render_step_header(1, "SKUs & Format")
+    st.text_area("SKUs (eine pro Zeile):", key=key("batch_skus"), height=140)
+    c1, c2 = st.columns(2)
+    c1.number_input("Varianten pro Bild:", min_value=1, max_value=MAX_BATCH_VARIANTS, key=key("batch_variants"))
+    if st.session_state[key("image_input")]:
+        c2.checkbox(f"Geladenes Bild einbeziehen ({st.session_state[key('image_input_name')]})", key=key("batch_include_image"))
+    st.checkbox("♻️ Beinahe-Duplikate erkennen (gleiches Produktbild → eine GPT-4o-Analyse für alle)", key=key("batch_dedupe"))
+    st.checkbox(f"🧠 Bis zu {BATCH_MAX_IMAGES} Bilder pro GPT-4o-Anfrage analysieren (nur Vision-Modus)", key=key("batch_vision"),
+                help="Verkleinerte Bilder in einer Anfrage mit JSON-Antwort; fehlende Prompts werden einzeln nachgeholt.")
+    st.markdown("---")
+    _select_format_and_quality()
+    _update_target_size_from_state()
+
+    sku_count = len({s.strip() for s in st.session_state[key("batch_skus")].splitlines() if s.strip()})
+    image_count = sku_count + (1 if st.session_state[key("image_input")] and st.session_state[key("batch_include_image")] else 0)
+    total = image_count * st.session_state[key("batch_variants")]
+    tw, th = st.session_state[key("target_size")]
+    st.caption(f"📐 Zielgröße: {tw}x{th}px | 🖼️ {total} Banner | 💰 Geschätzte Kosten pro Banner: {_get_dalle3_cost()}")
+    st.caption("<small><i>GPT-4o analysiert bereits das nächste Bild, während DALL·E das vorherige rendert.</i></small>", unsafe_allow_html=True)
+
+    _render_step_header(2, "Stapel generieren")
+    if st.button(f"🚀 {total} KI-Banner generieren", type="primary", use_container_width=True, disabled=total == 0):
+        _perform_batch_generation(df_skus)
+
+    if st.session_state[key("status_message")]:
+        if "✅" in st.session_state[key("status_message")]:
+            st.success(st.session_state[key("status_message")])
+        else:
+            st.error(st.session_state[key("status_message")])
+        st.session_state[key("status_message")] = ""
+    _render_batch_results()
 
 # ---------------------------------------------------- Haupt-Page
 def banner_generator_classic_page() -> None:
     initialize_session_state()
     df_skus = load_sku_data(SKU_CSV_FILENAME)
     _render_hero()
+
+    st.radio("Modus:", GENERATION_MODES, key=key("mode"), horizontal=True)
+    if st.session_state[key("mode")] != GENERATION_MODES[0]:
+        _render_batch_mode(df_skus); return
     
     _render_step_header(1, "Bildquelle & Format")
     up_col, sku_col = st.columns([0.6, 0.4])
-    with up_col: _handle_upload()
-    with sku_col: _handle_sku_lookup(df_skus)
+    with up_col: handle_upload(PREFIX, _on_new_image)
+    with sku_col: handle_sku_lookup(PREFIX, df_skus, _on_new_image)
 
     if not st.session_state[key("image_input")]:
         st.info("Bitte zuerst ein Bild hochladen oder per SKU laden."); st.stop()
@@ -257,12 +365,14 @@ def banner_generator_classic_page() -> None:
     quality_display = st.session_state[key('dalle_quality_choice')].upper()
     
     st.caption(f"📐 Zielgröße für Zuschnitt: {tw}x{th}px | 🎨 DALL·E 3 Qualität: {quality_display} | 💰 Geschätzte Kosten: {cost_estimate}")
-    st.caption("<small><i>*Die Kosten für die Bildanalyse durch GPT-4o Vision sind hier nicht eingerechnet (typ. < 0.01 CHF).</i></small>", unsafe_allow_html=True)
+    if _prompt_mode() != "fast":
+        st.caption("<small><i>*Die Kosten für die Bildanalyse durch GPT-4o Vision sind hier nicht eingerechnet (typ. < 0.01 CHF).</i></small>", unsafe_allow_html=True)
 
 
     _render_step_header(2, "KI-Banner generieren")
     if st.button("🚀 KI-Banner generieren", type="primary", use_container_width=True, disabled=st.session_state[key("generation_phase")] is not None):
         st.session_state[key("generation_phase")] = "prompting"
+        st.session_state[key("run_id")] = uuid.uuid4().hex
         st.rerun()
     
     _perform_generation_flow()
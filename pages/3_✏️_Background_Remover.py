@@ -1,12 +1,15 @@
+import time
+_PAGE_IMPORT_START = time.perf_counter()
 import streamlit as st
 from PIL import Image, ImageOps
-import pandas as pd
 import io
 import os
-import requests
-from rembg import remove
 import base64 # Für die Base64-Kodierung der Bilder für HTML
-from typing import Tuple, Optional, List, Any
+from typing import TYPE_CHECKING, Tuple, Optional, List, Any
+
+if TYPE_CHECKING:
+    import pandas as pd  # pandas wird erst mit den SKU-Daten geladen
+
 from streamlit.runtime.uploaded_file_manager import UploadedFile # type: ignore
 
 # Importe aus utils.py
@@ -16,9 +19,20 @@ project_root = os.path.dirname(current_dir)
 if project_root not in sys.path:
     sys.path.append(project_root)
 
-from utils import load_css, load_sku_data, SKU_CSV_FILENAME
+from utils import load_css, load_sku_data, find_sku_row, render_sku_search, SKU_CSV_FILENAME
+from logic.instrumentation import record_page_startup
+from logic.clients import get_http_session
+from logic.matte import MATTE_ASPECT_PRESETS, DEFAULT_MATTE_OPTIONS, postprocess_matte, transfer_alpha
+from logic.image_encoding import encode_image
+from logic.background_removal import (
+    REMBG_MODELS, DEFAULT_REMBG_MODEL, DEFAULT_EXECUTION_PROVIDER, DEFAULT_ALPHA_MATTING_OPTIONS, EXECUTION_PROVIDER_OPTIONS,
+    available_execution_providers, get_session_pool, remove_background,
+)
+from logic.cutout_store import load_cutout, store_cutout
+from logic.phash import register_and_find_duplicates
 
 # --- Seitenkonfiguration ---
+record_page_startup("Background Remover", time.perf_counter() - _PAGE_IMPORT_START)
 st.set_page_config(
     page_title="Background Remover",
     page_icon="✏️",
@@ -30,6 +44,10 @@ load_css()
 TARGET_PREVIEW_HEIGHT: int = 300
 SUPPORTED_IMAGE_TYPES_BG_REMOVER: List[str] = ["png", "jpg", "jpeg", "webp"]
 REQUESTS_TIMEOUT_BG_REMOVER: int = 15
+MATTE_BACKGROUND_OPTIONS: List[str] = ["Transparent", "Weiß", "Markenfarbe"]
+DEFAULT_BRAND_COLOR_HEX: str = "#8c133a"
+MATTE_JPEG_QUALITY: int = 90
+OPTIMIZER_PAGE_PATH: str = "pages/4_✂️_Image_Optimizer.py"
 
 # --- Session State Initialisierung für diese Seite ---
 def initialize_bg_remover_session_state() -> None:
@@ -42,6 +60,17 @@ def initialize_bg_remover_session_state() -> None:
         prefix + "sku_input_text": "",
         prefix + "last_uploaded_file_id": None,
         prefix + "processing_error": None,
+        prefix + "matte_image_pil": None,
+        prefix + "rembg_model": DEFAULT_REMBG_MODEL,
+        prefix + "alpha_matting": False,
+        prefix + "alpha_fg_threshold": DEFAULT_ALPHA_MATTING_OPTIONS["alpha_matting_foreground_threshold"],
+        prefix + "alpha_bg_threshold": DEFAULT_ALPHA_MATTING_OPTIONS["alpha_matting_background_threshold"],
+        prefix + "alpha_erode_size": DEFAULT_ALPHA_MATTING_OPTIONS["alpha_matting_erode_size"],
+        prefix + "execution_provider": DEFAULT_EXECUTION_PROVIDER,
+        prefix + "threads": 0,
+        prefix + "last_inference_seconds": None,
+        prefix + "reused_from_sku": None,
+        prefix + "source_url": None,
     }
     for key, value in session_defaults.items():
         if key not in st.session_state:
@@ -54,13 +83,75 @@ def reset_bg_remover_images() -> None:
     st.session_state[prefix + "current_sku"] = None
     st.session_state[prefix + "image_source_name"] = None
     st.session_state[prefix + "processing_error"] = None
+    st.session_state[prefix + "matte_image_pil"] = None
+    st.session_state[prefix + "reused_from_sku"] = None
+    st.session_state[prefix + "source_url"] = None
 
 # --- Helper Funktionen für diese Seite ---
-def process_and_store_image(image_bytes: bytes, source_name: str, sku: Optional[str] = None) -> None:
+def _matting_options() -> Optional[dict]:
+    """Aktuelle Alpha-Matting-Parameter oder None, wenn Alpha-Matting aus ist (auch Teil des Store-Schlüssels)."""
+    prefix = "bg_remover_"
+    if not st.session_state[prefix + "alpha_matting"]:
+        return None
+    return {
+        "alpha_matting_foreground_threshold": st.session_state[prefix + "alpha_fg_threshold"],
+        "alpha_matting_background_threshold": st.session_state[prefix + "alpha_bg_threshold"],
+        "alpha_matting_erode_size": st.session_state[prefix + "alpha_erode_size"],
+    }
+
+def load_cutout_from_store(sku: str, image_url: str) -> bool:
+    """
+    Übernimmt eine vorab berechnete Freistellung, ohne das Originalbild herunterzuladen.
+    Das Original wird erst auf Wunsch nachgeladen (siehe load_original_image).
+    """
+    prefix = "bg_remover_"
+    model = st.session_state[prefix + "rembg_model"]
+    cutout = load_cutout(image_url, model, matting=_matting_options())
+    if cutout is None:
+        return False
+    reset_bg_remover_images()
+    st.session_state[prefix + "image_source_name"] = f"SKU_{sku}"
+    st.session_state[prefix + "current_sku"] = sku
+    st.session_state[prefix + "source_url"] = image_url
+    st.session_state[prefix + "freigestelltes_image_pil"] = cutout
+    st.session_state[prefix + "last_inference_seconds"] = 0.0
+    return True
+
+def load_original_image(image_url: str) -> None:
+    """Lädt das Originalbild zu einer Freistellung aus dem Cut-out-Store nach."""
+    prefix = "bg_remover_"
+    try:
+        response = get_http_session().get(image_url, timeout=REQUESTS_TIMEOUT_BG_REMOVER)
+        response.raise_for_status()
+        original = ImageOps.exif_transpose(Image.open(io.BytesIO(response.content)))
+        st.session_state[prefix + "original_image_pil"] = original.convert("RGBA")
+    except Exception as e:
+        st.session_state[prefix + "processing_error"] = f"Originalbild konnte nicht geladen werden: {e}"
+
+def _reuse_duplicate_cutout(sku: str, image_url: str, original: Image.Image, model: str) -> Optional[Tuple[str, Image.Image]]:
+    """
+    Alpha-Maske eines Beinahe-Duplikats (andere SKU) aus dem Cut-out-Store auf das eigene Bild übertragen,
+    sofern Größe und Ausrichtung übereinstimmen; sonst None (dann wird per rembg freigestellt).
+    """
+    try:
+        matches = register_and_find_duplicates(sku, image_url, original)
+    except Exception as e:
+        print(f"pHash-Abgleich fehlgeschlagen: {e}")
+        return None
+    for match in matches:
+        cutout = load_cutout(match.image_url, model, matting=_matting_options())
+        reused = transfer_alpha(cutout, original) if cutout is not None else None
+        if reused is not None:
+            return match.sku, reused
+    return None
+
+def process_and_store_image(image_bytes: bytes, source_name: str, sku: Optional[str] = None, image_url: Optional[str] = None,
+                            allow_reuse: bool = True) -> None:
     prefix = "bg_remover_"
     reset_bg_remover_images()
     st.session_state[prefix + "image_source_name"] = source_name
     st.session_state[prefix + "current_sku"] = sku
+    st.session_state[prefix + "source_url"] = image_url
     original_pil_temp = None
 
     try:
@@ -71,15 +162,38 @@ def process_and_store_image(image_bytes: bytes, source_name: str, sku: Optional[
             st.session_state[prefix + "original_image_pil"] = original_pil_temp
 
         if original_pil_temp:
-            with st.spinner("Entferne Hintergrund... Dies kann einen Moment dauern."):
-                buffer = io.BytesIO()
-                original_pil_temp.save(buffer, format="PNG")
-                original_png_bytes_for_rembg = buffer.getvalue()
-
-                removed_bg_bytes: bytes = remove(original_png_bytes_for_rembg)
-                freigestelltes_pil = Image.open(io.BytesIO(removed_bg_bytes)).convert("RGBA")
+            model = st.session_state[prefix + "rembg_model"]
+            # Vorab berechnete Freistellung aus dem Cut-out-Store verwenden, falls vorhanden
+            cached_cutout = load_cutout(image_url, model, matting=_matting_options()) if image_url else None
+            if cached_cutout is not None and cached_cutout.size == original_pil_temp.size:
+                st.session_state[prefix + "freigestelltes_image_pil"] = cached_cutout
+                st.session_state[prefix + "last_inference_seconds"] = 0.0
+                st.success(f"Freistellung aus dem Cut-out-Store geladen ({model}).")
+                return
+            # Gleiches Etikett unter anderer SKU (Jahrgang, Flaschengröße)? Dann deren Freistellung übernehmen
+            reused = _reuse_duplicate_cutout(sku, image_url, original_pil_temp, model) if allow_reuse and sku and image_url else None
+            if reused is not None:
+                st.session_state[prefix + "freigestelltes_image_pil"] = reused[1]
+                st.session_state[prefix + "last_inference_seconds"] = 0.0
+                st.session_state[prefix + "reused_from_sku"] = reused[0]
+                return
+            with st.spinner(f"Entferne Hintergrund mit {model}... Dies kann einen Moment dauern."):
+                freigestelltes_pil, inference_seconds = remove_background(
+                    original_pil_temp,
+                    model=model,
+                    alpha_matting=st.session_state[prefix + "alpha_matting"],
+                    alpha_matting_options=_matting_options(),
+                    execution_provider=st.session_state[prefix + "execution_provider"],
+                    threads=st.session_state[prefix + "threads"] or None,
+                )
                 st.session_state[prefix + "freigestelltes_image_pil"] = freigestelltes_pil
-                st.success("Hintergrund erfolgreich entfernt!")
+                st.session_state[prefix + "last_inference_seconds"] = inference_seconds
+                if image_url:
+                    try:
+                        store_cutout(image_url, model, freigestelltes_pil, image_bytes, sku, matting=_matting_options())
+                    except (OSError, TimeoutError) as store_error:
+                        st.warning(f"Freistellung konnte nicht im Cut-out-Store gespeichert werden: {store_error}")
+                st.success(f"Hintergrund erfolgreich entfernt! ({model}: {inference_seconds:.2f} s)")
         else:
             st.session_state[prefix + "processing_error"] = "Originalbild konnte nicht geladen werden."
             st.error(st.session_state[prefix + "processing_error"])
@@ -99,6 +213,115 @@ def process_and_store_image(image_bytes: bytes, source_name: str, sku: Optional[
                 except Exception as final_e:
                     st.warning(f"Konnte Originalbild auch im Fallback nicht laden: {final_e}")
 
+def _hex_to_rgb(hex_color: str) -> Tuple[int, int, int]:
+    hex_color = hex_color.lstrip("#")
+    return int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16)
+
+def send_to_optimizer(img: Image.Image, name: str) -> None:
+    """Übergibt das Bild direkt (als PIL-Objekt) an den Image Optimizer und wechselt die Seite."""
+    opt_prefix = "optimizer_"
+    st.session_state[opt_prefix + "original_img_details"] = {
+        'image': img, 'name': name, 'type': img.mode,
+        'width': img.width, 'height': img.height, 'source': 'bg_remover'
+    }
+    st.session_state[opt_prefix + "cropped_img"] = None
+    st.session_state[opt_prefix + "error_message"] = None
+    # Verhindert, dass der Optimizer beim ersten Aufruf seinen State (inkl. Bild) zurücksetzt
+    st.session_state[opt_prefix + "initialized_flag"] = True
+    st.switch_page(OPTIMIZER_PAGE_PATH)
+
+def render_matte_postprocessing(freigestellt: Image.Image, original: Optional[Image.Image], source_name: str) -> None:
+    """UI für Zuschnitt, Kantenbehandlung, Auffüllen und Hintergrund der Freistellung."""
+    prefix = "bg_remover_"
+    st.markdown("---")
+    st.subheader("3. Nachbearbeitung")
+    col_edge, col_layout = st.columns(2)
+    with col_edge:
+        trim = st.checkbox("Auf Objekt zuschneiden", value=DEFAULT_MATTE_OPTIONS["trim"], key=prefix + "matte_trim")
+        decontaminate = st.checkbox("Farbsäume entfernen", value=DEFAULT_MATTE_OPTIONS["decontaminate"], key=prefix + "matte_decontaminate")
+        alpha_threshold = st.slider("Alpha-Schwelle", 0, 128, DEFAULT_MATTE_OPTIONS["alpha_threshold"], key=prefix + "matte_threshold")
+        erode_px = st.slider("Kante einziehen (px)", 0, 10, DEFAULT_MATTE_OPTIONS["erode_px"], key=prefix + "matte_erode")
+        feather_px = st.slider("Kante weichzeichnen (px)", 0, 10, DEFAULT_MATTE_OPTIONS["feather_px"], key=prefix + "matte_feather")
+    with col_layout:
+        aspect_preset = st.selectbox("Seitenverhältnis", list(MATTE_ASPECT_PRESETS.keys()), key=prefix + "matte_aspect")
+        padding_pct = st.slider("Rand (%)", 0, 40, DEFAULT_MATTE_OPTIONS["padding_pct"], key=prefix + "matte_padding")
+        background_choice = st.radio("Hintergrund", MATTE_BACKGROUND_OPTIONS, key=prefix + "matte_background", horizontal=True)
+        background_color = None
+        if background_choice == "Weiß":
+            background_color = (255, 255, 255)
+        elif background_choice == "Markenfarbe":
+            background_color = _hex_to_rgb(st.color_picker("Markenfarbe", DEFAULT_BRAND_COLOR_HEX, key=prefix + "matte_brand_color"))
+
+    options = {
+        "trim": trim, "alpha_threshold": alpha_threshold, "erode_px": erode_px, "feather_px": feather_px,
+        "decontaminate": decontaminate, "aspect_preset": aspect_preset, "padding_pct": padding_pct,
+        "background_color": background_color,
+    }
+    try:
+        matte_img = postprocess_matte(freigestellt, original, options)
+    except Exception as e:
+        st.error(f"Fehler bei der Nachbearbeitung: {e}")
+        return
+    st.session_state[prefix + "matte_image_pil"] = matte_img
+
+    preview_bg_class = "transparent-preview-bg" if matte_img.mode == "RGBA" else "original-preview-container"
+    with st.container():
+        st.markdown(f'<div class="{preview_bg_class}">', unsafe_allow_html=True)
+        st.image(matte_img, caption=f"Nachbearbeitet: {matte_img.width}x{matte_img.height}px", use_container_width=True)
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    base_name = os.path.splitext(source_name or "bild")[0]
+    if matte_img.mode == "RGBA":
+        file_ext, mime, download_data = "png", "image/png", encode_image(matte_img, "PNG", quality=0)
+    else:
+        file_ext, mime, download_data = "jpg", "image/jpeg", encode_image(matte_img, "JPEG", quality=MATTE_JPEG_QUALITY)
+
+    col_dl, col_opt = st.columns(2)
+    with col_dl:
+        st.download_button(
+            label=f"📥 Nachbearbeitet herunterladen (.{file_ext})",
+            data=download_data,
+            file_name=f"freigestellt_{base_name}.{file_ext}",
+            mime=mime,
+            key=prefix + "download_matte_btn",
+            use_container_width=True,
+        )
+    with col_opt:
+        if st.button("✂️ Im Image Optimizer öffnen", key=prefix + "send_to_optimizer_btn", use_container_width=True):
+            send_to_optimizer(matte_img, f"freigestellt_{base_name}.{file_ext}")
+
+def render_model_settings() -> None:
+    """Modellwahl, Alpha-Matting und Ausführungsoptionen für rembg."""
+    prefix = "bg_remover_"
+    with st.expander("⚙️ Modell & Leistung", expanded=False):
+        col_model, col_exec = st.columns(2)
+        with col_model:
+            model_names = list(REMBG_MODELS.keys())
+            st.selectbox(
+                "rembg-Modell", model_names, key=prefix + "rembg_model",
+                format_func=lambda m: f"{m} – {REMBG_MODELS[m].split(' – ', 1)[-1]}",
+            )
+            st.checkbox("Alpha-Matting (feinere Kanten, langsamer)", key=prefix + "alpha_matting")
+            if st.session_state[prefix + "alpha_matting"]:
+                st.slider("Vordergrund-Schwelle", 0, 255, key=prefix + "alpha_fg_threshold")
+                st.slider("Hintergrund-Schwelle", 0, 255, key=prefix + "alpha_bg_threshold")
+                st.slider("Erosion", 0, 40, key=prefix + "alpha_erode_size")
+        with col_exec:
+            providers = available_execution_providers()
+            if st.session_state[prefix + "execution_provider"] not in providers:
+                st.session_state[prefix + "execution_provider"] = providers[0]
+            st.selectbox("Execution Provider", providers, key=prefix + "execution_provider")
+            st.number_input("Threads (0 = automatisch)", min_value=0, max_value=64, step=1, key=prefix + "threads")
+            pool = get_session_pool()
+            loaded, loading = pool.loaded_models(), pool.loading_models()
+            st.caption(f"Geladene Modelle: {', '.join(loaded) if loaded else '–'} (max. {pool.max_size})"
+                       + (f" · wird geladen: {', '.join(loading)}" if loading else ""))
+
+        timing_rows = get_session_pool().timing_summary()
+        if timing_rows:
+            st.markdown("###### Inferenzzeiten pro Modell")
+            st.dataframe(timing_rows, hide_index=True, use_container_width=True)
+
 # --- Hauptanwendung für diese Seite ---
 def background_remover_page() -> None:
     st.title("🪄 Automatischer Background Remover")
@@ -108,6 +331,22 @@ def background_remover_page() -> None:
 
     sku_df: pd.DataFrame = load_sku_data(SKU_CSV_FILENAME)
 
+    # Gewähltes Modell im Hintergrund vorwärmen, damit die erste Freistellung nicht auf das Laden wartet
+    pool = get_session_pool()
+    selected_model = st.session_state[prefix + "rembg_model"]
+    preload_flag = prefix + "preloading_" + selected_model
+    if selected_model in pool.loaded_models():
+        # Flag zurücksetzen, damit ein später verdrängtes Modell erneut vorgewärmt wird
+        st.session_state.pop(preload_flag, None)
+    elif not st.session_state.get(preload_flag) and selected_model not in pool.loading_models():
+        st.session_state[preload_flag] = True
+        pool.preload_async(
+            selected_model,
+            EXECUTION_PROVIDER_OPTIONS.get(st.session_state[prefix + "execution_provider"]),
+            st.session_state[prefix + "threads"] or None,
+        )
+    render_model_settings()
+
     with st.container(border=True):
         st.subheader("1. Bild-Input")
         # ... (Input-Logik bleibt unverändert von der vorherigen Version) ...
@@ -132,14 +371,7 @@ def background_remover_page() -> None:
 
         with input_col2:
             st.markdown("##### Bild via SKU laden")
-            current_sku_text = st.session_state.get(prefix + "sku_input_text", "")
-            new_sku_text = st.text_input(
-                "Produkt SKU:", value=current_sku_text, key=prefix + "sku_input_widget_final_bg",
-                label_visibility="collapsed",
-                on_change=reset_bg_remover_images
-            )
-            if new_sku_text != current_sku_text:
-                 st.session_state[prefix + "sku_input_text"] = new_sku_text
+            render_sku_search(prefix + "sku_input_text", sku_df, "Produkt SKU:")
 
             if st.button("🔎 SKU laden & Freistellen", key=prefix + "load_sku_btn_final_bg", use_container_width=True, type="primary"):
                 sku_to_load: str = st.session_state[prefix + "sku_input_text"].strip()
@@ -147,17 +379,17 @@ def background_remover_page() -> None:
                     reset_bg_remover_images()
                     if sku_df.empty: st.error("SKU-Daten nicht geladen.")
                     else:
-                        match = sku_df[sku_df["sku"] == sku_to_load]
-                        if match.empty: st.error(f"SKU '{sku_to_load}' nicht gefunden.")
+                        match = find_sku_row(sku_df, sku_to_load)
+                        if match is None: st.error(f"SKU '{sku_to_load}' nicht gefunden.")
                         else:
-                            image_url = str(match["image_url"].values[0]).strip()
+                            image_url = str(match["image_url"]).strip()
                             if not image_url or not image_url.startswith("http"):
                                 st.error(f"Keine gültige Bild-URL für SKU '{sku_to_load}'.")
-                            else:
+                            elif not load_cutout_from_store(sku_to_load, image_url):
                                 try:
-                                    response = requests.get(image_url, timeout=REQUESTS_TIMEOUT_BG_REMOVER)
+                                    response = get_http_session().get(image_url, timeout=REQUESTS_TIMEOUT_BG_REMOVER)
                                     response.raise_for_status()
-                                    process_and_store_image(response.content, f"SKU_{sku_to_load}", sku_to_load)
+                                    process_and_store_image(response.content, f"SKU_{sku_to_load}", sku_to_load, image_url)
                                 except Exception as e:
                                     st.error(f"Fehler bei SKU '{sku_to_load}': {e}")
                                     st.session_state[prefix + "processing_error"] = str(e)
@@ -170,28 +402,46 @@ def background_remover_page() -> None:
     freigestelltes_image_to_display: Optional[Image.Image] = st.session_state.get(prefix + "freigestelltes_image_pil")
     image_source_name: Optional[str] = st.session_state.get(prefix + "image_source_name")
 
-    if original_image_to_display:
+    if original_image_to_display or freigestelltes_image_to_display:
         st.markdown("---")
         st.subheader("2. Ergebnisse")
+        reused_from_sku = st.session_state.get(prefix + "reused_from_sku")
+        if reused_from_sku and freigestelltes_image_to_display:
+            info_col, redo_col = st.columns([0.75, 0.25])
+            info_col.info(f"♻️ Beinahe-Duplikat erkannt: Maske der Freistellung von SKU {reused_from_sku} auf dieses Bild übertragen.")
+            if redo_col.button("🔁 Neu freistellen", key=prefix + "redo_duplicate_btn", use_container_width=True):
+                buffer = io.BytesIO()
+                original_image_to_display.save(buffer, format="PNG")
+                process_and_store_image(buffer.getvalue(), image_source_name or "Bild", st.session_state[prefix + "current_sku"],
+                                        st.session_state[prefix + "source_url"], allow_reuse=False)
+                st.rerun()
         col_orig, col_frei = st.columns(2)
 
         with col_orig:
             st.markdown("##### Originalbild")
-            # Konvertiere Original für HTML-Einbettung (PNG Format für Vorschau, um Alpha zu erhalten, falls vorhanden)
-            buffered_orig = io.BytesIO()
-            original_image_to_display.save(buffered_orig, format="PNG")
-            img_str_base64_orig = base64.b64encode(buffered_orig.getvalue()).decode()
-
-            st.markdown(
-                f"""
-                <div class="original-preview-container" style="max-width: 100%; text-align: center; line-height: {TARGET_PREVIEW_HEIGHT}px;">
-                    <img src="data:image/png;base64,{img_str_base64_orig}" alt="Originalbild"
-                         style="max-width:100%; max-height:{TARGET_PREVIEW_HEIGHT}px; object-fit:contain; vertical-align: middle;">
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
-            st.caption(f"Original: {image_source_name or 'Bild'}")
+            if original_image_to_display is None:
+                if st.session_state.get(prefix + "processing_error"):
+                    st.warning(st.session_state[prefix + "processing_error"])
+                st.info("Freistellung aus dem Cut-out-Store – das Original wurde nicht heruntergeladen.")
+                if st.button("🖼️ Originalbild laden", key=prefix + "load_original_btn", use_container_width=True):
+                    load_original_image(st.session_state[prefix + "source_url"])
+                    st.rerun()
+            else:
+                # Konvertiere Original für HTML-Einbettung (PNG Format für Vorschau, um Alpha zu erhalten, falls vorhanden)
+                buffered_orig = io.BytesIO()
+                original_image_to_display.save(buffered_orig, format="PNG")
+                img_str_base64_orig = base64.b64encode(buffered_orig.getvalue()).decode()
+
+                st.markdown(
+                    f"""
+                    <div class="original-preview-container" style="max-width: 100%; text-align: center; line-height: {TARGET_PREVIEW_HEIGHT}px;">
+                        <img src="data:image/png;base64,{img_str_base64_orig}" alt="Originalbild"
+                             style="max-width:100%; max-height:{TARGET_PREVIEW_HEIGHT}px; object-fit:contain; vertical-align: middle;">
+                    </div>
+                    """,
+                    unsafe_allow_html=True
+                )
+                st.caption(f"Original: {image_source_name or 'Bild'}")
 
         if freigestelltes_image_to_display:
             with col_frei:
@@ -223,6 +473,7 @@ def background_remover_page() -> None:
                     use_container_width=True,
                     type="primary"
                 )
+            render_matte_postprocessing(freigestelltes_image_to_display, original_image_to_display, image_source_name or "bild")
         elif st.session_state.get(prefix + "processing_error"):
             with col_frei:
                 st.error("Fehler bei der Freistellung.")
@@ -1,7 +1,9 @@
+import time
+_PAGE_IMPORT_START = time.perf_counter()
 import streamlit as st
 from PIL import Image, ImageOps
 from io import BytesIO
-import requests
+import hashlib
 
 # Importe aus utils.py
 import sys
@@ -12,6 +14,10 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 from utils import load_css
+from logic.instrumentation import record_page_startup
+from logic.clients import get_http_session
+from logic.image_encoding import SUPPORTED_SEARCH_FORMATS, encode_to_target
+from logic.upscale import resize_to_target, super_resolution_applies, upscaler_available
 
 # Cropper Import (bleibt spezifisch hier)
 try:
@@ -23,6 +29,7 @@ except ImportError:
 
 
 # --- Seitenkonfiguration ---
+record_page_startup("Image Optimizer", time.perf_counter() - _PAGE_IMPORT_START)
 st.set_page_config(
     page_title="Image Optimizer",
     page_icon="✂️",
@@ -43,6 +50,9 @@ FORMAT_OPTIONS_ORDER_OPTIMIZER = list(ASPECT_RATIOS_CONFIG_OPTIMIZER.keys())
 DEFAULT_CUSTOM_WIDTH_OPTIMIZER = 1200
 DEFAULT_CUSTOM_HEIGHT_OPTIMIZER = 800
 DEFAULT_JPEG_QUALITY_OPTIMIZER = 80 # Höhere Standardqualität
+COMPRESSION_MODES_OPTIMIZER = ["Feste Qualität", "Zielgröße (KB)", "Qualitäts-Untergrenze (SSIM)", "Zielgröße + SSIM"]
+DEFAULT_TARGET_KB_OPTIMIZER = 250
+DEFAULT_MIN_SSIM_OPTIMIZER = 0.95
 DEFAULT_INITIAL_BOX_WIDTH_SCALE_FACTOR_OPTIMIZER = 0.3 # Größerer Startwert
 MIN_BOX_SCALE_FACTOR_OPTIMIZER = 0.05
 MAX_BOX_SCALE_FACTOR_OPTIMIZER = 0.95 # Kann bis fast Vollbild gehen
@@ -54,9 +64,11 @@ def init_optimizer_session_state(full_reset=False):
     # Prefix für Session State Keys dieser Seite
     prefix = "optimizer_"
     defaults = {
-        'cropped_img': None, 'original_img_details': None, 'image_url': "",
+        'cropped_img': None, 'crop_box': None, 'sr_result': None, 'encoded_result': None, 'original_img_details': None, 'image_url': "",
         'error_message': None, 'uploader_key': 0, 'output_format': "JPEG",
         'jpeg_quality': DEFAULT_JPEG_QUALITY_OPTIMIZER,
+        'compression_mode': COMPRESSION_MODES_OPTIMIZER[0],
+        'target_kb': DEFAULT_TARGET_KB_OPTIMIZER, 'min_ssim': DEFAULT_MIN_SSIM_OPTIMIZER,
         'custom_ar_w': 16, 'custom_ar_h': 9,
         'custom_w': DEFAULT_CUSTOM_WIDTH_OPTIMIZER, 'custom_h': DEFAULT_CUSTOM_HEIGHT_OPTIMIZER,
         'format_selector': FORMAT_OPTIONS_ORDER_OPTIMIZER[0], # Default zum ersten in der Liste
@@ -149,7 +161,7 @@ def calculate_cropper_aspect_parameter_optimizer(img_width, img_height, aspect_r
 
 def load_image_from_url_optimizer(url):
     try:
-        response = requests.get(url, stream=True, timeout=10)
+        response = get_http_session().get(url, stream=True, timeout=10)
         response.raise_for_status()
         img = Image.open(BytesIO(response.content))
         img = ImageOps.exif_transpose(img) # Wichtig für korrekte Orientierung
@@ -157,6 +169,47 @@ def load_image_from_url_optimizer(url):
     except Exception as e:
         return None, f"Fehler beim Laden von URL: {e}"
 
+def scale_cropped_optimizer(source: Image.Image, cropped: Image.Image, target_size: tuple) -> tuple:
+    """
+    Skaliert den Zuschnitt auf die Zielgröße. Jede Bewegung der Box ist ein Rerun, daher nur LANCZOS;
+    ESRGAN läuft erst auf Knopfdruck und gilt, bis sich Bild, Zuschnitt oder Zielgröße ändern.
+    Rückgabe: (Bild, mit Super-Resolution?).
+    """
+    if not upscaler_available() or not super_resolution_applies(cropped.size, target_size) or not st.checkbox(
+            "🔍 KI-Hochskalierung (Super-Resolution)", value=True, key=opt_prefix + "use_sr",
+            help="Vergrößert per lokalem ESRGAN-Modell, bevor auf die Zielgröße skaliert wird (nur wenn die Zielgröße den Zuschnitt übersteigt)."):
+        return resize_to_target(cropped, target_size, False), False
+
+    crop_box = st.session_state[opt_prefix + 'crop_box']
+    upscaled = st.session_state[opt_prefix + 'sr_result']
+    if upscaled and upscaled["source"] is source and upscaled["box"] == crop_box and upscaled["target_size"] == target_size:
+        return upscaled["image"], True
+    if st.button("🔍 Zuschnitt per KI hochskalieren", key=opt_prefix + "sr_btn", use_container_width=True):
+        with st.spinner("Skaliere per ESRGAN hoch..."):
+            image = resize_to_target(cropped, target_size, True)
+        st.session_state[opt_prefix + 'sr_result'] = {"source": source, "box": crop_box, "target_size": target_size, "image": image}
+        return image, True
+    st.caption("Vorschau ohne KI-Hochskalierung – erst den Zuschnitt wählen, dann hochskalieren.")
+    return resize_to_target(cropped, target_size, False), False
+
+def search_compression_optimizer(img: Image.Image, output_format: str, max_bytes, min_ssim):
+    """
+    Qualitätssuche (encode_to_target) nur auf Knopfdruck; das Ergebnis gilt, bis sich Bild, Format oder Vorgaben ändern.
+    Rückgabe: Info der Suche inkl. "data" oder None, solange noch nicht gesucht wurde.
+    """
+    digest = hashlib.blake2b(f"{img.mode}:{img.size}:{output_format}:{max_bytes}:{min_ssim}".encode("utf-8"), digest_size=16)
+    digest.update(img.tobytes())
+    cached = st.session_state[opt_prefix + 'encoded_result']
+    if cached and cached["key"] == digest.hexdigest():
+        return cached["info"]
+    if not st.button("🗜️ Optimale Kompression suchen", key=opt_prefix + "encode_btn", use_container_width=True):
+        return None
+    with st.spinner("Suche optimale Kompression..."):
+        encoded_bytes, enc_info = encode_to_target(img, output_format, max_bytes=max_bytes, min_ssim=min_ssim)
+    info = {**enc_info, "data": encoded_bytes}
+    st.session_state[opt_prefix + 'encoded_result'] = {"key": digest.hexdigest(), "info": info}
+    return info
+
 # --- Hauptanwendung für diese Seite ---
 def image_optimizer_page():
     init_optimizer_session_state() # Initialisiert mit Prefix
@@ -247,7 +300,26 @@ def image_optimizer_page():
                 index=["JPEG", "PNG", "WEBP"].index(st.session_state[opt_prefix + 'output_format']),
                 key=opt_prefix + f"out_fmt_sb_{st.session_state[opt_prefix + 'uploader_key']}"
             )
-            if st.session_state[opt_prefix + 'output_format'] == "JPEG":
+            if st.session_state[opt_prefix + 'output_format'] in SUPPORTED_SEARCH_FORMATS:
+                st.session_state[opt_prefix + 'compression_mode'] = st.radio(
+                    "Kompression:", COMPRESSION_MODES_OPTIMIZER,
+                    index=COMPRESSION_MODES_OPTIMIZER.index(st.session_state[opt_prefix + 'compression_mode']),
+                    key=opt_prefix + f"comp_mode_{st.session_state[opt_prefix + 'uploader_key']}"
+                )
+            compression_mode = st.session_state[opt_prefix + 'compression_mode']
+            if st.session_state[opt_prefix + 'output_format'] in SUPPORTED_SEARCH_FORMATS and compression_mode != COMPRESSION_MODES_OPTIMIZER[0]:
+                if "Zielgröße" in compression_mode:
+                    st.session_state[opt_prefix + 'target_kb'] = st.number_input(
+                        "Max. Dateigröße (KB):", min_value=10, max_value=20000, value=st.session_state[opt_prefix + 'target_kb'], step=10,
+                        key=opt_prefix + f"target_kb_{st.session_state[opt_prefix + 'uploader_key']}"
+                    )
+                if "SSIM" in compression_mode:
+                    st.session_state[opt_prefix + 'min_ssim'] = st.slider(
+                        "Min. SSIM:", 0.80, 0.999, st.session_state[opt_prefix + 'min_ssim'], 0.005, format="%.3f",
+                        key=opt_prefix + f"min_ssim_{st.session_state[opt_prefix + 'uploader_key']}"
+                    )
+                st.caption("Qualität und Chroma-Subsampling werden automatisch gesucht (JPEG progressiv, optimierte Huffman-Tabellen).")
+            elif st.session_state[opt_prefix + 'output_format'] == "JPEG":
                 st.session_state[opt_prefix + 'jpeg_quality'] = st.slider(
                     "JPEG Qualität:", 10, 100, st.session_state[opt_prefix + 'jpeg_quality'], 5,
                     key=opt_prefix + f"jpeg_ql_sl_{st.session_state[opt_prefix + 'uploader_key']}"
@@ -290,9 +362,12 @@ def image_optimizer_page():
             cropper_key_parts.append(f"{st.session_state[opt_prefix+'custom_w']}x{st.session_state[opt_prefix+'custom_h']}")
         cropper_key = "_".join(cropper_key_parts)
 
-        cropped_pil_image = st_cropper(og_pil_img, realtime_update=True, box_color="#FF4B4B",
-                                       aspect_ratio=cropper_aspect_param, key=cropper_key)
+        box = st_cropper(og_pil_img, realtime_update=True, box_color="#FF4B4B",
+                         aspect_ratio=cropper_aspect_param, return_type="box", key=cropper_key)
+        crop_box = (box["left"], box["top"], box["left"] + box["width"], box["top"] + box["height"])
+        cropped_pil_image = og_pil_img.crop(crop_box)
         st.session_state[opt_prefix + 'cropped_img'] = cropped_pil_image
+        st.session_state[opt_prefix + 'crop_box'] = crop_box
         st.caption(f"Aktueller Ausschnitt (vor Skalierung): {cropped_pil_image.width}x{cropped_pil_image.height}px")
 
     with col_box_controls:
@@ -322,8 +397,10 @@ def image_optimizer_page():
 
         # Wenn eine feste Zielgröße definiert ist, skaliere das zugeschnittene Bild
         if final_target_output_size:
-            final_img_to_display = st.session_state[opt_prefix + 'cropped_img'].resize(final_target_output_size, Image.Resampling.LANCZOS)
+            final_img_to_display, sr_used = scale_cropped_optimizer(og_pil_img, final_img_to_display, tuple(final_target_output_size))
             caption_text = f"Final skaliert auf: {final_target_output_size[0]}x{final_target_output_size[1]}px"
+            if sr_used:
+                caption_text += " (mit Super-Resolution)"
             current_output_dimensions = final_target_output_size
 
         st.image(final_img_to_display, caption=caption_text, use_container_width=True) # use_container_width für responsive Anzeige
@@ -349,7 +426,26 @@ def image_optimizer_page():
                  img_to_save = img_to_save.convert('RGBA')
 
 
-        img_to_save.save(buffer, format=output_format_selected.upper(), **save_args) # Format muss UPPERCASE sein
+        compression_mode = st.session_state[opt_prefix + 'compression_mode']
+        if output_format_selected in SUPPORTED_SEARCH_FORMATS and compression_mode != COMPRESSION_MODES_OPTIMIZER[0]:
+            max_bytes = st.session_state[opt_prefix + 'target_kb'] * 1024 if "Zielgröße" in compression_mode else None
+            min_ssim = st.session_state[opt_prefix + 'min_ssim'] if "SSIM" in compression_mode else None
+            enc_info = search_compression_optimizer(img_to_save, output_format_selected, max_bytes, min_ssim)
+            if enc_info is None:  # Noch keine Suche für diesen Zuschnitt: Export mit fester Qualität
+                img_to_save.save(buffer, format=output_format_selected.upper(), **save_args)
+                st.caption(f"Export mit fester Qualität ({buffer.tell() / 1024:.0f} KB) – erst den Zuschnitt wählen, dann komprimieren.")
+            else:
+                buffer.write(enc_info['data'])
+                status_text = (f"{enc_info['size'] / 1024:.0f} KB | Qualität {enc_info['quality']} | "
+                               f"Subsampling {enc_info['subsampling_label']} | SSIM {enc_info['ssim']:.4f}")
+                if not enc_info['within_budget']:
+                    st.warning(f"Budget nicht erreichbar, kleinste Variante verwendet: {status_text}")
+                elif min_ssim is not None and not enc_info['ssim_met']:
+                    st.warning(f"SSIM-Untergrenze nicht erreichbar: {status_text}")
+                else:
+                    st.caption(f"🗜️ {status_text}")
+        else:
+            img_to_save.save(buffer, format=output_format_selected.upper(), **save_args) # Format muss UPPERCASE sein
 
         download_filename = f"optimized_image_{current_output_dimensions[0]}x{current_output_dimensions[1]}.{file_extension}"
         st.download_button(
@@ -1,9 +1,7 @@
+import time
+_PAGE_IMPORT_START = time.perf_counter()
 import streamlit as st
-from PIL import Image, ImageOps
-from io import BytesIO
 import os
-import pandas as pd
-import requests
 from dotenv import load_dotenv
 import sys
 
@@ -14,36 +12,28 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 # -------------------------------------------------------------------- Imports
-from utils import load_css
-from logic.prompt_engine_concept import CATEGORIZED_ART_STYLES, build_concept_prompt
-from logic.generation_v1 import generate_dalle_image, get_best_dalle_size
-from logic.generation_advanced import generate_image_with_gpt_image_1_from_text, get_best_gpt_image_1_size
+from utils import get_secret, load_css
+from logic.instrumentation import record_page_startup
+from logic.prompt_engine_concept import CATEGORIZED_ART_STYLES, stream_concept_prompt
+from logic.generation_v1 import get_best_dalle_size
+from logic.pipeline import DRAFT_QUALITY, FINAL_QUALITY, MAX_DRAFTS, finalize_draft, generate_drafts, run_flow
+from logic.history import record_result
+from logic.banner_page import crop_banner, download_banner, update_target_size
 
 # ---------------------------------------------------------------- Streamlit
+record_page_startup("Concept Generator", time.perf_counter() - _PAGE_IMPORT_START)
 st.set_page_config(page_title="Concept Generator", page_icon="💡", layout="wide")
 load_css()
 
 # ---------------------------------------------------------------- OpenAI-Key
 load_dotenv(os.path.join(project_root, ".env"))
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
+# Der OpenAI-Client wird in logic/clients.py einmal pro Prozess erzeugt und liest den Key über get_secret
+if not get_secret("OPENAI_API_KEY"):
     st.error("OpenAI API-Key fehlt. Bitte in `.env` setzen.")
     st.stop()
-import openai
-openai.api_key = OPENAI_API_KEY
-
-# -------------------------------------------------------- optionale Abhängigkeit
-try:
-    from streamlit_cropper import st_cropper
-    CROPPER_AVAILABLE = True
-except ImportError:
-    CROPPER_AVAILABLE = False
 
 # ---------------------------------------------------------------- Konstanten
 OUTPUT_IMAGE_FORMAT = "JPEG"
-OUTPUT_IMAGE_QUALITY_DOWNLOAD = 95
-OUTPUT_IMAGE_EXTENSION = OUTPUT_IMAGE_FORMAT.lower()
-OUTPUT_IMAGE_MIME = f"image/{OUTPUT_IMAGE_EXTENSION}"
 DEFAULT_MODEL = "DALL·E 3"
 
 RATIO_OPTIONS_MAP = {
@@ -53,7 +43,6 @@ RATIO_OPTIONS_MAP = {
 DEFAULT_RATIO_KEY = "Wide Banner (4.54:1)"
 CUSTOM_DEFAULT_WIDTH = 3840
 CUSTOM_DEFAULT_HEIGHT = 2160
-CROPPER_ASPECT_DEFINITION_MAX_WIDTH = 700
 
 DALLE3_PRICING_CHF = {
     "standard": {"1024x1024": 0.04, "1792x1024": 0.08, "1024x1792": 0.08},
@@ -61,6 +50,8 @@ DALLE3_PRICING_CHF = {
 }
 GPT_IMAGE_1_PRICING_CHF = {"low": 0.01, "medium": 0.015, "high": 0.03, "auto": 0.015}
 PROMPT_ENHANCEMENT_COST_CHF = 0.01
+DRAFT_COUNT_DEFAULT = 2
+DRAFT_PREVIEW_WIDTH = 260
 
 # ------------------------------------------------------- Session-State & Callbacks
 PREFIX = "concept_bg_"
@@ -76,21 +67,20 @@ def initialize_session_state() -> None:
         "direct_prompt_mode": False, "model_choice": DEFAULT_MODEL,
         "ratio_choice": DEFAULT_RATIO_KEY, "custom_width": CUSTOM_DEFAULT_WIDTH, "custom_height": CUSTOM_DEFAULT_HEIGHT,
         "dalle_quality_choice": "standard", "gpt_quality_choice": "medium",
-        "generated_dalle_prompt": None, "ai_banner_img": None, "status_message": "", "is_generating": False
+        "generated_dalle_prompt": None, "ai_banner_img": None, "status_message": "", "is_generating": False,
+        "draft_mode": False, "draft_count": DRAFT_COUNT_DEFAULT, "drafts": None,
     }
     for k, v in defaults.items(): st.session_state.setdefault(key(k), v)
     _update_target_size_from_state()
 
 def _update_target_size_from_state() -> None:
-    if st.session_state[key("ratio_choice")] == "Custom":
-        st.session_state[key("target_size")] = (st.session_state[key("custom_width")], st.session_state[key("custom_height")])
-    else:
-        st.session_state[key("target_size")] = RATIO_OPTIONS_MAP.get(st.session_state[key("ratio_choice")])
+    update_target_size(PREFIX, RATIO_OPTIONS_MAP, DEFAULT_RATIO_KEY)
 
 def _reset_ai_states() -> None:
     st.session_state[key("generated_dalle_prompt")] = None
     st.session_state[key("ai_banner_img")] = None
     st.session_state[key("status_message")] = ""
+    st.session_state[key("drafts")] = None
 
 def _on_parameter_change():
     _update_target_size_from_state()
@@ -110,13 +100,16 @@ def _render_hero() -> None:
 def _render_step_header(step: int, title: str) -> None:
     st.markdown(f"<h2>{step}️⃣ Schritt {step}: {title}</h2>", unsafe_allow_html=True)
 
-def _get_total_cost() -> str:
+def _total_cost_chf() -> float | None:
     try:
         model = st.session_state[key("model_choice")]
         w, h = st.session_state[key("target_size")]
         ratio = w / h if h > 0 else 1
         
-        if model == "DALL·E 3":
+        if _draft_mode_active():
+            # Entwürfe plus ein finales Rendering (entfällt bei lokaler Hochskalierung)
+            gen_cost = st.session_state[key("draft_count")] * GPT_IMAGE_1_PRICING_CHF[DRAFT_QUALITY] + GPT_IMAGE_1_PRICING_CHF[FINAL_QUALITY]
+        elif model == "DALL·E 3":
             quality = st.session_state[key("dalle_quality_choice")]
             native_size = get_best_dalle_size(ratio)
             gen_cost = DALLE3_PRICING_CHF.get(quality, {}).get(native_size, 0)
@@ -127,8 +120,12 @@ def _get_total_cost() -> str:
         total_cost = gen_cost
         if not st.session_state[key("direct_prompt_mode")]:
             total_cost += PROMPT_ENHANCEMENT_COST_CHF
-        return f"~{total_cost:.2f} CHF"
-    except Exception: return "N/A"
+        return total_cost
+    except Exception: return None
+
+def _get_total_cost() -> str:
+    total_cost = _total_cost_chf()
+    return f"~{total_cost:.2f} CHF" if total_cost is not None else "N/A"
 
 def _select_options() -> None:
     # --- Modus & Eingabe ---
@@ -164,7 +161,12 @@ def _select_options() -> None:
         if st.session_state[key("model_choice")] == "DALL·E 3":
             st.radio("Qualität:", ["standard", "hd"], key=key("dalle_quality_choice"), on_change=_on_parameter_change, horizontal=True)
         else:
-            st.radio("Qualität:", ["auto", "low", "medium", "high"], key=key("gpt_quality_choice"), on_change=_on_parameter_change, horizontal=True)
+            st.checkbox(f"✏️ Erst Entwürfe ({DRAFT_QUALITY}), dann finalisieren", key=key("draft_mode"), on_change=_on_parameter_change,
+                        help=f"Schnelle, günstige Entwürfe in einer Anfrage; nur der gewählte wird in {FINAL_QUALITY} neu gerendert oder lokal hochskaliert.")
+            if st.session_state[key("draft_mode")]:
+                st.slider("Anzahl Entwürfe:", 1, MAX_DRAFTS, key=key("draft_count"), on_change=_on_parameter_change)
+            else:
+                st.radio("Qualität:", ["auto", "low", "medium", "high"], key=key("gpt_quality_choice"), on_change=_on_parameter_change, horizontal=True)
     
     st.markdown("##### Format")
     st.radio("Seitenverhältnis:", list(RATIO_OPTIONS_MAP.keys()), key=key("ratio_choice"), on_change=_on_parameter_change)
@@ -173,59 +175,95 @@ def _select_options() -> None:
         c1.number_input("Breite (px)", min_value=1, key=key("custom_width"), value=st.session_state[key("custom_width")], on_change=_on_parameter_change)
         c2.number_input("Höhe (px)", min_value=1, key=key("custom_height"), value=st.session_state[key("custom_height")], on_change=_on_parameter_change)
 
+def _draft_mode_active() -> bool:
+    return st.session_state[key("draft_mode")] and st.session_state[key("model_choice")] != "DALL·E 3"
+
 def _perform_generation() -> None: # Unverändert
     prompt_input = st.session_state[key("subject")].strip()
     if not prompt_input: st.warning("Bitte geben Sie ein Motiv oder einen Prompt ein."); return
     
     st.session_state[key("is_generating")] = True; _reset_ai_states(); st.session_state[key("is_generating")] = True
     
+    # Prompt-Anreicherung live streamen: die ersten Wörter erscheinen nach wenigen hundert Millisekunden
+    prompt_text = None
+    if not st.session_state[key("direct_prompt_mode")]:
+        st.markdown("##### 💡 Prompt wird erstellt…")
+        try:
+            prompt_text = (st.write_stream(stream_concept_prompt(prompt_input, st.session_state[key("style_choice")])) or "").strip()
+        except Exception as e:
+            st.session_state[key("status_message")] = f"Fehler bei der Prompt-Erstellung: {e}"
+            st.session_state[key("is_generating")] = False; return
+
     model_choice = st.session_state[key("model_choice")]
+    _update_target_size_from_state()
+    quality = st.session_state[key("dalle_quality_choice")] if model_choice == "DALL·E 3" else st.session_state[key("gpt_quality_choice")]
+    params = {
+        "subject": prompt_input,
+        "style": st.session_state[key("style_choice")],
+        "direct_prompt_mode": st.session_state[key("direct_prompt_mode")],
+        "prompt_text": prompt_text,
+        "model": model_choice,
+        "target_size": st.session_state[key("target_size")],
+        "quality": quality,
+    }
+    if _draft_mode_active():
+        count = st.session_state[key("draft_count")]
+        with st.spinner(f"✏️ {model_choice} erstellt {count} Entwürfe (Qualität: {DRAFT_QUALITY})..."):
+            try:
+                drafts = generate_drafts("concept", params, count)
+                st.session_state[key("drafts")] = drafts
+                st.session_state[key("generated_dalle_prompt")] = drafts.prompt
+            except Exception as e: st.session_state[key("status_message")] = f"Fehler bei Banner-Generierung: {e}"
+            finally: st.session_state[key("is_generating")] = False
+        return
+
     status_message = f"🖼️ {model_choice} generiert Banner..."
     with st.spinner(status_message):
         try:
-            _update_target_size_from_state()
-            prompt = prompt_input if st.session_state[key("direct_prompt_mode")] else build_concept_prompt(prompt_input, st.session_state[key("style_choice")])
-            st.session_state[key("generated_dalle_prompt")] = prompt
-            
-            w, h = st.session_state[key("target_size")]
-            ratio = w / h if h > 0 else 1
-
-            if model_choice == "DALL·E 3":
-                quality = st.session_state[key("dalle_quality_choice")]
-                native_size = get_best_dalle_size(ratio)
-                img_url = generate_dalle_image(prompt, native_size, quality)
-                resp = requests.get(img_url, timeout=45); resp.raise_for_status()
-                img = Image.open(BytesIO(resp.content))
-            else:
-                quality = st.session_state[key("gpt_quality_choice")]
-                native_size = get_best_gpt_image_1_size(ratio)
-                img = generate_image_with_gpt_image_1_from_text(prompt, native_size, quality)
-
-            st.session_state[key("ai_banner_img")] = img.convert("RGB")
+            _store_result(run_flow("concept", params, until="postprocess"), model_choice)
             st.session_state[key("status_message")] = "✅ Banner erfolgreich generiert!"
         except Exception as e: st.session_state[key("status_message")] = f"Fehler bei Banner-Generierung: {e}"
         finally: st.session_state[key("is_generating")] = False
 
-def _crop_and_download() -> None: # Unverändert
-    img_to_crop = st.session_state[key("ai_banner_img")]
-    if not img_to_crop: return 
-    target_w, target_h = st.session_state[key("target_size")]
-    if CROPPER_AVAILABLE:
-        aspect_def_w, aspect_def_h = target_w, target_h
-        if aspect_def_w > CROPPER_ASPECT_DEFINITION_MAX_WIDTH:
-            scale = CROPPER_ASPECT_DEFINITION_MAX_WIDTH / aspect_def_w
-            aspect_def_w, aspect_def_h = int(aspect_def_w * scale), int(aspect_def_h * scale)
-        if aspect_def_h <= 0: aspect_def_h = 1
-        cropped_pil_img = st_cropper(img_to_crop, realtime_update=True, box_color="#8c133a", aspect_ratio=(aspect_def_w, aspect_def_h), key=key("cropper"))
-        final_image = cropped_pil_img.resize((target_w, target_h), Image.Resampling.LANCZOS)
-    else: st.warning("`streamlit-cropper` nicht installiert."); final_image = img_to_crop
-    st.image(final_image, caption=f"Vorschau Banner ({target_w}×{target_h}px)", width=400)
-    img_byte_buffer = BytesIO(); save_kwargs_dl = {}
-    if OUTPUT_IMAGE_FORMAT == "JPEG":
-        save_kwargs_dl["quality"] = OUTPUT_IMAGE_QUALITY_DOWNLOAD
-        if final_image.mode in ("RGBA", "P"): final_image = final_image.convert("RGB")
-    final_image.save(img_byte_buffer, format=OUTPUT_IMAGE_FORMAT, **save_kwargs_dl)
-    st.download_button(f"📥 Banner herunterladen ({target_w}×{target_h}px)", data=img_byte_buffer.getvalue(), file_name=f"concept_banner_{target_w}x{target_h}.{OUTPUT_IMAGE_EXTENSION}", mime=OUTPUT_IMAGE_MIME, type="primary", use_container_width=True)
+def _store_result(result, model: str, cost_chf: float | None = None) -> None:
+    st.session_state[key("generated_dalle_prompt")] = result["prompt"]
+    st.session_state[key("ai_banner_img")] = result["postprocess"]
+    record_result(
+        result["postprocess"], "Concept Generator", model=model, prompt=result["prompt"],
+        params=result.public_params, cost_chf=cost_chf if cost_chf is not None else _total_cost_chf(), latency_s=result.elapsed,
+    )
+
+def _finalize_selected_draft(index: int, mode: str) -> None:
+    drafts = st.session_state[key("drafts")]
+    label = f"in {FINAL_QUALITY} neu gerendert" if mode == "rerender" else "Entwurf lokal weiterverarbeitet"
+    draft_cost = len(drafts.images) * GPT_IMAGE_1_PRICING_CHF[DRAFT_QUALITY]
+    final_cost = GPT_IMAGE_1_PRICING_CHF[FINAL_QUALITY] if mode == "rerender" else 0.0
+    enhancement_cost = 0.0 if st.session_state[key("direct_prompt_mode")] else PROMPT_ENHANCEMENT_COST_CHF
+    with st.spinner(f"🎯 Entwurf {index + 1}: {label}..."):
+        try:
+            result = finalize_draft(drafts, index, mode, until="postprocess")
+            _store_result(result, f"GPT-Image-1 (Entwurf {index + 1}, {label})", draft_cost + final_cost + enhancement_cost)
+            st.session_state[key("status_message")] = f"✅ Banner erfolgreich generiert! (Entwurf {index + 1}, {label})"
+        except Exception as e: st.session_state[key("status_message")] = f"Fehler bei Banner-Generierung: {e}"
+
+def _render_drafts() -> None:
+    drafts = st.session_state[key("drafts")]
+    if not drafts: return
+    st.caption(f"✏️ {len(drafts.images)} Entwürfe in {drafts.elapsed:.1f} s (Qualität: {DRAFT_QUALITY}). "
+               f"Wähle einen Entwurf: auf seiner Basis in {FINAL_QUALITY} neu rendern (Komposition bleibt) oder direkt lokal hochskalieren.")
+    cols = st.columns(len(drafts.images))
+    for i, (col, img) in enumerate(zip(cols, drafts.images)):
+        with col:
+            st.image(img, caption=f"Entwurf {i + 1}", width=DRAFT_PREVIEW_WIDTH)
+            if st.button(f"🎯 In {FINAL_QUALITY} rendern", key=key(f"draft_rerender_{i}"), use_container_width=True):
+                _finalize_selected_draft(i, "rerender"); st.rerun()
+            if st.button("🔍 Lokal hochskalieren", key=key(f"draft_upscale_{i}"), use_container_width=True):
+                _finalize_selected_draft(i, "upscale"); st.rerun()
+
+def _crop_and_download() -> None:
+    final_image = crop_banner(PREFIX)
+    if final_image is not None:
+        download_banner(PREFIX, final_image, "concept_banner", OUTPUT_IMAGE_FORMAT)
 
 # ---------------------------------------------------- Haupt-Page
 def concept_generator_page() -> None:
@@ -240,11 +278,16 @@ def concept_generator_page() -> None:
     cost = _get_total_cost()
     st.caption(f"📐 Zielgröße: {tw}x{th}px | 🤖 Modell: {st.session_state[key('model_choice')]} | 💰 Geschätzte Gesamtkosten: {cost}")
     cost_explanation = "*Gesamtkosten = Prompt-Anreicherung + Bildgenerierung.*" if not st.session_state[key("direct_prompt_mode")] else "*Gesamtkosten = Nur Bildgenerierung.*"
+    if _draft_mode_active():
+        cost_explanation += f" *Entwürfe ({DRAFT_QUALITY}) + ein finales Rendering ({FINAL_QUALITY}); lokale Hochskalierung spart Letzteres.*"
     st.caption(f"<small><i>{cost_explanation}</i></small>", unsafe_allow_html=True)
 
     _render_step_header(2, "KI-Banner generieren")
-    if st.button("🚀 KI-Banner generieren", type="primary", use_container_width=True, disabled=st.session_state[key("is_generating")]):
+    button_label = f"✏️ {st.session_state[key('draft_count')]} Entwürfe generieren ({DRAFT_QUALITY})" if _draft_mode_active() else "🚀 KI-Banner generieren"
+    if st.button(button_label, type="primary", use_container_width=True, disabled=st.session_state[key("is_generating")]):
         _perform_generation(); st.rerun()
+    if _draft_mode_active():
+        _render_drafts()
 
     if not st.session_state[key("is_generating")]:
         prompt_expander_label = "💡 Generierter Prompt (KI-erweitert)" if not st.session_state[key("direct_prompt_mode")] else "📝 Eigener Prompt"
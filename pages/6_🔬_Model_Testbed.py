@@ -1,11 +1,9 @@
+import time
+_PAGE_IMPORT_START = time.perf_counter()
 import streamlit as st
 from PIL import Image
 import os
-import time
-import requests
-from io import BytesIO
 import sys
-import openai
 
 # --- Pfade und Imports ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -13,15 +11,15 @@ project_root = os.path.dirname(current_dir)
 if project_root not in sys.path:
     sys.path.append(project_root)
 
-# Utils mit der neuen get_secret Funktion importieren
-from utils import load_css, get_secret
-from logic.generation_v1 import generate_dalle_image
-from logic.generation_stability import generate_image_with_stability_ai, get_best_stability_aspect_ratio
-from logic.generation_google import generate_image_with_google_imagen
-from logic.generation_advanced import generate_image_with_gpt_image_1_from_text, get_best_gpt_image_1_size
-from logic.generation_fal import generate_image_with_fal_flux_pro, generate_image_with_fal_flux_ultra, generate_image_with_ideogram_v3
+from utils import load_css
+from logic.instrumentation import record_page_startup
+from logic.clients import missing_secrets
+# Provider-Module werden erst geladen, wenn ein Modell tatsächlich ausgeführt wird
+from logic.providers import PROVIDER_ORDER, QUEUED_PROVIDERS, generate_with_provider, monitor_provider_jobs, submit_provider_job
+from logic.benchmark import DEFAULT_CONCURRENCY, DEFAULT_TRIALS, METRICS, TrialResult, histogram, run_benchmark, summarize, to_csv, to_json
 
 # --- Streamlit Page Konfiguration ---
+record_page_startup("Model Testbed", time.perf_counter() - _PAGE_IMPORT_START)
 st.set_page_config(page_title="AI Model Testbed", page_icon="🔬", layout="wide")
 load_css()
 
@@ -31,9 +29,12 @@ RATIO_OPTIONS_MAP_TESTBED = {"Landscape (16:9)": (1920, 1080), "Square (1:1)": (
 DALLE3_SIZE_MAP = {"Landscape (16:9)": "1792x1024", "Square (1:1)": "1024x1024", "Portrait (9:16)": "1024x1792"}
 DALLE3_PRICING_CHF = {"hd": {"1024x1024": 0.08, "1792x1024": 0.12, "1024x1792": 0.12}}
 GPT_IMAGE_1_PRICING_CHF = {"high": 0.03}
-STABILITY_AI_PRICING_CHF = {"Ultra": 0.08}
+STABILITY_AI_PRICING_CHF = {"Ultra": 0.08, "SD3": 0.065, "Core": 0.03}
 GOOGLE_IMAGEN_PRICING_CHF = {"Standard": 0.02}
 FAL_AI_PRICING_CHF = {"FLUX.1 Pro": "N/A", "FLUX.1.1 Ultra": "N/A", "Ideogram 3.0": "N/A"}
+MODES = ["Vergleich (ein Lauf)", "Benchmark (Wiederholungen)"]
+MAX_BENCHMARK_TRIALS = 20
+MAX_BENCHMARK_CONCURRENCY = 8
 
 # --- Session-State ---
 PREFIX = "testbed_"
@@ -43,6 +44,8 @@ def initialize_session_state():
         "prompt": "Hyperrealistic photograph of a single perfect red grape on a rustic wooden table, with a soft, out-of-focus vineyard in the background, golden hour lighting, cinematic.",
         "models_to_run": ["DALL·E 3", "GPT-Image-1"], "ratio_choice": "Landscape (16:9)",
         "results": {}, "is_generating": False,
+        "mode": MODES[0], "benchmark_prompts": "", "benchmark_trials": DEFAULT_TRIALS,
+        "benchmark_concurrency": DEFAULT_CONCURRENCY, "benchmark_results": None, "benchmark_meta": None,
     }
     for k, v in defaults.items(): st.session_state.setdefault(key(k), v)
 
@@ -52,10 +55,22 @@ def _render_hero():
 
 def _select_options():
     st.text_area("Master Prompt:", key=key("prompt"), height=150, help="Gib hier den Prompt ein, der an alle ausgewählten Modelle gesendet wird.")
-    available_models = ["DALL·E 3", "GPT-Image-1", "Google Imagen 2", "Stability AI (Ultra)", "FLUX.1 Pro", "FLUX.1.1 Ultra", "Ideogram 3.0"]
-    st.multiselect("Modelle zum Testen auswählen:", options=available_models, key=key("models_to_run"))
+    st.multiselect("Modelle zum Testen auswählen:", options=PROVIDER_ORDER, key=key("models_to_run"))
     st.radio("Seitenverhältnis:", list(RATIO_OPTIONS_MAP_TESTBED.keys()), key=key("ratio_choice"), horizontal=True)
 
+def _model_cost_chf(model: str) -> float | None:
+    """Kosten pro Bild wie in der Schätzung; None, wenn kein Preis hinterlegt ist."""
+    if model == "DALL·E 3":
+        return DALLE3_PRICING_CHF["hd"].get(DALLE3_SIZE_MAP[st.session_state[key("ratio_choice")]], 0)
+    if model == "GPT-Image-1":
+        return GPT_IMAGE_1_PRICING_CHF["high"]
+    if model == "Google Imagen 2":
+        return GOOGLE_IMAGEN_PRICING_CHF["Standard"]
+    if model.startswith("Stability AI ("):
+        return STABILITY_AI_PRICING_CHF[model[len("Stability AI ("):-1]]
+    cost = FAL_AI_PRICING_CHF.get(model)
+    return cost if isinstance(cost, (int, float)) else None
+
 def _get_cost_estimate_text() -> str:
     #... (Diese Funktion bleibt unverändert)
     models = st.session_state.get(key("models_to_run"), [])
@@ -72,9 +87,10 @@ def _get_cost_estimate_text() -> str:
         elif model == "Google Imagen 2":
             cost = GOOGLE_IMAGEN_PRICING_CHF["Standard"]
             cost_str = f"Google Imagen 2: ~{cost:.2f} CHF"
-        elif model == "Stability AI (Ultra)":
-            cost = STABILITY_AI_PRICING_CHF["Ultra"]
-            cost_str = f"Stability AI (Ultra): ~{cost:.2f} CHF"
+        elif model.startswith("Stability AI ("):
+            tier = model[len("Stability AI ("):-1]
+            cost = STABILITY_AI_PRICING_CHF[tier]
+            cost_str = f"{model}: ~{cost:.2f} CHF"
         elif model == "FLUX.1 Pro":
             cost = FAL_AI_PRICING_CHF["FLUX.1 Pro"]
             cost_str = f"FLUX.1 Pro: {cost}"
@@ -87,8 +103,17 @@ def _get_cost_estimate_text() -> str:
         cost_texts.append(cost_str)
     return " | ".join(cost_texts)
 
+FAL_STATUS_LABELS = {"queued": "⏳ In Warteschlange", "running": "⚙️ Läuft", "downloading": "⬇️ Lade Ergebnis", "done": "✅ Fertig", "error": "❌ Fehler"}
+
+def _fal_status_line(job) -> str:
+    label = FAL_STATUS_LABELS.get(job.status, job.status)
+    if job.status == "queued" and job.queue_position is not None:
+        label += f" (Position {job.queue_position})"
+    if job.status == "running" and job.logs:
+        label += f" – {job.logs[-1][:80]}"
+    return f"**{job.label}**: {label} · {job.elapsed:.1f} s"
+
 def _perform_generation():
-    #... (Diese Funktion bleibt unverändert)
     st.session_state[key("is_generating")] = True
     st.session_state[key("results")] = {}
     prompt = st.session_state[key("prompt")]
@@ -100,81 +125,144 @@ def _perform_generation():
     if not models: st.warning("Bitte mindestens ein Modell zum Testen auswählen."); st.session_state[key("is_generating")] = False; return
 
     progress_bar = st.progress(0, text="Starte Generierung...")
-    preferred_order = ["DALL·E 3", "GPT-Image-1", "Google Imagen 2", "Stability AI (Ultra)", "FLUX.1 Pro", "FLUX.1.1 Ultra", "Ideogram 3.0"]
-    models_to_run_sorted = sorted(models, key=lambda m: preferred_order.index(m) if m in preferred_order else 99)
+    models_to_run_sorted = sorted(models, key=lambda m: PROVIDER_ORDER.index(m) if m in PROVIDER_ORDER else 99)
+    results = st.session_state[key("results")]
+    completed = 0
 
-    for i, model_name in enumerate(models_to_run_sorted):
+    # Warteschlangen-Modelle (Fal) zuerst einreihen – sie laufen, während die übrigen Modelle generieren
+    fal_jobs = []
+    for model_name in [m for m in models_to_run_sorted if m in QUEUED_PROVIDERS]:
+        try:
+            fal_jobs.append(submit_provider_job(model_name, prompt, target_w, target_h))
+        except Exception as e:
+            results[model_name] = {"image": None, "time": None, "error": str(e)}
+            completed += 1
+    monitor = monitor_provider_jobs(fal_jobs) if fal_jobs else None
+
+    for model_name in [m for m in models_to_run_sorted if m not in QUEUED_PROVIDERS]:
         text = f"Generiere mit {model_name}..."; st.info(text)
-        progress_bar.progress((i + 1) / len(models_to_run_sorted), text=text)
+        progress_bar.progress(completed / len(models_to_run_sorted), text=text)
         try:
-            start_time = time.time(); image_result = None
-            if model_name == "DALL·E 3":
-                dalle_size = DALLE3_SIZE_MAP[ratio_key]
-                image_url = generate_dalle_image(prompt, dalle_size, quality="hd")
-                response = requests.get(image_url, timeout=45); response.raise_for_status()
-                image_result = Image.open(BytesIO(response.content))
-            elif model_name == "GPT-Image-1":
-                gpt_size = get_best_gpt_image_1_size(target_w / target_h if target_h > 0 else 1)
-                image_result = generate_image_with_gpt_image_1_from_text(prompt, gpt_size, quality="high")
-            elif model_name == "Google Imagen 2":
-                image_result = generate_image_with_google_imagen(prompt, target_w, target_h)
-            elif model_name == "Stability AI (Ultra)":
-                stability_ratio_str = get_best_stability_aspect_ratio(target_w, target_h)
-                image_result = generate_image_with_stability_ai(prompt, stability_ratio_str)
-            elif model_name == "FLUX.1 Pro":
-                fal_ratio_str = get_best_stability_aspect_ratio(target_w, target_h)
-                image_result = generate_image_with_fal_flux_pro(prompt, fal_ratio_str)
-            elif model_name == "FLUX.1.1 Ultra":
-                fal_ratio_str = get_best_stability_aspect_ratio(target_w, target_h)
-                image_result = generate_image_with_fal_flux_ultra(prompt, fal_ratio_str)
-            elif model_name == "Ideogram 3.0":
-                fal_ratio_str = get_best_stability_aspect_ratio(target_w, target_h)
-                image_result = generate_image_with_ideogram_v3(prompt, fal_ratio_str)
+            start_time = time.time()
+            image_result = generate_with_provider(model_name, prompt, target_w, target_h)
 
             end_time = time.time()
             if image_result:
-                st.session_state[key("results")][model_name] = {"image": image_result, "time": end_time - start_time, "error": None}
+                results[model_name] = {"image": image_result, "time": end_time - start_time, "error": None}
         except Exception as e:
-            st.session_state[key("results")][model_name] = {"image": None, "time": None, "error": str(e)}
+            results[model_name] = {"image": None, "time": None, "error": str(e)}
+        completed += 1
+
+    if monitor:
+        status_placeholder = st.empty()
+        for job in monitor.updates():
+            if job.finished:
+                results[job.label] = {"image": job.image, "time": job.elapsed if not job.error else None, "error": job.error}
+            done_count = completed + sum(1 for j in monitor.jobs if j.finished)
+            progress_bar.progress(done_count / len(models_to_run_sorted), text=f"Warte auf {len(monitor.pending)} Fal-Auftrag/-Aufträge...")
+            status_placeholder.markdown("  \n".join(_fal_status_line(j) for j in monitor.jobs))
+    progress_bar.progress(1.0, text="Fertig.")
     st.session_state[key("is_generating")] = False
 
+# --- Benchmark ---
+def _benchmark_prompts() -> list[str]:
+    extra = [line.strip() for line in st.session_state[key("benchmark_prompts")].splitlines() if line.strip()]
+    return [st.session_state[key("prompt")].strip()] + extra if st.session_state[key("prompt")].strip() else extra
+
+def _select_benchmark_options():
+    st.text_area("Weitere Prompts (einer pro Zeile, zusätzlich zum Master Prompt):", key=key("benchmark_prompts"), height=100)
+    col_trials, col_concurrency = st.columns(2)
+    col_trials.number_input("Wiederholungen pro Modell und Prompt:", min_value=1, max_value=MAX_BENCHMARK_TRIALS, key=key("benchmark_trials"))
+    col_concurrency.slider("Gleichzeitige Aufrufe:", 1, MAX_BENCHMARK_CONCURRENCY, key=key("benchmark_concurrency"),
+                           help="Obergrenze für parallele Aufrufe insgesamt; pro Modell laufen höchstens zwei gleichzeitig.")
+    models = st.session_state[key("models_to_run")]
+    calls = len(models) * len(_benchmark_prompts()) * st.session_state[key("benchmark_trials")]
+    known = [c for c in (_model_cost_chf(m) for m in models) if c is not None]
+    cost = sum(known) * len(_benchmark_prompts()) * st.session_state[key("benchmark_trials")]
+    st.caption(f"🧮 {calls} Aufrufe | 💰 ~{cost:.2f} CHF" + (" (ohne Modelle ohne Preisangabe)" if len(known) < len(models) else ""))
+
+def _perform_benchmark():
+    models = st.session_state[key("models_to_run")]
+    prompts = _benchmark_prompts()
+    if not prompts: st.warning("Bitte einen Prompt eingeben."); return
+    if not models: st.warning("Bitte mindestens ein Modell zum Testen auswählen."); return
+    st.session_state[key("is_generating")] = True
+    target_size = RATIO_OPTIONS_MAP_TESTBED[st.session_state[key("ratio_choice")]]
+    progress_bar = st.progress(0, text="Starte Benchmark...")
+
+    def on_result(result: TrialResult, done: int, total: int):
+        status = f"{result.latency_s:.1f} s" if result.ok else "Fehler"
+        progress_bar.progress(done / total, text=f"{done}/{total} · zuletzt {result.model}: {status}")
+
+    try:
+        results = run_benchmark(
+            models, prompts, st.session_state[key("benchmark_trials")], target_size,
+            max_concurrency=st.session_state[key("benchmark_concurrency")],
+            cost_per_call={m: _model_cost_chf(m) for m in models}, on_result=on_result,
+        )
+        st.session_state[key("benchmark_results")] = results
+        st.session_state[key("benchmark_meta")] = {
+            "prompts": prompts, "size": list(target_size), "concurrency": st.session_state[key("benchmark_concurrency")],
+        }
+    except Exception as e: st.error(f"Benchmark fehlgeschlagen: {e}")
+    finally: st.session_state[key("is_generating")] = False
+
+def _render_benchmark_results():
+    results = st.session_state[key("benchmark_results")]
+    if not results: return
+    meta = st.session_state[key("benchmark_meta")]
+    st.markdown("---"); st.markdown("<h2>Benchmark-Ergebnisse</h2>", unsafe_allow_html=True)
+    st.dataframe(summarize(results), hide_index=True, use_container_width=True)
+    st.caption("Perzentile nur über erfolgreiche Läufe. „Zeit bis Bilddaten“ = bis zum Beginn des Einlesens der Bildantwort (keine echte TTFB); bei base64-Antworten (OpenAI) erst, wenn die ganze Antwort vorliegt.")
+
+    metric_label = st.radio("Histogramm:", list(METRICS.values()), horizontal=True, key=key("benchmark_metric"))
+    metric = next(m for m, label in METRICS.items() if label == metric_label)
+    data = histogram(results, metric)
+    if data:
+        st.bar_chart(data, x="Bereich", y=[m for m in data if m != "Bereich"])
+    else:
+        st.info("Keine Messwerte für diese Kennzahl.")
+
+    errors = [r for r in results if not r.ok]
+    if errors:
+        with st.expander(f"❌ {len(errors)} fehlgeschlagene Aufrufe", expanded=False):
+            st.dataframe([{"Modell": r.model, "Prompt": r.prompt_index + 1, "Lauf": r.trial + 1, "Fehler": r.error} for r in errors],
+                         hide_index=True, use_container_width=True)
+
+    col_csv, col_json = st.columns(2)
+    col_csv.download_button("📥 Einzelergebnisse (.csv)", data=to_csv(results), file_name="testbed_benchmark.csv", mime="text/csv", use_container_width=True)
+    col_json.download_button("📥 Ergebnisse & Zusammenfassung (.json)", data=to_json(results, meta["prompts"], meta),
+                             file_name="testbed_benchmark.json", mime="application/json", use_container_width=True)
+
 # --- Haupt-Page ---
 def testbed_page():
-    # --- START DER KORREKTUR ---
-    # API-Schlüssel sicher laden mit der neuen Hilfsfunktion
-    openai.api_key = get_secret("OPENAI_API_KEY")
-    
-    # Für Bibliotheken, die os.environ nutzen
-    stability_key = get_secret("STABILITY_API_KEY")
-    if stability_key:
-        os.environ["STABILITY_API_KEY"] = stability_key
-        
-    fal_key = get_secret("FAL_KEY")
-    if fal_key:
-        os.environ["FAL_KEY"] = fal_key
-
+    # Die API-Clients (logic/clients.py) lesen ihre Schlüssel selbst über get_secret.
     # Google Credentials werden von der `generation_google`-Logik selbst geholt.
-    # Wir müssen hier nichts tun, außer sicherstellen, dass die .env-Variablen
-    # (für lokale Entwicklung) durch load_dotenv() in Image_Tools_Hub.py geladen werden.
-
-    # Optionale Prüfung, ob die Keys vorhanden sind
-    if not all([openai.api_key, stability_key, fal_key]):
-        st.warning("Ein oder mehrere API-Schlüssel (OpenAI, Stability, Fal) wurden nicht gefunden. Einige Modelle werden nicht funktionieren.")
-    # --- ENDE DER KORREKTUR ---
+    # Lokal stammen die Werte aus der .env, die Image_Tools_Hub.py per load_dotenv() lädt.
+    missing = missing_secrets(["OPENAI_API_KEY", "STABILITY_API_KEY", "FAL_KEY"])
+    if missing:
+        st.warning(f"API-Schlüssel nicht gefunden: {', '.join(missing)}. Einige Modelle werden nicht funktionieren.")
 
     initialize_session_state()
     _render_hero()
+    st.radio("Modus:", MODES, key=key("mode"), horizontal=True)
     _select_options()
     st.caption(f"💰 Geschätzte Kosten pro Bild: {_get_cost_estimate_text()}")
 
+    if st.session_state[key("mode")] == MODES[1]:
+        _select_benchmark_options()
+        if st.button("⏱️ Benchmark starten", type="primary", use_container_width=True, disabled=st.session_state[key("is_generating")]):
+            _perform_benchmark(); st.rerun()
+        _render_benchmark_results()
+        return
+
     if st.button("🚀 Modelle vergleichen", type="primary", use_container_width=True, disabled=st.session_state[key("is_generating")]):
         _perform_generation(); st.rerun()
 
     if st.session_state[key("results")]:
         st.markdown("---"); st.markdown("<h2>Ergebnisse</h2>", unsafe_allow_html=True)
-        preferred_order = ["DALL·E 3", "GPT-Image-1", "Google Imagen 2", "Stability AI (Ultra)", "FLUX.1 Pro", "FLUX.1.1 Ultra", "Ideogram 3.0"]
         valid_results = {k: v for k, v in st.session_state[key("results")].items() if v}
-        sorted_results = {k: valid_results[k] for k in preferred_order if k in valid_results}
+        sorted_results = {k: valid_results[k] for k in PROVIDER_ORDER if k in valid_results}
 
         if sorted_results:
             cols = st.columns(len(sorted_results))
@@ -1,10 +1,10 @@
+import time
+_PAGE_IMPORT_START = time.perf_counter()
 import streamlit as st
 from PIL import Image, ImageOps
 import os
-import requests
 from io import BytesIO
 import sys
-import pandas as pd
 
 # --------------------------------------------------------------------
 # Pfade und Imports
@@ -14,14 +14,19 @@ project_root = os.path.dirname(current_dir)
 if project_root not in sys.path:
     sys.path.append(project_root)
 
-from utils import load_css, load_sku_data, SKU_CSV_FILENAME
-from logic.prompt_engine_concept import CATEGORIZED_ART_STYLES, build_concept_prompt
-from logic.generation_v1 import generate_banner_prompt_gpt4
-from logic.prompt_engine_origin import build_origin_prompt
+from utils import get_secret, load_css, load_sku_data, find_sku_row, render_sku_search, SKU_CSV_FILENAME
+from logic.instrumentation import record_page_startup
+from logic.clients import get_http_session
+from logic.prompt_engine_concept import CATEGORIZED_ART_STYLES, stream_concept_prompt
+from logic.generation_v1 import stream_banner_prompt_gpt4
+from logic.prompt_engine_origin import stream_origin_prompt
+from logic.prompt_engine_v1 import build_autonomous_prompt, build_enrichment_context
+from logic.palette import analyse_label, build_fast_prompt, find_cached_cutout, to_prompt_fragment
 
 # --------------------------------------------------------------------
 # Streamlit Page Konfiguration
 # --------------------------------------------------------------------
+record_page_startup("Prompt Generator", time.perf_counter() - _PAGE_IMPORT_START)
 st.set_page_config(page_title="Prompt Generator", page_icon="✍️", layout="wide")
 load_css()
 
@@ -30,9 +35,8 @@ load_css()
 # --------------------------------------------------------------------
 from dotenv import load_dotenv
 load_dotenv(os.path.join(project_root, ".env"))
-import openai
-openai.api_key = os.getenv("OPENAI_API_KEY")
-if not openai.api_key:
+# Der OpenAI-Client wird in logic/clients.py einmal pro Prozess erzeugt und liest den Key über get_secret
+if not get_secret("OPENAI_API_KEY"):
     st.error("OPENAI_API_KEY nicht in .env gefunden.")
     st.stop()
 
@@ -40,6 +44,9 @@ if not openai.api_key:
 # Konstanten
 # --------------------------------------------------------------------
 PREVIEW_IMAGE_WIDTH = 220
+# Streaming-Quellen für _display_generated_prompt (Art -> Generator-Funktion)
+PROMPT_STREAMS = {"concept": stream_concept_prompt, "sku": stream_banner_prompt_gpt4, "origin": stream_origin_prompt}
+SKU_PROMPT_MODES = ["🧠 GPT-4o Vision", "⚡ Schnell (lokale Etikett-Analyse, ohne API)", "⚡+🧠 Lokale Analyse + GPT-4o-Anreicherung"]
 
 # --------------------------------------------------------------------
 # Session-State
@@ -56,12 +63,15 @@ def initialize_session_state():
         # Modus 2: SKU
         "sku_input": "",
         "sku_image": None,
+        "sku_prompt_mode": SKU_PROMPT_MODES[0],
+        "sku_analysis": None,
         # Modus 3: Herkunft
         "origin_wine_type": "Lagrein",
         "origin_region": "Südtirol, Italien",
         "origin_mood": "Realistisch & Elegant",
         # Allgemein
         "generated_prompt": "",
+        "pending_stream": None,
         "is_generating": False,
     }
     for k, v in defaults.items(): st.session_state.setdefault(key(k), v)
@@ -72,11 +82,41 @@ def initialize_session_state():
 def _render_hero():
     st.markdown( """<div class="hero-section" style="padding:1.5em 1em;margin-bottom:1.5em"> <h1 style="font-size:2em">✍️ Prompt Generator</h1> <p class="subtitle" style="font-size:1em">Erstelle hochwertige Prompts für KI-Bildgeneratoren auf verschiedene Weisen.</p> </div> """, unsafe_allow_html=True)
 
+def _render_label_analysis(analysis) -> None:
+    """Farbfelder der gemessenen Palette plus strukturiertes Fragment."""
+    swatches = "".join(
+        f"<div style='flex:{c.share:.3f};background:{c.hex};height:28px' title='{c.name} ({c.share:.0%})'></div>"
+        for c in analysis.colours
+    )
+    st.markdown(f"<div style='display:flex;border-radius:4px;overflow:hidden'>{swatches}</div>", unsafe_allow_html=True)
+    mask_source = "Freistellung aus dem Cut-out-Store" if analysis.used_cutout else "Randfarbe als Hintergrund"
+    st.caption(f"Lokale Etikett-Analyse in {analysis.elapsed_ms:.0f} ms · Maske: {mask_source}")
+    with st.expander("🎨 Prompt-Fragment", expanded=False):
+        st.code(to_prompt_fragment(analysis), language="text")
+
+def _request_prompt_stream(kind: str, *args) -> None:
+    """Merkt einen Prompt zum Streamen vor; geschrieben wird er in _display_generated_prompt."""
+    st.session_state[key("pending_stream")] = (kind, args)
+    st.session_state[key("generated_prompt")] = ""
+
 def _display_generated_prompt():
-    """Zeigt das Textfeld für den generierten Prompt an."""
-    if st.session_state[key("generated_prompt")]:
+    """Streamt einen vorgemerkten Prompt Wort für Wort und zeigt danach das Textfeld zum Kopieren an."""
+    pending = st.session_state[key("pending_stream")]
+    st.session_state[key("pending_stream")] = None
+    if pending or st.session_state[key("generated_prompt")]:
         st.markdown("---")
         st.markdown("#### Ihr generierter Prompt:")
+    if pending:
+        kind, args = pending
+        placeholder = st.empty()
+        try:
+            with placeholder.container():
+                streamed = st.write_stream(PROMPT_STREAMS[kind](*args))
+            st.session_state[key("generated_prompt")] = (streamed or "").strip()
+        except Exception as e:
+            st.error(f"Fehler bei der Prompt-Erstellung: {e}")
+        placeholder.empty()
+    if st.session_state[key("generated_prompt")]:
         st.code(
             st.session_state[key("generated_prompt")],
             language='text',
@@ -109,21 +149,14 @@ def tab_from_concept():
         style = st.session_state[key("concept_style")]
         if not subject.strip():
             st.warning("Bitte geben Sie ein Motiv / Thema ein."); return
-        
-        st.session_state[key("is_generating")] = True
-        with st.spinner("KI erweitert Ihre Idee zu einem detaillierten Prompt..."):
-            try:
-                prompt = build_concept_prompt(subject, style)
-                st.session_state[key("generated_prompt")] = prompt
-            except Exception as e:
-                st.error(f"Fehler bei der Prompt-Erstellung: {e}")
-            finally:
-                st.session_state[key("is_generating")] = False
+        _request_prompt_stream("concept", subject, style)
 
 def tab_from_sku(df_skus):
+    import pandas as pd  # Lazy: ist durch load_sku_data bereits geladen
     st.markdown("#### 1. Geben Sie die Produkt-SKU an")
-    st.text_input("SKU:", key=key("sku_input"))
+    render_sku_search(key("sku_input"), df_skus, "SKU:")
     
+    st.radio("Analyse:", SKU_PROMPT_MODES, key=key("sku_prompt_mode"), horizontal=True)
     if st.session_state[key("sku_image")]:
         st.image(st.session_state[key("sku_image")], caption="Analysiertes Bild", width=PREVIEW_IMAGE_WIDTH)
 
@@ -134,34 +167,41 @@ def tab_from_sku(df_skus):
             st.warning("Bitte eine SKU eingeben."); return
             
         st.session_state[key("is_generating")] = True
-        with st.spinner(f"Lade & analysiere Bild für SKU {sku}..."):
+        with st.spinner(f"Lade Bild für SKU {sku}..."):
             try:
                 # Bild laden
-                match = df_skus[df_skus["sku"].astype(str).str.lower() == sku.lower()]
-                if match.empty or pd.isna(match.iloc[0]["image_url"]):
+                match = find_sku_row(df_skus, sku)
+                if match is None or pd.isna(match["image_url"]):
                     st.error(f"Für SKU '{sku}' wurde kein gültiges Bild gefunden.")
                     st.session_state[key("is_generating")] = False
                     return
                 
-                resp = requests.get(match.iloc[0]["image_url"], timeout=15); resp.raise_for_status()
+                image_url = str(match["image_url"]).strip()
+                resp = get_http_session().get(image_url, timeout=15); resp.raise_for_status()
                 img = Image.open(BytesIO(resp.content)); img = ImageOps.exif_transpose(img).convert("RGB")
                 st.session_state[key("sku_image")] = img
-                
-                # Dummy-System-Prompt; der eigentliche wird in der v1-Logik verwendet
-                # NOTE: Die Funktion `generate_banner_prompt_gpt4` aus logic.generation_v1 erwartet einen system_prompt.
-                # In der Implementierung des Classic Banner Generators wird `build_autonomous_prompt` aus `prompt_engine_v1` verwendet.
-                # Hier wurde ein leerer String übergeben, was zu Fehlern führen kann. Wir verwenden den korrekten autonomen Prompt.
-                from logic.prompt_engine_v1 import build_autonomous_prompt
-                system_prompt = build_autonomous_prompt()
-
-                prompt = generate_banner_prompt_gpt4(img, system_prompt)
-                st.session_state[key("generated_prompt")] = prompt
+                st.session_state[key("sku_analysis")] = None
+
+                mode_index = SKU_PROMPT_MODES.index(st.session_state[key("sku_prompt_mode")])
+                if mode_index == 0:
+                    _request_prompt_stream("sku", img, build_autonomous_prompt())
+                else:
+                    # Lokale Analyse (Freistellung als Maske, falls bereits im Cut-out-Store)
+                    analysis = analyse_label(img, find_cached_cutout(image_url))
+                    st.session_state[key("sku_analysis")] = analysis
+                    if mode_index == 1:
+                        st.session_state[key("generated_prompt")] = build_fast_prompt(analysis)
+                    else:
+                        _request_prompt_stream("sku", img, build_autonomous_prompt(), build_enrichment_context(to_prompt_fragment(analysis)))
 
             except Exception as e:
                 st.error(f"Fehler bei der SKU-Verarbeitung: {e}")
             finally:
                 st.session_state[key("is_generating")] = False
 
+    if st.session_state[key("sku_analysis")]:
+        _render_label_analysis(st.session_state[key("sku_analysis")])
+
 def tab_from_origin():
     st.markdown("#### 1. Beschreiben Sie den Wein")
     col1, col2 = st.columns(2)
@@ -180,16 +220,7 @@ def tab_from_origin():
         mood = st.session_state[key("origin_mood")]
         if not wine_type.strip() or not origin.strip():
             st.warning("Bitte geben Sie Weintyp und Herkunft an."); return
-            
-        st.session_state[key("is_generating")] = True
-        with st.spinner("KI erstellt einen atmosphärischen Prompt basierend auf der Herkunft..."):
-            try:
-                prompt = build_origin_prompt(wine_type, origin, mood)
-                st.session_state[key("generated_prompt")] = prompt
-            except Exception as e:
-                st.error(f"Fehler bei der Prompt-Erstellung: {e}")
-            finally:
-                st.session_state[key("is_generating")] = False
+        _request_prompt_stream("origin", wine_type, origin, mood)
 
 # --------------------------------------------------------------------
 # Haupt-Page
@@ -0,0 +1,131 @@
+import time
+_PAGE_IMPORT_START = time.perf_counter()
+import streamlit as st
+from datetime import datetime
+import os
+import sys
+
+# --- Pfade und Imports ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils import load_css
+from logic.instrumentation import record_page_startup
+from logic.history import (
+    count_results, delete_result, get_result, list_pages, list_results,
+    load_image_bytes, load_thumbnail_bytes,
+)
+
+# --- Streamlit Page Konfiguration ---
+record_page_startup("History Gallery", time.perf_counter() - _PAGE_IMPORT_START)
+st.set_page_config(page_title="Verlauf", page_icon="🗂️", layout="wide")
+load_css()
+
+# --- Konstanten ---
+GRID_COLUMNS = 4
+PAGE_SIZE_OPTIONS = [12, 24, 48]
+ALL_PAGES_LABEL = "Alle"
+
+# --- Session-State ---
+PREFIX = "history_"
+def key(k: str) -> str: return f"{PREFIX}{k}"
+def initialize_session_state():
+    defaults = {"page_index": 0, "page_size": PAGE_SIZE_OPTIONS[0], "filter_page": ALL_PAGES_LABEL,
+                "filter_sku": "", "filter_search": "", "selected_id": None}
+    for k, v in defaults.items(): st.session_state.setdefault(key(k), v)
+
+def _on_filter_change():
+    st.session_state[key("page_index")] = 0
+    st.session_state[key("selected_id")] = None
+
+# --- UI-Funktionen ---
+def _render_hero():
+    st.markdown( """<div class="hero-section" style="padding:1.5em 1em;margin-bottom:1.5em"> <h1 style="font-size:2em">🗂️ Verlauf</h1> <p class="subtitle" style="font-size:1em">Alle generierten Banner – ohne erneute Generierung wieder öffnen und herunterladen.</p> </div> """, unsafe_allow_html=True)
+
+def _filters() -> dict:
+    c1, c2, c3, c4 = st.columns([0.25, 0.2, 0.4, 0.15])
+    c1.selectbox("Seite:", [ALL_PAGES_LABEL] + list_pages(), key=key("filter_page"), on_change=_on_filter_change)
+    c2.text_input("SKU:", key=key("filter_sku"), on_change=_on_filter_change)
+    c3.text_input("Suche in Prompt/Modell:", key=key("filter_search"), on_change=_on_filter_change)
+    c4.selectbox("Pro Seite:", PAGE_SIZE_OPTIONS, key=key("page_size"), on_change=_on_filter_change)
+    page = st.session_state[key("filter_page")]
+    return {
+        "page": None if page == ALL_PAGES_LABEL else page,
+        "sku": st.session_state[key("filter_sku")].strip() or None,
+        "search": st.session_state[key("filter_search")].strip() or None,
+    }
+
+def _pagination(total: int) -> None:
+    page_size = st.session_state[key("page_size")]
+    page_count = max(1, -(-total // page_size))
+    st.session_state[key("page_index")] = min(st.session_state[key("page_index")], page_count - 1)
+    c1, c2, c3 = st.columns([0.2, 0.6, 0.2])
+    if c1.button("◀ Zurück", disabled=st.session_state[key("page_index")] == 0, use_container_width=True):
+        st.session_state[key("page_index")] -= 1; st.rerun()
+    c2.markdown(f"<div style='text-align:center'>Seite {st.session_state[key('page_index')] + 1} von {page_count} ({total} Einträge)</div>", unsafe_allow_html=True)
+    if c3.button("Weiter ▶", disabled=st.session_state[key("page_index")] >= page_count - 1, use_container_width=True):
+        st.session_state[key("page_index")] += 1; st.rerun()
+
+def _render_grid(entries) -> None:
+    for row_start in range(0, len(entries), GRID_COLUMNS):
+        cols = st.columns(GRID_COLUMNS)
+        for col, entry in zip(cols, entries[row_start:row_start + GRID_COLUMNS]):
+            with col:
+                thumb = load_thumbnail_bytes(entry.image_hash)
+                if thumb: st.image(thumb, use_container_width=True)
+                else: st.warning("Vorschau fehlt.")
+                created = datetime.fromtimestamp(entry.created_at).strftime("%d.%m.%Y %H:%M")
+                st.caption(f"{created} · {entry.page}" + (f" · SKU {entry.sku}" if entry.sku else ""))
+                if st.button("🔎 Öffnen", key=key(f"open_{entry.id}"), use_container_width=True):
+                    st.session_state[key("selected_id")] = entry.id; st.rerun()
+
+def _render_detail(entry_id: int) -> None:
+    entry = get_result(entry_id)
+    if entry is None:
+        st.session_state[key("selected_id")] = None; return
+    data = load_image_bytes(entry.image_hash)  # Nur ein Lesezugriff, kein API-Aufruf
+    st.markdown("---")
+    img_col, info_col = st.columns([0.65, 0.35])
+    with img_col:
+        if data: st.image(data, caption=f"{entry.width}×{entry.height}px", use_container_width=True)
+        else: st.error("Bilddatei fehlt im Verlauf.")
+    with info_col:
+        st.markdown(f"**Seite:** {entry.page}  \n**Modell:** {entry.model or '–'}  \n**SKU:** {entry.sku or '–'}")
+        cost = f"{entry.cost_chf:.2f} CHF" if entry.cost_chf is not None else "–"
+        latency = f"{entry.latency_s:.1f} s" if entry.latency_s is not None else "–"
+        st.markdown(f"**Kosten:** {cost}  \n**Dauer:** {latency}")
+        if entry.params:
+            with st.expander("⚙️ Parameter", expanded=False): st.json(entry.params)
+        if entry.prompt:
+            with st.expander("💡 Prompt", expanded=False): st.code(entry.prompt, language="text")
+        if data:
+            st.download_button("📥 Original herunterladen (.png)", data=data, file_name=f"banner_{entry.id}_{entry.width}x{entry.height}.png", mime="image/png", type="primary", use_container_width=True)
+        c1, c2 = st.columns(2)
+        if c1.button("✖️ Schließen", use_container_width=True):
+            st.session_state[key("selected_id")] = None; st.rerun()
+        if c2.button("🗑️ Löschen", use_container_width=True):
+            delete_result(entry.id)
+            st.session_state[key("selected_id")] = None; st.rerun()
+
+# --- Haupt-Page ---
+def history_gallery_page():
+    initialize_session_state()
+    _render_hero()
+    filters = _filters()
+    total = count_results(**filters)
+    if total == 0:
+        st.info("Noch keine Einträge im Verlauf. Generierte Banner erscheinen hier automatisch."); return
+
+    if st.session_state[key("selected_id")] is not None:
+        _render_detail(st.session_state[key("selected_id")])
+        st.markdown("---")
+
+    page_size = st.session_state[key("page_size")]
+    _pagination(total)
+    entries = list_results(offset=st.session_state[key("page_index")] * page_size, limit=page_size, **filters)
+    _render_grid(entries)
+
+if __name__ == "__main__":
+    history_gallery_page()
@@ -1,7 +1,11 @@
+from __future__ import annotations
 import streamlit as st
-import pandas as pd
 import os
 from io import BytesIO # Nur wenn Download-Helfer hier wären
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd  # pandas wird erst beim ersten Laden der SKU-Daten importiert
 
 # --- Gemeinsame Konstanten ---
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
@@ -13,17 +17,16 @@ def get_secret(key: str) -> str | None:
     """
     Ruft einen Secret-Wert sicher ab.
     Versucht zuerst, aus st.secrets zu lesen (für Streamlit Cloud).
-    Wenn das fehlschlägt (lokale Ausführung), wird auf os.getenv() zurückgegriffen.
+    Wenn das fehlschlägt (lokale Ausführung) oder der Key dort fehlt, wird auf os.getenv() zurückgegriffen.
     """
     try:
         # Dieser Block wird in der Streamlit Cloud ausgeführt
         if key in st.secrets:
             return st.secrets[key]
-        else:
-            return None
-    except st.errors.StreamlitAPIException:
-        # Dieser Block wird bei lokaler Ausführung ausgeführt, da st.secrets nicht verfügbar ist
-        return os.getenv(key)
+    except (st.errors.StreamlitAPIException, FileNotFoundError):
+        # Lokale Ausführung ohne secrets.toml (auch außerhalb von Streamlit, z. B. in CLI-Jobs)
+        pass
+    return os.getenv(key)
 
 # --- Bestehende Funktionen (unverändert) ---
 
@@ -36,39 +39,21 @@ def load_css(css_filename: str = "style.css"):
     except FileNotFoundError:
         st.warning(f"CSS-Datei nicht gefunden: {css_file_path}. Stelle sicher, dass sie im '{ASSETS_DIR}' Ordner liegt.")
 
-@st.cache_data
 def load_sku_data(path: str = SKU_CSV_FILENAME) -> pd.DataFrame:
     """
-    Lädt SKU-Daten aus einer CSV-Datei.
-    Bereinigt Spaltennamen und behandelt potenzielle Fehler.
+    Lädt SKU-Daten über den spaltenorientierten Katalog-Snapshot (siehe logic/catalogue.py).
+    Alle Seiten erhalten denselben DataFrame ohne Kopie – er darf nicht verändert werden.
+    Spalten: sku, image_url, background_image_url_opt, name (+ interner Zeilen-Hash).
     """
-    try:
-        df = pd.read_csv(path, sep=";", encoding="utf-8-sig", dtype={"sku": str})
-        df.columns = [str(col).strip().lower() for col in df.columns]
-
-        if "sku" not in df.columns:
-            st.error(f"FEHLER: Die CSV-Datei unter '{path}' muss eine Spalte 'sku' enthalten.")
-            return pd.DataFrame(columns=["sku", "image_url", "background_image_url_opt"])
-
-        df["sku"] = df["sku"].astype(str).str.strip()
-
-        if "image_url" not in df.columns and "bild" in df.columns:
-            df.rename(columns={"bild": "image_url"}, inplace=True)
-        elif "image_url" not in df.columns and "bild" not in df.columns:
-            df["image_url"] = None
-
-        if "background_image_url_opt" not in df.columns and "hintergrundbild" in df.columns:
-            df.rename(columns={"hintergrundbild": "background_image_url_opt"}, inplace=True)
-        elif "background_image_url_opt" not in df.columns and "hintergrundbild" not in df.columns:
-            df["background_image_url_opt"] = None
+    import pandas as pd
+    from logic.catalogue import get_catalogue  # Lazy, da logic.catalogue selbst utils importiert
 
-        final_expected_cols = ["sku", "image_url", "background_image_url_opt"]
-        for col in final_expected_cols:
-            if col not in df.columns:
-                df[col] = None
-
-        return df[final_expected_cols]
+    try:
+        return get_catalogue(path)
 
+    except ValueError as e:
+        st.error(f"FEHLER: {e}")
+        return pd.DataFrame(columns=["sku", "image_url", "background_image_url_opt"])
     except FileNotFoundError:
         st.error(f"FEHLER: Die SKU-Datendatei '{path}' wurde nicht gefunden.")
         return pd.DataFrame(columns=["sku", "image_url", "background_image_url_opt"])
@@ -76,6 +61,79 @@ def load_sku_data(path: str = SKU_CSV_FILENAME) -> pd.DataFrame:
         st.error(f"Ein Fehler ist beim Laden der SKU-Daten von '{path}' aufgetreten: {e}.")
         return pd.DataFrame(columns=["sku", "image_url", "background_image_url_opt"])
 
+def find_sku_row(df: pd.DataFrame, sku: str) -> pd.Series | None:
+    """Exakte SKU-Suche über den Index statt eines vollständigen Spaltenvergleichs."""
+    from logic.sku_search import get_search_index
+
+    row = get_search_index(df).row_of(sku)
+    return df.iloc[row] if row is not None else None
+
+def render_sku_search(state_key: str, df: pd.DataFrame, label: str = "SKU suchen:") -> str | None:
+    """
+    Gemeinsames Such-Feld für SKUs (Präfix + unscharfe Suche über SKU und Produktname).
+    Die gewählte SKU wird in st.session_state[state_key] abgelegt und zurückgegeben.
+    """
+    from logic.sku_search import get_search_index, timed_search
+
+    query = st.text_input(label, key=f"{state_key}_query", placeholder="SKU oder Produktname …")
+    if not query.strip():
+        st.session_state[state_key] = ""
+        return None
+
+    results, elapsed_ms = timed_search(get_search_index(df), query)
+    if not results:
+        st.caption(f"Keine Treffer für '{query}'.")
+        st.session_state[state_key] = ""
+        return None
+
+    names = {r["sku"]: r["name"] for r in results}
+    choice = st.selectbox(
+        "Treffer:", [r["sku"] for r in results], key=f"{state_key}_choice",
+        format_func=lambda s: f"{s} – {names[s]}" if names.get(s) else s,
+    )
+    st.caption(f"{len(results)} Treffer in {elapsed_ms:.1f} ms")
+    st.session_state[state_key] = choice
+    return choice
+
+def render_startup_report() -> None:
+    """Zeigt die gemessenen Import-/Startzeiten der Seiten in diesem Prozess an."""
+    from logic.instrumentation import page_startup_report, loaded_heavy_modules
+
+    rows = page_startup_report()
+    with st.expander("⏱️ Startzeiten der Seiten", expanded=False):
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.caption("Noch keine Seite geladen.")
+        heavy = loaded_heavy_modules()
+        st.caption(f"Geladene schwere Bibliotheken: {', '.join(heavy) if heavy else '–'}")
+        st.caption("Kaltstart pro Seite in frischen Prozessen messen: `python -m logic.instrumentation`")
+
+def render_api_usage_report() -> None:
+    """Zeigt Tokens, Prompt-Cache-Anteil und Latenzen der GPT-4o-Aufrufe in diesem Prozess an."""
+    from logic.instrumentation import api_call_report
+
+    rows = api_call_report()
+    with st.expander("🧾 GPT-4o-Aufrufe & Prompt-Cache", expanded=False):
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.caption("Noch keine Aufrufe in diesem Prozess.")
+        st.caption("OpenAI cacht gleichbleibende Prompt-Anfänge ab 1024 Tokens; gecachte Tokens sind günstiger und verkürzen die Zeit bis zum ersten Token.")
+    render_image_transfer_report()
+
+def render_image_transfer_report() -> None:
+    """Zeigt Größe und Dekodierzeit der Bildantworten (logic.transport) in diesem Prozess an."""
+    from logic.instrumentation import image_transfer_report
+
+    rows = image_transfer_report()
+    with st.expander("📦 Bildantworten der Provider (Bytes & Dekodierung)", expanded=False):
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.caption("Noch keine Bildantworten in diesem Prozess.")
+        st.caption("gpt-image-1 liefert JPEG statt PNG, Fal das Bild inline statt per CDN-URL; bei Downloads enthält die Zeit die Übertragung.")
+
 def set_global_setting(key, value):
     st.session_state[key] = value
 